@@ -12,7 +12,7 @@ from .firetv import FireTV
 __version__ = '0.0.4'
 
 
-async def setup(host, port=5555, adbkey='', state_detection_rules=None, device_class='auto', auth_timeout_s=DEFAULT_AUTH_TIMEOUT_S):
+async def setup(host, port=5555, adbkey='', state_detection_rules=None, device_class='auto', auth_timeout_s=DEFAULT_AUTH_TIMEOUT_S, persistent_shell=False, max_streams=1, volume_cache_ttl_s=0., auth_executor=None, tcp_keepalive_s=None):
     """Connect to a device and determine whether it's an Android TV or an Amazon Fire TV.
 
     Parameters
@@ -33,6 +33,16 @@ async def setup(host, port=5555, adbkey='', state_detection_rules=None, device_c
         The type of device: ``'auto'`` (detect whether it is an Android TV or Fire TV device), ``'androidtv'``, or ``'firetv'```
     auth_timeout_s : float
         Authentication timeout (in seconds)
+    persistent_shell : bool
+        Whether to run shell commands in a long-lived shell session instead of opening a new ADB stream for each command
+    max_streams : int
+        The maximum number of ADB commands that can be in flight at the same time (default is 1)
+    volume_cache_ttl_s : float
+        How long (in seconds) the volume properties can be answered from the last parsed ``STREAM_MUSIC`` block instead of querying the device (default is 0, i.e., no caching)
+    auth_executor : concurrent.futures.Executor, None
+        The executor (e.g., a ``ThreadPoolExecutor`` or ``ProcessPoolExecutor``) in which the token is signed during ADB authentication, or ``None`` to sign it on the event loop
+    tcp_keepalive_s : float, None
+        If not ``None``, enable TCP keepalive on the connection with this idle time and probe interval (in seconds), so that a dead connection is dropped by the OS
 
     Returns
     -------
@@ -41,13 +51,13 @@ async def setup(host, port=5555, adbkey='', state_detection_rules=None, device_c
 
     """
     if device_class == 'androidtv':
-        atv = AndroidTV(host, port, adbkey, state_detection_rules)
+        atv = AndroidTV(host, port, adbkey, state_detection_rules, persistent_shell, max_streams, volume_cache_ttl_s, auth_executor, tcp_keepalive_s)
         await atv.adb_connect(auth_timeout_s=auth_timeout_s)
         atv.device_properties = await atv.get_device_properties()
         return atv
 
     if device_class == 'firetv':
-        ftv = FireTV(host, port, adbkey, state_detection_rules)
+        ftv = FireTV(host, port, adbkey, state_detection_rules, persistent_shell, max_streams, volume_cache_ttl_s, auth_executor, tcp_keepalive_s)
         await ftv.adb_connect(auth_timeout_s=auth_timeout_s)
         ftv.device_properties = await ftv.get_device_properties()
         return ftv
@@ -55,7 +65,7 @@ async def setup(host, port=5555, adbkey='', state_detection_rules=None, device_c
     if device_class != 'auto':
         raise ValueError("`device_class` must be 'androidtv', 'firetv', or 'auto'.")
 
-    aftv = BaseTV(host, port, adbkey, state_detection_rules)
+    aftv = BaseTV(host, port, adbkey, state_detection_rules, persistent_shell, max_streams, volume_cache_ttl_s, auth_executor, tcp_keepalive_s)
 
     # establish the ADB connection
     await aftv.adb_connect(auth_timeout_s=auth_timeout_s)
@@ -1,6 +1,8 @@
 """Classes to manage ADB connections.
 
 * :py:class:`ADBPython` utilizes a Python implementation of the ADB protocol.
+* :py:class:`KeyStore` caches the RSA signers that are used for ADB authentication (see :py:data:`KEY_STORE`).
+* :py:class:`ShellSession` runs commands one after another in a long-lived interactive shell.
 
 """
 
@@ -8,29 +10,51 @@
 import asyncio
 from contextlib import asynccontextmanager
 import logging
+import os
+import socket
+import time
 
-from aio_adb_shell.adb_device import AdbDeviceTcp
+from aio_adb_shell import constants as adb_constants
+from aio_adb_shell.adb_device import AdbDeviceTcp, _AdbTransactionInfo
+from aio_adb_shell.adb_message import AdbMessage
 from aio_adb_shell.auth.sign_pythonrsa import PythonRSASigner
+from aio_adb_shell.exceptions import InvalidCommandError, InvalidResponseError, TcpTimeoutException
 
-from .constants import DEFAULT_AUTH_TIMEOUT_S
-from .exceptions import LockNotAcquiredException
+from .constants import DEFAULT_AUTH_TIMEOUT_S, DEFAULT_PROBE_TIMEOUT_S
+from .exceptions import CommandTimeoutException, LockNotAcquiredException, ShellSessionClosedException
+from .scheduler import CommandScheduler, PRIORITY_BULK, PRIORITY_INTERACTIVE, PRIORITY_POLLING
+from .supervisor import DEFAULT_BACKOFF, DEFAULT_MAX_BACKOFF_S, DEFAULT_MIN_BACKOFF_S, STATE_CLOSED, ConnectionSupervisor
 
 _LOGGER = logging.getLogger(__name__)
 
 #: Default timeout for acquiring the async lock that protects ADB commands
 DEFAULT_TIMEOUT = 3.0
 
+#: The default deadline (in seconds) of a command, including the wait for the lock, by priority (see :py:mod:`aio_androidtv.scheduler`): short for key presses, long for screencaps and file transfers
+DEFAULT_COMMAND_TIMEOUTS_S = {PRIORITY_INTERACTIVE: 5., PRIORITY_POLLING: 10., PRIORITY_BULK: 60.}
+
+#: How long (in seconds) to wait for the device to send a packet on a stream that was abandoned because its command timed out, before closing the connection instead
+ABANDONED_STREAM_TIMEOUT_S = 1.
+
+#: How long (in seconds) to keep discarding packets that were in flight on an abandoned stream after it was closed
+ABANDONED_STREAM_QUIET_S = 0.1
+
+#: The number of unanswered TCP keepalive probes after which the connection is dropped (see the ``tcp_keepalive_s`` parameter of :py:class:`ADBPython`)
+TCP_KEEPALIVE_PROBES = 3
+
 
 @asynccontextmanager
-async def _acquire(lock, timeout=DEFAULT_TIMEOUT):
+async def _acquire(lock, timeout=DEFAULT_TIMEOUT, priority=None):
     """Handle acquisition and release of an ``asyncio.Lock`` object with a timeout.
 
     Parameters
     ----------
-    lock : asyncio.Lock
+    lock : asyncio.Lock, CommandScheduler
         The lock that we will try to acquire
     timeout : float
         The timeout in seconds
+    priority : int, None
+        The priority with which a :py:class:`~aio_androidtv.scheduler.CommandScheduler` lock will be acquired, or ``None`` to use its default
 
     Yields
     ------
@@ -42,21 +66,435 @@ async def _acquire(lock, timeout=DEFAULT_TIMEOUT):
     LockNotAcquiredException
         Raised if the lock was not acquired
 
+    """
+    acquired = await _acquire_lock(lock, timeout, priority)
+    try:
+        yield acquired
+
+    finally:
+        lock.release()
+
+
+async def _acquire_lock(lock, timeout=DEFAULT_TIMEOUT, priority=None):
+    """Acquire an ``asyncio.Lock`` object with a timeout, without releasing it.
+
+    Parameters
+    ----------
+    lock : asyncio.Lock, CommandScheduler
+        The lock that we will try to acquire
+    timeout : float
+        The timeout in seconds
+    priority : int, None
+        The priority with which a :py:class:`~aio_androidtv.scheduler.CommandScheduler` lock will be acquired, or ``None`` to use its default
+
+    Returns
+    -------
+    bool
+        ``True``
+
+    Raises
+    ------
+    LockNotAcquiredException
+        Raised if the lock was not acquired
+
     """
     try:
-        acquired = False
+        acquired = await asyncio.wait_for(lock.acquire() if priority is None else lock.acquire(priority), timeout)
+    except asyncio.TimeoutError:
+        raise LockNotAcquiredException
+
+    if not acquired:
+        raise LockNotAcquiredException
+
+    return acquired
+
+
+def _is_timeout(exc):
+    """Check whether an exception that ``aio_adb_shell`` raised means that a command ran out of time.
+
+    A packet that is not received within the timeout raises a ``TcpTimeoutException``, and a command that does not
+    receive the packets that it expects within the total timeout raises an ``InvalidCommandError``, which is also
+    raised for a packet with an unknown command (i.e., a connection that is out of sync with the device).
+
+    Parameters
+    ----------
+    exc : Exception
+        The exception
+
+    Returns
+    -------
+    bool
+        Whether or not the exception is a timeout
+
+    """
+    if isinstance(exc, TcpTimeoutException):
+        return True
+
+    return isinstance(exc, InvalidCommandError) and str(exc.args[0]).startswith('Never got one of the expected responses')
+
+
+def _remaining(deadline):
+    """Get the time left until a deadline.
+
+    Parameters
+    ----------
+    deadline : float
+        The deadline, per ``time.monotonic()``
+
+    Returns
+    -------
+    float
+        The time (in seconds) left until the deadline, or 0 if it has passed
+
+    """
+    return max(deadline - time.monotonic(), 0.)
+
+
+def _set_tcp_keepalive(sock, keepalive_s):
+    """Enable TCP keepalive on a socket, so that the OS drops the connection if the device stops responding.
+
+    The first probe is sent after the connection has been idle for ``keepalive_s`` seconds and the next ones every
+    ``keepalive_s`` seconds, and the connection is dropped after :py:const:`TCP_KEEPALIVE_PROBES` unanswered probes.
+    Where it is supported, unacknowledged data also causes the connection to be dropped after that time.  The options
+    that the platform does not provide are skipped.
+
+    Parameters
+    ----------
+    sock : socket.socket
+        The socket
+    keepalive_s : float
+        The idle time (in seconds) before the first probe, and the time between probes
+
+    """
+    keepalive_s = max(int(round(keepalive_s)), 1)
+    sock.setsockopt(socket.SOL_SOCKET, socket.SO_KEEPALIVE, 1)
+
+    # `TCP_KEEPALIVE` is the macOS name of `TCP_KEEPIDLE`, and `TCP_USER_TIMEOUT` (Linux) is in milliseconds
+    for option, value in (('TCP_KEEPIDLE', keepalive_s),
+                          ('TCP_KEEPALIVE', keepalive_s),
+                          ('TCP_KEEPINTVL', keepalive_s),
+                          ('TCP_KEEPCNT', TCP_KEEPALIVE_PROBES),
+                          ('TCP_USER_TIMEOUT', 1000 * keepalive_s * (TCP_KEEPALIVE_PROBES + 1))):
+        if hasattr(socket, option):
+            sock.setsockopt(socket.IPPROTO_TCP, getattr(socket, option), value)
+
+
+class KeyStore(object):
+    """A cache of the RSA signers that are used for ADB authentication, keyed by the path to the ``adbkey`` file.
+
+    Reading the key files and parsing the private key are blocking, so they are done in the event loop's default
+    executor.  A cached signer is used for as long as the modification times of ``adbkey`` and ``adbkey.pub`` are
+    unchanged, and concurrent requests for the same key (e.g., when many devices reconnect at once) share one lookup.
+
+    """
+    def __init__(self):
+        #: The number of times that a key has been read from disk and parsed
+        self.loads = 0
+
+        # the modification times of the key files and the signer, keyed by the path to the `adbkey` file
+        self._signers = {}
+
+        # the most recent lookup, keyed by the path to the `adbkey` file
+        self._lookups = {}
+
+    async def get_signer(self, adbkey):
+        """Get the signer for a key, reading and parsing the key files if they are not cached or they have changed.
+
+        Parameters
+        ----------
+        adbkey : str
+            The path to the ``adbkey`` file
+
+        Returns
+        -------
+        PythonRSASigner
+            The signer for the key
+
+        """
+        loop = asyncio.get_event_loop()
+        lookup = self._lookups.get(adbkey)
+        if lookup is None or lookup.done() or lookup.get_loop() is not loop:
+            lookup = self._lookups[adbkey] = loop.run_in_executor(None, self._get_signer, adbkey)
+
+        # cancelling one caller should not cancel the lookup for the others
+        return await asyncio.shield(lookup)
+
+    def invalidate(self, adbkey=None):
+        """Remove a key from the cache, so that it is read from disk the next time it is needed.
+
+        Parameters
+        ----------
+        adbkey : str, None
+            The path to the ``adbkey`` file, or ``None`` to remove all keys
+
+        """
+        if adbkey is None:
+            self._signers.clear()
+        else:
+            self._signers.pop(adbkey, None)
+
+    def _get_signer(self, adbkey):
+        """Get the signer for a key, reading and parsing the key files if they are not cached or they have changed.
+
+        This method is blocking.
+
+        Parameters
+        ----------
+        adbkey : str
+            The path to the ``adbkey`` file
+
+        Returns
+        -------
+        PythonRSASigner
+            The signer for the key
+
+        """
+        # get the modification times before reading the files, so that a change while they are being read is not missed
+        mtimes = (self._mtime(adbkey), self._mtime(adbkey + '.pub'))
+        cached = self._signers.get(adbkey)
+        if cached and cached[0] == mtimes:
+            return cached[1]
+
+        # private key
+        with open(adbkey) as f:
+            priv = f.read()
+
+        # public key
         try:
-            acquired = await asyncio.wait_for(lock.acquire(), timeout)
-            if not acquired:
-                raise LockNotAcquiredException
-            yield acquired
+            with open(adbkey + '.pub') as f:
+                pub = f.read()
+        except FileNotFoundError:
+            pub = ''
 
-        except asyncio.TimeoutError:
-            raise LockNotAcquiredException
+        signer = PythonRSASigner(pub, priv)
+        self.loads += 1
 
-    finally:
-        if acquired:
-            lock.release()
+        # a key whose modification time is unknown cannot be checked for changes, so it is not cached
+        if mtimes[0] is not None:
+            self._signers[adbkey] = (mtimes, signer)
+
+        return signer
+
+    @staticmethod
+    def _mtime(path):
+        """Get the modification time of a file.
+
+        Parameters
+        ----------
+        path : str
+            The path to the file
+
+        Returns
+        -------
+        int, None
+            The modification time of the file (in nanoseconds), or ``None`` if it does not exist
+
+        """
+        try:
+            return os.stat(path).st_mtime_ns
+        except OSError:
+            return None
+
+
+#: The key store that is shared by all :py:class:`ADBPython` objects
+KEY_STORE = KeyStore()
+
+
+def _sign(signer, data):
+    """Sign the token that the device sent for ADB authentication.
+
+    This is a module-level function so that it can be run in a ``concurrent.futures.ProcessPoolExecutor``.
+
+    Parameters
+    ----------
+    signer : PythonRSASigner
+        The signer for the key
+    data : bytes
+        The token that will be signed
+
+    Returns
+    -------
+    bytes
+        The signed token
+
+    """
+    return signer.Sign(data)
+
+
+class ShellSession(object):
+    """A long-lived interactive shell on the device in which commands are run one after another.
+
+    Each command is sent to the shell as::
+
+        echo '<BEGIN>'; { <cmd>
+        } </dev/null; echo -n '<END>'
+
+    and its output is the data that the device sends between the ``<BEGIN>`` and ``<END>`` markers.  The
+    markers are written as two quoted halves so that the device's echo of the input does not contain them.
+
+    Parameters
+    ----------
+    adb : AdbDeviceTcp
+        The connected ADB device on which the session will be opened
+    timeout_s : float, None
+        Timeout in seconds for sending and receiving packets, or ``None`` to use the device's default timeout
+
+    """
+    #: The ADB service that provides the shell
+    SERVICE = b'shell:sh'
+
+    def __init__(self, adb, timeout_s=None):
+        self._adb = adb
+        self._timeout_s = timeout_s
+
+        # info about the ADB stream, or `None` if the session is not open
+        self._adb_info = None
+
+        # data that has been received but not yet returned
+        self._buffer = b''
+
+        # the number of commands that have been sent (used to make the markers unique)
+        self._count = 0
+
+    @property
+    def alive(self):
+        """Whether the session's stream is open.
+
+        Returns
+        -------
+        bool
+            Whether or not the session's stream is open
+
+        """
+        return self._adb_info is not None
+
+    async def open(self):
+        """Open the session's stream on the device.
+
+        """
+        adb_info = _AdbTransactionInfo(None, None, self._timeout_s)
+        await self._adb._open(self.SERVICE, adb_info)  # pylint: disable=protected-access
+        self._adb_info = adb_info
+        self._buffer = b''
+
+    async def close(self):
+        """Close the session's stream.
+
+        Errors are ignored, since the stream may already have been closed by the device or the transport may be gone.
+
+        """
+        if self._adb_info is None:
+            return
+
+        adb_info, self._adb_info = self._adb_info, None
+        try:
+            await self._adb._send(AdbMessage(adb_constants.CLSE, adb_info.local_id, adb_info.remote_id), adb_info)  # pylint: disable=protected-access
+        except Exception:  # pylint: disable=broad-except
+            pass
+
+    async def run(self, cmd, timeout_s=None):
+        """Run a command in the session.
+
+        Parameters
+        ----------
+        cmd : str
+            The command that will be run
+        timeout_s : float, None
+            Timeout in seconds for sending and receiving each packet of this command, or ``None`` to use the session's timeout
+
+        Returns
+        -------
+        str
+            The output of the command; if the device closes the session while the command is running, this is the output received up to that point
+
+        Raises
+        ------
+        ShellSessionClosedException
+            The session is not open or the device closed it before the command was sent
+
+        """
+        if self._adb_info is None:
+            raise ShellSessionClosedException("The shell session is not open")
+
+        self._adb_info.timeout_s = self._timeout_s if timeout_s is None else timeout_s
+        self._count += 1
+        begin = '__AIO_ANDROIDTV_BEGIN_{}__'.format(self._count)
+        end = '__AIO_ANDROIDTV_END_{}__'.format(self._count)
+        data = "echo '{0}''{1}'; {{ {2}\n}} </dev/null; echo -n '{3}''{4}'\n".format(begin[:5], begin[5:], cmd, end[:5], end[5:]).encode('utf8')
+
+        # send the command, waiting for the device to acknowledge each packet
+        for i in range(0, len(data), adb_constants.MAX_ADB_DATA):
+            await self._send(adb_constants.WRTE, data[i:i + adb_constants.MAX_ADB_DATA])
+            while await self._read_packet() != adb_constants.OKAY:
+                pass
+
+        # read until the end marker has been received
+        begin = begin.encode('utf8')
+        end = end.encode('utf8')
+        while True:
+            begin_index = self._buffer.find(begin)
+            end_index = self._buffer.find(end, begin_index) if begin_index >= 0 else -1
+            if end_index >= 0:
+                break
+
+            try:
+                await self._read_packet()
+            except ShellSessionClosedException:
+                # the command closed the shell (e.g., `exit`), so return what it printed
+                if begin_index < 0:
+                    return ''
+                end_index = len(self._buffer)
+                break
+
+        output = self._buffer[begin_index + len(begin):end_index]
+        self._buffer = self._buffer[end_index + len(end):]
+
+        # remove the line ending that was printed after the begin marker
+        if output[:2] == b'\r\n':
+            output = output[2:]
+        elif output[:1] == b'\n':
+            output = output[1:]
+
+        return output.decode('utf8')
+
+    async def _read_packet(self):
+        """Read a packet from the session's stream, buffering and acknowledging any data.
+
+        Returns
+        -------
+        bytes
+            The command of the packet that was read (``b'OKAY'`` or ``b'WRTE'``)
+
+        Raises
+        ------
+        ShellSessionClosedException
+            The device closed the session
+
+        """
+        cmd, _, _, data = await self._adb._read([adb_constants.CLSE, adb_constants.OKAY, adb_constants.WRTE], self._adb_info)  # pylint: disable=protected-access
+
+        if cmd == adb_constants.CLSE:
+            self._adb_info = None
+            raise ShellSessionClosedException("The shell session was closed by the device")
+
+        if cmd == adb_constants.WRTE:
+            self._buffer += data
+            await self._send(adb_constants.OKAY)
+
+        return cmd
+
+    async def _send(self, cmd, data=b''):
+        """Send a packet on the session's stream.
+
+        Parameters
+        ----------
+        cmd : bytes
+            The ADB command (``b'OKAY'`` or ``b'WRTE'``)
+        data : bytes
+            The data that will be sent
+
+        """
+        await self._adb._send(AdbMessage(cmd, self._adb_info.local_id, self._adb_info.remote_id, data), self._adb_info)  # pylint: disable=protected-access
 
 
 class ADBPython(object):
@@ -70,41 +508,110 @@ class ADBPython(object):
         The device port to which we are connecting (default is 5555)
     adbkey : str
         The path to the ``adbkey`` file for ADB authentication
+    persistent_shell : bool
+        Whether to run shell commands in a long-lived :py:class:`ShellSession` instead of opening a new stream for each command
+    max_streams : int
+        The maximum number of ADB commands that can be in flight at the same time (default is 1)
+    auth_executor : concurrent.futures.Executor, None
+        The executor (e.g., a ``ThreadPoolExecutor`` or ``ProcessPoolExecutor``) in which the token is signed during ADB authentication, or ``None`` to sign it on the event loop
+    tcp_keepalive_s : float, None
+        If not ``None``, enable TCP keepalive on the connection with this idle time and probe interval (in seconds), so that a dead connection is dropped by the OS
 
     """
-    def __init__(self, host, port, adbkey=''):
+    def __init__(self, host, port, adbkey='', persistent_shell=False, max_streams=1, auth_executor=None, tcp_keepalive_s=None):
         self.host = host
         self.port = int(port)
         self.adbkey = adbkey
+        self.persistent_shell = persistent_shell
+        self.max_streams = max(int(max_streams), 1)
+        self.auth_executor = auth_executor
+        self.tcp_keepalive_s = tcp_keepalive_s
         self._adb = AdbDeviceTcp(host=self.host, port=self.port, default_timeout_s=9., banner=b'aio-androidtv')
 
         # keep track of whether the ADB connection is intact
         self._available = False
 
-        # use a lock to make sure that ADB commands don't overlap
-        self._adb_lock = asyncio.Lock()
+        # use a lock to make sure that ADB commands don't overlap; waiting commands are sent in order of priority
+        self._adb_lock = CommandScheduler()
+
+        # the persistent shell session, if one is open
+        self._shell_session = None
+
+        # `aio_adb_shell` can only handle one stream per connection at a time, so additional streams are run on
+        # additional connections, which are established when they are first needed
+        self._extra_streams = [ADBPython(host, port, adbkey, persistent_shell, auth_executor=auth_executor, tcp_keepalive_s=tcp_keepalive_s) for _ in range(self.max_streams - 1)]
+
+        # the authentication timeout that is used when connecting the additional streams
+        self._auth_timeout_s = DEFAULT_AUTH_TIMEOUT_S
+
+        # the additional streams that have been picked for a command (see `_free_stream`), and, for each additional
+        # stream that failed to connect, the number of failed attempts and when it may next be connected
+        self._reserved_streams = set()
+        self._stream_backoff = {}
+
+        # the supervisor that reconnects in the background, if there is one (see `supervise`)
+        self._supervisor = None
+
+        # when the connection was last established or a command last succeeded, and when the command that holds the
+        # ADB lock started or last received output (see `probe`)
+        self._last_used = 0.
+        self._command_started = 0.
+
+        # whether a command timed out or was cancelled while its stream was open, so that the stream must be closed
+        # before the next command is sent (see `_close_abandoned_stream`)
+        self._abandoned_stream = False
+
+        # the tasks that close the streams of abandoned commands and then release the ADB lock (see `_abandon`)
+        self._abandon_tasks = set()
 
     @property
     def available(self):
         """Check whether the ADB connection is intact.
 
+        If the connection is supervised (see :py:meth:`supervise`), it is not available while it is being re-established.
+
         Returns
         -------
         bool
             Whether or not the ADB connection is intact
 
         """
-        return self._adb.available
+        return self._adb.available and (self._supervisor is None or self._supervisor.state == STATE_CLOSED)
+
+    def command_stats(self):
+        """Get the queue depth and wait time statistics for the commands sent on the primary stream.
+
+        Returns
+        -------
+        dict
+            The statistics, per priority class (see :py:meth:`aio_androidtv.scheduler.CommandScheduler.stats`)
+
+        """
+        return self._adb_lock.stats()
 
     async def close(self):
         """Close the ADB socket connection.
 
         """
+        # wait for the abandoned commands' streams to be closed and the lock to be released (`_close_abandoned_stream`
+        # calls this method from one of these tasks if it fails)
+        abandon_tasks = self._abandon_tasks - {asyncio.current_task()}
+        if abandon_tasks:
+            await asyncio.gather(*abandon_tasks, return_exceptions=True)
+
+        self._shell_session = None
+        self._abandoned_stream = False
         await self._adb.close()
 
+        for stream in self._extra_streams:
+            await stream.close()
+
     async def connect(self, always_log_errors=True, auth_timeout_s=DEFAULT_AUTH_TIMEOUT_S):
         """Connect to an Android TV / Fire TV device.
 
+        If the connection is supervised (see :py:meth:`supervise`) and it is being re-established in the background,
+        this returns ``False`` right away.
+
         Parameters
         ----------
         always_log_errors : bool
@@ -118,63 +625,94 @@ class ADBPython(object):
             Whether or not the connection was successfully established and the device is available
 
         """
-        try:
-            async with _acquire(self._adb_lock):
-                # Catch exceptions
-                try:
-                    # Connect with authentication
-                    if self.adbkey:
-                        # private key
-                        with open(self.adbkey) as f:
-                            priv = f.read()
+        if self._supervisor is None:
+            return await self._connect(always_log_errors, auth_timeout_s)
 
-                        # public key
-                        try:
-                            with open(self.adbkey + '.pub') as f:
-                                pub = f.read()
-                        except FileNotFoundError:
-                            pub = ''
+        if self._supervisor.state != STATE_CLOSED:
+            _LOGGER.debug("Not connecting to %s:%d because the connection is being re-established in the background", self.host, self.port)
+            return False
 
-                        signer = PythonRSASigner(pub, priv)
+        connected = await self._connect(always_log_errors, auth_timeout_s)
+        if not connected:
+            self._supervisor.trip()
 
-                        await self._adb.connect(rsa_keys=[signer], auth_timeout_s=auth_timeout_s)
+        return connected
 
-                    # Connect without authentication
-                    else:
-                        await self._adb.connect(auth_timeout_s=auth_timeout_s)
+    def supervise(self, **supervisor_kwargs):
+        """Reconnect in the background whenever the connection fails, and make commands fail fast while it is down.
 
-                    # ADB connection successfully established
-                    _LOGGER.debug("ADB connection to %s:%d successfully established", self.host, self.port)
-                    self._available = True
-                    return True
+        Parameters
+        ----------
+        supervisor_kwargs
+            Keyword arguments for :py:class:`~aio_androidtv.supervisor.ConnectionSupervisor` (these are only used when the supervisor is first created)
 
-                except OSError as exc:
-                    if self._available or always_log_errors:
-                        if exc.strerror is None:
-                            exc.strerror = "Timed out trying to connect to ADB device."
-                        _LOGGER.warning("Couldn't connect to %s:%d.  %s: %s", self.host, self.port, exc.__class__.__name__, exc.strerror)
+        Returns
+        -------
+        ConnectionSupervisor
+            The supervisor, which has been started
 
-                    # ADB connection attempt failed
-                    await self.close()
-                    self._available = False
-                    return False
+        """
+        if self._supervisor is None:
+            self._supervisor = ConnectionSupervisor(self, **supervisor_kwargs)
 
-                except Exception as exc:  # pylint: disable=broad-except
-                    if self._available or always_log_errors:
-                        _LOGGER.warning("Couldn't connect to %s:%d.  %s: %s", self.host, self.port, exc.__class__.__name__, exc)
+        self._supervisor.start()
+        return self._supervisor
 
-                    # ADB connection attempt failed
-                    await self.close()
-                    self._available = False
-                    return False
+    async def probe(self, timeout_s=DEFAULT_PROBE_TIMEOUT_S):
+        """Check that the connection is alive by running a no-op command (``:``) on the device.
+
+        The command is not sent if another command is in flight, since that command will find out whether the
+        connection is alive; the connection is only considered alive if that command started (or, if it streams its
+        output, last received output) less than ``timeout_s`` seconds ago.  If the probe fails and the connection is
+        supervised (see :py:meth:`supervise`), the supervisor starts reconnecting.
+
+        Parameters
+        ----------
+        timeout_s : float
+            How long to wait for the device to respond (in seconds)
+
+        Returns
+        -------
+        bool
+            Whether the device responded, or another command has been in flight for less than ``timeout_s`` seconds
+
+        """
+        if not self.available:
+            return False
+
+        if self._adb_lock.locked():
+            return time.monotonic() - self._command_started < timeout_s
+
+        try:
+            async with self._supervised(), _acquire(self._adb_lock, priority=PRIORITY_BULK):
+                self._command_started = time.monotonic()
+                _LOGGER.debug("Probing the connection to %s:%d", self.host, self.port)
+                if self._shell_session:
+                    try:
+                        await self._shell_session.run(':', timeout_s)
+
+                    # the session's stream is out of sync with its output
+                    except Exception:
+                        await self._close_shell_session()
+                        raise
+
+                else:
+                    async with self._stream():
+                        await self._adb.shell(':', timeout_s=timeout_s, total_timeout_s=timeout_s)
+
+            return True
 
         except LockNotAcquiredException:
-            _LOGGER.warning("Couldn't connect to %s:%d because adb-shell lock not acquired.", self.host, self.port)
-            await self.close()
-            self._available = False
+            return True
+
+        except asyncio.CancelledError:
+            raise
+
+        except Exception as exc:  # pylint: disable=broad-except
+            _LOGGER.debug("Probing the connection to %s:%d failed.  %s: %s", self.host, self.port, exc.__class__.__name__, exc)
             return False
 
-    async def pull(self, local_path, device_path):
+    async def pull(self, local_path, device_path, priority=PRIORITY_BULK, timeout_s=None):
         """Pull a file from the device using the Python ADB implementation.
 
         Parameters
@@ -183,18 +721,35 @@ class ADBPython(object):
             The path where the file will be saved
         device_path : str
             The file on the device that will be pulled
+        priority : int
+            The priority of the command (see :py:mod:`aio_androidtv.scheduler`)
+        timeout_s : float, None
+            The deadline (in seconds) for the command, including the wait for the lock, or ``None`` to use the default for its priority (see :py:const:`DEFAULT_COMMAND_TIMEOUTS_S`)
+
+        Raises
+        ------
+        CommandTimeoutException
+            The command did not finish before its deadline
 
         """
         if not self.available:
             _LOGGER.debug("ADB command not sent to %s:%d because adb-shell connection is not established: pull(%s, %s)", self.host, self.port, local_path, device_path)
             return
 
-        async with _acquire(self._adb_lock):
+        deadline = self._deadline(priority, timeout_s)
+        async with self._free_stream() as stream:
+            if stream is not self:
+                return await stream.pull(local_path, device_path, priority=priority, timeout_s=_remaining(deadline))
+
+        async def run():
             _LOGGER.debug("Sending command to %s:%d via adb-shell: pull(%s, %s)", self.host, self.port, local_path, device_path)
-            await self._adb.pull(device_path, local_path)
-            return
+            await self._close_shell_session()
+            async with self._stream():
+                await self._adb.pull(device_path, local_path, timeout_s=_remaining(deadline), total_timeout_s=_remaining(deadline))
+
+        await self._command(run, priority, deadline)
 
-    async def push(self, local_path, device_path):
+    async def push(self, local_path, device_path, priority=PRIORITY_BULK, timeout_s=None):
         """Push a file to the device using the Python ADB implementation.
 
         Parameters
@@ -203,55 +758,584 @@ class ADBPython(object):
             The file that will be pushed to the device
         device_path : str
             The path where the file will be saved on the device
+        priority : int
+            The priority of the command (see :py:mod:`aio_androidtv.scheduler`)
+        timeout_s : float, None
+            The deadline (in seconds) for the command, including the wait for the lock, or ``None`` to use the default for its priority (see :py:const:`DEFAULT_COMMAND_TIMEOUTS_S`)
+
+        Raises
+        ------
+        CommandTimeoutException
+            The command did not finish before its deadline
 
         """
         if not self.available:
             _LOGGER.debug("ADB command not sent to %s:%d because adb-shell connection is not established: push(%s, %s)", self.host, self.port, local_path, device_path)
             return
 
-        async with _acquire(self._adb_lock):
+        deadline = self._deadline(priority, timeout_s)
+        async with self._free_stream() as stream:
+            if stream is not self:
+                return await stream.push(local_path, device_path, priority=priority, timeout_s=_remaining(deadline))
+
+        async def run():
             _LOGGER.debug("Sending command to %s:%d via adb-shell: push(%s, %s)", self.host, self.port, local_path, device_path)
-            await self._adb.push(local_path, device_path)
-            return
+            await self._close_shell_session()
+            async with self._stream():
+                await self._adb.push(local_path, device_path, timeout_s=_remaining(deadline), total_timeout_s=_remaining(deadline))
+
+        await self._command(run, priority, deadline)
 
-    async def screencap(self):
+    async def screencap(self, priority=PRIORITY_BULK, timeout_s=None):
         """Take a screenshot using the Python ADB implementation.
 
+        Parameters
+        ----------
+        priority : int
+            The priority of the command (see :py:mod:`aio_androidtv.scheduler`)
+        timeout_s : float, None
+            The deadline (in seconds) for the command, including the wait for the lock, or ``None`` to use the default for its priority (see :py:const:`DEFAULT_COMMAND_TIMEOUTS_S`)
+
         Returns
         -------
         bytes
             The screencap as a binary .png image
 
+        Raises
+        ------
+        CommandTimeoutException
+            The command did not finish before its deadline
+
         """
         if not self.available:
             _LOGGER.debug("ADB screencap not taken from %s:%d because adb-shell connection is not established", self.host, self.port)
             return None
 
-        async with _acquire(self._adb_lock):
+        deadline = self._deadline(priority, timeout_s)
+        async with self._free_stream() as stream:
+            if stream is not self:
+                return await stream.screencap(priority=priority, timeout_s=_remaining(deadline))
+
+        async def run():
             _LOGGER.debug("Taking screencap from %s:%d via adb-shell", self.host, self.port)
-            result = await self._adb.shell("screencap -p", decode=False)
+            await self._close_shell_session()
+            async with self._stream():
+                result = await self._adb.shell("screencap -p", timeout_s=_remaining(deadline), total_timeout_s=_remaining(deadline), decode=False)
             if result[5:6] == b"\r":
                 return result.replace(b"\r\n", b"\n")
             return result
 
-    async def shell(self, cmd):
+        return await self._command(run, priority, deadline)
+
+    async def shell(self, cmd, priority=PRIORITY_POLLING, timeout_s=None):
         """Send an ADB command using the Python ADB implementation.
 
         Parameters
         ----------
         cmd : str
             The ADB command to be sent
+        priority : int
+            The priority of the command (see :py:mod:`aio_androidtv.scheduler`)
+        timeout_s : float, None
+            The deadline (in seconds) for the command, including the wait for the lock, or ``None`` to use the default for its priority (see :py:const:`DEFAULT_COMMAND_TIMEOUTS_S`)
 
         Returns
         -------
         str, None
             The response from the device, if there is a response
 
+        Raises
+        ------
+        CommandTimeoutException
+            The command did not finish before its deadline
+
         """
         if not self.available:
             _LOGGER.debug("ADB command not sent to %s:%d because adb-shell connection is not established: %s", self.host, self.port, cmd)
             return None
 
-        async with _acquire(self._adb_lock):
+        deadline = self._deadline(priority, timeout_s)
+        async with self._free_stream() as stream:
+            if stream is not self:
+                return await stream.shell(cmd, priority=priority, timeout_s=_remaining(deadline))
+
+        async def run():
             _LOGGER.debug("Sending command to %s:%d via adb-shell: %s", self.host, self.port, cmd)
-            return await self._adb.shell(cmd)
+            if self.persistent_shell:
+                output = await self._shell_session_run(cmd, _remaining(deadline))
+                if output is not None:
+                    return output
+
+            async with self._stream():
+                return await self._adb.shell(cmd, timeout_s=_remaining(deadline), total_timeout_s=_remaining(deadline))
+
+        return await self._command(run, priority, deadline)
+
+    async def streaming_shell(self, cmd, idle_timeout_s=None):
+        """Send an ADB command that keeps running (e.g., ``logcat``) and yield its output as it arrives.
+
+        The connection is held for as long as the command runs, so this should be used with an ``ADBPython`` object
+        that is dedicated to the command.
+
+        Parameters
+        ----------
+        cmd : str
+            The ADB command to be sent
+        idle_timeout_s : float, None
+            How long to wait for more output before raising an exception, or ``None`` to use the default timeout
+
+        Yields
+        ------
+        bytes
+            The output, in chunks that are not aligned with line boundaries
+
+        """
+        if not self.available:
+            _LOGGER.debug("ADB command not sent to %s:%d because adb-shell connection is not established: %s", self.host, self.port, cmd)
+            return
+
+        async with _acquire(self._adb_lock, priority=PRIORITY_BULK):
+            self._command_started = time.monotonic()
+            _LOGGER.debug("Streaming command to %s:%d via adb-shell: %s", self.host, self.port, cmd)
+            await self._close_shell_session()
+            async for data in self._adb.streaming_shell(cmd, timeout_s=idle_timeout_s, decode=False):
+                self._command_started = time.monotonic()
+                yield data
+
+    async def _connect(self, always_log_errors=True, auth_timeout_s=DEFAULT_AUTH_TIMEOUT_S):
+        """Connect to an Android TV / Fire TV device, regardless of the supervisor's state.
+
+        Parameters
+        ----------
+        always_log_errors : bool
+            If True, errors will always be logged; otherwise, errors will only be logged on the first failed reconnect attempt
+        auth_timeout_s : float
+            Authentication timeout (in seconds)
+
+        Returns
+        -------
+        bool
+            Whether or not the connection was successfully established and the device is available
+
+        """
+        self._auth_timeout_s = auth_timeout_s
+
+        # The additional streams will reconnect when they are next needed
+        self._stream_backoff.clear()
+        for stream in self._extra_streams:
+            if not stream._adb_lock.locked() and stream not in self._reserved_streams:  # pylint: disable=protected-access
+                await stream.close()
+
+        try:
+            async with _acquire(self._adb_lock):
+                self._command_started = time.monotonic()
+
+                # The shell session and an abandoned stream will not survive a new connection
+                self._shell_session = None
+                self._abandoned_stream = False
+
+                # Catch exceptions
+                try:
+                    # Connect with authentication
+                    if self.adbkey:
+                        signer = await KEY_STORE.get_signer(self.adbkey)
+                        if self.auth_executor is None:
+                            await self._adb.connect(rsa_keys=[signer], auth_timeout_s=auth_timeout_s)
+                        else:
+                            await self._connect_signing_in_executor(signer, auth_timeout_s)
+
+                    # Connect without authentication
+                    else:
+                        await self._adb.connect(auth_timeout_s=auth_timeout_s)
+
+                    if self.tcp_keepalive_s is not None:
+                        _set_tcp_keepalive(self._adb._handle._writer.get_extra_info('socket'), self.tcp_keepalive_s)  # pylint: disable=protected-access
+
+                    # ADB connection successfully established
+                    _LOGGER.debug("ADB connection to %s:%d successfully established", self.host, self.port)
+                    self._available = True
+                    self._last_used = time.monotonic()
+                    return True
+
+                except OSError as exc:
+                    if self._available or always_log_errors:
+                        if exc.strerror is None:
+                            exc.strerror = "Timed out trying to connect to ADB device."
+                        _LOGGER.warning("Couldn't connect to %s:%d.  %s: %s", self.host, self.port, exc.__class__.__name__, exc.strerror)
+
+                    # ADB connection attempt failed
+                    await self.close()
+                    self._available = False
+                    return False
+
+                except Exception as exc:  # pylint: disable=broad-except
+                    if self._available or always_log_errors:
+                        _LOGGER.warning("Couldn't connect to %s:%d.  %s: %s", self.host, self.port, exc.__class__.__name__, exc)
+
+                    # ADB connection attempt failed
+                    await self.close()
+                    self._available = False
+                    return False
+
+        except LockNotAcquiredException:
+            _LOGGER.warning("Couldn't connect to %s:%d because adb-shell lock not acquired.", self.host, self.port)
+            await self.close()
+            self._available = False
+            return False
+
+    async def _connect_signing_in_executor(self, signer, auth_timeout_s):
+        """Connect to the device with authentication, signing the device's token in ``auth_executor``.
+
+        This is the handshake of :py:meth:`aio_adb_shell.adb_device.AdbDevice.connect` with one key, except that
+        signing the token (which takes tens of milliseconds in pure Python) does not block the event loop.
+
+        Parameters
+        ----------
+        signer : PythonRSASigner
+            The signer for the key
+        auth_timeout_s : float
+            Authentication timeout (in seconds)
+
+        Raises
+        ------
+        InvalidResponseError
+            The device sent an unexpected ``b'AUTH'`` message
+
+        """
+        # pylint: disable=protected-access
+        await self._adb._handle.close()
+        await self._adb._handle.connect(None)
+
+        adb_info = _AdbTransactionInfo(None, None)
+        await self._adb._send(AdbMessage(adb_constants.CNXN, adb_constants.VERSION, adb_constants.MAX_ADB_DATA, b'host::%s\0' % self._adb._banner), adb_info)
+        cmd, arg0, arg1, banner = await self._adb._read([adb_constants.AUTH, adb_constants.CNXN], adb_info)
+
+        if cmd == adb_constants.AUTH:
+            if arg0 != adb_constants.AUTH_TOKEN:
+                await self._adb._handle.close()
+                raise InvalidResponseError('Unknown AUTH response: %s %s %s' % (arg0, arg1, banner))
+
+            signed_token = await asyncio.get_event_loop().run_in_executor(self.auth_executor, _sign, signer, banner)
+            await self._adb._send(AdbMessage(adb_constants.AUTH, adb_constants.AUTH_SIGNATURE, 0, signed_token), adb_info)
+            cmd, _, _, _ = await self._adb._read([adb_constants.CNXN, adb_constants.AUTH], adb_info)
+
+            # the key was not accepted, so send the public key, which the user must accept on the device
+            if cmd == adb_constants.AUTH:
+                pubkey = signer.GetPublicKey()
+                if not isinstance(pubkey, (bytes, bytearray)):
+                    pubkey = bytearray(pubkey, 'utf-8')
+
+                await self._adb._send(AdbMessage(adb_constants.AUTH, adb_constants.AUTH_RSAPUBLICKEY, 0, pubkey + b'\0'), adb_info)
+                adb_info.timeout_s = auth_timeout_s
+                await self._adb._read([adb_constants.CNXN], adb_info)
+
+        self._adb._available = True
+
+    @asynccontextmanager
+    async def _supervised(self):
+        """Record when a command succeeds, and open the supervisor's circuit if it fails (unless it failed because the lock was not acquired, it timed out, or it was cancelled).
+
+        A command that timed out only abandons its own stream; if the connection is dead, this is found out when the
+        stream is closed (see :py:meth:`_close_abandoned_stream`).
+
+        """
+        try:
+            yield
+            self._last_used = time.monotonic()
+
+        except (asyncio.CancelledError, CommandTimeoutException, LockNotAcquiredException):
+            raise
+
+        except Exception as exc:
+            if self._supervisor is not None:
+                self._supervisor.trip(exc)
+            raise
+
+    @staticmethod
+    def _deadline(priority, timeout_s):
+        """Get the deadline for a command.
+
+        Parameters
+        ----------
+        priority : int
+            The priority of the command (see :py:mod:`aio_androidtv.scheduler`)
+        timeout_s : float, None
+            The timeout (in seconds) for the command, or ``None`` to use the default for its priority (see :py:const:`DEFAULT_COMMAND_TIMEOUTS_S`)
+
+        Returns
+        -------
+        float
+            The deadline, per ``time.monotonic()``
+
+        """
+        if timeout_s is None:
+            timeout_s = DEFAULT_COMMAND_TIMEOUTS_S.get(priority, DEFAULT_COMMAND_TIMEOUTS_S[PRIORITY_POLLING])
+
+        return time.monotonic() + timeout_s
+
+    async def _command(self, run, priority, deadline):
+        """Send a command while holding the ADB lock, giving up at its deadline without leaving the connection in an undefined state.
+
+        The command is sent in a task of its own.  When the deadline passes or the caller is cancelled, the task is
+        cancelled and, in the background, the stream that it left open is closed (see
+        :py:meth:`_close_abandoned_stream`) before the lock is released, so that only that stream is affected.  The same
+        is done when the command times out in ``aio_adb_shell``.  If the task was cancelled in the middle of a packet,
+        the stream cannot be closed, so the connection is closed instead.
+
+        Parameters
+        ----------
+        run : function
+            A coroutine function that sends the command and returns its result
+        priority : int
+            The priority of the command (see :py:mod:`aio_androidtv.scheduler`)
+        deadline : float
+            The deadline for the command, including the wait for the lock, per ``time.monotonic()``
+
+        Returns
+        -------
+        object
+            The result of ``run``
+
+        Raises
+        ------
+        CommandTimeoutException
+            The command did not finish before its deadline
+        LockNotAcquiredException
+            The lock was not acquired before the deadline
+
+        """
+        async with self._supervised():
+            await _acquire_lock(self._adb_lock, _remaining(deadline), priority)
+            self._command_started = time.monotonic()
+
+            task = None
+            try:
+                task = asyncio.ensure_future(run())
+                done, _ = await asyncio.wait((task,), timeout=_remaining(deadline))
+                if task not in done:
+                    raise CommandTimeoutException("The command to {}:{} did not finish before its deadline".format(self.host, self.port))
+
+                try:
+                    return task.result()
+                except (TcpTimeoutException, InvalidCommandError) as exc:
+                    if not _is_timeout(exc):
+                        raise
+                    raise CommandTimeoutException("The command to {}:{} did not finish before its deadline.  {}".format(self.host, self.port, exc)) from exc
+
+            finally:
+                if task is None or (task.done() and not self._abandoned_stream):
+                    self._adb_lock.release()
+                else:
+                    task.cancel()
+                    abandon_task = asyncio.ensure_future(self._abandon(task))
+                    self._abandon_tasks.add(abandon_task)
+                    abandon_task.add_done_callback(self._abandon_tasks.discard)
+
+    async def _abandon(self, task):
+        """Stop a command that was abandoned, close the stream that it left open, and then release the ADB lock.
+
+        Parameters
+        ----------
+        task : asyncio.Task
+            The task that sent the command, which has been cancelled
+
+        """
+        self._command_started = time.monotonic()
+        try:
+            await asyncio.wait((task,))
+            if not task.cancelled() and task.exception() is not None:
+                exc = task.exception()
+                _LOGGER.debug("Command to %s:%d failed after it was abandoned.  %s: %s", self.host, self.port, exc.__class__.__name__, exc)
+
+            if self._abandoned_stream:
+                await self._close_abandoned_stream()
+
+        except asyncio.CancelledError:
+            raise
+
+        # `_close_abandoned_stream` logged the error and closed the connection
+        except Exception:  # pylint: disable=broad-except
+            pass
+
+        finally:
+            self._adb_lock.release()
+
+    @asynccontextmanager
+    async def _stream(self):
+        """Close an abandoned stream before a new stream is opened, and record whether the new stream was abandoned because it timed out or was cancelled.
+
+        """
+        if self._abandoned_stream:
+            await self._close_abandoned_stream()
+
+        try:
+            yield
+
+        except asyncio.CancelledError:
+            self._abandoned_stream = True
+            raise
+
+        except (TcpTimeoutException, InvalidCommandError) as exc:
+            if _is_timeout(exc):
+                self._abandoned_stream = True
+            raise
+
+    async def _close_abandoned_stream(self):
+        """Close a stream that was abandoned because its command timed out, so that its remaining packets are not mistaken for those of the next command.
+
+        ``aio_adb_shell`` does not expose the device's ID for the stream, so it is taken from the next packet that the
+        device sends on it, and the stream is closed by replying with a ``CLSE`` packet.  Packets that were already in
+        flight are then discarded until the device closes the stream too or :py:const:`ABANDONED_STREAM_QUIET_S` seconds
+        pass without a packet.  If the device does not send anything on the stream within
+        :py:const:`ABANDONED_STREAM_TIMEOUT_S` seconds, the connection is closed instead.
+
+        Raises
+        ------
+        Exception
+            The stream could not be closed, so the connection was closed
+
+        """
+        expected_cmds = [adb_constants.CLSE, adb_constants.OKAY, adb_constants.WRTE]
+        adb_info = _AdbTransactionInfo(None, None, ABANDONED_STREAM_TIMEOUT_S, ABANDONED_STREAM_TIMEOUT_S)
+
+        try:
+            cmd, adb_info.remote_id, adb_info.local_id, _ = await self._adb._read(expected_cmds, adb_info)  # pylint: disable=protected-access
+            _LOGGER.debug("Closing an abandoned stream on %s:%d", self.host, self.port)
+            await self._adb._send(AdbMessage(adb_constants.CLSE, adb_info.local_id, adb_info.remote_id), adb_info)  # pylint: disable=protected-access
+
+            adb_info.timeout_s = ABANDONED_STREAM_QUIET_S
+            while cmd != adb_constants.CLSE:
+                try:
+                    cmd, _, _, _ = await self._adb._read(expected_cmds, adb_info)  # pylint: disable=protected-access
+                except TcpTimeoutException:
+                    break
+
+            self._abandoned_stream = False
+
+        # if this is cancelled, the stream is still open, so it will be closed before the next command
+        except asyncio.CancelledError:
+            raise
+
+        except Exception as exc:
+            _LOGGER.warning("Couldn't close an abandoned stream on %s:%d, closing the connection.  %s: %s", self.host, self.port, exc.__class__.__name__, exc)
+            await self.close()
+            if self._supervisor is not None:
+                self._supervisor.trip(exc)
+            raise
+
+    @asynccontextmanager
+    async def _free_stream(self):
+        """Pick a stream on which a command can be sent without waiting for the commands that are in flight.
+
+        An additional stream is reserved for the command as soon as it is picked, before it is connected, so that
+        concurrent commands do not pick the same one.  An additional stream that fails to connect is not tried again
+        until a backoff has passed, which grows with each failed attempt (see :py:mod:`aio_androidtv.supervisor`).
+
+        Yields
+        ------
+        ADBPython
+            This instance if its stream is free or there are no free additional streams, else a connected additional stream that is free
+
+        """
+        stream = self
+        if self._extra_streams and self._adb_lock.locked():
+            now = time.monotonic()
+            for extra_stream in self._extra_streams:
+                if extra_stream._adb_lock.locked() or extra_stream in self._reserved_streams:  # pylint: disable=protected-access
+                    continue
+
+                failed_attempts, next_attempt = self._stream_backoff.get(extra_stream, (0, now))
+                if not extra_stream.available and next_attempt > now:
+                    continue
+
+                self._reserved_streams.add(extra_stream)
+                if extra_stream.available or await self._connect_extra_stream(extra_stream, failed_attempts):
+                    stream = extra_stream
+                    break
+
+                self._reserved_streams.discard(extra_stream)
+
+        try:
+            yield stream
+
+        finally:
+            self._reserved_streams.discard(stream)
+
+    async def _connect_extra_stream(self, stream, failed_attempts):
+        """Connect an additional stream, and record when it may next be connected if it fails.
+
+        Parameters
+        ----------
+        stream : ADBPython
+            The additional stream
+        failed_attempts : int
+            The number of failed attempts to connect it since it last connected
+
+        Returns
+        -------
+        bool
+            Whether or not the additional stream was connected
+
+        """
+        if await stream.connect(always_log_errors=False, auth_timeout_s=self._auth_timeout_s):
+            self._stream_backoff.pop(stream, None)
+            return True
+
+        backoff_s = min(DEFAULT_MAX_BACKOFF_S, DEFAULT_MIN_BACKOFF_S * DEFAULT_BACKOFF ** failed_attempts)
+        _LOGGER.debug("Couldn't connect an additional stream to %s:%d, retrying in %.1f seconds", self.host, self.port, backoff_s)
+        self._stream_backoff[stream] = (failed_attempts + 1, time.monotonic() + backoff_s)
+        return False
+
+    async def _close_shell_session(self):
+        """Close the persistent shell session, if one is open.
+
+        Other streams are not opened while the session is open, since ``aio_adb_shell`` can only handle one stream at a time.
+
+        """
+        if self._shell_session:
+            await self._shell_session.close()
+            self._shell_session = None
+
+    async def _shell_session_run(self, cmd, timeout_s=None):
+        """Run a command in the persistent shell session, opening the session if necessary.
+
+        Parameters
+        ----------
+        cmd : str
+            The ADB command to be sent
+        timeout_s : float, None
+            Timeout in seconds for sending and receiving each packet of the command, or ``None`` to use the device's default timeout
+
+        Returns
+        -------
+        str, None
+            The response from the device, or ``None`` if the session could not be used
+
+        """
+        if not self._shell_session:
+            session = ShellSession(self._adb)
+            try:
+                async with self._stream():
+                    await session.open()
+            except asyncio.CancelledError:
+                raise
+            except Exception as exc:  # pylint: disable=broad-except
+                _LOGGER.debug("Couldn't open a persistent shell session on %s:%d, falling back to a new stream.  %s: %s", self.host, self.port, exc.__class__.__name__, exc)
+                return None
+
+            self._shell_session = session
+
+        try:
+            return await self._shell_session.run(cmd, timeout_s)
+
+        # the command was not sent, so it is safe to send it on a new stream
+        except ShellSessionClosedException as exc:
+            _LOGGER.debug("Persistent shell session on %s:%d was closed, falling back to a new stream.  %s", self.host, self.port, exc)
+            await self._close_shell_session()
+            return None
+
+        # the command may have been run, so don't run it again; if it was abandoned (see `_command`), the session is
+        # out of sync with its output, so it is closed too
+        except (asyncio.CancelledError, Exception):
+            await self._close_shell_session()
+            raise
@@ -6,11 +6,18 @@ ADB Debugging must be enabled.
 
 import logging
 
-from .basetv import BaseTV
+from .basetv import MEDIA_SESSION_STATES, BaseTV
 from . import constants
+from .properties import ANDROIDTV_FIELDS, DeviceProperties
+from .scheduler import PRIORITY_INTERACTIVE
+from .watch import ANDROIDTV_UPDATE_FIELDS
 
 _LOGGER = logging.getLogger(__name__)
 
+# the properties when the ADB command was unsuccessful and when the device is off; these are shared since snapshots are immutable
+_PROPERTIES_UNAVAILABLE = DeviceProperties()
+_PROPERTIES_OFF = DeviceProperties(False, False, wake_lock_size=-1)
+
 
 class AndroidTV(BaseTV):
     """Representation of an Android TV device.
@@ -25,26 +32,49 @@ class AndroidTV(BaseTV):
         The path to the ``adbkey`` file for ADB authentication
     state_detection_rules : dict, None
         A dictionary of rules for determining the state (see :class:`~aio_androidtv.basetv.BaseTV`)
+    persistent_shell : bool
+        Whether to run shell commands in a long-lived shell session instead of opening a new ADB stream for each command
+    max_streams : int
+        The maximum number of ADB commands that can be in flight at the same time (default is 1)
+    volume_cache_ttl_s : float
+        How long (in seconds) the volume properties can be answered from the last parsed ``STREAM_MUSIC`` block instead of querying the device (default is 0, i.e., no caching)
+    auth_executor : concurrent.futures.Executor, None
+        The executor (e.g., a ``ThreadPoolExecutor`` or ``ProcessPoolExecutor``) in which the token is signed during ADB authentication, or ``None`` to sign it on the event loop
+    tcp_keepalive_s : float, None
+        If not ``None``, enable TCP keepalive on the connection with this idle time and probe interval (in seconds), so that a dead connection is dropped by the OS
 
     """
 
     DEVICE_CLASS = 'androidtv'
 
-    def __init__(self, host, port=5555, adbkey='', state_detection_rules=None):
-        BaseTV.__init__(self, host, port, adbkey, state_detection_rules)
+    #: The properties that :meth:`get_properties` returns
+    PROPERTIES_FIELDS = ANDROIDTV_FIELDS
+
+    #: The values that :meth:`update` returns
+    UPDATE_FIELDS = ANDROIDTV_UPDATE_FIELDS
+
+    #: The built-in rules for determining the state (see :py:attr:`~aio_androidtv.basetv.BaseTV.builtin_state_detection_rules`)
+    BUILTIN_STATE_DETECTION_RULES = constants.ANDROIDTV_STATE_DETECTION_RULES
+
+    def __init__(self, host, port=5555, adbkey='', state_detection_rules=None, persistent_shell=False, max_streams=1, volume_cache_ttl_s=0., auth_executor=None, tcp_keepalive_s=None):
+        BaseTV.__init__(self, host, port, adbkey, state_detection_rules, persistent_shell, max_streams, volume_cache_ttl_s, auth_executor, tcp_keepalive_s)
 
     # ======================================================================= #
     #                                                                         #
     #                          Home Assistant Update                          #
     #                                                                         #
     # ======================================================================= #
-    async def update(self, get_running_apps=True):
+    async def update(self, get_running_apps=True, single_pass=False, hashed=False):
         """Get the info needed for a Home Assistant update.
 
         Parameters
         ----------
         get_running_apps : bool
             Whether or not to get the :meth:`~aio_androidtv.androidtv.AndroidTV.running_apps` property
+        single_pass : bool
+            Whether to run ``dumpsys power`` and ``dumpsys audio`` only once when getting the properties (see :meth:`get_properties`)
+        hashed : bool
+            Whether the device should only send the output of the properties command if it changed since the last call (see :meth:`~aio_androidtv.basetv.BaseTV._get_properties_output`)
 
         Returns
         -------
@@ -63,7 +93,25 @@ class AndroidTV(BaseTV):
 
         """
         # Get the properties needed for the update
-        screen_on, awake, audio_state, wake_lock_size, current_app, media_session_state, audio_output_device, is_volume_muted, volume, running_apps = await self.get_properties(get_running_apps=get_running_apps, lazy=True)
+        properties = await self.get_properties(get_running_apps=get_running_apps, lazy=True, single_pass=single_pass, hashed=hashed)
+
+        return self._update_from_properties(properties)
+
+    def _update_from_properties(self, properties):
+        """Determine the state and the info needed for a Home Assistant update from the device's properties.
+
+        Parameters
+        ----------
+        properties : DeviceProperties, list, tuple
+            The properties returned by :meth:`get_properties`
+
+        Returns
+        -------
+        tuple
+            See :meth:`update`
+
+        """
+        screen_on, awake, audio_state, wake_lock_size, current_app, media_session_state, audio_output_device, is_volume_muted, volume, running_apps = properties
 
         # Get the volume (between 0 and 1)
         volume_level = self._volume_level(volume)
@@ -90,100 +138,64 @@ class AndroidTV(BaseTV):
             if state:
                 return state, current_app, running_apps, audio_output_device, is_volume_muted, volume_level
 
-            # ATV Launcher
-            if current_app in [constants.APP_ATV_LAUNCHER, None]:
-                state = constants.STATE_IDLE
-
-            # BELL Fibe
-            elif current_app == constants.APP_BELL_FIBE:
-                state = audio_state
-
-            # Netflix
-            elif current_app == constants.APP_NETFLIX:
-                if media_session_state == 2:
-                    state = constants.STATE_PAUSED
-                elif media_session_state == 3:
-                    state = constants.STATE_PLAYING
-                else:
-                    state = constants.STATE_IDLE
-
-            # Plex
-            elif current_app == constants.APP_PLEX:
-                if media_session_state == 3:
-                    if wake_lock_size == 1:
-                        state = constants.STATE_PAUSED
-                    else:
-                        state = constants.STATE_PLAYING
-                else:
-                    state = constants.STATE_IDLE
-
-            # TVheadend
-            elif current_app == constants.APP_TVHEADEND:
-                if wake_lock_size == 5:
-                    state = constants.STATE_PAUSED
-                elif wake_lock_size == 6:
-                    state = constants.STATE_PLAYING
-                else:
-                    state = constants.STATE_IDLE
-
-            # VLC
-            elif current_app == constants.APP_VLC:
-                if media_session_state == 2:
-                    state = constants.STATE_PAUSED
-                elif media_session_state == 3:
-                    state = constants.STATE_PLAYING
-                else:
-                    state = constants.STATE_IDLE
-
-            # VRV
-            elif current_app == constants.APP_VRV:
-                state = audio_state
-
-            # YouTube
-            elif current_app == constants.APP_YOUTUBE:
-                if media_session_state == 2:
-                    state = constants.STATE_PAUSED
-                elif media_session_state == 3:
-                    state = constants.STATE_PLAYING
-                else:
-                    state = constants.STATE_IDLE
-
-            # Get the state from `media_session_state`
-            elif media_session_state:
-                if media_session_state == 2:
-                    state = constants.STATE_PAUSED
-                elif media_session_state == 3:
-                    state = constants.STATE_PLAYING
-                else:
-                    state = constants.STATE_IDLE
-
-            # Get the state from `audio_state`
-            elif audio_state != constants.STATE_IDLE:
-                state = audio_state
-
-            # Get the state from `wake_lock_size`
-            else:
-                if wake_lock_size == 1:
-                    state = constants.STATE_PAUSED
-                elif wake_lock_size == 2:
-                    state = constants.STATE_PLAYING
-                else:
-                    state = constants.STATE_IDLE
+            # Determine the state using the built-in rules for the current app
+            state = self._builtin_state_detection(current_app, media_session_state, wake_lock_size, audio_state)
 
         return state, current_app, running_apps, audio_output_device, is_volume_muted, volume_level
 
+    @staticmethod
+    def _default_state_detection(media_session_state, wake_lock_size, audio_state):
+        """Determine the state of an app that is not in the built-in rules.
+
+        Parameters
+        ----------
+        media_session_state : int, None
+            The :meth:`media_session_state` property
+        wake_lock_size : int, None
+            The :meth:`wake_lock_size` property
+        audio_state : str, None
+            The :meth:`audio_state` property
+
+        Returns
+        -------
+        str, None
+            The state, or ``None`` if it could not be determined
+
+        """
+        # Get the state from `media_session_state`
+        if media_session_state:
+            return MEDIA_SESSION_STATES.get(media_session_state, constants.STATE_IDLE)
+
+        # Get the state from `audio_state`
+        if audio_state != constants.STATE_IDLE:
+            return audio_state
+
+        # Get the state from `wake_lock_size`
+        if wake_lock_size == 1:
+            return constants.STATE_PAUSED
+        if wake_lock_size == 2:
+            return constants.STATE_PLAYING
+        return constants.STATE_IDLE
+
     # ======================================================================= #
     #                                                                         #
     #                               Properties                                #
     #                                                                         #
     # ======================================================================= #
-    async def get_properties(self, get_running_apps=True, lazy=False):
+    async def get_properties(self, get_running_apps=True, lazy=False, single_pass=False, hashed=False):
         """Get the properties needed for Home Assistant updates.
 
-        This will send one of the following ADB commands:
+        The properties are returned as a :py:class:`~aio_androidtv.properties.DeviceProperties` snapshot, which can be
+        unpacked like a tuple of the values listed below.  This will send one of the following ADB commands:
 
-        * :py:const:`aio_androidtv.constants.CMD_ANDROIDTV_PROPERTIES_LAZY`
-        * :py:const:`aio_androidtv.constants.CMD_ANDROIDTV_PROPERTIES_NOT_LAZY`
+        * :py:const:`aio_androidtv.constants.CMD_ANDROIDTV_PROPERTIES_LAZY_RUNNING_APPS`
+        * :py:const:`aio_androidtv.constants.CMD_ANDROIDTV_PROPERTIES_LAZY_NO_RUNNING_APPS`
+        * :py:const:`aio_androidtv.constants.CMD_ANDROIDTV_PROPERTIES_NOT_LAZY_RUNNING_APPS`
+        * :py:const:`aio_androidtv.constants.CMD_ANDROIDTV_PROPERTIES_NOT_LAZY_NO_RUNNING_APPS`
+        * :py:const:`aio_androidtv.constants.CMD_ANDROIDTV_PROPERTIES_LAZY_RUNNING_APPS_SINGLE_PASS`
+        * :py:const:`aio_androidtv.constants.CMD_ANDROIDTV_PROPERTIES_LAZY_NO_RUNNING_APPS_SINGLE_PASS`
+        * :py:const:`aio_androidtv.constants.CMD_ANDROIDTV_PROPERTIES_NOT_LAZY_RUNNING_APPS_SINGLE_PASS`
+        * :py:const:`aio_androidtv.constants.CMD_ANDROIDTV_PROPERTIES_NOT_LAZY_NO_RUNNING_APPS_SINGLE_PASS`
 
         Parameters
         ----------
@@ -191,6 +203,10 @@ class AndroidTV(BaseTV):
             Whether or not to get the :meth:`~aio_androidtv.androidtv.AndroidTV.running_apps` property
         lazy : bool
             Whether or not to continue retrieving properties if the device is off or the screensaver is running
+        single_pass : bool
+            Whether to run ``dumpsys power`` and ``dumpsys audio`` only once and derive all the properties from their captured output
+        hashed : bool
+            Whether the device should only send the output of the properties command if it changed since the last call (see :meth:`~aio_androidtv.basetv.BaseTV._get_properties_output`)
 
         Returns
         -------
@@ -216,63 +232,107 @@ class AndroidTV(BaseTV):
             A list of the running apps, or ``None`` if it was not determined
 
         """
-        if lazy:
+        output = await self._get_properties_output(self._get_properties_cmd(get_running_apps, lazy, single_pass), hashed)
+        _LOGGER.debug("Android TV %s:%d `get_properties` response: %s", self.host, self.port, output)
+
+        return self._parse_properties_cached(output, get_running_apps)
+
+    @staticmethod
+    def _get_properties_cmd(get_running_apps, lazy, single_pass):
+        """Get the ADB shell command that :meth:`get_properties` will send.
+
+        Parameters
+        ----------
+        get_running_apps : bool
+            Whether or not to get the :meth:`~aio_androidtv.androidtv.AndroidTV.running_apps` property
+        lazy : bool
+            Whether or not to continue retrieving properties if the device is off or the screensaver is running
+        single_pass : bool
+            Whether to run ``dumpsys power`` and ``dumpsys audio`` only once and derive all the properties from their captured output
+
+        Returns
+        -------
+        str
+            The ADB shell command
+
+        """
+        if single_pass:
+            if lazy:
+                if get_running_apps:
+                    return constants.CMD_ANDROIDTV_PROPERTIES_LAZY_RUNNING_APPS_SINGLE_PASS
+                return constants.CMD_ANDROIDTV_PROPERTIES_LAZY_NO_RUNNING_APPS_SINGLE_PASS
+
             if get_running_apps:
-                output = await self._adb.shell(constants.CMD_ANDROIDTV_PROPERTIES_LAZY_RUNNING_APPS)
-            else:
-                output = await self._adb.shell(constants.CMD_ANDROIDTV_PROPERTIES_LAZY_NO_RUNNING_APPS)
-        else:
+                return constants.CMD_ANDROIDTV_PROPERTIES_NOT_LAZY_RUNNING_APPS_SINGLE_PASS
+            return constants.CMD_ANDROIDTV_PROPERTIES_NOT_LAZY_NO_RUNNING_APPS_SINGLE_PASS
+
+        if lazy:
             if get_running_apps:
-                output = await self._adb.shell(constants.CMD_ANDROIDTV_PROPERTIES_NOT_LAZY_RUNNING_APPS)
-            else:
-                output = await self._adb.shell(constants.CMD_ANDROIDTV_PROPERTIES_NOT_LAZY_NO_RUNNING_APPS)
-        _LOGGER.debug("Android TV %s:%d `get_properties` response: %s", self.host, self.port, output)
+                return constants.CMD_ANDROIDTV_PROPERTIES_LAZY_RUNNING_APPS
+            return constants.CMD_ANDROIDTV_PROPERTIES_LAZY_NO_RUNNING_APPS
+
+        if get_running_apps:
+            return constants.CMD_ANDROIDTV_PROPERTIES_NOT_LAZY_RUNNING_APPS
+        return constants.CMD_ANDROIDTV_PROPERTIES_NOT_LAZY_NO_RUNNING_APPS
 
+    def _parse_properties(self, output, get_running_apps):
+        """Parse the output of the command sent by :meth:`get_properties`.
+
+        Parameters
+        ----------
+        output : str, None
+            The output of the ADB shell command, or ``None`` if it was unsuccessful
+        get_running_apps : bool
+            Whether or not the command retrieved the :meth:`~aio_androidtv.androidtv.AndroidTV.running_apps` property
+
+        Returns
+        -------
+        DeviceProperties
+            The properties (see :meth:`get_properties`)
+
+        """
         # ADB command was unsuccessful
         if output is None:
-            return None, None, None, None, None, None, None, None, None, None
+            return _PROPERTIES_UNAVAILABLE
 
         # `screen_on` property
         if not output:
-            return False, False, None, -1, None, None, None, None, None, None
+            return _PROPERTIES_OFF
         screen_on = output[0] == '1'
 
         # `awake` property
         if len(output) < 2:
-            return screen_on, False, None, -1, None, None, None, None, None, None
+            return DeviceProperties(screen_on, False, wake_lock_size=-1)
         awake = output[1] == '1'
 
         # `audio_state` property
         if len(output) < 3:
-            return screen_on, awake, None, -1, None, None, None, None, None, None
+            return DeviceProperties(screen_on, awake, wake_lock_size=-1)
         audio_state = self._audio_state(output[2])
 
         lines = output.strip().splitlines()
 
         # `wake_lock_size` property
         if len(lines[0]) < 4:
-            return screen_on, awake, audio_state, -1, None, None, None, None, None, None
+            return DeviceProperties(screen_on, awake, audio_state, -1)
         wake_lock_size = self._wake_lock_size(lines[0])
 
         # `current_app` property
         if len(lines) < 2:
-            return screen_on, awake, audio_state, wake_lock_size, None, None, None, None, None, None
+            return DeviceProperties(screen_on, awake, audio_state, wake_lock_size)
         current_app = self._current_app(lines[1])
 
         # `media_session_state` property
         if len(lines) < 3:
-            return screen_on, awake, audio_state, wake_lock_size, current_app, None, None, None, None, None
+            return DeviceProperties(screen_on, awake, audio_state, wake_lock_size, current_app)
         media_session_state = self._media_session_state(lines[2], current_app)
 
         # "STREAM_MUSIC" block
         if len(lines) < 4:
-            return screen_on, awake, audio_state, wake_lock_size, current_app, media_session_state, None, None, None, None
-
-        # reconstruct the output of `constants.CMD_STREAM_MUSIC`
-        stream_music_raw = "\n".join(lines[3:])
+            return DeviceProperties(screen_on, awake, audio_state, wake_lock_size, current_app, media_session_state)
 
         # the "STREAM_MUSIC" block from `adb shell dumpsys audio`
-        stream_music = await self._get_stream_music(stream_music_raw)
+        stream_music = self._cache_stream_music(self._parse_stream_music(lines[3:16]))
 
         # `audio_output_device` property
         audio_output_device = self._audio_output_device(stream_music)
@@ -285,12 +345,12 @@ class AndroidTV(BaseTV):
 
         # `running_apps` property
         if not get_running_apps or len(lines) < 16:
-            return screen_on, awake, audio_state, wake_lock_size, current_app, media_session_state, audio_output_device, is_volume_muted, volume, None
+            return DeviceProperties(screen_on, awake, audio_state, wake_lock_size, current_app, media_session_state, audio_output_device, is_volume_muted, volume)
         running_apps = self._running_apps(lines[15:])
 
-        return screen_on, awake, audio_state, wake_lock_size, current_app, media_session_state, audio_output_device, is_volume_muted, volume, running_apps
+        return DeviceProperties(screen_on, awake, audio_state, wake_lock_size, current_app, media_session_state, audio_output_device, is_volume_muted, volume, running_apps)
 
-    async def get_properties_dict(self, get_running_apps=True, lazy=True):
+    async def get_properties_dict(self, get_running_apps=True, lazy=True, single_pass=False, hashed=False):
         """Get the properties needed for Home Assistant updates and return them as a dictionary.
 
         Parameters
@@ -299,6 +359,10 @@ class AndroidTV(BaseTV):
             Whether or not to get the :meth:`~aio_androidtv.androidtv.AndroidTV.running_apps` property
         lazy : bool
             Whether or not to continue retrieving properties if the device is off or the screensaver is running
+        single_pass : bool
+            Whether to run ``dumpsys power`` and ``dumpsys audio`` only once and derive all the properties from their captured output
+        hashed : bool
+            Whether the device should only send the output of the properties command if it changed since the last call (see :meth:`~aio_androidtv.basetv.BaseTV._get_properties_output`)
 
         Returns
         -------
@@ -307,18 +371,9 @@ class AndroidTV(BaseTV):
             ``'media_session_state'``, ``'audio_state'``, ``'audio_output_device'``, ``'is_volume_muted'``, ``'volume'``, and ``'running_apps'``
 
         """
-        screen_on, awake, audio_state, wake_lock_size, current_app, media_session_state, audio_output_device, is_volume_muted, volume, running_apps = await self.get_properties(get_running_apps=get_running_apps, lazy=lazy)
-
-        return {'screen_on': screen_on,
-                'awake': awake,
-                'audio_state': audio_state,
-                'wake_lock_size': wake_lock_size,
-                'current_app': current_app,
-                'media_session_state': media_session_state,
-                'audio_output_device': audio_output_device,
-                'is_volume_muted': is_volume_muted,
-                'volume': volume,
-                'running_apps': running_apps}
+        properties = await self.get_properties(get_running_apps=get_running_apps, lazy=lazy, single_pass=single_pass, hashed=hashed)
+
+        return DeviceProperties.from_sequence(properties, ANDROIDTV_FIELDS).as_dict()
 
     async def running_apps(self):
         """Return a list of running user applications.
@@ -340,8 +395,8 @@ class AndroidTV(BaseTV):
     # ======================================================================= #
     async def turn_on(self):
         """Send ``POWER`` action if the device is off."""
-        await self._adb.shell(constants.CMD_SCREEN_ON + " || input keyevent {0}".format(constants.KEY_POWER))
+        await self._adb.shell(constants.CMD_SCREEN_ON + " || input keyevent {0}".format(constants.KEY_POWER), priority=PRIORITY_INTERACTIVE)
 
     async def turn_off(self):
         """Send ``POWER`` action if the device is not off."""
-        await self._adb.shell(constants.CMD_SCREEN_ON + " && input keyevent {0}".format(constants.KEY_POWER))
+        await self._adb.shell(constants.CMD_SCREEN_ON + " && input keyevent {0}".format(constants.KEY_POWER), priority=PRIORITY_INTERACTIVE)
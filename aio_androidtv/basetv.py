@@ -5,10 +5,14 @@ ADB Debugging must be enabled.
 
 
 import logging
-import re
+import time
 
 from . import constants
 from .adb_manager import ADBPython
+from .properties import DeviceProperties, StreamMusic
+from .scheduler import PRIORITY_BULK, PRIORITY_INTERACTIVE, PRIORITY_POLLING
+from .volume import DEFAULT_DEBOUNCE_S, VolumeController
+from .watch import DEFAULT_QUEUE_SIZE, DEFAULT_WATCH_FIELDS, WatchHub
 
 _LOGGER = logging.getLogger(__name__)
 
@@ -47,6 +51,9 @@ class BaseTV(object):
 
       * The valid properties are ``'media_session_state'``, ``'audio_state'``, and ``'wake_lock_size'``
 
+    If none of the rules for the current app apply, the state is determined by the built-in rules for the app (see
+    :py:attr:`builtin_state_detection_rules`), which are in the same format.
+
 
     Parameters
     ----------
@@ -58,10 +65,23 @@ class BaseTV(object):
         The path to the ``adbkey`` file for ADB authentication
     state_detection_rules : dict, None
         A dictionary of rules for determining the state (see above)
+    persistent_shell : bool
+        Whether to run shell commands in a long-lived shell session instead of opening a new ADB stream for each command
+    max_streams : int
+        The maximum number of ADB commands that can be in flight at the same time (default is 1)
+    volume_cache_ttl_s : float
+        How long (in seconds) the volume properties can be answered from the last parsed ``STREAM_MUSIC`` block instead of querying the device (default is 0, i.e., no caching)
+    auth_executor : concurrent.futures.Executor, None
+        The executor (e.g., a ``ThreadPoolExecutor`` or ``ProcessPoolExecutor``) in which the token is signed during ADB authentication, or ``None`` to sign it on the event loop
+    tcp_keepalive_s : float, None
+        If not ``None``, enable TCP keepalive on the connection with this idle time and probe interval (in seconds), so that a dead connection is dropped by the OS
 
     """
 
-    def __init__(self, host, port=5555, adbkey='', state_detection_rules=None):
+    #: The built-in rules for determining the state, in the same format as ``state_detection_rules``
+    BUILTIN_STATE_DETECTION_RULES = {}
+
+    def __init__(self, host, port=5555, adbkey='', state_detection_rules=None, persistent_shell=False, max_streams=1, volume_cache_ttl_s=0., auth_executor=None, tcp_keepalive_s=None):
         self.host = host
         self.port = int(port)
         self.adbkey = adbkey
@@ -75,11 +95,39 @@ class BaseTV(object):
                     raise TypeError("{0} is of type {1}, not str".format(app_id, type(app_id).__name__))
                 state_detection_rules_validator(rules)
 
+        # the built-in rules, if they were set for this device, and the compiled built-in rules (see `builtin_state_detection_rules`)
+        self._builtin_state_detection_rules_dict = None
+        self._compiled_builtin_state_detection_rules = None
+
         # the max volume level (determined when first getting the volume level)
         self.max_volume = None
 
+        # the last parsed "STREAM_MUSIC" block and when it was captured (see `_get_stream_music`)
+        self.volume_cache_ttl_s = volume_cache_ttl_s
+        self._stream_music = None
+        self._stream_music_time = None
+
+        # the last output of the `get_properties` command and the properties and "STREAM_MUSIC" block that were parsed from it
+        self._last_properties_output = None
+        self._last_properties = None
+        self._last_properties_stream_music = None
+
+        # the `get_properties` command, the hash of its output, and its output, from the last `hashed` call
+        self._last_properties_hash = None
+
+        # the properties, state detection rules, and result of the last update that was computed by `update_if_changed`
+        self._last_update_properties = None
+        self._last_update_rules = None
+        self._last_update = None
+
+        # the hub that polls the device for the subscriptions created by `watch`
+        self._watch_hub = None
+
+        # the controller that coalesces volume changes (see `volume_controller`)
+        self._volume_controller = None
+
         # the handler for ADB commands
-        self._adb = ADBPython(host, port, adbkey)
+        self._adb = ADBPython(host, port, adbkey, persistent_shell=persistent_shell, max_streams=max_streams, auth_executor=auth_executor, tcp_keepalive_s=tcp_keepalive_s)
 
     # ======================================================================= #
     #                                                                         #
@@ -98,7 +146,19 @@ class BaseTV(object):
         """
         return self._adb.available
 
-    async def adb_shell(self, cmd):
+    @property
+    def last_update(self):
+        """The result of the last update that was computed by :py:meth:`update_if_changed` or :py:meth:`update_from_properties`.
+
+        Returns
+        -------
+        tuple, None
+            The result of ``update()``, or ``None`` if no update has been computed yet
+
+        """
+        return self._last_update
+
+    async def adb_shell(self, cmd, priority=PRIORITY_INTERACTIVE, timeout_s=None):
         """Send an ADB command.
 
         This calls :py:meth:`aio_androidtv.adb_manager.ADBPython.shell`.
@@ -107,6 +167,10 @@ class BaseTV(object):
         ----------
         cmd : str
             The ADB command to be sent
+        priority : int
+            The priority of the command (see :py:mod:`aio_androidtv.scheduler`)
+        timeout_s : float, None
+            The deadline (in seconds) for the command, or ``None`` to use the default for its priority (see :py:const:`aio_androidtv.adb_manager.DEFAULT_COMMAND_TIMEOUTS_S`)
 
         Returns
         -------
@@ -114,9 +178,9 @@ class BaseTV(object):
             The response from the device, if there is a response
 
         """
-        return await self._adb.shell(cmd)
+        return await self._adb.shell(cmd, priority=priority, timeout_s=timeout_s)
 
-    async def adb_pull(self, local_path, device_path):
+    async def adb_pull(self, local_path, device_path, timeout_s=None):
         """Pull a file from the device.
 
         This calls :py:meth:`aio_androidtv.adb_manager.ADBPython.pull`.
@@ -127,11 +191,13 @@ class BaseTV(object):
             The path where the file will be saved
         device_path : str
             The file on the device that will be pulled
+        timeout_s : float, None
+            The deadline (in seconds) for the command, or ``None`` to use the default for its priority (see :py:const:`aio_androidtv.adb_manager.DEFAULT_COMMAND_TIMEOUTS_S`)
 
         """
-        return await self._adb.pull(local_path, device_path)
+        return await self._adb.pull(local_path, device_path, priority=PRIORITY_BULK, timeout_s=timeout_s)
 
-    async def adb_push(self, local_path, device_path):
+    async def adb_push(self, local_path, device_path, timeout_s=None):
         """Push a file to the device.
 
         This calls :py:meth:`aio_androidtv.adb_manager.ADBPython.push`.
@@ -142,22 +208,29 @@ class BaseTV(object):
             The file that will be pushed to the device
         device_path : str
             The path where the file will be saved on the device
+        timeout_s : float, None
+            The deadline (in seconds) for the command, or ``None`` to use the default for its priority (see :py:const:`aio_androidtv.adb_manager.DEFAULT_COMMAND_TIMEOUTS_S`)
 
         """
-        return await self._adb.push(local_path, device_path)
+        return await self._adb.push(local_path, device_path, priority=PRIORITY_BULK, timeout_s=timeout_s)
 
-    async def adb_screencap(self):
+    async def adb_screencap(self, timeout_s=None):
         """Take a screencap.
 
         This calls :py:meth:`aio_androidtv.adb_manager.ADBPython.screencap`.
 
+        Parameters
+        ----------
+        timeout_s : float, None
+            The deadline (in seconds) for the command, or ``None`` to use the default for its priority (see :py:const:`aio_androidtv.adb_manager.DEFAULT_COMMAND_TIMEOUTS_S`)
+
         Returns
         -------
         bytes
             The screencap as a binary .png image
 
         """
-        return await self._adb.screencap()
+        return await self._adb.screencap(priority=PRIORITY_BULK, timeout_s=timeout_s)
 
     async def adb_connect(self, always_log_errors=True, auth_timeout_s=constants.DEFAULT_AUTH_TIMEOUT_S):
         """Connect to an Android TV / Fire TV device.
@@ -184,6 +257,186 @@ class BaseTV(object):
         """
         await self._adb.close()
 
+    def adb_supervise(self, **supervisor_kwargs):
+        """Reconnect in the background whenever the ADB connection fails, and make commands fail fast while it is down.
+
+        Parameters
+        ----------
+        supervisor_kwargs
+            Keyword arguments for :py:class:`~aio_androidtv.supervisor.ConnectionSupervisor` (these are only used when the supervisor is first created)
+
+        Returns
+        -------
+        ConnectionSupervisor
+            The supervisor, which has been started (see :py:meth:`aio_androidtv.adb_manager.ADBPython.supervise`)
+
+        """
+        return self._adb.supervise(**supervisor_kwargs)
+
+    # ======================================================================= #
+    #                                                                         #
+    #                          Home Assistant Update                          #
+    #                                                                         #
+    # ======================================================================= #
+    async def update_if_changed(self, get_running_apps=True, single_pass=False, hashed=False):
+        """Get the info needed for a Home Assistant update, but only if it could have changed since the last call.
+
+        State detection is skipped when the properties are the same as they were for the last call (which is always
+        the case when the output of the ``get_properties`` command is unchanged) and the state detection rules have
+        not been replaced.
+
+        Parameters
+        ----------
+        get_running_apps : bool
+            Whether or not to get the running apps
+        single_pass : bool
+            Whether to run ``dumpsys power`` and ``dumpsys audio`` only once when getting the properties
+        hashed : bool
+            Whether the device should only send the output of the ``get_properties`` command if it changed since the last call
+
+        Returns
+        -------
+        changed_fields : frozenset
+            The names of the properties that changed since the last call (all of them on the first call)
+        update : tuple, None
+            The result of ``update()``, or ``None`` if nothing changed since the last call
+
+        """
+        properties = await self.get_properties(get_running_apps=get_running_apps, lazy=True, single_pass=single_pass, hashed=hashed)  # pylint: disable=no-member
+        properties = DeviceProperties.from_sequence(properties, self.PROPERTIES_FIELDS)  # pylint: disable=no-member
+
+        changed_fields = frozenset(properties.diff(self._last_update_properties))
+        if not changed_fields and self._last_update is not None and self._last_update_rules is self._state_detection_rules:
+            return changed_fields, None
+
+        return changed_fields, self.update_from_properties(properties)
+
+    def update_from_properties(self, properties):
+        """Get the info needed for a Home Assistant update from properties that were obtained elsewhere (e.g., from events), and record it as the last update.
+
+        Parameters
+        ----------
+        properties : DeviceProperties
+            The properties
+
+        Returns
+        -------
+        tuple
+            The result of ``update()``
+
+        """
+        self._last_update_properties = properties
+        self._last_update_rules = self._state_detection_rules
+        self._last_update = self._update_from_properties(properties)  # pylint: disable=no-member
+
+        return self._last_update
+
+    def watch(self, fields=DEFAULT_WATCH_FIELDS, queue_size=DEFAULT_QUEUE_SIZE, **poller_kwargs):
+        """Subscribe to the state changes of the device.
+
+        All subscriptions share one :py:class:`~aio_androidtv.polling.AdaptivePoller`, which is created with
+        ``poller_kwargs`` by the first call and runs for as long as there is at least one open subscription::
+
+            async with atv.watch() as changes:
+                async for change in changes:
+                    print(change.changes)
+
+        Parameters
+        ----------
+        fields : tuple
+            The names of the values returned by ``update()`` whose transitions are reported (see ``UPDATE_FIELDS``)
+        queue_size : int
+            The maximum number of state changes that are queued for the subscription; when the queue is full, the oldest change is dropped
+        poller_kwargs
+            Keyword arguments for the :py:class:`~aio_androidtv.polling.AdaptivePoller` (only used by the first call)
+
+        Returns
+        -------
+        Subscription
+            An async iterator over :py:class:`~aio_androidtv.watch.StateChange` objects
+
+        """
+        if self._watch_hub is None:
+            self._watch_hub = WatchHub(self, **poller_kwargs)
+
+        return self._watch_hub.subscribe(fields, queue_size)
+
+    async def _get_properties_output(self, cmd, hashed):
+        """Send the ``get_properties`` command and return its output.
+
+        If ``hashed`` is True, the command is wrapped in :py:const:`aio_androidtv.constants.CMD_HASHED` so that the
+        device hashes the output and compares it to the hash from the last call.  If they match, the device only sends
+        :py:const:`aio_androidtv.constants.HASHED_OUTPUT_UNCHANGED` and the last output is returned, so that
+        :meth:`_parse_properties_cached` can reuse the properties that were parsed from it.
+
+        Parameters
+        ----------
+        cmd : str
+            The ``get_properties`` command
+        hashed : bool
+            Whether the device should only send the output if it changed since the last call
+
+        Returns
+        -------
+        str, None
+            The output of the command, or ``None`` if it was unsuccessful
+
+        """
+        if not hashed:
+            return await self._adb.shell(cmd, priority=PRIORITY_POLLING)
+
+        # The hash is only meaningful for the same command
+        if self._last_properties_hash and self._last_properties_hash[0] == cmd:
+            last_hash, last_output = self._last_properties_hash[1:]
+        else:
+            last_hash, last_output = '', None
+
+        output = await self._adb.shell(constants.CMD_HASHED.format(cmd, last_hash), priority=PRIORITY_POLLING)
+        if output is None:
+            return None
+
+        if output.strip() == constants.HASHED_OUTPUT_UNCHANGED and last_output is not None:
+            _LOGGER.debug("%s:%d `get_properties` output is unchanged", self.host, self.port)
+            return last_output
+
+        # The first line is the hash (it is empty if `md5sum` is not available on the device)
+        output_hash, _, output = output.partition('\n')
+        output_hash = output_hash.strip()
+        self._last_properties_hash = (cmd, output_hash, output) if output_hash else None
+
+        return output
+
+    def _parse_properties_cached(self, output, get_running_apps):
+        """Parse the output of the ``get_properties`` command, unless it is the same as the last output.
+
+        Parameters
+        ----------
+        output : str, None
+            The output of the ADB shell command, or ``None`` if it was unsuccessful
+        get_running_apps : bool
+            Whether or not the command retrieved the running apps
+
+        Returns
+        -------
+        DeviceProperties
+            The properties; if ``output`` is identical to the last output, this is the same object that was returned last time
+
+        """
+        if output is not None and self._last_properties_output == (output, get_running_apps):
+            # the "STREAM_MUSIC" block in the output was captured just now, so refresh the cached block
+            self._cache_stream_music(self._last_properties_stream_music)
+            return self._last_properties
+
+        stream_music = self._stream_music
+        properties = self._parse_properties(output, get_running_apps)  # pylint: disable=no-member
+
+        if output is not None:
+            self._last_properties_output = (output, get_running_apps)
+            self._last_properties = properties
+            self._last_properties_stream_music = self._stream_music if self._stream_music is not stream_music else None
+
+        return properties
+
     # ======================================================================= #
     #                                                                         #
     #                        Home Assistant device info                       #
@@ -220,15 +473,15 @@ class BaseTV(object):
             _LOGGER.warning("Could not obtain serialno for %s:%d, got: '%s'", self.host, self.port, serialno)
             serialno = None
 
-        mac_wlan0_matches = re.findall(constants.MAC_REGEX_PATTERN, mac_wlan0_output)
+        mac_wlan0_matches = constants.REGEX_MAC.search(mac_wlan0_output)
         if mac_wlan0_matches:
-            wifimac = mac_wlan0_matches[0]
+            wifimac = mac_wlan0_matches.group('mac')
         else:
             wifimac = None
 
-        mac_eth0_matches = re.findall(constants.MAC_REGEX_PATTERN, mac_eth0_output)
+        mac_eth0_matches = constants.REGEX_MAC.search(mac_eth0_output)
         if mac_eth0_matches:
-            ethmac = mac_eth0_matches[0]
+            ethmac = mac_eth0_matches.group('mac')
         else:
             ethmac = None
 
@@ -246,8 +499,77 @@ class BaseTV(object):
     #                         Custom state detection                          #
     #                                                                         #
     # ======================================================================= #
-    def _custom_state_detection(self, current_app=None, media_session_state=None, wake_lock_size=None, audio_state=None):
-        """Use the rules in ``self._state_detection_rules`` to determine the state.
+    @property
+    def _state_detection_rules(self):
+        """The rules for determining the state (see the ``state_detection_rules`` parameter).
+
+        Setting the rules compiles them with :func:`compile_state_detection_rules`.
+
+        Returns
+        -------
+        dict, None
+            A dictionary of rules for determining the state
+
+        """
+        return self._state_detection_rules_dict
+
+    @_state_detection_rules.setter
+    def _state_detection_rules(self, state_detection_rules):
+        """Set and compile the rules for determining the state.
+
+        Parameters
+        ----------
+        state_detection_rules : dict, None
+            A dictionary of rules for determining the state
+
+        """
+        self._state_detection_rules_dict = state_detection_rules
+        self._compiled_state_detection_rules = compile_state_detection_rules(state_detection_rules)
+
+    @property
+    def builtin_state_detection_rules(self):
+        """The built-in rules for determining the state, which are used when none of the custom rules apply.
+
+        These are :py:const:`BUILTIN_STATE_DETECTION_RULES` unless they were set for this device.  To override or
+        extend them, set a new dictionary in the same format as the ``state_detection_rules`` parameter::
+
+            atv.builtin_state_detection_rules = dict(atv.builtin_state_detection_rules, **{'com.example.app': ['media_session_state', 'idle']})
+
+        For an app that is not in the built-in rules, the state is determined from the properties by
+        ``_default_state_detection``.
+
+        Returns
+        -------
+        dict
+            A dictionary whose keys are app IDs and whose values are lists of rules
+
+        """
+        if self._builtin_state_detection_rules_dict is not None:
+            return self._builtin_state_detection_rules_dict
+
+        return self.BUILTIN_STATE_DETECTION_RULES
+
+    @builtin_state_detection_rules.setter
+    def builtin_state_detection_rules(self, builtin_state_detection_rules):
+        """Validate and set the built-in rules for determining the state.
+
+        Parameters
+        ----------
+        builtin_state_detection_rules : dict
+            A dictionary whose keys are app IDs and whose values are lists of rules
+
+        """
+        for rules in builtin_state_detection_rules.values():
+            state_detection_rules_validator(rules)
+
+        self._builtin_state_detection_rules_dict = builtin_state_detection_rules
+        self._compiled_builtin_state_detection_rules = None
+
+        # the state that was cached by `update_if_changed` may have been determined by the old rules
+        self._last_update = None
+
+    def _builtin_state_detection(self, current_app, media_session_state=None, wake_lock_size=None, audio_state=None):
+        """Use the built-in rules for ``current_app`` to determine the state, or ``_default_state_detection`` if there are none.
 
         Parameters
         ----------
@@ -263,48 +585,45 @@ class BaseTV(object):
         Returns
         -------
         str, None
-            The state, if it could be determined using the rules in ``self._state_detection_rules``; otherwise, ``None``
+            The state, or ``None`` if it could not be determined
 
         """
-        if not self._state_detection_rules or current_app is None or current_app not in self._state_detection_rules:
-            return None
+        # the rules are compiled when they are first used, since `setup` may change the class of the object
+        if self._compiled_builtin_state_detection_rules is None:
+            self._compiled_builtin_state_detection_rules = compile_state_detection_rules(self.builtin_state_detection_rules)
 
-        rules = self._state_detection_rules[current_app]
+        decide = self._compiled_builtin_state_detection_rules.get(current_app, self._default_state_detection)
 
-        for rule in rules:
-            # The state is always the same for this app
-            if rule in constants.VALID_STATES:
-                return rule
+        return decide(media_session_state, wake_lock_size, audio_state)
 
-            # Use the `media_session_state` property
-            if rule == 'media_session_state':
-                if media_session_state == 2:
-                    return constants.STATE_PAUSED
-                if media_session_state == 3:
-                    return constants.STATE_PLAYING
-                if media_session_state is not None:
-                    return constants.STATE_IDLE
+    @staticmethod
+    def _default_state_detection(media_session_state, wake_lock_size, audio_state):  # pylint: disable=unused-argument
+        """Determine the state of an app that is not in the built-in rules.
 
-            # Use the `audio_state` property
-            if rule == 'audio_state' and audio_state in constants.VALID_STATES:
-                return audio_state
+        Parameters
+        ----------
+        media_session_state : int, None
+            The :meth:`media_session_state` property
+        wake_lock_size : int, None
+            The :meth:`wake_lock_size` property
+        audio_state : str, None
+            The :meth:`audio_state` property
 
-            # Check conditions and if they are true, return the specified state
-            if isinstance(rule, dict):
-                for state, conditions in rule.items():
-                    if state in constants.VALID_STATES and self._conditions_are_true(conditions, media_session_state, wake_lock_size, audio_state):
-                        return state
+        Returns
+        -------
+        str, None
+            The state, or ``None`` if it could not be determined
 
+        """
         return None
 
-    @staticmethod
-    def _conditions_are_true(conditions, media_session_state=None, wake_lock_size=None, audio_state=None):
-        """Check whether the conditions in ``conditions`` are true.
+    def _custom_state_detection(self, current_app=None, media_session_state=None, wake_lock_size=None, audio_state=None):
+        """Use the rules in ``self._state_detection_rules`` to determine the state.
 
         Parameters
         ----------
-        conditions : dict
-            A dictionary of conditions to be checked (see the ``state_detection_rules`` parameter in :class:`~aio_androidtv.basetv.BaseTV`)
+        current_app : str, None
+            The :meth:`current_app` property
         media_session_state : int, None
             The :meth:`media_session_state` property
         wake_lock_size : int, None
@@ -314,28 +633,15 @@ class BaseTV(object):
 
         Returns
         -------
-        bool
-            Whether or not all the conditions in ``conditions`` are true
+        str, None
+            The state, if it could be determined using the rules in ``self._state_detection_rules``; otherwise, ``None``
 
         """
-        for key, val in conditions.items():
-            if key == 'media_session_state':
-                if media_session_state is None or media_session_state != val:
-                    return False
-
-            elif key == 'wake_lock_size':
-                if wake_lock_size is None or wake_lock_size != val:
-                    return False
-
-            elif key == 'audio_state':
-                if audio_state is None or audio_state != val:
-                    return False
-
-            # key is invalid
-            else:
-                return False
+        decide = self._compiled_state_detection_rules.get(current_app)
+        if decide is None:
+            return None
 
-        return True
+        return decide(media_session_state, wake_lock_size, audio_state)
 
     # ======================================================================= #
     #                                                                         #
@@ -481,8 +787,8 @@ class BaseTV(object):
 
         Parameters
         ----------
-        stream_music : str, None
-            The ``STREAM_MUSIC`` block from ``adb shell dumpsys audio``
+        stream_music : StreamMusic, None
+            The parsed ``STREAM_MUSIC`` block from ``adb shell dumpsys audio``
 
         Returns
         -------
@@ -493,12 +799,7 @@ class BaseTV(object):
         if not stream_music:
             return None
 
-        assert isinstance(stream_music, str), "stream_music is of type {}".format(type(stream_music))
-        matches = re.findall(constants.DEVICE_REGEX_PATTERN, stream_music, re.DOTALL | re.MULTILINE)
-        if matches:
-            return matches[0]
-
-        return None
+        return stream_music.device
 
     @staticmethod
     def _audio_state(audio_state_response):
@@ -577,6 +878,9 @@ class BaseTV(object):
     async def _get_stream_music(self, stream_music_raw=None):
         """Get the ``STREAM_MUSIC`` block from the output of the command :py:const:`aio_androidtv.constants.CMD_STREAM_MUSIC`.
 
+        If ``stream_music_raw`` is not provided and the last parsed block was captured less than
+        ``self.volume_cache_ttl_s`` seconds ago, that block is returned without querying the device.
+
         Parameters
         ----------
         stream_music_raw : str, None
@@ -584,21 +888,76 @@ class BaseTV(object):
 
         Returns
         -------
-        str, None
-            The ``STREAM_MUSIC`` block from the output of :py:const:`aio_androidtv.constants.CMD_STREAM_MUSIC`, or ``None`` if it could not be determined
+        StreamMusic, None
+            The parsed ``STREAM_MUSIC`` block from the output of :py:const:`aio_androidtv.constants.CMD_STREAM_MUSIC`, or ``None`` if it could not be determined
 
         """
         if not stream_music_raw:
+            if self._stream_music is not None and time.monotonic() - self._stream_music_time < self.volume_cache_ttl_s:
+                return self._stream_music
+
             stream_music_raw = await self._adb.shell(constants.CMD_STREAM_MUSIC)
 
-        if not stream_music_raw:
-            return None
+        return self._cache_stream_music(self._parse_stream_music(stream_music_raw))
 
-        matches = re.findall(constants.STREAM_MUSIC_REGEX_PATTERN, stream_music_raw, re.DOTALL | re.MULTILINE)
-        if matches:
-            return matches[0]
+    def _cache_stream_music(self, stream_music):
+        """Store a parsed ``STREAM_MUSIC`` block and the time when it was captured.
 
-        return None
+        Parameters
+        ----------
+        stream_music : StreamMusic, None
+            The parsed ``STREAM_MUSIC`` block from ``adb shell dumpsys audio``
+
+        Returns
+        -------
+        StreamMusic, None
+            ``stream_music``
+
+        """
+        if stream_music is not None:
+            self._stream_music = stream_music
+            self._stream_music_time = time.monotonic()
+
+        return stream_music
+
+    def _update_stream_music_cache(self, volume=None, muted=None):
+        """Update the cached ``STREAM_MUSIC`` block after a volume command, without changing when it was captured.
+
+        Parameters
+        ----------
+        volume : int, None
+            The new volume of the current audio output device, or ``None`` if it did not change
+        muted : bool, None
+            Whether or not the volume is now muted, or ``None`` if it did not change
+
+        """
+        if self._stream_music is None:
+            return
+
+        changes = {}
+        if volume is not None and self._stream_music.device:
+            changes['volumes'] = dict(self._stream_music.volumes, **{self._stream_music.device: int(volume)})
+        if muted is not None:
+            changes['muted'] = muted
+
+        self._stream_music = self._stream_music.replace(**changes)
+
+    @staticmethod
+    def _parse_stream_music(stream_music_raw):
+        """Parse the ``STREAM_MUSIC`` block from the output of the command :py:const:`aio_androidtv.constants.CMD_STREAM_MUSIC`.
+
+        Parameters
+        ----------
+        stream_music_raw : str, list, None
+            The output of the command :py:const:`aio_androidtv.constants.CMD_STREAM_MUSIC`, or a list of its lines
+
+        Returns
+        -------
+        StreamMusic, None
+            The parsed ``STREAM_MUSIC`` block from the output of :py:const:`aio_androidtv.constants.CMD_STREAM_MUSIC`, or ``None`` if it could not be determined
+
+        """
+        return StreamMusic.from_output(stream_music_raw)
 
     @staticmethod
     def _is_volume_muted(stream_music):
@@ -606,8 +965,8 @@ class BaseTV(object):
 
         Parameters
         ----------
-        stream_music : str, None
-            The ``STREAM_MUSIC`` block from ``adb shell dumpsys audio``
+        stream_music : StreamMusic, None
+            The parsed ``STREAM_MUSIC`` block from ``adb shell dumpsys audio``
 
         Returns
         -------
@@ -618,11 +977,7 @@ class BaseTV(object):
         if not stream_music:
             return None
 
-        matches = re.findall(constants.MUTED_REGEX_PATTERN, stream_music, re.DOTALL | re.MULTILINE)
-        if matches:
-            return matches[0] == 'true'
-
-        return None
+        return stream_music.muted
 
     @staticmethod
     def _media_session_state(media_session_state_response, current_app):
@@ -677,8 +1032,8 @@ class BaseTV(object):
 
         Parameters
         ----------
-        stream_music : str, None
-            The ``STREAM_MUSIC`` block from ``adb shell dumpsys audio``
+        stream_music : StreamMusic, None
+            The parsed ``STREAM_MUSIC`` block from ``adb shell dumpsys audio``
         audio_output_device : str, None
             The current audio playback device
 
@@ -692,20 +1047,15 @@ class BaseTV(object):
             return None
 
         if not self.max_volume:
-            max_volume_matches = re.findall(constants.MAX_VOLUME_REGEX_PATTERN, stream_music, re.DOTALL | re.MULTILINE)
-            if max_volume_matches:
-                self.max_volume = float(max_volume_matches[0])
+            if stream_music.max_volume is not None:
+                self.max_volume = stream_music.max_volume
             else:
                 self.max_volume = 15.
 
         if not audio_output_device:
             return None
 
-        volume_matches = re.findall(audio_output_device + constants.VOLUME_REGEX_PATTERN, stream_music, re.DOTALL | re.MULTILINE)
-        if volume_matches:
-            return int(volume_matches[0])
-
-        return None
+        return stream_music.volume(audio_output_device)
 
     def _volume_level(self, volume):
         """Get the relative volume level from the absolute volume level.
@@ -775,7 +1125,7 @@ class BaseTV(object):
 
         # adb shell outputs in weird format, so we cut it into lines,
         # separate the retcode and return info to the user
-        res = await self._adb.shell(cmd)
+        res = await self._adb.shell(cmd, priority=PRIORITY_INTERACTIVE)
         if res is None:
             return {}
 
@@ -794,7 +1144,7 @@ class BaseTV(object):
             The ID of the app that will be launched
 
         """
-        await self._adb.shell(constants.CMD_LAUNCH_APP.format(app))
+        await self._adb.shell(constants.CMD_LAUNCH_APP.format(app), priority=PRIORITY_INTERACTIVE)
 
     async def stop_app(self, app):
         """Stop an app.
@@ -810,7 +1160,7 @@ class BaseTV(object):
             The output of the ``am force-stop`` ADB shell command, or ``None`` if the device is unavailable
 
         """
-        return await self._adb.shell("am force-stop {0}".format(app))
+        return await self._adb.shell("am force-stop {0}".format(app), priority=PRIORITY_INTERACTIVE)
 
     async def start_intent(self, uri):
         """Start an intent on the device.
@@ -821,7 +1171,7 @@ class BaseTV(object):
             The intent that will be sent is ``am start -a android.intent.action.VIEW -d <uri>``
 
         """
-        await self._adb.shell("am start -a android.intent.action.VIEW -d {}".format(uri))
+        await self._adb.shell("am start -a android.intent.action.VIEW -d {}".format(uri), priority=PRIORITY_INTERACTIVE)
 
     # ======================================================================= #
     #                                                                         #
@@ -837,7 +1187,47 @@ class BaseTV(object):
             The Key constant
 
         """
-        await self._adb.shell('input keyevent {0}'.format(key))
+        await self._adb.shell(constants.CMD_INPUT_KEYEVENT.format(key), priority=PRIORITY_INTERACTIVE)
+
+    async def send_keys(self, keys, delay=None):
+        """Send a sequence of key events to the device in one ADB shell command.
+
+        If there is no delay between the keys and the device's Android version supports it (see
+        :py:const:`~aio_androidtv.constants.MIN_VERSION_MULTIPLE_KEYEVENTS`), all of the keys are sent in a single
+        ``input keyevent`` call.  Otherwise, the ``input keyevent`` calls are chained.
+
+        Parameters
+        ----------
+        keys : list
+            The key constants (see :py:mod:`aio_androidtv.constants`)
+        delay : float, None
+            The time (in seconds) to wait between key events
+
+        """
+        if not keys:
+            return
+
+        if not delay and self._supports_multiple_keyevents():
+            cmd = constants.CMD_INPUT_KEYEVENT.format(" ".join(str(key) for key in keys))
+        else:
+            separator = " && " + constants.CMD_SLEEP.format(delay) + " && " if delay else " && "
+            cmd = separator.join(constants.CMD_INPUT_KEYEVENT.format(key) for key in keys)
+
+        await self._adb.shell(cmd, priority=PRIORITY_INTERACTIVE)
+
+    def _supports_multiple_keyevents(self):
+        """Determine whether the device's ``input keyevent`` command accepts more than one key code.
+
+        Returns
+        -------
+        bool
+            Whether the Android version in ``self.device_properties`` is at least :py:const:`~aio_androidtv.constants.MIN_VERSION_MULTIPLE_KEYEVENTS`
+
+        """
+        try:
+            return int(self.device_properties.get('sw_version', '').split('.')[0]) >= constants.MIN_VERSION_MULTIPLE_KEYEVENTS
+        except ValueError:
+            return False
 
     async def power(self):
         """Send power action."""
@@ -883,6 +1273,10 @@ class BaseTV(object):
         """Mute the volume."""
         await self._key(constants.KEY_MUTE)
 
+        # the mute key toggles the mute state
+        if self._stream_music is not None and self._stream_music.muted is not None:
+            self._update_stream_music_cache(muted=not self._stream_music.muted)
+
     # ======================================================================= #
     #                                                                         #
     #                      "key" methods: media commands                      #
@@ -1092,11 +1486,31 @@ class BaseTV(object):
 
         new_volume = int(min(max(round(self.max_volume * volume_level), 0.), self.max_volume))
 
-        await self._adb.shell("media volume --show --stream 3 --set {}".format(new_volume))
+        await self._adb.shell("media volume --show --stream 3 --set {}".format(new_volume), priority=PRIORITY_INTERACTIVE)
+        self._update_stream_music_cache(volume=new_volume)
 
         # return the new volume level
         return new_volume / self.max_volume
 
+    def volume_controller(self, debounce_s=DEFAULT_DEBOUNCE_S):
+        """Get the controller that coalesces rapid volume changes into one ``set_volume_level`` command per window.
+
+        Parameters
+        ----------
+        debounce_s : float
+            The length (in seconds) of the window in which volume changes are coalesced (only used by the first call)
+
+        Returns
+        -------
+        VolumeController
+            The device's :py:class:`~aio_androidtv.volume.VolumeController`
+
+        """
+        if self._volume_controller is None:
+            self._volume_controller = VolumeController(self, debounce_s)
+
+        return self._volume_controller
+
     async def volume_up(self, current_volume_level=None):
         """Send volume up action.
 
@@ -1123,8 +1537,11 @@ class BaseTV(object):
         if not self.max_volume or current_volume is None:
             return None
 
+        new_volume = min(current_volume + 1, self.max_volume)
+        self._update_stream_music_cache(volume=new_volume)
+
         # return the new volume level
-        return min(current_volume + 1, self.max_volume) / self.max_volume
+        return new_volume / self.max_volume
 
     async def volume_down(self, current_volume_level=None):
         """Send volume down action.
@@ -1152,8 +1569,11 @@ class BaseTV(object):
         if not self.max_volume or current_volume is None:
             return None
 
+        new_volume = max(current_volume - 1, 0.)
+        self._update_stream_music_cache(volume=new_volume)
+
         # return the new volume level
-        return max(current_volume - 1, 0.) / self.max_volume
+        return new_volume / self.max_volume
 
     # ======================================================================= #
     #                                                                         #
@@ -1203,6 +1623,152 @@ class BaseTV(object):
         return "sendevent {} {} {} {}".format(device_name, *integers)
 
 
+# ======================================================================= #
+#                                                                         #
+#                    Compile the state detection rules                    #
+#                                                                         #
+# ======================================================================= #
+#: The state for each value of the ``media_session_state`` property when the ``'media_session_state'`` rule is used (any other value means idle)
+MEDIA_SESSION_STATES = {2: constants.STATE_PAUSED,
+                        3: constants.STATE_PLAYING}
+
+# a condition that is always true
+_ANY = object()
+
+
+def compile_state_detection_rules(state_detection_rules):
+    """Compile the rules for determining the state into a function for each app.
+
+    Each function takes the ``media_session_state``, ``wake_lock_size``, and ``audio_state`` properties and returns
+    the state, or ``None`` if none of the app's rules apply.  The rules are evaluated in the same way as by
+    :meth:`BaseTV._custom_state_detection`, but the rule types and condition keys are only examined once, here.
+
+    Parameters
+    ----------
+    state_detection_rules : dict, None
+        A dictionary of rules for determining the state (see :class:`~aio_androidtv.basetv.BaseTV`)
+
+    Returns
+    -------
+    dict
+        A dictionary whose keys are app IDs and whose values are the compiled rules for those apps
+
+    """
+    if not state_detection_rules:
+        return {}
+
+    return {app_id: _compile_rules(rules) for app_id, rules in state_detection_rules.items()}
+
+
+def _compile_rules(rules):
+    """Compile the rules for one app into a function that determines the state.
+
+    Parameters
+    ----------
+    rules : list
+        The rules for the app (see :class:`~aio_androidtv.basetv.BaseTV`)
+
+    Returns
+    -------
+    function
+        A function that takes the ``media_session_state``, ``wake_lock_size``, and ``audio_state`` properties and returns the state, or ``None`` if none of the rules apply
+
+    """
+    steps = []
+    for rule in rules:
+        # The state is always the same for this app, so the rules after this one are never used
+        if isinstance(rule, str) and rule in constants.VALID_STATES:
+            steps.append(_compile_constant(rule))
+            break
+
+        # Use the `media_session_state` property
+        if rule == 'media_session_state':
+            steps.append(_decide_media_session_state)
+
+        # Use the `audio_state` property
+        elif rule == 'audio_state':
+            steps.append(_decide_audio_state)
+
+        # Check conditions and if they are true, return the specified state
+        elif isinstance(rule, dict):
+            steps.extend(_compile_conditions(state, conditions) for state, conditions in rule.items() if state in constants.VALID_STATES)
+
+    steps = tuple(step for step in steps if step is not None)
+
+    if not steps:
+        return _decide_none
+
+    if len(steps) == 1:
+        return steps[0]
+
+    def decide(media_session_state, wake_lock_size, audio_state):
+        """Return the state from the first rule that applies."""
+        for step in steps:
+            state = step(media_session_state, wake_lock_size, audio_state)
+            if state:
+                return state
+        return None
+
+    return decide
+
+
+def _compile_constant(state):
+    """Compile a rule that always reports ``state``."""
+    def decide(media_session_state, wake_lock_size, audio_state):  # pylint: disable=unused-argument
+        """Return the state."""
+        return state
+
+    return decide
+
+
+def _compile_conditions(state, conditions):
+    """Compile a rule that reports ``state`` if all of the ``conditions`` are true, or ``None`` if they can never be true."""
+    if not isinstance(conditions, dict):
+        return None
+
+    expected = {prop: _ANY for prop in constants.VALID_PROPERTIES}
+    for prop, value in conditions.items():
+        # an invalid property or a `None` value is never matched
+        if prop not in expected or value is None:
+            return None
+        expected[prop] = value
+
+    expected_media_session_state = expected['media_session_state']
+    expected_wake_lock_size = expected['wake_lock_size']
+    expected_audio_state = expected['audio_state']
+
+    def decide(media_session_state, wake_lock_size, audio_state):
+        """Return the state if the conditions are true."""
+        if expected_media_session_state is not _ANY and media_session_state != expected_media_session_state:
+            return None
+        if expected_wake_lock_size is not _ANY and wake_lock_size != expected_wake_lock_size:
+            return None
+        if expected_audio_state is not _ANY and audio_state != expected_audio_state:
+            return None
+        return state
+
+    return decide
+
+
+def _decide_media_session_state(media_session_state, wake_lock_size, audio_state):  # pylint: disable=unused-argument
+    """Determine the state from the ``media_session_state`` property."""
+    if media_session_state is None:
+        return None
+    return MEDIA_SESSION_STATES.get(media_session_state, constants.STATE_IDLE)
+
+
+def _decide_audio_state(media_session_state, wake_lock_size, audio_state):  # pylint: disable=unused-argument
+    """Determine the state from the ``audio_state`` property."""
+    if audio_state in constants.VALID_STATES:
+        return audio_state
+    return None
+
+
+def _decide_none(media_session_state, wake_lock_size, audio_state):  # pylint: disable=unused-argument
+    """None of the rules apply."""
+    return None
+
+
 # ======================================================================= #
 #                                                                         #
 #                    Validate the state detection rules                   #
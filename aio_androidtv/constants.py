@@ -55,6 +55,27 @@ CMD_STREAM_MUSIC = r"dumpsys audio | grep '\- STREAM_MUSIC:' -A 12"
 #: Get the wake lock size
 CMD_WAKE_LOCK_SIZE = "dumpsys power | grep Locks | grep 'size='"
 
+#: Capture the output of ``dumpsys audio`` in the shell variable ``AUDIO`` so that it only needs to be run once
+CMD_CAPTURE_AUDIO = "AUDIO=$(dumpsys audio)"
+
+#: Capture the output of ``dumpsys power`` in the shell variable ``POWER`` so that it only needs to be run once
+CMD_CAPTURE_POWER = "POWER=$(dumpsys power)"
+
+#: Get the audio state; this assumes that the variable ``AUDIO`` has been defined (see :py:const:`CMD_CAPTURE_AUDIO`)
+CMD_AUDIO_STATE_CAPTURED = r"""echo "$AUDIO" | grep paused | grep -qv 'Buffer Queue' && echo -e '1\c' || (echo "$AUDIO" | grep started | grep -qv 'Buffer Queue' && echo '2\c' || echo '0\c')"""
+
+#: Determine whether the device is awake; this assumes that the variable ``POWER`` has been defined (see :py:const:`CMD_CAPTURE_POWER`)
+CMD_AWAKE_CAPTURED = r"""echo "$POWER" | grep mWakefulness | grep -q Awake"""
+
+#: Determine if the device is on; this assumes that the variable ``POWER`` has been defined (see :py:const:`CMD_CAPTURE_POWER`)
+CMD_SCREEN_ON_CAPTURED = r"""(echo "$POWER" | grep 'Display Power' | grep -q 'state=ON' || echo "$POWER" | grep -q 'mScreenOn=true')"""
+
+#: Get the "STREAM_MUSIC" block; this assumes that the variable ``AUDIO`` has been defined (see :py:const:`CMD_CAPTURE_AUDIO`)
+CMD_STREAM_MUSIC_CAPTURED = r"""echo "$AUDIO" | grep '\- STREAM_MUSIC:' -A 12"""
+
+#: Get the wake lock size; this assumes that the variable ``POWER`` has been defined (see :py:const:`CMD_CAPTURE_POWER`)
+CMD_WAKE_LOCK_SIZE_CAPTURED = r"""echo "$POWER" | grep Locks | grep 'size='"""
+
 #: Get the properties for an :py:class:`~aio_androidtv.androidtv.AndroidTV` device (``lazy=True, get_running_apps=True``); see :py:meth:`aio_androidtv.androidtv.AndroidTV.get_properties`
 CMD_ANDROIDTV_PROPERTIES_LAZY_RUNNING_APPS = CMD_SCREEN_ON + CMD_SUCCESS1 + " && " + CMD_AWAKE + CMD_SUCCESS1 + " && (" + CMD_AUDIO_STATE + ") && " + CMD_WAKE_LOCK_SIZE + " && " + CMD_CURRENT_APP + " && (" + CMD_MEDIA_SESSION_STATE + " || echo) && " + CMD_STREAM_MUSIC + " && " + CMD_ANDROIDTV_RUNNING_APPS
 
@@ -79,6 +100,46 @@ CMD_FIRETV_PROPERTIES_NOT_LAZY_RUNNING_APPS = CMD_SCREEN_ON + CMD_SUCCESS1_FAILU
 #: Get the properties for a :py:class:`~aio_androidtv.firetv.FireTV` device (``lazy=False, get_running_apps=False``); see :py:meth:`aio_androidtv.firetv.FireTV.get_properties`
 CMD_FIRETV_PROPERTIES_NOT_LAZY_NO_RUNNING_APPS = CMD_SCREEN_ON + CMD_SUCCESS1_FAILURE0 + " && " + CMD_AWAKE + CMD_SUCCESS1_FAILURE0 + " && " + CMD_WAKE_LOCK_SIZE + " && " + CMD_CURRENT_APP + " && (" + CMD_MEDIA_SESSION_STATE + " || echo)"
 
+#: Get the properties for an :py:class:`~aio_androidtv.androidtv.AndroidTV` device (``lazy=True, get_running_apps=True``), running ``dumpsys power`` and ``dumpsys audio`` only once; see :py:meth:`aio_androidtv.androidtv.AndroidTV.get_properties`
+CMD_ANDROIDTV_PROPERTIES_LAZY_RUNNING_APPS_SINGLE_PASS = CMD_CAPTURE_POWER + " && " + CMD_SCREEN_ON_CAPTURED + CMD_SUCCESS1 + " && " + CMD_AWAKE_CAPTURED + CMD_SUCCESS1 + " && " + CMD_CAPTURE_AUDIO + " && (" + CMD_AUDIO_STATE_CAPTURED + ") && " + CMD_WAKE_LOCK_SIZE_CAPTURED + " && " + CMD_CURRENT_APP + " && (" + CMD_MEDIA_SESSION_STATE + " || echo) && " + CMD_STREAM_MUSIC_CAPTURED + " && " + CMD_ANDROIDTV_RUNNING_APPS
+
+#: Get the properties for an :py:class:`~aio_androidtv.androidtv.AndroidTV` device (``lazy=True, get_running_apps=False``), running ``dumpsys power`` and ``dumpsys audio`` only once; see :py:meth:`aio_androidtv.androidtv.AndroidTV.get_properties`
+CMD_ANDROIDTV_PROPERTIES_LAZY_NO_RUNNING_APPS_SINGLE_PASS = CMD_CAPTURE_POWER + " && " + CMD_SCREEN_ON_CAPTURED + CMD_SUCCESS1 + " && " + CMD_AWAKE_CAPTURED + CMD_SUCCESS1 + " && " + CMD_CAPTURE_AUDIO + " && (" + CMD_AUDIO_STATE_CAPTURED + ") && " + CMD_WAKE_LOCK_SIZE_CAPTURED + " && " + CMD_CURRENT_APP + " && (" + CMD_MEDIA_SESSION_STATE + " || echo) && " + CMD_STREAM_MUSIC_CAPTURED
+
+#: Get the properties for an :py:class:`~aio_androidtv.androidtv.AndroidTV` device (``lazy=False, get_running_apps=True``), running ``dumpsys power`` and ``dumpsys audio`` only once; see :py:meth:`aio_androidtv.androidtv.AndroidTV.get_properties`
+CMD_ANDROIDTV_PROPERTIES_NOT_LAZY_RUNNING_APPS_SINGLE_PASS = CMD_CAPTURE_POWER + " && " + CMD_SCREEN_ON_CAPTURED + CMD_SUCCESS1_FAILURE0 + " && " + CMD_AWAKE_CAPTURED + CMD_SUCCESS1_FAILURE0 + " && " + CMD_CAPTURE_AUDIO + " && (" + CMD_AUDIO_STATE_CAPTURED + ") && " + CMD_WAKE_LOCK_SIZE_CAPTURED + " && " + CMD_CURRENT_APP + " && (" + CMD_MEDIA_SESSION_STATE + " || echo) && " + CMD_STREAM_MUSIC_CAPTURED + " && " + CMD_ANDROIDTV_RUNNING_APPS
+
+#: Get the properties for an :py:class:`~aio_androidtv.androidtv.AndroidTV` device (``lazy=False, get_running_apps=False``), running ``dumpsys power`` and ``dumpsys audio`` only once; see :py:meth:`aio_androidtv.androidtv.AndroidTV.get_properties`
+CMD_ANDROIDTV_PROPERTIES_NOT_LAZY_NO_RUNNING_APPS_SINGLE_PASS = CMD_CAPTURE_POWER + " && " + CMD_SCREEN_ON_CAPTURED + CMD_SUCCESS1_FAILURE0 + " && " + CMD_AWAKE_CAPTURED + CMD_SUCCESS1_FAILURE0 + " && " + CMD_CAPTURE_AUDIO + " && (" + CMD_AUDIO_STATE_CAPTURED + ") && " + CMD_WAKE_LOCK_SIZE_CAPTURED + " && " + CMD_CURRENT_APP + " && (" + CMD_MEDIA_SESSION_STATE + " || echo) && " + CMD_STREAM_MUSIC_CAPTURED
+
+#: Get the properties for a :py:class:`~aio_androidtv.firetv.FireTV` device (``lazy=True, get_running_apps=True``), running ``dumpsys power`` only once; see :py:meth:`aio_androidtv.firetv.FireTV.get_properties`
+CMD_FIRETV_PROPERTIES_LAZY_RUNNING_APPS_SINGLE_PASS = CMD_CAPTURE_POWER + " && " + CMD_SCREEN_ON_CAPTURED + CMD_SUCCESS1 + " && " + CMD_AWAKE_CAPTURED + CMD_SUCCESS1 + " && " + CMD_WAKE_LOCK_SIZE_CAPTURED + " && " + CMD_CURRENT_APP + " && (" + CMD_MEDIA_SESSION_STATE + " || echo) && " + CMD_FIRETV_RUNNING_APPS
+
+#: Get the properties for a :py:class:`~aio_androidtv.firetv.FireTV` device (``lazy=True, get_running_apps=False``), running ``dumpsys power`` only once; see :py:meth:`aio_androidtv.firetv.FireTV.get_properties`
+CMD_FIRETV_PROPERTIES_LAZY_NO_RUNNING_APPS_SINGLE_PASS = CMD_CAPTURE_POWER + " && " + CMD_SCREEN_ON_CAPTURED + CMD_SUCCESS1 + " && " + CMD_AWAKE_CAPTURED + CMD_SUCCESS1 + " && " + CMD_WAKE_LOCK_SIZE_CAPTURED + " && " + CMD_CURRENT_APP + " && (" + CMD_MEDIA_SESSION_STATE + " || echo)"
+
+#: Get the properties for a :py:class:`~aio_androidtv.firetv.FireTV` device (``lazy=False, get_running_apps=True``), running ``dumpsys power`` only once; see :py:meth:`aio_androidtv.firetv.FireTV.get_properties`
+CMD_FIRETV_PROPERTIES_NOT_LAZY_RUNNING_APPS_SINGLE_PASS = CMD_CAPTURE_POWER + " && " + CMD_SCREEN_ON_CAPTURED + CMD_SUCCESS1_FAILURE0 + " && " + CMD_AWAKE_CAPTURED + CMD_SUCCESS1_FAILURE0 + " && " + CMD_WAKE_LOCK_SIZE_CAPTURED + " && " + CMD_CURRENT_APP + " && (" + CMD_MEDIA_SESSION_STATE + " || echo) && " + CMD_FIRETV_RUNNING_APPS
+
+#: Get the properties for a :py:class:`~aio_androidtv.firetv.FireTV` device (``lazy=False, get_running_apps=False``), running ``dumpsys power`` only once; see :py:meth:`aio_androidtv.firetv.FireTV.get_properties`
+CMD_FIRETV_PROPERTIES_NOT_LAZY_NO_RUNNING_APPS_SINGLE_PASS = CMD_CAPTURE_POWER + " && " + CMD_SCREEN_ON_CAPTURED + CMD_SUCCESS1_FAILURE0 + " && " + CMD_AWAKE_CAPTURED + CMD_SUCCESS1_FAILURE0 + " && " + CMD_WAKE_LOCK_SIZE_CAPTURED + " && " + CMD_CURRENT_APP + " && (" + CMD_MEDIA_SESSION_STATE + " || echo)"
+
+#: Printed instead of the output of a command wrapped in :py:const:`CMD_HASHED` when the output is unchanged
+HASHED_OUTPUT_UNCHANGED = "__AIO_ANDROIDTV_UNCHANGED__"
+
+#: Run a command (``{0}``) and hash its output on the device; if the hash equals ``{1}``, print only :py:const:`HASHED_OUTPUT_UNCHANGED`, otherwise print the hash on the first line followed by the output
+CMD_HASHED = "OUTPUT=$({0}) ; HASH=$(echo \"$OUTPUT\" | md5sum 2>/dev/null) ; HASH=${{HASH%% *}} ; if [ -n \"$HASH\" ] && [ \"$HASH\" = '{1}' ]; then echo -n '" + HASHED_OUTPUT_UNCHANGED + "'; else echo \"$HASH\" && echo \"$OUTPUT\"; fi"
+
+# Event streams (see :py:class:`aio_androidtv.events.EventMonitor`)
+#: The ``logcat`` tags from which focus changes, playback state changes, and screen on/off events are parsed
+LOGCAT_EVENT_TAGS = ('ActivityManager', 'ActivityTaskManager', 'DreamManagerService', 'MediaSessionRecord', 'MediaSessionService', 'PowerManagerService')
+
+#: Stream new ``logcat`` lines from the :py:const:`LOGCAT_EVENT_TAGS`
+CMD_LOGCAT_EVENTS = "logcat -v brief -T 1 " + " ".join(tag + ":V" for tag in LOGCAT_EVENT_TAGS) + " *:S"
+
+#: Stream activity changes from the activity manager
+CMD_AM_MONITOR = "am monitor"
+
 # `getprop` commands
 CMD_MANUFACTURER = "getprop ro.product.manufacturer"
 CMD_MODEL = "getprop ro.product.model"
@@ -90,6 +151,15 @@ CMD_MAC_WLAN0 = "ip addr show wlan0 | grep -m 1 ether"
 CMD_MAC_ETH0 = "ip addr show eth0 | grep -m 1 ether"
 
 
+#: Send one or more key events (the key codes are separated by spaces)
+CMD_INPUT_KEYEVENT = "input keyevent {0}"
+
+#: Pause between key events (in seconds)
+CMD_SLEEP = "sleep {0}"
+
+#: The first Android version (``ro.build.version.release``) whose ``input keyevent`` command accepts more than one key code
+MIN_VERSION_MULTIPLE_KEYEVENTS = 6
+
 # ADB key event codes
 # https://developer.android.com/reference/android/view/KeyEvent
 KEY_BACK = 4
@@ -308,11 +378,58 @@ APPS = {APP_AMAZON_VIDEO: 'Amazon Video',
         APP_YOUTUBE: 'YouTube'}
 
 
+# Built-in state detection rules
+#: The built-in rules for determining the state of an Android TV device, in the format of the ``state_detection_rules`` parameter of :py:class:`~aio_androidtv.basetv.BaseTV` (the key ``None`` is used when the current app could not be determined)
+ANDROIDTV_STATE_DETECTION_RULES = {None: [STATE_IDLE],
+                                   APP_ATV_LAUNCHER: [STATE_IDLE],
+                                   APP_BELL_FIBE: ['audio_state'],
+                                   APP_NETFLIX: ['media_session_state', STATE_IDLE],
+                                   APP_PLEX: [{STATE_PAUSED: {'media_session_state': 3, 'wake_lock_size': 1}},
+                                              {STATE_PLAYING: {'media_session_state': 3}},
+                                              STATE_IDLE],
+                                   APP_TVHEADEND: [{STATE_PAUSED: {'wake_lock_size': 5}},
+                                                   {STATE_PLAYING: {'wake_lock_size': 6}},
+                                                   STATE_IDLE],
+                                   APP_VLC: ['media_session_state', STATE_IDLE],
+                                   APP_VRV: ['audio_state'],
+                                   APP_YOUTUBE: ['media_session_state', STATE_IDLE]}
+
+#: The built-in rules for determining the state of a Fire TV device, in the format of the ``state_detection_rules`` parameter of :py:class:`~aio_androidtv.basetv.BaseTV` (the key ``None`` is used when the current app could not be determined)
+FIRETV_STATE_DETECTION_RULES = {None: [STATE_IDLE],
+                                APP_FIRETV_PACKAGE_LAUNCHER: [STATE_IDLE],
+                                APP_FIRETV_PACKAGE_SETTINGS: [STATE_IDLE],
+                                APP_AMAZON_VIDEO: ['media_session_state', STATE_IDLE],
+                                APP_FIREFOX: [{STATE_PLAYING: {'wake_lock_size': 3}},
+                                              STATE_IDLE],
+                                APP_HULU: [{STATE_PLAYING: {'wake_lock_size': 4}},
+                                           {STATE_PAUSED: {'wake_lock_size': 2}},
+                                           STATE_IDLE],
+                                APP_JELLYFIN_TV: [{STATE_PLAYING: {'wake_lock_size': 2}},
+                                                  STATE_PAUSED],
+                                APP_NETFLIX: ['media_session_state', STATE_IDLE],
+                                APP_PLEX: [{STATE_PAUSED: {'media_session_state': 3, 'wake_lock_size': 2}},
+                                           {STATE_PLAYING: {'media_session_state': 3}},
+                                           STATE_IDLE],
+                                APP_SPORT1: [{STATE_PAUSED: {'wake_lock_size': 2}},
+                                             {STATE_PLAYING: {'wake_lock_size': 3}},
+                                             STATE_IDLE],
+                                APP_SPOTIFY: ['media_session_state', STATE_IDLE],
+                                APP_TWITCH: [{STATE_PAUSED: {'wake_lock_size': 2}},
+                                             {STATE_PLAYING: {'media_session_state': 3}},
+                                             {STATE_PLAYING: {'media_session_state': 4}},
+                                             STATE_IDLE],
+                                APP_WAIPU_TV: [{STATE_PAUSED: {'wake_lock_size': 2}},
+                                               {STATE_PLAYING: {'wake_lock_size': 3}},
+                                               STATE_IDLE]}
+
 # Regular expressions
+REGEX_MAC = re.compile(r"ether (?P<mac>.*?) brd")
 REGEX_MEDIA_SESSION_STATE = re.compile(r"state=(?P<state>[0-9]+)", re.MULTILINE)
+REGEX_STREAM_MUSIC_DEVICE = re.compile(r"\w+")
+REGEX_STREAM_MUSIC_VOLUME = re.compile(r"\((?P<device>[^()]+)\): (?P<volume>[0-9]+)")
 REGEX_WAKE_LOCK_SIZE = re.compile(r"size=(?P<size>[0-9]+)")
 
-# Regular expression patterns
+# Regular expression patterns (the library uses the compiled expressions above; these are kept for backward compatibility)
 DEVICE_REGEX_PATTERN = r"Devices: (.*?)\W"
 MAC_REGEX_PATTERN = "ether (.*?) brd"
 MAX_VOLUME_REGEX_PATTERN = r"Max: (\d{1,})"
@@ -322,3 +439,6 @@ VOLUME_REGEX_PATTERN = r"\): (\d{1,})"
 
 #: Default authentication timeout (in s) for :meth:`adb_shell.tcp_handle.TcpHandle.connect`
 DEFAULT_AUTH_TIMEOUT_S = 0.1
+
+#: Default timeout (in s) for the no-op command that checks whether an ADB connection is alive (see :meth:`aio_androidtv.adb_manager.ADBPython.probe`)
+DEFAULT_PROBE_TIMEOUT_S = 2.
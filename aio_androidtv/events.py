@@ -0,0 +1,330 @@
+"""Update the state of a device from events that are streamed from it, rather than by polling.
+
+* :py:class:`LineParser` splits a stream of output chunks into lines.
+* :py:func:`parse_event` gets the property changes (focus changes, playback state changes, and screen on/off) from one line of ``logcat`` or ``am monitor`` output.
+* :py:class:`EventMonitor` keeps an event stream open on a dedicated connection and updates the state of a device from it.
+
+"""
+
+
+import asyncio
+import codecs
+import logging
+import re
+
+from . import constants
+from .adb_manager import ADBPython
+from .properties import DeviceProperties
+
+_LOGGER = logging.getLogger(__name__)
+
+
+#: The rules for getting property changes from lines of event output: a compiled regex and either a dictionary of property changes or a function that gets them from the match (the media session state is per app, so it is unknown after a focus change)
+EVENT_RULES = ((re.compile(r"\bDisplayed ([\w.]+)/"), lambda match: {'current_app': match.group(1), 'media_session_state': None}),
+               (re.compile(r"\bActivity (?:starting|resuming): ([\w.]+)"), lambda match: {'current_app': match.group(1), 'media_session_state': None}),
+               (re.compile(r"\bPlaybackState \{state=(\d+)"), lambda match: {'media_session_state': int(match.group(1))}),
+               (re.compile(r"\bGoing to sleep\b"), {'screen_on': False, 'awake': False}),
+               (re.compile(r"\bWaking up from\b"), {'screen_on': True, 'awake': True}),
+               (re.compile(r"\bEntering dreamland\b"), {'awake': False}),
+               (re.compile(r"\b(?:Gently waking up from dream|Dream finished)\b"), {'awake': True}))
+
+#: The default interval (in seconds) at which the properties are fully retrieved, in case an event was missed
+DEFAULT_RECONCILE_INTERVAL_S = 300.
+
+#: The default interval (in seconds) between attempts to reconnect the event stream
+DEFAULT_RECONNECT_INTERVAL_S = 5.
+
+
+def parse_event(line):
+    """Get the property changes from a line of event output.
+
+    Parameters
+    ----------
+    line : str
+        A line of ``logcat`` or ``am monitor`` output
+
+    Returns
+    -------
+    dict, None
+        The property changes, or ``None`` if the line is not an event
+
+    """
+    for regex, changes in EVENT_RULES:
+        match = regex.search(line)
+        if match:
+            return changes(match) if callable(changes) else dict(changes)
+
+    return None
+
+
+class LineParser(object):
+    """Split a stream of output chunks into lines.
+
+    A chunk may end in the middle of a line or even of a UTF-8 character; the incomplete part is kept until the
+    rest of it arrives.
+
+    """
+    def __init__(self):
+        self._decoder = codecs.getincrementaldecoder('utf-8')(errors='replace')
+        self._partial = ''
+
+    def feed(self, data):
+        """Add a chunk of output and get the lines that it completes.
+
+        Parameters
+        ----------
+        data : bytes
+            A chunk of output
+
+        Returns
+        -------
+        list
+            The complete lines, without line endings
+
+        """
+        lines = (self._partial + self._decoder.decode(data)).split('\n')
+        self._partial = lines.pop()
+        return [line.rstrip('\r') for line in lines]
+
+    def flush(self):
+        """Get the incomplete line at the end of the output, when the stream has ended.
+
+        Returns
+        -------
+        list
+            The incomplete line, if there is one
+
+        """
+        partial = (self._partial + self._decoder.decode(b'', final=True)).rstrip('\r')
+        self._partial = ''
+        return [partial] if partial else []
+
+
+class EventMonitor(object):
+    """Keep an event stream open to a device and update its state from the events.
+
+    The stream runs on a dedicated connection, so it does not block the commands that are sent via the device's
+    own connection.  The properties are fully retrieved via ``get_properties`` when the stream is (re)connected,
+    when the device wakes up, and every ``reconcile_interval_s`` seconds; in between, they are updated from the
+    events.  If retrieving the properties fails, the error is logged and it is retried every ``reconnect_interval_s``
+    seconds.
+
+    Parameters
+    ----------
+    atv : BaseTV
+        The device (an :py:class:`~aio_androidtv.androidtv.AndroidTV` or :py:class:`~aio_androidtv.firetv.FireTV` object)
+    callback : callable, None
+        A function (or coroutine function) that is called with the result of ``update()`` whenever it changes
+    cmd : str
+        The command that streams the events (:py:const:`aio_androidtv.constants.CMD_LOGCAT_EVENTS` or :py:const:`aio_androidtv.constants.CMD_AM_MONITOR`)
+    reconcile_interval_s : float
+        The interval at which the properties are fully retrieved
+    reconnect_interval_s : float
+        The interval between attempts to reconnect the event stream
+    get_running_apps : bool
+        Whether or not to get the running apps when the properties are fully retrieved
+
+    """
+    def __init__(self, atv, callback=None, cmd=constants.CMD_LOGCAT_EVENTS, reconcile_interval_s=DEFAULT_RECONCILE_INTERVAL_S, reconnect_interval_s=DEFAULT_RECONNECT_INTERVAL_S, get_running_apps=True):  # pylint: disable=too-many-arguments
+        self.atv = atv
+        self.callback = callback
+        self.cmd = cmd
+        self.reconcile_interval_s = reconcile_interval_s
+        self.reconnect_interval_s = reconnect_interval_s
+        self.get_running_apps = get_running_apps
+
+        #: The current properties and the result of ``update()`` that was determined from them
+        self.properties = None
+        self.update = None
+
+        #: The number of events that were applied, the number of times that the properties were fully retrieved, and the number of times that this failed
+        self.events = 0
+        self.reconciles = 0
+        self.reconcile_errors = 0
+
+        self._adb = ADBPython(atv.host, atv.port, atv.adbkey, auth_executor=atv._adb.auth_executor, tcp_keepalive_s=atv._adb.tcp_keepalive_s)  # pylint: disable=protected-access
+        self._task = None
+
+        # the event that requests a full retrieval of the properties (created in `run`, so that it is bound to the running event loop)
+        self._reconcile_now = None
+
+    # ======================================================================= #
+    #                                                                         #
+    #                               Event loop                                #
+    #                                                                         #
+    # ======================================================================= #
+    def start(self):
+        """Start monitoring the device in a background task.
+
+        Returns
+        -------
+        asyncio.Task
+            The monitoring task
+
+        """
+        if self._task is None or self._task.done():
+            self._task = asyncio.ensure_future(self.run())
+
+        return self._task
+
+    async def stop(self):
+        """Stop monitoring the device and close the event stream's connection.
+
+        """
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+        await self._adb.close()
+
+    async def run(self):
+        """Stream events from the device until the task is cancelled, reconnecting when the stream ends.
+
+        """
+        self._reconcile_now = asyncio.Event()
+        reconcile_task = asyncio.ensure_future(self._reconcile_loop())
+        try:
+            while True:
+                if not self._adb.available and not await self._adb.connect(always_log_errors=False):
+                    await asyncio.sleep(self.reconnect_interval_s)
+                    continue
+
+                if not await self._try_reconcile():
+                    await asyncio.sleep(self.reconnect_interval_s)
+                    continue
+
+                await self._stream()
+
+                # the stream ended, so start over with a new connection
+                await self._adb.close()
+                await asyncio.sleep(self.reconnect_interval_s)
+        finally:
+            reconcile_task.cancel()
+
+    async def reconcile(self):
+        """Fully retrieve the properties from the device and update the state.
+
+        """
+        properties = await self.atv.get_properties(get_running_apps=self.get_running_apps, lazy=True)  # pylint: disable=no-member
+
+        # `get_properties` does not raise when the device is unavailable, so check that the properties were retrieved
+        if properties[0] is None:
+            raise ConnectionError("The properties could not be retrieved from {}:{}".format(self.atv.host, self.atv.port))
+
+        self.reconciles += 1
+        await self._set_properties(DeviceProperties.from_sequence(properties, self.atv.PROPERTIES_FIELDS))
+
+    async def handle_line(self, line):
+        """Update the state from a line of event output.
+
+        Parameters
+        ----------
+        line : str
+            A line of event output
+
+        Returns
+        -------
+        dict, None
+            The property changes, or ``None`` if the line is not an event
+
+        """
+        changes = parse_event(line)
+        if not changes:
+            return None
+
+        _LOGGER.debug("%s:%d event: %s", self.atv.host, self.atv.port, changes)
+        self.events += 1
+
+        # the other properties are unknown after the device wakes up
+        if (changes.get('screen_on') or self.properties is None) and self._reconcile_now is not None:
+            self._reconcile_now.set()
+
+        if self.properties is not None:
+            await self._set_properties(self.properties.replace(**{field: value for field, value in changes.items() if field in self.properties.fields}))
+
+        return changes
+
+    # ======================================================================= #
+    #                                                                         #
+    #                                 Helpers                                 #
+    #                                                                         #
+    # ======================================================================= #
+    async def _reconcile_loop(self):
+        """Fully retrieve the properties every ``reconcile_interval_s`` seconds, or sooner when requested.
+
+        """
+        while True:
+            try:
+                await asyncio.wait_for(self._reconcile_now.wait(), self.reconcile_interval_s)
+            except asyncio.TimeoutError:
+                pass
+
+            self._reconcile_now.clear()
+            while not await self._try_reconcile():
+                await asyncio.sleep(self.reconnect_interval_s)
+
+    async def _try_reconcile(self):
+        """Fully retrieve the properties from the device, logging any error.
+
+        Returns
+        -------
+        bool
+            Whether or not the properties were retrieved
+
+        """
+        try:
+            await self.reconcile()
+            return True
+
+        except asyncio.CancelledError:
+            raise
+
+        except Exception as exc:  # pylint: disable=broad-except
+            self.reconcile_errors += 1
+            _LOGGER.warning("%s:%d couldn't retrieve the properties, retrying in %.1f seconds.  %s: %s", self.atv.host, self.atv.port, self.reconnect_interval_s, exc.__class__.__name__, exc)
+            return False
+
+    async def _set_properties(self, properties):
+        """Set the properties, record them as the device's last update, and, if the result of ``update()`` changed, call the callback.
+
+        Parameters
+        ----------
+        properties : DeviceProperties
+            The new properties
+
+        """
+        self.properties = properties
+        update = self.atv.update_from_properties(properties)
+        if update == self.update:
+            return
+
+        self.update = update
+        if self.callback:
+            result = self.callback(update)
+            if asyncio.iscoroutine(result):
+                await result
+
+    async def _stream(self):
+        """Read the event stream until it ends or fails.
+
+        If no output arrives for ``reconcile_interval_s`` seconds, the stream is considered to have failed.
+
+        """
+        parser = LineParser()
+        try:
+            async for data in self._adb.streaming_shell(self.cmd, idle_timeout_s=self.reconcile_interval_s):
+                for line in parser.feed(data):
+                    await self.handle_line(line)
+
+            for line in parser.flush():
+                await self.handle_line(line)
+
+        except asyncio.CancelledError:
+            raise
+
+        except Exception as exc:  # pylint: disable=broad-except
+            _LOGGER.debug("Event stream from %s:%d ended: %s", self.atv.host, self.atv.port, exc)
@@ -3,5 +3,20 @@
 """
 
 
+from aio_adb_shell.exceptions import TcpTimeoutException
+
+
 class LockNotAcquiredException(Exception):
     """The ADB lock could not be acquired."""
+
+
+class ShellSessionClosedException(Exception):
+    """The persistent shell session was closed by the device."""
+
+
+class CommandTimeoutException(TcpTimeoutException):
+    """An ADB command did not finish before its deadline.
+
+    This is a ``TcpTimeoutException``, which callers already handle for commands that time out in ``aio_adb_shell``.
+
+    """
@@ -0,0 +1,366 @@
+"""Poll many devices for Home Assistant updates with bounded concurrency.
+
+* :py:class:`DeviceFleet` runs the ``update()`` calls for many :py:class:`~aio_androidtv.androidtv.AndroidTV` and :py:class:`~aio_androidtv.firetv.FireTV` devices under a global concurrency limit and per-host rate limits.
+
+"""
+
+
+import asyncio
+from collections import deque
+import logging
+import math
+import random
+import time
+
+_LOGGER = logging.getLogger(__name__)
+
+
+#: The default maximum number of ``update()`` calls that run at the same time
+DEFAULT_MAX_CONCURRENCY = 32
+
+#: The default interval (in seconds) between polls of each device
+DEFAULT_INTERVAL_S = 10.
+
+#: The default minimum interval (in seconds) between the starts of two polls of the same host
+DEFAULT_MIN_HOST_INTERVAL_S = 1.
+
+#: The default fraction of the interval by which the time until each poll is randomly varied
+DEFAULT_JITTER = 0.1
+
+#: The default time (in seconds) after which an ``update()`` call is abandoned
+DEFAULT_UPDATE_TIMEOUT_S = 30.
+
+#: The default number of recent polls from which the latency percentiles are computed
+DEFAULT_LATENCY_WINDOW = 1000
+
+#: The default period (in seconds) over which the throughput is measured
+DEFAULT_THROUGHPUT_WINDOW_S = 60.
+
+
+def _percentile(sorted_values, percent):
+    """Get a percentile of a sorted list of values using the nearest-rank method.
+
+    Parameters
+    ----------
+    sorted_values : list
+        The values, in ascending order
+    percent : float
+        The percentile (between 0 and 100)
+
+    Returns
+    -------
+    float, None
+        The percentile, or ``None`` if there are no values
+
+    """
+    if not sorted_values:
+        return None
+
+    return sorted_values[max(0, int(math.ceil(percent / 100. * len(sorted_values))) - 1)]
+
+
+class DeviceFleet(object):
+    """Poll many devices, each in its own task, under a global concurrency limit.
+
+    Each device is polled every ``interval_s`` seconds, varied by up to ``jitter * interval_s`` seconds, and the
+    first polls are spread over the first interval, so that the polls of different devices do not synchronize.  A
+    device that is slow to respond only delays its own polls: at most ``max_concurrency`` polls run at the same time,
+    and a poll that takes longer than ``update_timeout_s`` seconds is abandoned.
+
+    Parameters
+    ----------
+    callback : callable, None
+        A function (or coroutine function) that is called with the device and the result of ``update()`` after each successful poll; an exception that it raises is logged and does not stop the polling
+    max_concurrency : int
+        The maximum number of ``update()`` calls that run at the same time
+    interval_s : float
+        The interval between polls of each device
+    min_host_interval_s : float
+        The minimum interval between the starts of two polls of the same host (e.g., devices on different ports of one host)
+    jitter : float
+        The fraction of the interval by which the time until each poll is randomly varied
+    update_timeout_s : float
+        The time after which an ``update()`` call is abandoned
+    update_kwargs
+        Keyword arguments for ``update()``
+
+    """
+    def __init__(self, callback=None, max_concurrency=DEFAULT_MAX_CONCURRENCY, interval_s=DEFAULT_INTERVAL_S, min_host_interval_s=DEFAULT_MIN_HOST_INTERVAL_S, jitter=DEFAULT_JITTER, update_timeout_s=DEFAULT_UPDATE_TIMEOUT_S, **update_kwargs):  # pylint: disable=too-many-arguments
+        self.callback = callback
+        self.max_concurrency = max_concurrency
+        self.interval_s = interval_s
+        self.min_host_interval_s = min_host_interval_s
+        self.jitter = jitter
+        self.update_timeout_s = update_timeout_s
+        self.update_kwargs = update_kwargs
+
+        #: The devices in the fleet
+        self.devices = []
+
+        # the semaphore that limits the number of concurrent polls (see `_get_semaphore`)
+        self._semaphore = None
+        self._tasks = {}
+        self._running = False
+
+        # the earliest time at which the next poll of each host may start
+        self._host_next_start = {}
+
+        # the latencies of the recent polls, the times at which they finished, and the counts of polls, errors, and timeouts
+        self._latencies = deque(maxlen=DEFAULT_LATENCY_WINDOW)
+        self._finished = deque()
+        self._start = None
+        self._polls = 0
+        self._errors = 0
+        self._timeouts = 0
+
+    # ======================================================================= #
+    #                                                                         #
+    #                                 Devices                                 #
+    #                                                                         #
+    # ======================================================================= #
+    def add(self, atv):
+        """Add a device to the fleet and, if the fleet is running, start polling it.
+
+        Parameters
+        ----------
+        atv : BaseTV
+            The device (an :py:class:`~aio_androidtv.androidtv.AndroidTV` or :py:class:`~aio_androidtv.firetv.FireTV` object)
+
+        """
+        if atv in self.devices:
+            return
+
+        self.devices.append(atv)
+        if self._running:
+            self._start_device(atv)
+
+    async def remove(self, atv):
+        """Stop polling a device and remove it from the fleet.
+
+        Parameters
+        ----------
+        atv : BaseTV
+            The device
+
+        """
+        if atv in self.devices:
+            self.devices.remove(atv)
+
+        task = self._tasks.pop(atv, None)
+        if task is not None:
+            task.cancel()
+            try:
+                await task
+            except asyncio.CancelledError:
+                pass
+
+    # ======================================================================= #
+    #                                                                         #
+    #                              Polling loop                               #
+    #                                                                         #
+    # ======================================================================= #
+    def start(self):
+        """Start polling all the devices in the fleet.
+
+        """
+        self._running = True
+        if self._start is None:
+            self._start = time.monotonic()
+
+        for atv in self.devices:
+            if atv not in self._tasks:
+                self._start_device(atv)
+
+    async def stop(self):
+        """Stop polling all the devices in the fleet.
+
+        """
+        self._running = False
+        tasks = list(self._tasks.values())
+        self._tasks = {}
+
+        for task in tasks:
+            task.cancel()
+
+        await asyncio.gather(*tasks, return_exceptions=True)
+
+    async def poll(self, atv):
+        """Poll one device, subject to the concurrency limit and the host's rate limit.
+
+        Parameters
+        ----------
+        atv : BaseTV
+            The device
+
+        Returns
+        -------
+        tuple, None
+            The result of ``update()``, or ``None`` if the poll failed or timed out
+
+        """
+        await self._wait_for_host(atv.host)
+
+        async with self._get_semaphore():
+            start = time.monotonic()
+            try:
+                update = await asyncio.wait_for(atv.update(**self.update_kwargs), self.update_timeout_s)
+            except asyncio.TimeoutError:
+                self._timeouts += 1
+                _LOGGER.warning("%s:%d update timed out after %.1f seconds", atv.host, atv.port, self.update_timeout_s)
+                return None
+            except asyncio.CancelledError:
+                raise
+            except Exception as exc:  # pylint: disable=broad-except
+                self._errors += 1
+                _LOGGER.warning("%s:%d update failed: %s", atv.host, atv.port, exc)
+                return None
+            finally:
+                self._record(time.monotonic() - start)
+
+        if self.callback:
+            try:
+                result = self.callback(atv, update)
+                if asyncio.iscoroutine(result):
+                    await result
+            except asyncio.CancelledError:
+                raise
+            except Exception as exc:  # pylint: disable=broad-except
+                _LOGGER.warning("%s:%d update callback failed.  %s: %s", atv.host, atv.port, exc.__class__.__name__, exc)
+
+        return update
+
+    # ======================================================================= #
+    #                                                                         #
+    #                                 Metrics                                 #
+    #                                                                         #
+    # ======================================================================= #
+    def stats(self):
+        """Get fleet-wide statistics about the polling.
+
+        Returns
+        -------
+        dict
+            A dictionary with keys ``'devices'``, ``'polls'``, ``'errors'``, ``'timeouts'``, ``'polls_per_s'`` (the
+            throughput over the last :py:const:`DEFAULT_THROUGHPUT_WINDOW_S` seconds), and ``'latency_p50_s'``,
+            ``'latency_p95_s'``, and ``'latency_p99_s'`` (the latency percentiles of the recent polls)
+
+        """
+        now = time.monotonic()
+        self._trim_finished(now)
+
+        elapsed_s = min(DEFAULT_THROUGHPUT_WINDOW_S, now - self._start) if self._start is not None else 0.
+        latencies = sorted(self._latencies)
+
+        return {'devices': len(self.devices),
+                'polls': self._polls,
+                'errors': self._errors,
+                'timeouts': self._timeouts,
+                'polls_per_s': len(self._finished) / elapsed_s if elapsed_s > 0 else 0.,
+                'latency_p50_s': _percentile(latencies, 50),
+                'latency_p95_s': _percentile(latencies, 95),
+                'latency_p99_s': _percentile(latencies, 99)}
+
+    # ======================================================================= #
+    #                                                                         #
+    #                                 Helpers                                 #
+    #                                                                         #
+    # ======================================================================= #
+    def _get_semaphore(self):
+        """Get the semaphore that limits the number of concurrent polls, creating it on first use so that it is bound to the running event loop.
+
+        Returns
+        -------
+        asyncio.Semaphore
+            The semaphore
+
+        """
+        if self._semaphore is None:
+            self._semaphore = asyncio.Semaphore(self.max_concurrency)
+
+        return self._semaphore
+
+    def _jittered(self, interval_s):
+        """Randomly vary an interval by up to ``jitter * interval_s``.
+
+        Parameters
+        ----------
+        interval_s : float
+            The interval
+
+        Returns
+        -------
+        float
+            The varied interval
+
+        """
+        return max(0., interval_s * (1. + random.uniform(-self.jitter, self.jitter)))
+
+    def _record(self, latency_s):
+        """Record the latency of a poll.
+
+        Parameters
+        ----------
+        latency_s : float
+            How long the poll took
+
+        """
+        now = time.monotonic()
+        self._polls += 1
+        self._latencies.append(latency_s)
+        self._finished.append(now)
+        self._trim_finished(now)
+
+    def _trim_finished(self, now):
+        """Forget the finish times that are older than :py:const:`DEFAULT_THROUGHPUT_WINDOW_S` seconds.
+
+        Parameters
+        ----------
+        now : float
+            The current time, as given by ``time.monotonic()``
+
+        """
+        while self._finished and self._finished[0] < now - DEFAULT_THROUGHPUT_WINDOW_S:
+            self._finished.popleft()
+
+    async def _run_device(self, atv):
+        """Poll a device until the task is cancelled.
+
+        Parameters
+        ----------
+        atv : BaseTV
+            The device
+
+        """
+        # spread the first polls over the first interval
+        await asyncio.sleep(random.uniform(0., self.interval_s))
+
+        while True:
+            await self.poll(atv)
+            await asyncio.sleep(self._jittered(self.interval_s))
+
+    def _start_device(self, atv):
+        """Start polling a device in its own task.
+
+        Parameters
+        ----------
+        atv : BaseTV
+            The device
+
+        """
+        self._tasks[atv] = asyncio.ensure_future(self._run_device(atv))
+
+    async def _wait_for_host(self, host):
+        """Wait until a poll of ``host`` may start, and reserve that start time.
+
+        Parameters
+        ----------
+        host : str
+            The host
+
+        """
+        now = time.monotonic()
+        start = max(now, self._host_next_start.get(host, now))
+        self._host_next_start[host] = start + self.min_host_interval_s
+
+        if start > now:
+            await asyncio.sleep(start - now)
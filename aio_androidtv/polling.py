@@ -0,0 +1,321 @@
+"""Poll a device for Home Assistant updates at an interval that adapts to how often its state changes.
+
+* :py:class:`AdaptivePoller` repeatedly calls :py:meth:`~aio_androidtv.basetv.BaseTV.update_if_changed` and chooses the time until the next poll based on the current state, whether it just changed, and whether commands were recently sent to the device.
+
+"""
+
+
+import asyncio
+import logging
+import time
+
+from . import constants
+from .scheduler import PRIORITY_INTERACTIVE, PRIORITY_NAMES
+
+_LOGGER = logging.getLogger(__name__)
+
+
+#: The polling interval (in seconds) for each state when it has not recently changed
+DEFAULT_STATE_INTERVALS_S = {constants.STATE_PLAYING: 2.,
+                             constants.STATE_PAUSED: 5.,
+                             constants.STATE_IDLE: 5.,
+                             constants.STATE_ON: 5.,
+                             constants.STATE_STANDBY: 10.,
+                             constants.STATE_OFF: 10.,
+                             None: 10.}
+
+#: The states in which the polling interval backs off exponentially for as long as the state does not change (``None`` means that the state could not be determined)
+BACKOFF_STATES = (constants.STATE_OFF, constants.STATE_STANDBY, None)
+
+#: The polling interval (in seconds) right after the state changed or a command was sent
+DEFAULT_MIN_INTERVAL_S = 1.
+
+#: The longest polling interval (in seconds)
+DEFAULT_MAX_INTERVAL_S = 60.
+
+#: The factor by which the polling interval grows with each poll in one of the :py:const:`BACKOFF_STATES`
+DEFAULT_BACKOFF = 2.
+
+#: For how long (in seconds) after a command was sent the device is polled at the minimum interval
+DEFAULT_BOOST_S = 10.
+
+
+class AdaptivePoller(object):
+    """Poll a device at an interval that adapts to its recent activity.
+
+    The device is polled at ``min_interval_s`` right after its state changed and for ``boost_s`` seconds after an
+    interactive command (a key press, launching an app, etc.) was sent to it.  Otherwise, the interval is given by
+    ``state_intervals_s`` for the current state, and while the device is in one of the :py:const:`BACKOFF_STATES`
+    it grows by a factor of ``backoff`` with each poll, up to ``max_interval_s``.
+
+    A poll that fails (e.g., because the ADB lock was not acquired or the command timed out) is logged and counted,
+    and the interval backs off by a factor of ``backoff``, up to ``max_interval_s``, until a poll succeeds.
+
+    Interactive commands are detected by the :py:meth:`~aio_androidtv.adb_manager.ADBPython.command_stats` of the
+    device's ADB handler, so a command that is sent while the poller is waiting ends the wait after at most
+    ``min_interval_s`` seconds.  Commands that are sent by other means can be reported via :py:meth:`notify_command`.
+
+    Parameters
+    ----------
+    atv : BaseTV
+        The device to poll (an :py:class:`~aio_androidtv.androidtv.AndroidTV` or :py:class:`~aio_androidtv.firetv.FireTV` object)
+    callback : callable, None
+        A function (or coroutine function) that is called with the result of ``update()`` whenever it changes
+    min_interval_s : float
+        The polling interval right after the state changed or a command was sent
+    max_interval_s : float
+        The longest polling interval
+    backoff : float
+        The factor by which the polling interval grows with each poll in one of the :py:const:`BACKOFF_STATES`
+    boost_s : float
+        For how long after a command was sent the device is polled at ``min_interval_s``
+    state_intervals_s : dict, None
+        The polling interval for each state (default is :py:const:`DEFAULT_STATE_INTERVALS_S`)
+    update_kwargs
+        Keyword arguments for :py:meth:`~aio_androidtv.basetv.BaseTV.update_if_changed`
+
+    """
+    def __init__(self, atv, callback=None, min_interval_s=DEFAULT_MIN_INTERVAL_S, max_interval_s=DEFAULT_MAX_INTERVAL_S, backoff=DEFAULT_BACKOFF, boost_s=DEFAULT_BOOST_S, state_intervals_s=None, **update_kwargs):  # pylint: disable=too-many-arguments
+        self.atv = atv
+        self.callback = callback
+        self.min_interval_s = min_interval_s
+        self.max_interval_s = max_interval_s
+        self.backoff = backoff
+        self.boost_s = boost_s
+        self.state_intervals_s = state_intervals_s if state_intervals_s is not None else DEFAULT_STATE_INTERVALS_S
+        self.update_kwargs = update_kwargs
+
+        #: The result of the last ``update()`` and the state that it contains
+        self.update = None
+        self.state = None
+
+        #: The interval (in seconds) until the next poll
+        self.interval_s = min_interval_s
+
+        # the event that ends the wait until the next poll early; it is created by `run`, so that it is bound to the
+        # event loop that runs the polling
+        self._task = None
+        self._wakeup = None
+        self._last_command = None
+        self._interactive_commands = self._count_interactive_commands()
+
+        # the number of polls, the number of polls that failed, the number of polls that found a changed update, and
+        # the total time spent waiting between polls
+        self._polls = 0
+        self._errors = 0
+        self._changes = 0
+        self._total_interval_s = 0.
+
+    # ======================================================================= #
+    #                                                                         #
+    #                              Polling loop                               #
+    #                                                                         #
+    # ======================================================================= #
+    def start(self):
+        """Start polling the device in a background task.
+
+        Returns
+        -------
+        asyncio.Task
+            The polling task
+
+        """
+        if self._task is None or self._task.done():
+            self._task = asyncio.ensure_future(self.run())
+
+        return self._task
+
+    async def stop(self):
+        """Stop polling the device.
+
+        """
+        if self._task is None:
+            return
+
+        self._task.cancel()
+        try:
+            await self._task
+        except asyncio.CancelledError:
+            pass
+        self._task = None
+
+    async def run(self):
+        """Poll the device until the task is cancelled.
+
+        Errors are logged, so that they do not end the polling.
+
+        """
+        if self._wakeup is None:
+            self._wakeup = asyncio.Event()
+
+        while True:
+            try:
+                await self.poll()
+            except asyncio.CancelledError:
+                raise
+            except Exception as exc:  # pylint: disable=broad-except
+                _LOGGER.warning("%s:%d polling callback failed.  %s: %s", self.atv.host, self.atv.port, exc.__class__.__name__, exc)
+
+            await self._wait(self.interval_s)
+
+    async def poll(self):
+        """Poll the device once and compute the interval until the next poll.
+
+        Returns
+        -------
+        float
+            The interval (in seconds) until the next poll
+
+        """
+        self._polls += 1
+        try:
+            _, update = await self.atv.update_if_changed(**self.update_kwargs)
+        except asyncio.CancelledError:
+            raise
+        except Exception as exc:  # pylint: disable=broad-except
+            self._errors += 1
+            self.interval_s = min(self.max_interval_s, max(self.min_interval_s, self.interval_s * self.backoff))
+            _LOGGER.warning("%s:%d poll failed, retrying in %.1f seconds.  %s: %s", self.atv.host, self.atv.port, self.interval_s, exc.__class__.__name__, exc)
+            return self.interval_s
+
+        # `update_if_changed` compares the properties to those of its last call, which may have been made by someone
+        # else, so a change that they received would be missed without comparing the update to this poller's own
+        if update is None:
+            update = self.atv.last_update
+
+        state_changed = False
+        if update is not None and update != self.update:
+            self._changes += 1
+            state_changed = update[0] != self.state
+            self.update = update
+            self.state = update[0]
+
+            if self.callback:
+                result = self.callback(update)
+                if asyncio.iscoroutine(result):
+                    await result
+
+        self.interval_s = self._next_interval(state_changed)
+        _LOGGER.debug("%s:%d polling interval: %.1f seconds (state = %s)", self.atv.host, self.atv.port, self.interval_s, self.state)
+
+        return self.interval_s
+
+    def notify_command(self):
+        """Report that a command was sent to the device, so that it is polled soon and at the minimum interval.
+
+        """
+        self._last_command = time.monotonic()
+        if self._wakeup is not None:
+            self._wakeup.set()
+
+    # ======================================================================= #
+    #                                                                         #
+    #                                 Metrics                                 #
+    #                                                                         #
+    # ======================================================================= #
+    def stats(self):
+        """Get statistics about the polling.
+
+        Returns
+        -------
+        dict
+            A dictionary with keys ``'interval_s'`` (the current polling interval), ``'polls'`` (the number of polls),
+            ``'errors'`` (the number of polls that failed), ``'changes'`` (the number of polls that found a changed
+            update), and ``'mean_interval_s'`` (the mean interval between polls)
+
+        """
+        return {'interval_s': self.interval_s,
+                'polls': self._polls,
+                'errors': self._errors,
+                'changes': self._changes,
+                'mean_interval_s': self._total_interval_s / (self._polls - 1) if self._polls > 1 else self.interval_s}
+
+    # ======================================================================= #
+    #                                                                         #
+    #                                 Helpers                                 #
+    #                                                                         #
+    # ======================================================================= #
+    def _count_interactive_commands(self):
+        """Get the number of interactive commands that the device's ADB handler has sent.
+
+        Returns
+        -------
+        int
+            The number of interactive commands, or 0 if the ADB handler does not keep count
+
+        """
+        command_stats = getattr(self.atv._adb, 'command_stats', None)  # pylint: disable=protected-access
+        if command_stats is None:
+            return 0
+
+        return command_stats().get(PRIORITY_NAMES[PRIORITY_INTERACTIVE], {}).get('granted', 0)
+
+    def _check_commands(self):
+        """Check whether an interactive command was sent to the device since the last check.
+
+        Returns
+        -------
+        bool
+            Whether an interactive command was sent
+
+        """
+        interactive_commands = self._count_interactive_commands()
+        if interactive_commands != self._interactive_commands:
+            self._interactive_commands = interactive_commands
+            self._last_command = time.monotonic()
+            return True
+
+        return False
+
+    def _next_interval(self, state_changed):
+        """Compute the interval until the next poll.
+
+        Parameters
+        ----------
+        state_changed : bool
+            Whether the state changed in the last poll
+
+        Returns
+        -------
+        float
+            The interval (in seconds) until the next poll
+
+        """
+        self._check_commands()
+        if state_changed or (self._last_command is not None and time.monotonic() - self._last_command < self.boost_s):
+            return self.min_interval_s
+
+        base_interval_s = self.state_intervals_s.get(self.state, self.max_interval_s)
+        if self.state in BACKOFF_STATES:
+            # grow the interval from the base interval for this state
+            return min(self.max_interval_s, max(base_interval_s, self.interval_s * self.backoff))
+
+        return min(self.max_interval_s, base_interval_s)
+
+    async def _wait(self, interval_s):
+        """Wait until the next poll.
+
+        The wait ends early if :py:meth:`notify_command` is called or an interactive command is sent to the device.
+
+        Parameters
+        ----------
+        interval_s : float
+            The interval (in seconds) until the next poll
+
+        """
+        start = time.monotonic()
+        deadline = start + interval_s
+        self._wakeup.clear()
+
+        while not self._check_commands():
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), min(remaining, self.min_interval_s))
+                break
+            except asyncio.TimeoutError:
+                pass
+
+        self._total_interval_s += time.monotonic() - start
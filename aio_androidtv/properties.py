@@ -0,0 +1,361 @@
+"""An immutable snapshot of the properties that are retrieved from a device in order to determine its state.
+
+* :py:class:`DeviceProperties` is returned by :py:meth:`aio_androidtv.androidtv.AndroidTV.get_properties` and :py:meth:`aio_androidtv.firetv.FireTV.get_properties`.
+* :py:class:`StreamMusic` is the parsed ``STREAM_MUSIC`` block from ``adb shell dumpsys audio``, from which the audio output device, mute state, and volume are determined.
+
+.. note::
+
+   These are the properties that change from one update to the next.  The static properties of a device (its model,
+   serial number, etc.) are in the ``device_properties`` dictionary of a :py:class:`~aio_androidtv.basetv.BaseTV` object.
+
+"""
+
+
+from operator import attrgetter
+
+from . import constants
+
+
+#: The properties that are retrieved from an Android TV device, in the order in which :py:meth:`aio_androidtv.androidtv.AndroidTV.get_properties` returns them
+ANDROIDTV_FIELDS = ('screen_on', 'awake', 'audio_state', 'wake_lock_size', 'current_app', 'media_session_state', 'audio_output_device', 'is_volume_muted', 'volume', 'running_apps')
+
+#: The properties that are retrieved from a Fire TV device, in the order in which :py:meth:`aio_androidtv.firetv.FireTV.get_properties` returns them
+FIRETV_FIELDS = ('screen_on', 'awake', 'wake_lock_size', 'current_app', 'media_session_state', 'running_apps')
+
+
+class DeviceProperties(object):
+    """An immutable snapshot of the properties of a device.
+
+    A snapshot behaves like a tuple of the properties in ``fields``, so it can be unpacked in the same way as the
+    tuples that ``get_properties`` used to return.  Properties that are not in ``fields`` are always ``None``.
+
+    Parameters
+    ----------
+    screen_on : bool, None
+        Whether or not the device is on, or ``None`` if it was not determined
+    awake : bool, None
+        Whether or not the device is awake (screensaver is not running), or ``None`` if it was not determined
+    audio_state : str, None
+        The audio state, as determined from "dumpsys audio", or ``None`` if it was not determined
+    wake_lock_size : int, None
+        The size of the current wake lock, or ``None`` if it was not determined
+    current_app : str, None
+        The current app property, or ``None`` if it was not determined
+    media_session_state : int, None
+        The state from the output of ``dumpsys media_session``, or ``None`` if it was not determined
+    audio_output_device : str, None
+        The current audio playback device, or ``None`` if it was not determined
+    is_volume_muted : bool, None
+        Whether or not the volume is muted, or ``None`` if it was not determined
+    volume : int, None
+        The absolute volume level, or ``None`` if it was not determined
+    running_apps : list, None
+        A list of the running apps, or ``None`` if it was not determined
+    fields : tuple
+        The properties that were retrieved from the device (:py:const:`ANDROIDTV_FIELDS` or :py:const:`FIRETV_FIELDS`)
+
+    """
+    # the properties are stored in private slots and exposed as read-only attributes below
+    __slots__ = tuple('_' + field for field in ANDROIDTV_FIELDS + ('fields',))
+
+    screen_on = property(attrgetter('_screen_on'), doc="Whether or not the device is on")
+    awake = property(attrgetter('_awake'), doc="Whether or not the device is awake (screensaver is not running)")
+    audio_state = property(attrgetter('_audio_state'), doc="The audio state, as determined from \"dumpsys audio\"")
+    wake_lock_size = property(attrgetter('_wake_lock_size'), doc="The size of the current wake lock")
+    current_app = property(attrgetter('_current_app'), doc="The current app property")
+    media_session_state = property(attrgetter('_media_session_state'), doc="The state from the output of ``dumpsys media_session``")
+    audio_output_device = property(attrgetter('_audio_output_device'), doc="The current audio playback device")
+    is_volume_muted = property(attrgetter('_is_volume_muted'), doc="Whether or not the volume is muted")
+    volume = property(attrgetter('_volume'), doc="The absolute volume level")
+    running_apps = property(attrgetter('_running_apps'), doc="A list of the running apps")
+    fields = property(attrgetter('_fields'), doc="The properties that were retrieved from the device")
+
+    def __init__(self, screen_on=None, awake=None, audio_state=None, wake_lock_size=None, current_app=None, media_session_state=None, audio_output_device=None, is_volume_muted=None, volume=None, running_apps=None, fields=ANDROIDTV_FIELDS):  # pylint: disable=too-many-arguments
+        self._screen_on = screen_on
+        self._awake = awake
+        self._audio_state = audio_state
+        self._wake_lock_size = wake_lock_size
+        self._current_app = current_app
+        self._media_session_state = media_session_state
+        self._audio_output_device = audio_output_device
+        self._is_volume_muted = is_volume_muted
+        self._volume = volume
+        self._running_apps = running_apps
+        self._fields = fields
+
+    @classmethod
+    def from_sequence(cls, properties, fields=ANDROIDTV_FIELDS):
+        """Create a snapshot from a sequence of properties (e.g., the tuple that ``get_properties`` used to return).
+
+        Parameters
+        ----------
+        properties : DeviceProperties, list, tuple
+            The properties, in the order given by ``fields``
+        fields : tuple
+            The names of the properties
+
+        Returns
+        -------
+        DeviceProperties
+            The snapshot
+
+        """
+        if isinstance(properties, cls):
+            return properties
+
+        return cls(fields=fields, **dict(zip(fields, properties)))
+
+    def __iter__(self):
+        return (getattr(self, field) for field in self.fields)
+
+    def __len__(self):
+        return len(self.fields)
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return tuple(getattr(self, field) for field in self.fields[index])
+        return getattr(self, self.fields[index])
+
+    def __eq__(self, other):
+        if isinstance(other, DeviceProperties):
+            return self.fields == other.fields and all(getattr(self, field) == getattr(other, field) for field in self.fields)
+
+        if isinstance(other, (list, tuple)):
+            return tuple(self) == tuple(other)
+
+        return NotImplemented
+
+    def __ne__(self, other):
+        equal = self.__eq__(other)
+        return equal if equal is NotImplemented else not equal
+
+    def __hash__(self):
+        return hash(tuple(tuple(value) if isinstance(value, list) else value for value in self))
+
+    def __repr__(self):
+        return "DeviceProperties({})".format(", ".join("{}={!r}".format(field, getattr(self, field)) for field in self.fields))
+
+    def __reduce__(self):
+        return (_make_device_properties, (self.fields, tuple(self)))
+
+    def as_dict(self):
+        """Get the properties as a dictionary.
+
+        Returns
+        -------
+        dict
+            A dictionary whose keys are ``fields`` and whose values are the properties
+
+        """
+        return {field: getattr(self, field) for field in self.fields}
+
+    def replace(self, **changes):
+        """Create a copy of this snapshot with some of the properties replaced.
+
+        Parameters
+        ----------
+        changes
+            The new values of the properties, which must be in ``fields``
+
+        Returns
+        -------
+        DeviceProperties
+            The new snapshot
+
+        Raises
+        ------
+        ValueError
+            A property is not in ``fields``
+
+        """
+        unknown = [field for field in changes if field not in self.fields]
+        if unknown:
+            raise ValueError("Unknown properties: {}".format(", ".join(unknown)))
+
+        properties = self.as_dict()
+        properties.update(changes)
+        return DeviceProperties(fields=self.fields, **properties)
+
+    def diff(self, other):
+        """Get the properties that differ between this snapshot and another one.
+
+        Parameters
+        ----------
+        other : DeviceProperties, None
+            The other snapshot (usually the previous one), or ``None``, in which case all of the properties differ
+
+        Returns
+        -------
+        tuple
+            The names of the properties in ``fields`` whose values differ, in the order given by ``fields``
+
+        """
+        if other is None:
+            return self.fields
+
+        if other is self:
+            return ()
+
+        return tuple(field for field in self.fields if getattr(self, field) != getattr(other, field))
+
+
+def _make_device_properties(fields, properties):
+    """Create a :py:class:`DeviceProperties` snapshot when unpickling.
+
+    Parameters
+    ----------
+    fields : tuple
+        The names of the properties
+    properties : tuple
+        The properties, in the order given by ``fields``
+
+    Returns
+    -------
+    DeviceProperties
+        The snapshot
+
+    """
+    return DeviceProperties.from_sequence(properties, fields)
+
+
+class StreamMusic(object):
+    """The parsed ``STREAM_MUSIC`` block from ``adb shell dumpsys audio``.
+
+    Parameters
+    ----------
+    device : str, None
+        The current audio playback device (the first entry on the ``Devices:`` line), or ``None`` if it was not found
+    muted : bool, None
+        Whether or not the stream is muted, or ``None`` if it was not found
+    min_volume : float, None
+        The minimum volume (the ``Min:`` line), or ``None`` if it was not found
+    max_volume : float, None
+        The maximum volume (the ``Max:`` line), or ``None`` if it was not found
+    volumes : dict, None
+        A dictionary whose keys are audio output devices and whose values are their volumes (the ``Current:`` line)
+
+    """
+    #: The attributes of the block, in the order in which they are passed to the constructor
+    ATTRIBUTES = ('device', 'muted', 'min_volume', 'max_volume', 'volumes')
+
+    # the attributes are stored in private slots and exposed as read-only attributes below
+    __slots__ = tuple('_' + attr for attr in ATTRIBUTES)
+
+    device = property(attrgetter('_device'), doc="The current audio playback device")
+    muted = property(attrgetter('_muted'), doc="Whether or not the stream is muted")
+    min_volume = property(attrgetter('_min_volume'), doc="The minimum volume")
+    max_volume = property(attrgetter('_max_volume'), doc="The maximum volume")
+    volumes = property(attrgetter('_volumes'), doc="A dictionary whose keys are audio output devices and whose values are their volumes")
+
+    def __init__(self, device=None, muted=None, min_volume=None, max_volume=None, volumes=None):  # pylint: disable=too-many-arguments
+        self._device = device
+        self._muted = muted
+        self._min_volume = min_volume
+        self._max_volume = max_volume
+        self._volumes = volumes if volumes is not None else {}
+
+    @classmethod
+    def from_output(cls, stream_music_raw):
+        """Parse the ``STREAM_MUSIC`` block in the output of :py:const:`aio_androidtv.constants.CMD_STREAM_MUSIC`.
+
+        The block is read in a single pass: it starts at the ``- STREAM_MUSIC:`` line and ends at the header of the
+        next stream (or at the end of the output).
+
+        Parameters
+        ----------
+        stream_music_raw : str, list, None
+            The output of :py:const:`aio_androidtv.constants.CMD_STREAM_MUSIC`, or a list of its lines
+
+        Returns
+        -------
+        StreamMusic, None
+            The parsed ``STREAM_MUSIC`` block, or ``None`` if it was not found
+
+        """
+        if not stream_music_raw:
+            return None
+
+        lines = iter(stream_music_raw.splitlines() if isinstance(stream_music_raw, str) else stream_music_raw)
+        for line in lines:
+            if line.lstrip().startswith('- STREAM_MUSIC:'):
+                break
+        else:
+            return None
+
+        device = muted = min_volume = max_volume = None
+        volumes = {}
+        for line in lines:
+            key, _, value = line.strip().partition(': ')
+            if key.startswith('- '):
+                break
+
+            if key == 'Current':
+                volumes = {match.group('device'): int(match.group('volume')) for match in constants.REGEX_STREAM_MUSIC_VOLUME.finditer(value)}
+            elif key == 'Devices':
+                device_match = constants.REGEX_STREAM_MUSIC_DEVICE.match(value)
+                if device_match:
+                    device = device_match.group()
+            elif key == 'Muted':
+                muted = value == 'true'
+            elif key == 'Max' and value.isdigit():
+                max_volume = float(value)
+            elif key == 'Min' and value.isdigit():
+                min_volume = float(value)
+
+        return cls(device, muted, min_volume, max_volume, volumes)
+
+    def __eq__(self, other):
+        if isinstance(other, StreamMusic):
+            return all(getattr(self, attr) == getattr(other, attr) for attr in self.ATTRIBUTES)
+
+        return NotImplemented
+
+    def __ne__(self, other):
+        equal = self.__eq__(other)
+        return equal if equal is NotImplemented else not equal
+
+    def __repr__(self):
+        return "StreamMusic({})".format(", ".join("{}={!r}".format(attr, getattr(self, attr)) for attr in self.ATTRIBUTES))
+
+    def replace(self, **changes):
+        """Create a copy of this block with some of its values replaced.
+
+        Parameters
+        ----------
+        changes
+            The new values, which must be attributes of :py:class:`StreamMusic`
+
+        Returns
+        -------
+        StreamMusic
+            The new block
+
+        Raises
+        ------
+        ValueError
+            A value is not an attribute of :py:class:`StreamMusic`
+
+        """
+        unknown = [attr for attr in changes if attr not in self.ATTRIBUTES]
+        if unknown:
+            raise ValueError("Unknown attributes: {}".format(", ".join(unknown)))
+
+        values = {attr: getattr(self, attr) for attr in self.ATTRIBUTES}
+        values.update(changes)
+        return StreamMusic(**values)
+
+    def volume(self, device):
+        """Get the volume of an audio output device.
+
+        Parameters
+        ----------
+        device : str, None
+            The audio output device
+
+        Returns
+        -------
+        int, None
+            The volume of ``device``, or ``None`` if it could not be determined
+
+        """
+        return self.volumes.get(device)
@@ -0,0 +1,217 @@
+"""A scheduler that decides the order in which ADB commands are sent to a device.
+
+* :py:class:`CommandScheduler` is a drop-in replacement for an ``asyncio.Lock`` that grants the lock to waiting commands in order of priority.
+
+"""
+
+
+import asyncio
+import itertools
+import time
+
+
+#: Interactive commands (key presses, launching apps)
+PRIORITY_INTERACTIVE = 0
+
+#: State polling (``get_properties``)
+PRIORITY_POLLING = 1
+
+#: Bulk transfers (``pull``, ``push``, ``screencap``)
+PRIORITY_BULK = 2
+
+#: The names of the priority classes, which are used as the keys in :py:meth:`CommandScheduler.stats`
+PRIORITY_NAMES = {PRIORITY_INTERACTIVE: 'interactive',
+                  PRIORITY_POLLING: 'polling',
+                  PRIORITY_BULK: 'bulk'}
+
+#: A waiting command is promoted by one priority class for every ``DEFAULT_AGING_S`` seconds that it waits
+DEFAULT_AGING_S = 1.0
+
+
+class _Waiter(object):  # pylint: disable=too-few-public-methods
+    """A command that is waiting for the lock.
+
+    Parameters
+    ----------
+    priority : int
+        The priority class of the command
+    start : float
+        The time at which the command started waiting
+    seq : int
+        A sequence number, which makes the order of waiters with the same priority first-in, first-out
+    future : asyncio.Future
+        The future that is resolved when the command is granted the lock
+
+    """
+    __slots__ = ('priority', 'start', 'seq', 'future')
+
+    def __init__(self, priority, start, seq, future):
+        self.priority = priority
+        self.start = start
+        self.seq = seq
+        self.future = future
+
+
+class CommandScheduler(object):
+    """A lock that grants access to the waiting command with the highest priority.
+
+    A lower number means a higher priority.  To prevent starvation, a command's effective priority is improved by
+    one class for every ``aging_s`` seconds that it has been waiting.
+
+    Parameters
+    ----------
+    aging_s : float
+        The number of seconds that a command must wait in order to be promoted by one priority class
+
+    """
+    def __init__(self, aging_s=DEFAULT_AGING_S):
+        self.aging_s = aging_s
+        self._locked = False
+        self._waiters = []
+        self._seq = itertools.count()
+
+        # the number of commands that have been granted the lock and their total and maximum wait times, per priority class
+        self._granted = {priority: 0 for priority in PRIORITY_NAMES}
+        self._total_wait_s = {priority: 0. for priority in PRIORITY_NAMES}
+        self._max_wait_s = {priority: 0. for priority in PRIORITY_NAMES}
+
+    async def __aenter__(self):
+        await self.acquire()
+
+    async def __aexit__(self, exc_type, exc, tb):
+        self.release()
+
+    def locked(self):
+        """Check whether the lock is held.
+
+        Returns
+        -------
+        bool
+            Whether or not the lock is held
+
+        """
+        return self._locked
+
+    async def acquire(self, priority=PRIORITY_POLLING):
+        """Wait until the lock is granted to this command.
+
+        Parameters
+        ----------
+        priority : int
+            The priority class of the command (:py:const:`PRIORITY_INTERACTIVE`, :py:const:`PRIORITY_POLLING`, or :py:const:`PRIORITY_BULK`)
+
+        Returns
+        -------
+        bool
+            ``True``
+
+        """
+        priority = min(max(priority, PRIORITY_INTERACTIVE), PRIORITY_BULK)
+        start = time.monotonic()
+        if not self._locked and not self._waiters:
+            self._locked = True
+            self._record(priority, 0.)
+            return True
+
+        waiter = _Waiter(priority, start, next(self._seq), asyncio.get_event_loop().create_future())
+        self._waiters.append(waiter)
+        try:
+            await waiter.future
+
+        except asyncio.CancelledError:
+            if waiter in self._waiters:
+                self._waiters.remove(waiter)
+
+            # the lock was granted to this command just before it was cancelled, so pass it on
+            elif not waiter.future.cancelled():
+                self.release()
+
+            raise
+
+        self._record(priority, time.monotonic() - start)
+        return True
+
+    def release(self):
+        """Release the lock and grant it to the waiting command with the highest effective priority.
+
+        """
+        if not self._locked:
+            raise RuntimeError("CommandScheduler is not acquired.")
+
+        now = time.monotonic()
+        while self._waiters:
+            waiter = min(self._waiters, key=lambda w: (self._effective_priority(w, now), w.seq))
+            self._waiters.remove(waiter)
+            if not waiter.future.done():
+                # the lock is handed over without being unlocked
+                waiter.future.set_result(True)
+                return
+
+        self._locked = False
+
+    def queue_depth(self):
+        """Get the number of commands that are waiting for the lock, per priority class.
+
+        Returns
+        -------
+        dict
+            A dictionary whose keys are the names in :py:const:`PRIORITY_NAMES` and whose values are the number of waiting commands
+
+        """
+        depth = {name: 0 for name in PRIORITY_NAMES.values()}
+        for waiter in self._waiters:
+            depth[PRIORITY_NAMES[waiter.priority]] += 1
+
+        return depth
+
+    def stats(self):
+        """Get the queue depth and wait time statistics, per priority class.
+
+        Returns
+        -------
+        dict
+            A dictionary whose keys are the names in :py:const:`PRIORITY_NAMES` and whose values are dictionaries with the keys
+            ``'queued'``, ``'granted'``, ``'mean_wait_s'``, and ``'max_wait_s'``
+
+        """
+        depth = self.queue_depth()
+        return {name: {'queued': depth[name],
+                       'granted': self._granted[priority],
+                       'mean_wait_s': self._total_wait_s[priority] / self._granted[priority] if self._granted[priority] else 0.,
+                       'max_wait_s': self._max_wait_s[priority]} for priority, name in PRIORITY_NAMES.items()}
+
+    def _effective_priority(self, waiter, now):
+        """Get the priority of a waiting command, taking into account how long it has been waiting.
+
+        Parameters
+        ----------
+        waiter : _Waiter
+            The waiting command
+        now : float
+            The current time
+
+        Returns
+        -------
+        float
+            The effective priority of the command
+
+        """
+        if not self.aging_s:
+            return waiter.priority
+
+        return waiter.priority - (now - waiter.start) / self.aging_s
+
+    def _record(self, priority, wait_s):
+        """Record the wait time of a command that was granted the lock.
+
+        Parameters
+        ----------
+        priority : int
+            The priority class of the command
+        wait_s : float
+            The time (in seconds) that the command waited for the lock
+
+        """
+        self._granted[priority] += 1
+        self._total_wait_s[priority] += wait_s
+        self._max_wait_s[priority] = max(self._max_wait_s[priority], wait_s)
@@ -0,0 +1,401 @@
+"""Poll a fleet of devices from several worker processes.
+
+* :py:func:`shard_for` assigns a host to a worker using rendezvous hashing.
+* :py:class:`ShardedFleet` runs a :py:class:`~aio_androidtv.fleet.DeviceFleet` in each of several worker processes and collects the state changes in the parent process.
+
+Each worker process has its own event loop and ADB connections, so the CPU time that is spent on ADB authentication
+and on parsing the output of the ``get_properties`` command is spread over several cores.  All of the devices on one
+host are polled by the same worker, and when a worker dies, only its devices are moved to the other workers.
+
+"""
+
+
+import asyncio
+import hashlib
+import logging
+import multiprocessing
+
+from . import setup
+from .fleet import DeviceFleet
+
+_LOGGER = logging.getLogger(__name__)
+
+
+# The messages that are sent between the parent and the workers, as tuples whose first item is one of these
+#: Parent -> worker: ``(MSG_ADD, setup_kwargs)``
+MSG_ADD = 'add'
+
+#: Parent -> worker: ``(MSG_REMOVE, host, port)``
+MSG_REMOVE = 'remove'
+
+#: Parent -> worker: ``(MSG_STOP,)``
+MSG_STOP = 'stop'
+
+#: Worker -> parent: ``(MSG_UPDATE, host, port, update)``, which is only sent when the result of ``update()`` changes
+MSG_UPDATE = 'update'
+
+#: Worker -> parent: ``(MSG_STATS, stats)``, where ``stats`` is the result of :py:meth:`DeviceFleet.stats() <aio_androidtv.fleet.DeviceFleet.stats>`
+MSG_STATS = 'stats'
+
+#: The default interval (in seconds) at which the workers report their statistics
+DEFAULT_STATS_INTERVAL_S = 5.
+
+
+def shard_for(host, workers):
+    """Choose the worker that polls a host, using rendezvous (highest random weight) hashing.
+
+    The choice only depends on the host and the set of workers, and when a worker is removed, only the hosts that
+    were assigned to it are reassigned.
+
+    Parameters
+    ----------
+    host : str
+        The host
+    workers : list
+        The IDs of the workers that are alive
+
+    Returns
+    -------
+    int, None
+        The ID of the chosen worker, or ``None`` if there are no workers
+
+    """
+    if not workers:
+        return None
+
+    return max(workers, key=lambda worker: hashlib.md5('{}:{}'.format(worker, host).encode('utf-8')).digest())
+
+
+def _worker_main(conn, fleet_kwargs, stats_interval_s):
+    """The entry point of a worker process.
+
+    Parameters
+    ----------
+    conn : multiprocessing.connection.Connection
+        The worker's end of the pipe to the parent
+    fleet_kwargs : dict
+        Keyword arguments for the :py:class:`~aio_androidtv.fleet.DeviceFleet`
+    stats_interval_s : float
+        The interval at which the worker reports its statistics
+
+    """
+    loop = asyncio.new_event_loop()
+    asyncio.set_event_loop(loop)
+    try:
+        loop.run_until_complete(_worker(conn, fleet_kwargs, stats_interval_s))
+    finally:
+        loop.close()
+
+
+async def _worker(conn, fleet_kwargs, stats_interval_s):
+    """Poll the devices that the parent assigns to this worker and report their state changes.
+
+    Parameters
+    ----------
+    conn : multiprocessing.connection.Connection
+        The worker's end of the pipe to the parent
+    fleet_kwargs : dict
+        Keyword arguments for the :py:class:`~aio_androidtv.fleet.DeviceFleet`
+    stats_interval_s : float
+        The interval at which the worker reports its statistics
+
+    """
+    loop = asyncio.get_event_loop()
+    last_updates = {}
+    devices = {}
+    messages = asyncio.Queue()
+
+    def on_update(atv, update):
+        key = (atv.host, atv.port)
+        if last_updates.get(key) != update:
+            last_updates[key] = update
+            conn.send((MSG_UPDATE, atv.host, atv.port, update))
+
+    def on_readable():
+        try:
+            messages.put_nowait(conn.recv())
+        except (EOFError, OSError):
+            # the parent is gone
+            loop.remove_reader(conn.fileno())
+            messages.put_nowait((MSG_STOP,))
+
+    async def add(setup_kwargs):
+        try:
+            atv = await setup(**setup_kwargs)
+        except Exception as exc:  # pylint: disable=broad-except
+            _LOGGER.warning("Could not set up %s:%d: %s", setup_kwargs['host'], setup_kwargs.get('port', 5555), exc)
+            return
+
+        # if the device was added again (e.g., with different `setup` arguments), replace the old instance
+        old = devices.get((atv.host, atv.port))
+        devices[(atv.host, atv.port)] = atv
+        fleet.add(atv)
+        if old is not None:
+            await fleet.remove(old)
+            await old.adb_close()
+
+    async def report_stats():
+        while True:
+            await asyncio.sleep(stats_interval_s)
+            conn.send((MSG_STATS, fleet.stats()))
+
+    fleet = DeviceFleet(callback=on_update, **fleet_kwargs)
+    fleet.start()
+    loop.add_reader(conn.fileno(), on_readable)
+    tasks = [asyncio.ensure_future(report_stats())]
+
+    while True:
+        msg = await messages.get()
+        if msg[0] == MSG_ADD:
+            tasks.append(asyncio.ensure_future(add(msg[1])))
+        elif msg[0] == MSG_REMOVE:
+            atv = devices.pop((msg[1], msg[2]), None)
+            last_updates.pop((msg[1], msg[2]), None)
+            if atv is not None:
+                await fleet.remove(atv)
+                await atv.adb_close()
+        else:
+            break
+
+    for task in tasks:
+        task.cancel()
+    await fleet.stop()
+    for atv in devices.values():
+        await atv.adb_close()
+
+
+class ShardedFleet(object):
+    """Poll a fleet of devices from several worker processes.
+
+    The devices are assigned to the workers with :py:func:`shard_for`, so all of the devices on one host are polled
+    by the same worker.  When a worker dies, its devices are reassigned to the remaining workers.
+
+    Parameters
+    ----------
+    callback : callable, None
+        A function (or coroutine function) that is called with the host, the port, and the result of ``update()`` whenever it changes
+    workers : int, None
+        The number of worker processes (default is the number of CPUs)
+    stats_interval_s : float
+        The interval at which the workers report their statistics
+    fleet_kwargs
+        Keyword arguments for the :py:class:`~aio_androidtv.fleet.DeviceFleet` in each worker (e.g., ``max_concurrency`` and ``interval_s``)
+
+    """
+    def __init__(self, callback=None, workers=None, stats_interval_s=DEFAULT_STATS_INTERVAL_S, **fleet_kwargs):
+        self.callback = callback
+        self.workers = workers or multiprocessing.cpu_count()
+        self.stats_interval_s = stats_interval_s
+        self.fleet_kwargs = fleet_kwargs
+
+        #: The latest result of ``update()`` for each ``(host, port)``
+        self.updates = {}
+
+        # the `setup` keyword arguments for each device, and the worker to which it is assigned
+        self._devices = {}
+        self._assignments = {}
+
+        # the processes, pipes, and latest statistics of the workers that are alive
+        self._processes = {}
+        self._conns = {}
+        self._stats = {}
+        self._context = multiprocessing.get_context('spawn')
+
+    # ======================================================================= #
+    #                                                                         #
+    #                                 Devices                                 #
+    #                                                                         #
+    # ======================================================================= #
+    def add(self, host, port=5555, **setup_kwargs):
+        """Add a device to the fleet.
+
+        Adding a device that is already in the fleet with the same arguments does nothing; adding it with different
+        arguments replaces it.
+
+        Parameters
+        ----------
+        host : str
+            The address of the device
+        port : int
+            The device port
+        setup_kwargs
+            Keyword arguments for :py:func:`aio_androidtv.setup` (e.g., ``adbkey`` and ``device_class``)
+
+        """
+        key = (host, int(port))
+        kwargs = dict(setup_kwargs, host=host, port=int(port))
+        if self._devices.get(key) == kwargs:
+            return
+
+        self._devices[key] = kwargs
+        if self._processes:
+            self._assign(key)
+
+    def remove(self, host, port=5555):
+        """Remove a device from the fleet.
+
+        Parameters
+        ----------
+        host : str
+            The address of the device
+        port : int
+            The device port
+
+        """
+        key = (host, int(port))
+        self._devices.pop(key, None)
+        self.updates.pop(key, None)
+        worker = self._assignments.pop(key, None)
+        if worker in self._conns:
+            self._conns[worker].send((MSG_REMOVE, host, int(port)))
+
+    # ======================================================================= #
+    #                                                                         #
+    #                                 Workers                                 #
+    #                                                                         #
+    # ======================================================================= #
+    def start(self):
+        """Start the worker processes and assign the devices to them.
+
+        """
+        loop = asyncio.get_event_loop()
+        for worker in range(self.workers):
+            parent_conn, child_conn = self._context.Pipe()
+            process = self._context.Process(target=_worker_main, args=(child_conn, self.fleet_kwargs, self.stats_interval_s), daemon=True)
+            process.start()
+            child_conn.close()
+
+            self._processes[worker] = process
+            self._conns[worker] = parent_conn
+            loop.add_reader(parent_conn.fileno(), self._on_readable, worker)
+
+        for key in self._devices:
+            self._assign(key)
+
+    async def stop(self, timeout_s=5.):
+        """Stop the worker processes.
+
+        Parameters
+        ----------
+        timeout_s : float
+            How long to wait for each worker to stop before it is terminated
+
+        """
+        processes = dict(self._processes)
+        for worker in list(self._conns):
+            try:
+                self._conns[worker].send((MSG_STOP,))
+            except OSError:
+                pass
+            self._remove_worker(worker)
+
+        loop = asyncio.get_event_loop()
+        for process in processes.values():
+            await loop.run_in_executor(None, process.join, timeout_s)
+            if process.is_alive():
+                process.terminate()
+
+        self._assignments = {}
+
+    def stats(self):
+        """Get the statistics that were most recently reported by the workers.
+
+        Returns
+        -------
+        dict
+            A dictionary with keys ``'workers'`` (the number of workers that are alive), ``'devices'``, ``'polls'``,
+            ``'polls_per_s'`` (summed over the workers), ``'latency_p99_s'`` (the maximum over the workers), and
+            ``'per_worker'`` (the statistics of each worker)
+
+        """
+        stats = list(self._stats.values())
+        latencies = [worker_stats['latency_p99_s'] for worker_stats in stats if worker_stats['latency_p99_s'] is not None]
+
+        return {'workers': len(self._processes),
+                'devices': len(self._devices),
+                'polls': sum(worker_stats['polls'] for worker_stats in stats),
+                'polls_per_s': sum(worker_stats['polls_per_s'] for worker_stats in stats),
+                'latency_p99_s': max(latencies) if latencies else None,
+                'per_worker': dict(self._stats)}
+
+    # ======================================================================= #
+    #                                                                         #
+    #                                 Helpers                                 #
+    #                                                                         #
+    # ======================================================================= #
+    def _assign(self, key):
+        """Send a device to the worker that is chosen by :py:func:`shard_for`.
+
+        Parameters
+        ----------
+        key : tuple
+            The ``(host, port)`` of the device
+
+        """
+        worker = shard_for(key[0], list(self._conns))
+        if worker is None:
+            _LOGGER.warning("No workers are alive to poll %s:%d", key[0], key[1])
+            return
+
+        self._assignments[key] = worker
+        self._conns[worker].send((MSG_ADD, self._devices[key]))
+
+    def _on_readable(self, worker):
+        """Handle a message from a worker.
+
+        Parameters
+        ----------
+        worker : int
+            The ID of the worker
+
+        """
+        try:
+            msg = self._conns[worker].recv()
+        except (EOFError, OSError):
+            self._worker_died(worker)
+            return
+
+        if msg[0] == MSG_UPDATE:
+            _, host, port, update = msg
+            if (host, port) not in self._devices:
+                return
+
+            self.updates[(host, port)] = update
+            if self.callback:
+                result = self.callback(host, port, update)
+                if asyncio.iscoroutine(result):
+                    asyncio.ensure_future(result)
+
+        elif msg[0] == MSG_STATS:
+            self._stats[worker] = msg[1]
+
+    def _remove_worker(self, worker):
+        """Stop listening to a worker and forget about it.
+
+        Parameters
+        ----------
+        worker : int
+            The ID of the worker
+
+        """
+        conn = self._conns.pop(worker)
+        asyncio.get_event_loop().remove_reader(conn.fileno())
+        conn.close()
+        self._processes.pop(worker, None)
+        self._stats.pop(worker, None)
+
+    def _worker_died(self, worker):
+        """Reassign the devices of a worker that died to the remaining workers.
+
+        Parameters
+        ----------
+        worker : int
+            The ID of the worker
+
+        """
+        _LOGGER.warning("Worker %d died; reassigning its %d devices", worker, sum(1 for assigned in self._assignments.values() if assigned == worker))
+        self._remove_worker(worker)
+
+        for key, assigned in list(self._assignments.items()):
+            if assigned == worker:
+                self._assign(key)
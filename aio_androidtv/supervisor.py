@@ -0,0 +1,303 @@
+"""Reconnect to a device in the background, with exponential backoff, jitter, and a circuit breaker, and optionally probe the connection while it is idle.
+
+* :py:class:`ConnectionSupervisor` is returned by :py:meth:`aio_androidtv.adb_manager.ADBPython.supervise`.
+
+"""
+
+
+import asyncio
+import logging
+import random
+import time
+
+from .constants import DEFAULT_AUTH_TIMEOUT_S, DEFAULT_PROBE_TIMEOUT_S
+
+_LOGGER = logging.getLogger(__name__)
+
+
+#: The circuit state in which the connection is intact and commands are sent to the device
+STATE_CLOSED = 'closed'
+
+#: The circuit state in which the connection failed and commands fail fast until the next reconnect attempt
+STATE_OPEN = 'open'
+
+#: The circuit state in which a reconnect attempt is in progress (commands still fail fast)
+STATE_HALF_OPEN = 'half_open'
+
+#: The default time (in seconds) until the first reconnect attempt after the connection failed
+DEFAULT_MIN_BACKOFF_S = 1.
+
+#: The default longest time (in seconds) between reconnect attempts
+DEFAULT_MAX_BACKOFF_S = 60.
+
+#: The default factor by which the time between reconnect attempts grows with each failed attempt
+DEFAULT_BACKOFF = 2.
+
+#: The default fraction of the backoff by which the time until each reconnect attempt is randomly varied
+DEFAULT_JITTER = 0.2
+
+
+class ConnectionSupervisor(object):
+    """Keep an ADB connection up by reconnecting in the background, and make commands fail fast while it is down.
+
+    The supervisor is a circuit breaker.  While the circuit is :py:const:`STATE_CLOSED`, commands are sent to the
+    device as usual.  When a command or a connection attempt fails, the circuit opens (:py:const:`STATE_OPEN`): the
+    connection is reported as not :py:attr:`~aio_androidtv.adb_manager.ADBPython.available`, so
+    :py:meth:`~aio_androidtv.adb_manager.ADBPython.shell` and the other commands return right away without touching the
+    socket, and :py:meth:`~aio_androidtv.adb_manager.ADBPython.connect` returns ``False`` right away.  Meanwhile, the
+    supervisor's task waits ``min_backoff_s`` seconds and then tries to reconnect (:py:const:`STATE_HALF_OPEN`).  Each
+    failed attempt multiplies the wait by ``backoff``, up to ``max_backoff_s``, and each wait is randomly varied by up to
+    ``jitter`` times its length, so that a fleet of devices that dropped off the network together is not reconnected in
+    waves.  A successful attempt closes the circuit again.
+
+    A connection that the device abandoned (e.g., because it went to sleep) is only detected when a command times out.
+    If ``keepalive_interval_s`` is not ``None``, the supervisor checks the connection with
+    :py:meth:`~aio_androidtv.adb_manager.ADBPython.probe` whenever it has been idle for that long, so that a dead
+    connection is replaced before a command is sent on it.
+
+    Parameters
+    ----------
+    adb : ADBPython
+        The ADB connection to supervise
+    min_backoff_s : float
+        The time until the first reconnect attempt after the connection failed
+    max_backoff_s : float
+        The longest time between reconnect attempts
+    backoff : float
+        The factor by which the time between reconnect attempts grows with each failed attempt
+    jitter : float
+        The fraction of the backoff by which the time until each reconnect attempt is randomly varied
+    auth_timeout_s : float
+        Authentication timeout (in seconds) for the reconnect attempts
+    keepalive_interval_s : float, None
+        How long (in seconds) the connection can be idle before it is probed, or ``None`` to not probe it
+    keepalive_timeout_s : float
+        How long (in seconds) to wait for the device to respond to a probe
+
+    """
+    def __init__(self, adb, min_backoff_s=DEFAULT_MIN_BACKOFF_S, max_backoff_s=DEFAULT_MAX_BACKOFF_S, backoff=DEFAULT_BACKOFF, jitter=DEFAULT_JITTER, auth_timeout_s=DEFAULT_AUTH_TIMEOUT_S,
+                 keepalive_interval_s=None, keepalive_timeout_s=DEFAULT_PROBE_TIMEOUT_S):  # pylint: disable=too-many-arguments
+        self.adb = adb
+        self.min_backoff_s = min_backoff_s
+        self.max_backoff_s = max_backoff_s
+        self.backoff = backoff
+        self.jitter = jitter
+        self.auth_timeout_s = auth_timeout_s
+        self.keepalive_interval_s = keepalive_interval_s
+        self.keepalive_timeout_s = keepalive_timeout_s
+
+        #: The state of the circuit (:py:const:`STATE_CLOSED`, :py:const:`STATE_OPEN`, or :py:const:`STATE_HALF_OPEN`)
+        self.state = STATE_CLOSED
+
+        # the event that is set when the circuit opens; it is created by `start`, so that it is bound to the event
+        # loop that runs the supervision
+        self._task = None
+        self._tripped = None
+
+        # the number of failed reconnect attempts since the circuit opened, and when the next one will be made
+        self._failed_attempts = 0
+        self._next_attempt = None
+
+        # when the connection was last probed
+        self._last_probe = 0.
+
+        # the number of times that the circuit opened, the reconnect attempts, the successful reconnects, and the probes
+        self._trips = 0
+        self._attempts = 0
+        self._reconnects = 0
+        self._probes = 0
+
+    # ======================================================================= #
+    #                                                                         #
+    #                             Supervision loop                            #
+    #                                                                         #
+    # ======================================================================= #
+    def start(self):
+        """Start supervising the connection in a background task.
+
+        Returns
+        -------
+        asyncio.Task
+            The supervision task
+
+        """
+        if self._tripped is None:
+            self._tripped = asyncio.Event()
+
+        if self._task is None or self._task.done():
+            self._task = asyncio.ensure_future(self.run())
+
+        return self._task
+
+    async def stop(self):
+        """Stop supervising the connection and close the circuit, so that commands are no longer held back.
+
+        """
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+        self.state = STATE_CLOSED
+        self._failed_attempts = 0
+        self._next_attempt = None
+
+    async def run(self):
+        """Reconnect whenever the circuit opens, and probe the connection whenever it is idle, until the task is cancelled.
+
+        """
+        if self._tripped is None:
+            self._tripped = asyncio.Event()
+
+        if not self.adb.available:
+            self.trip()
+
+        while True:
+            if self.state != STATE_CLOSED:
+                await self.reconnect()
+                continue
+
+            if self.keepalive_interval_s is None:
+                await self._tripped.wait()
+                self._tripped.clear()
+                continue
+
+            # a probe that found a command in flight does not count as a use of the connection, so it is measured separately
+            idle_s = time.monotonic() - max(self.adb._last_used, self._last_probe)  # pylint: disable=protected-access
+            if idle_s < self.keepalive_interval_s:
+                try:
+                    await asyncio.wait_for(self._tripped.wait(), self.keepalive_interval_s - idle_s)
+                    self._tripped.clear()
+                except asyncio.TimeoutError:
+                    pass
+                continue
+
+            self._probes += 1
+            self._last_probe = time.monotonic()
+            if not await self.adb.probe(self.keepalive_timeout_s):
+                self.trip()
+
+    async def reconnect(self):
+        """Wait for the backoff and then try to reconnect.
+
+        Returns
+        -------
+        bool
+            Whether or not the connection was re-established
+
+        """
+        backoff_s = self._jittered(min(self.max_backoff_s, self.min_backoff_s * self.backoff ** self._failed_attempts))
+        self._next_attempt = time.monotonic() + backoff_s
+        await asyncio.sleep(backoff_s)
+
+        self.state = STATE_HALF_OPEN
+        self._next_attempt = None
+        self._attempts += 1
+        try:
+            connected = await self.adb._connect(always_log_errors=False, auth_timeout_s=self.auth_timeout_s)  # pylint: disable=protected-access
+        except asyncio.CancelledError:
+            raise
+        except Exception as exc:  # pylint: disable=broad-except
+            _LOGGER.warning("%s:%d reconnect attempt failed.  %s: %s", self.adb.host, self.adb.port, exc.__class__.__name__, exc)
+            connected = False
+
+        if connected:
+            _LOGGER.info("%s:%d reconnected after %d failed attempt(s)", self.adb.host, self.adb.port, self._failed_attempts)
+            self.state = STATE_CLOSED
+            self._failed_attempts = 0
+            self._reconnects += 1
+        else:
+            self.state = STATE_OPEN
+            self._failed_attempts += 1
+
+        return connected
+
+    # ======================================================================= #
+    #                                                                         #
+    #                             Circuit breaker                             #
+    #                                                                         #
+    # ======================================================================= #
+    @property
+    def running(self):
+        """Whether the supervision task is running.
+
+        Returns
+        -------
+        bool
+            Whether or not the supervision task is running
+
+        """
+        return self._task is not None and not self._task.done()
+
+    def trip(self, exc=None):
+        """Open the circuit, so that commands fail fast and the supervisor starts reconnecting.
+
+        This has no effect if the circuit is already open or the supervisor is not running.
+
+        Parameters
+        ----------
+        exc : Exception, None
+            The exception that caused the failure, if any
+
+        """
+        if self.state != STATE_CLOSED or not self.running:
+            return
+
+        if exc is not None:
+            _LOGGER.warning("%s:%d connection failed, reconnecting in the background.  %s: %s", self.adb.host, self.adb.port, exc.__class__.__name__, exc)
+        else:
+            _LOGGER.debug("%s:%d connection is down, reconnecting in the background", self.adb.host, self.adb.port)
+
+        self.state = STATE_OPEN
+        self._trips += 1
+        self._tripped.set()
+
+    # ======================================================================= #
+    #                                                                         #
+    #                                 Metrics                                 #
+    #                                                                         #
+    # ======================================================================= #
+    def stats(self):
+        """Get statistics about the supervision.
+
+        Returns
+        -------
+        dict
+            A dictionary with keys ``'state'`` (the circuit state), ``'trips'`` (the number of times that the circuit
+            opened), ``'attempts'`` (the number of reconnect attempts), ``'reconnects'`` (the number of successful
+            reconnect attempts), ``'probes'`` (the number of times that the idle connection was probed),
+            ``'failed_attempts'`` (the number of failed reconnect attempts since the circuit opened), and
+            ``'next_attempt_s'`` (the time until the next reconnect attempt, or ``None``)
+
+        """
+        return {'state': self.state,
+                'trips': self._trips,
+                'attempts': self._attempts,
+                'reconnects': self._reconnects,
+                'probes': self._probes,
+                'failed_attempts': self._failed_attempts,
+                'next_attempt_s': max(0., self._next_attempt - time.monotonic()) if self._next_attempt is not None else None}
+
+    # ======================================================================= #
+    #                                                                         #
+    #                                 Helpers                                 #
+    #                                                                         #
+    # ======================================================================= #
+    def _jittered(self, backoff_s):
+        """Randomly vary a backoff by up to ``jitter * backoff_s``.
+
+        Parameters
+        ----------
+        backoff_s : float
+            The backoff (in seconds)
+
+        Returns
+        -------
+        float
+            The randomly varied backoff (in seconds)
+
+        """
+        return max(0., backoff_s * (1. + random.uniform(-self.jitter, self.jitter)))
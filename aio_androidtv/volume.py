@@ -0,0 +1,237 @@
+"""Coalesce rapid volume changes into one absolute volume command per debounce window.
+
+* :py:class:`VolumeController` is returned by :py:meth:`aio_androidtv.basetv.BaseTV.volume_controller`.
+
+"""
+
+
+import asyncio
+import logging
+
+_LOGGER = logging.getLogger(__name__)
+
+
+#: The default length (in seconds) of the window in which volume changes are coalesced into one command
+DEFAULT_DEBOUNCE_S = 0.25
+
+
+class VolumeController(object):
+    """Debounce relative and absolute volume changes into a target volume that is set once per window.
+
+    When a user holds the volume up button, :py:meth:`aio_androidtv.basetv.BaseTV.volume_up` is called many times in
+    quick succession, and each call determines the current volume and then sends a key press.  Instead,
+    :py:meth:`volume_up`, :py:meth:`volume_down`, and :py:meth:`set_volume_level` only update a target volume and
+    return the predicted volume level right away.  The current volume is determined once, when the target is first
+    needed, and the target is sent to the device via :py:meth:`~aio_androidtv.basetv.BaseTV.set_volume_level` at the
+    end of each ``debounce_s`` window in which it changed.  Once a whole window passes without any changes, the target
+    is forgotten, so that the next change starts from the device's actual volume.
+
+    Parameters
+    ----------
+    atv : BaseTV
+        The device (an :py:class:`~aio_androidtv.androidtv.AndroidTV` or :py:class:`~aio_androidtv.firetv.FireTV` object)
+    debounce_s : float
+        The length (in seconds) of the window in which volume changes are coalesced into one command
+
+    """
+    def __init__(self, atv, debounce_s=DEFAULT_DEBOUNCE_S):
+        self.atv = atv
+        self.debounce_s = debounce_s
+
+        #: The number of volume commands that have been sent to the device
+        self.commands = 0
+
+        # the target volume, the last volume that was sent to the device, and the task that sends the target
+        self._target = None
+        self._sent = None
+        self._task = None
+
+        # the lock that serializes the volume changes (see `_get_lock`)
+        self._lock = None
+
+    @property
+    def target(self):
+        """The volume that will be sent to the device, or ``None`` if there is no pending change.
+
+        Returns
+        -------
+        int, None
+            The target volume, or ``None`` if there is no pending change
+
+        """
+        return self._target
+
+    # ======================================================================= #
+    #                                                                         #
+    #                             Volume changes                              #
+    #                                                                         #
+    # ======================================================================= #
+    async def set_volume_level(self, volume_level):
+        """Set the target volume level.
+
+        Parameters
+        ----------
+        volume_level : float
+            The new volume level (between 0 and 1)
+
+        Returns
+        -------
+        float, None
+            The new volume level (between 0 and 1), or ``None`` if ``atv.max_volume`` could not be determined
+
+        """
+        async with self._get_lock():
+            if not self.atv.max_volume:
+                await self.atv.volume()
+                if not self.atv.max_volume:
+                    return None
+
+            return self._set_target(round(self.atv.max_volume * volume_level))
+
+    async def volume_up(self, steps=1):
+        """Raise the target volume.
+
+        Parameters
+        ----------
+        steps : int
+            The number of volume steps (i.e., volume up key presses)
+
+        Returns
+        -------
+        float, None
+            The new volume level (between 0 and 1), or ``None`` if the current volume could not be determined
+
+        """
+        return await self._change_volume(steps)
+
+    async def volume_down(self, steps=1):
+        """Lower the target volume.
+
+        Parameters
+        ----------
+        steps : int
+            The number of volume steps (i.e., volume down key presses)
+
+        Returns
+        -------
+        float, None
+            The new volume level (between 0 and 1), or ``None`` if the current volume could not be determined
+
+        """
+        return await self._change_volume(-steps)
+
+    async def _change_volume(self, steps):
+        """Change the target volume by ``steps``, starting from the current volume if there is no target.
+
+        Parameters
+        ----------
+        steps : int
+            The change in the volume
+
+        Returns
+        -------
+        float, None
+            The new volume level (between 0 and 1), or ``None`` if the current volume could not be determined
+
+        """
+        async with self._get_lock():
+            if self._target is None:
+                volume = await self.atv.volume()
+                if volume is None or not self.atv.max_volume:
+                    return None
+
+                self._target = self._sent = volume
+
+            return self._set_target(self._target + steps)
+
+    def _get_lock(self):
+        """Get the lock that serializes the volume changes, creating it on first use so that it is bound to the running event loop.
+
+        Returns
+        -------
+        asyncio.Lock
+            The lock
+
+        """
+        if self._lock is None:
+            self._lock = asyncio.Lock()
+
+        return self._lock
+
+    def _set_target(self, volume):
+        """Set the target volume and make sure that it will be sent at the end of the window.
+
+        Parameters
+        ----------
+        volume : int
+            The target volume, which is clipped to the range from 0 to ``atv.max_volume``
+
+        Returns
+        -------
+        float
+            The new volume level (between 0 and 1)
+
+        """
+        self._target = int(min(max(volume, 0), self.atv.max_volume))
+
+        if self._task is None or self._task.done():
+            self._task = asyncio.ensure_future(self._run())
+
+        return self._target / self.atv.max_volume
+
+    # ======================================================================= #
+    #                                                                         #
+    #                             Sending changes                             #
+    #                                                                         #
+    # ======================================================================= #
+    async def flush(self):
+        """Send the target volume to the device now, if it has not been sent.
+
+        """
+        if self._target is None or self._target == self._sent:
+            return
+
+        self._sent = self._target
+        self.commands += 1
+        await self.atv.set_volume_level(self._sent / self.atv.max_volume)
+
+    async def close(self):
+        """Send the target volume, if it has not been sent, and stop the task that sends it.
+
+        """
+        if self._task is None:
+            return
+
+        try:
+            await self.flush()
+        finally:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+            self._target = None
+            self._sent = None
+
+    async def _run(self):
+        """Send the target volume at the end of each window in which it changed, until a window passes without changes.
+
+        """
+        try:
+            while True:
+                await asyncio.sleep(self.debounce_s)
+                if self._target is None or self._target == self._sent:
+                    break
+
+                await self.flush()
+
+        except asyncio.CancelledError:
+            raise
+
+        except Exception as exc:  # pylint: disable=broad-except
+            _LOGGER.warning("%s:%d failed to set the volume: %s", self.atv.host, self.atv.port, exc)
+
+        finally:
+            self._target = None
+            self._sent = None
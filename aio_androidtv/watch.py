@@ -0,0 +1,319 @@
+"""Stream the state changes of a device to any number of subscribers that share one underlying poll.
+
+* :py:class:`StateChange` is a transition in the result of ``update()``.
+* :py:class:`Subscription` is an async iterator over the state changes, which is returned by :py:meth:`aio_androidtv.basetv.BaseTV.watch`.
+* :py:class:`WatchHub` polls the device with an :py:class:`~aio_androidtv.polling.AdaptivePoller` and fans the changes out to the subscriptions.
+
+"""
+
+
+import asyncio
+import logging
+
+from .polling import AdaptivePoller
+
+_LOGGER = logging.getLogger(__name__)
+
+
+#: The values returned by :py:meth:`aio_androidtv.androidtv.AndroidTV.update`, in order
+ANDROIDTV_UPDATE_FIELDS = ('state', 'current_app', 'running_apps', 'audio_output_device', 'is_volume_muted', 'volume_level')
+
+#: The values returned by :py:meth:`aio_androidtv.firetv.FireTV.update`, in order
+FIRETV_UPDATE_FIELDS = ('state', 'current_app', 'running_apps')
+
+#: The values whose transitions are reported by default
+DEFAULT_WATCH_FIELDS = ('state', 'current_app', 'is_volume_muted', 'volume_level')
+
+#: The default maximum number of state changes that are queued for a subscriber; when the queue is full, the oldest change is dropped
+DEFAULT_QUEUE_SIZE = 16
+
+
+class StateChange(object):
+    """A transition in one or more of the values returned by ``update()``.
+
+    Parameters
+    ----------
+    changes : dict
+        A dictionary whose keys are the names of the values that changed and whose values are ``(old, new)`` tuples
+    update : tuple
+        The result of ``update()`` after the change
+
+    """
+    __slots__ = ('changes', 'update')
+
+    def __init__(self, changes, update):
+        self.changes = changes
+        self.update = update
+
+    def __eq__(self, other):
+        if not isinstance(other, StateChange):
+            return NotImplemented
+        return self.changes == other.changes and self.update == other.update
+
+    def __repr__(self):
+        return "StateChange(changes={!r}, update={!r})".format(self.changes, self.update)
+
+
+class Subscription(object):
+    """An async iterator over the state changes of a device.
+
+    Use it as an async context manager, or call :py:meth:`close` when done, so that the device stops being polled
+    once there are no more subscribers::
+
+        async with atv.watch() as changes:
+            async for change in changes:
+                ...
+
+    Parameters
+    ----------
+    hub : WatchHub
+        The hub that delivers the state changes
+    fields : tuple
+        The names of the values whose transitions are reported
+    queue_size : int
+        The maximum number of state changes that are queued; when the queue is full, the oldest change is dropped
+
+    """
+    def __init__(self, hub, fields, queue_size):
+        self.fields = fields
+        self.queue_size = queue_size
+
+        #: The number of state changes that were dropped because the queue was full
+        self.dropped = 0
+
+        # the queue of state changes (see `_get_queue`)
+        self._hub = hub
+        self._queue = None
+        self._closed = False
+
+    def __aiter__(self):
+        return self
+
+    async def __anext__(self):
+        queue = self._get_queue()
+        if self._closed and queue.empty():
+            raise StopAsyncIteration
+
+        change = await queue.get()
+        if change is None:
+            raise StopAsyncIteration
+
+        if isinstance(change, Exception):
+            raise change
+
+        return change
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, exc_type, exc, tb):
+        await self.close()
+
+    async def close(self):
+        """Stop receiving state changes and end the iteration.
+
+        """
+        if self._closed:
+            return
+
+        self._closed = True
+        self._put(None)
+        await self._hub.unsubscribe(self)
+
+    def _end(self, exc=None):
+        """End the iteration because the hub stopped polling the device.
+
+        Parameters
+        ----------
+        exc : Exception, None
+            The exception that stopped the polling, which is raised by the iteration, or ``None`` to just end it
+
+        """
+        if self._closed:
+            return
+
+        self._closed = True
+        self._put(exc)
+
+    def _deliver(self, changes, update):
+        """Queue a state change, if any of the values in ``fields`` changed.
+
+        Parameters
+        ----------
+        changes : dict
+            A dictionary whose keys are the names of the values that changed and whose values are ``(old, new)`` tuples
+        update : tuple
+            The result of ``update()`` after the change
+
+        """
+        if self._closed:
+            return
+
+        changes = {field: change for field, change in changes.items() if field in self.fields}
+        if changes:
+            self._put(StateChange(changes, update))
+
+    def _get_queue(self):
+        """Get the queue of state changes, creating it on first use so that it is bound to the running event loop.
+
+        One slot of the queue is reserved for the ``None`` or the exception that ends the iteration.
+
+        Returns
+        -------
+        asyncio.Queue
+            The queue
+
+        """
+        if self._queue is None:
+            self._queue = asyncio.Queue(maxsize=self.queue_size + 1)
+
+        return self._queue
+
+    def _put(self, item):
+        """Add an item to the queue, dropping the oldest state change if it is full.
+
+        Parameters
+        ----------
+        item : StateChange, Exception, None
+            The state change, or an exception or ``None`` to end the iteration
+
+        """
+        queue = self._get_queue()
+        if isinstance(item, StateChange) and queue.qsize() >= self.queue_size:
+            queue.get_nowait()
+            self.dropped += 1
+
+        queue.put_nowait(item)
+
+
+class WatchHub(object):
+    """Poll a device and deliver its state changes to all subscriptions.
+
+    The device is polled by a single :py:class:`~aio_androidtv.polling.AdaptivePoller`, which is started when the
+    first subscription is created and stopped when the last one is closed.  If the polling task ends while there are
+    subscriptions (e.g., because it was cancelled), their iterations end, raising the exception that ended it, if any.
+
+    The transitions are computed against the hub's own last update, so calling
+    :py:meth:`~aio_androidtv.basetv.BaseTV.update_if_changed` directly while the device is watched does not hide
+    transitions from the subscriptions.
+
+    Parameters
+    ----------
+    atv : BaseTV
+        The device (an :py:class:`~aio_androidtv.androidtv.AndroidTV` or :py:class:`~aio_androidtv.firetv.FireTV` object)
+    poller_kwargs
+        Keyword arguments for the :py:class:`~aio_androidtv.polling.AdaptivePoller`
+
+    """
+    def __init__(self, atv, **poller_kwargs):
+        self.atv = atv
+        self.poller = AdaptivePoller(atv, callback=self._dispatch, **poller_kwargs)
+
+        #: The last result of ``update()``
+        self.update = None
+
+        self._subscriptions = []
+        self._task = None
+
+    def subscribe(self, fields=DEFAULT_WATCH_FIELDS, queue_size=DEFAULT_QUEUE_SIZE):
+        """Create a subscription and start polling the device, if it is not already being polled.
+
+        If the state of the device is already known, the subscription starts with a change from ``None`` to it.
+
+        Parameters
+        ----------
+        fields : tuple
+            The names of the values whose transitions are reported
+        queue_size : int
+            The maximum number of state changes that are queued for the subscription
+
+        Returns
+        -------
+        Subscription
+            The subscription
+
+        """
+        subscription = Subscription(self, fields, queue_size)
+        if self.update is not None:
+            subscription._deliver(self._changes(None, self.update), self.update)  # pylint: disable=protected-access
+
+        self._subscriptions.append(subscription)
+        task = self.poller.start()
+        if task is not self._task:
+            self._task = task
+            task.add_done_callback(self._poller_done)
+
+        return subscription
+
+    async def unsubscribe(self, subscription):
+        """Remove a subscription and stop polling the device if it was the last one.
+
+        Parameters
+        ----------
+        subscription : Subscription
+            The subscription
+
+        """
+        if subscription in self._subscriptions:
+            self._subscriptions.remove(subscription)
+
+        if not self._subscriptions:
+            await self.poller.stop()
+
+    def _poller_done(self, task):
+        """End all of the subscriptions when the polling task ends.
+
+        Parameters
+        ----------
+        task : asyncio.Task
+            The polling task
+
+        """
+        if task is not self._task:
+            return
+
+        self._task = None
+        exc = None if task.cancelled() else task.exception()
+        if self._subscriptions:
+            _LOGGER.warning("%s:%d stopped polling while %d subscription(s) were open", self.atv.host, self.atv.port, len(self._subscriptions))
+
+        subscriptions, self._subscriptions = self._subscriptions, []
+        for subscription in subscriptions:
+            subscription._end(exc)  # pylint: disable=protected-access
+
+    def _changes(self, old_update, new_update):
+        """Compare two results of ``update()``.
+
+        Parameters
+        ----------
+        old_update : tuple, None
+            The previous result of ``update()``
+        new_update : tuple
+            The new result of ``update()``
+
+        Returns
+        -------
+        dict
+            A dictionary whose keys are the names of the values that changed and whose values are ``(old, new)`` tuples
+
+        """
+        if old_update is None:
+            old_update = (None,) * len(new_update)
+
+        return {field: (old, new) for field, old, new in zip(self.atv.UPDATE_FIELDS, old_update, new_update) if old != new}
+
+    def _dispatch(self, update):
+        """Deliver a new result of ``update()`` to all subscriptions.
+
+        Parameters
+        ----------
+        update : tuple
+            The result of ``update()``
+
+        """
+        changes = self._changes(self.update, update)
+        self.update = update
+        _LOGGER.debug("%s:%d state changes: %s", self.atv.host, self.atv.port, changes)
+
+        for subscription in self._subscriptions:
+            subscription._deliver(changes, update)  # pylint: disable=protected-access
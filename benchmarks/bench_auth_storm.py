@@ -0,0 +1,144 @@
+"""Measure how long the event loop is stalled while many devices reconnect with RSA authentication at once.
+
+A fake ADB server (:py:mod:`tests.fake_adbd`) that requires authentication runs in its own process and simulates
+``--devices`` devices on consecutive loopback addresses (this requires Linux, where all of ``127.0.0.0/8`` is routed
+to the loopback interface).  All of the devices are then reconnected at the same time, while a task that sleeps for
+``--tick`` seconds at a time measures how late the event loop wakes it up.  This is done with the token signed on
+the event loop and with the ``auth_executor`` option of :py:class:`~aio_androidtv.adb_manager.ADBPython` set to a
+thread pool and to a process pool.
+
+Usage::
+
+    python benchmarks/bench_auth_storm.py [--devices 200] [--workers 4] [--rounds 3]
+
+"""
+
+
+import argparse
+import asyncio
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+import multiprocessing
+import os
+import resource
+import shutil
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+from aio_adb_shell.auth.keygen import keygen  # noqa: E402 pylint: disable=wrong-import-position
+
+from aio_androidtv.adb_manager import ADBPython  # noqa: E402 pylint: disable=wrong-import-position
+from aio_androidtv.fleet import _percentile  # noqa: E402 pylint: disable=wrong-import-position
+from tests.fake_adbd import FakeAdbServer, host_range  # noqa: E402 pylint: disable=wrong-import-position
+
+
+def raise_open_files_limit():
+    """Raise the soft limit on open files to the hard limit, since each simulated device needs a socket."""
+    _, hard = resource.getrlimit(resource.RLIMIT_NOFILE)
+    resource.setrlimit(resource.RLIMIT_NOFILE, (hard, hard))
+
+
+def run_server(hosts, port, ready):
+    """Run the fake ADB server (in its own process)."""
+    raise_open_files_limit()
+    server = FakeAdbServer(hosts, port, auth=True)
+    loop = asyncio.new_event_loop()
+    asyncio.set_event_loop(loop)
+    loop.run_until_complete(server.start())
+    ready.set()
+    loop.run_forever()
+
+
+async def monitor(tick, stalls):
+    """Sleep for ``tick`` seconds at a time and record how much later than that the event loop woke this task up."""
+    while True:
+        start = time.perf_counter()
+        await asyncio.sleep(tick)
+        stalls.append(time.perf_counter() - start - tick)
+
+
+async def reconnect_storm(adbs, tick):
+    """Reconnect all of the devices at once, and return the time that it took and the event loop stalls."""
+    stalls = []
+    task = asyncio.ensure_future(monitor(tick, stalls))
+    await asyncio.sleep(tick)
+
+    start = time.perf_counter()
+    results = await asyncio.gather(*[adb.connect() for adb in adbs])
+    duration = time.perf_counter() - start
+
+    task.cancel()
+    try:
+        await task
+    except asyncio.CancelledError:
+        pass
+
+    for adb in adbs:
+        await adb.close()
+
+    return duration, stalls, results.count(False)
+
+
+def main():
+    """Run the benchmark."""
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--devices', type=int, default=200, help="the number of simulated devices")
+    parser.add_argument('--workers', type=int, default=4, help="the number of workers in the thread pool and the process pool")
+    parser.add_argument('--rounds', type=int, default=3, help="the number of reconnect storms for each setting (the stalls of all of them are reported)")
+    parser.add_argument('--tick', type=float, default=0.001, help="how long the monitoring task sleeps at a time (in seconds)")
+    parser.add_argument('--port', type=int, default=15559, help="the port of the fake ADB server")
+    args = parser.parse_args()
+
+    raise_open_files_limit()
+    hosts = host_range(args.devices)
+    context = multiprocessing.get_context('spawn')
+    ready = context.Event()
+    server = context.Process(target=run_server, args=(hosts, args.port, ready), daemon=True)
+    server.start()
+    ready.wait()
+
+    tmpdir = tempfile.mkdtemp()
+    loop = asyncio.get_event_loop()
+    try:
+        adbkey = os.path.join(tmpdir, 'adbkey')
+        keygen(adbkey)
+
+        # authorize the key (the fake server accepts new keys)
+        adb = ADBPython(hosts[0], args.port, adbkey)
+        loop.run_until_complete(adb.connect())
+        loop.run_until_complete(adb.close())
+
+        print("{:<20} {:>10} {:>14} {:>14} {:>14} {:>8}".format("signing", "storm (s)", "p50 stall (ms)", "p99 stall (ms)", "max stall (ms)", "failed"))
+        for name, executor in (("event loop", None),
+                               ("thread pool ({})".format(args.workers), ThreadPoolExecutor(args.workers)),
+                               ("process pool ({})".format(args.workers), ProcessPoolExecutor(args.workers))):
+            adbs = [ADBPython(host, args.port, adbkey, auth_executor=executor) for host in hosts]
+
+            # start the workers before measuring
+            loop.run_until_complete(reconnect_storm(adbs, args.tick))
+
+            durations = []
+            stalls = []
+            failed = 0
+            for _ in range(args.rounds):
+                duration, round_stalls, round_failed = loop.run_until_complete(reconnect_storm(adbs, args.tick))
+                durations.append(duration)
+                stalls.extend(round_stalls)
+                failed += round_failed
+
+            stalls.sort()
+            print("{:<20} {:>10.2f} {:>14.2f} {:>14.2f} {:>14.2f} {:>8}".format(name, min(durations), 1000 * _percentile(stalls, 50), 1000 * _percentile(stalls, 99), 1000 * stalls[-1], failed))
+
+            if executor is not None:
+                executor.shutdown()
+
+    finally:
+        shutil.rmtree(tmpdir)
+        server.terminate()
+        server.join()
+
+
+if __name__ == '__main__':
+    main()
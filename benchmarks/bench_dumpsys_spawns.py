@@ -0,0 +1,140 @@
+"""Count the device-side ``dumpsys`` invocations made by the ``get_properties`` shell commands.
+
+Each command is run locally by ``bash`` with fake ``dumpsys`` and ``ps`` executables at the front of
+``PATH``.  The fakes log every invocation and sleep for ``--dumpsys-cost`` seconds, which simulates the
+100-400 ms that a ``dumpsys`` call costs on a low-end Android TV device.
+
+Usage::
+
+    python benchmarks/bench_dumpsys_spawns.py [--dumpsys-cost 0.1]
+
+"""
+
+
+import argparse
+import collections
+import os
+import subprocess
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+from aio_androidtv import constants  # noqa: E402 pylint: disable=wrong-import-position
+
+
+DUMPSYS_OUTPUT = {'audio': """- STREAM_VOICE_CALL:
+   Muted: false
+   Min: 1
+   Max: 5
+   Current: 2 (speaker): 4, 40000 (hmdi_arc): 4, 40000000 (default): 4
+   Devices: speaker
+- STREAM_MUSIC:
+   Muted: false
+   Min: 0
+   Max: 60
+   Current: 2 (speaker): 20, 40000 (hmdi_arc): 22, 40000000 (default): 15
+   Devices: hmdi_arc
+- STREAM_ALARM:
+   Muted: false
+   Min: 0
+   Max: 7
+   Current: 2 (speaker): 3, 40000 (hmdi_arc): 3, 40000000 (default): 2
+   Devices: speaker
+  AudioPlaybackConfiguration piid:15 type:android.media.MediaPlayer u/pid:10054/3811 state:started attr:AudioAttributes: usage=USAGE_MEDIA
+""",
+                  'media_session': """Sessions Stack - have 1 sessions:
+  com.plexapp.android/PlexMediaSession (userId=0)
+    state=PlaybackState {state=3, position=0, buffered position=0, speed=1.0, updated=65749, actions=240640, custom actions=[], active item id=-1, error=null}
+""",
+                  'power': """POWER MANAGER (dumpsys power)
+  mWakefulness=Awake
+  mScreenOn=true
+  Display Power: state=ON
+Wake Locks: size=2
+""",
+                  'window': """  mCurrentFocus=Window{2b6b4a5 u0 com.plexapp.android/com.plexapp.plex.activities.SplashActivity}
+"""}
+
+PS_OUTPUT = """u0_a18    316   197   1189204 115000 ffffffff 00000000 S com.plexapp.android
+u0_a2     15121 197   998628 24628 ffffffff 00000000 S com.amazon.device.controllermanager
+"""
+
+FAKE_DUMPSYS = """#!/bin/bash
+echo "$1" >> "{log}"
+sleep {cost}
+cat "{fixtures}/$1.txt"
+"""
+
+FAKE_PS = """#!/bin/bash
+cat "{fixtures}/ps.txt"
+"""
+
+
+def make_fake_bin(tmpdir, cost):
+    """Write the fake ``dumpsys`` and ``ps`` executables and their fixtures to ``tmpdir``."""
+    fixtures = os.path.join(tmpdir, 'fixtures')
+    os.mkdir(fixtures)
+    for service, output in DUMPSYS_OUTPUT.items():
+        with open(os.path.join(fixtures, service + '.txt'), 'w') as f:
+            f.write(output)
+
+    with open(os.path.join(fixtures, 'ps.txt'), 'w') as f:
+        f.write(PS_OUTPUT)
+
+    log = os.path.join(tmpdir, 'dumpsys.log')
+    bindir = os.path.join(tmpdir, 'bin')
+    os.mkdir(bindir)
+    for name, template in (('dumpsys', FAKE_DUMPSYS), ('ps', FAKE_PS)):
+        path = os.path.join(bindir, name)
+        with open(path, 'w') as f:
+            f.write(template.format(log=log, cost=cost, fixtures=fixtures))
+        os.chmod(path, 0o755)
+
+    return bindir, log
+
+
+def run(cmd, bindir, log):
+    """Run ``cmd`` and return its output, the elapsed time, and a count of the ``dumpsys`` calls per service."""
+    if os.path.exists(log):
+        os.remove(log)
+
+    env = dict(os.environ, PATH=bindir + os.pathsep + os.environ['PATH'])
+    start = time.perf_counter()
+    output = subprocess.run(['bash', '-c', cmd], stdout=subprocess.PIPE, env=env, check=False).stdout.decode('utf-8')
+    elapsed = time.perf_counter() - start
+
+    calls = collections.Counter()
+    if os.path.exists(log):
+        with open(log) as f:
+            calls.update(line.strip() for line in f)
+
+    return output, elapsed, calls
+
+
+def main():
+    """Compare the original and single-pass ``get_properties`` commands."""
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--dumpsys-cost', type=float, default=0.1, help="simulated cost of one `dumpsys` call (in seconds)")
+    args = parser.parse_args()
+
+    variants = [('androidtv lazy', constants.CMD_ANDROIDTV_PROPERTIES_LAZY_RUNNING_APPS, constants.CMD_ANDROIDTV_PROPERTIES_LAZY_RUNNING_APPS_SINGLE_PASS),
+                ('androidtv not lazy', constants.CMD_ANDROIDTV_PROPERTIES_NOT_LAZY_RUNNING_APPS, constants.CMD_ANDROIDTV_PROPERTIES_NOT_LAZY_RUNNING_APPS_SINGLE_PASS),
+                ('firetv lazy', constants.CMD_FIRETV_PROPERTIES_LAZY_RUNNING_APPS, constants.CMD_FIRETV_PROPERTIES_LAZY_RUNNING_APPS_SINGLE_PASS),
+                ('firetv not lazy', constants.CMD_FIRETV_PROPERTIES_NOT_LAZY_RUNNING_APPS, constants.CMD_FIRETV_PROPERTIES_NOT_LAZY_RUNNING_APPS_SINGLE_PASS)]
+
+    with tempfile.TemporaryDirectory() as tmpdir:
+        bindir, log = make_fake_bin(tmpdir, args.dumpsys_cost)
+
+        print("{:<20} {:<12} {:>8} {:>8} {:>8} {:>10}  {}".format("command", "mode", "power", "audio", "total", "time (s)", "same output"))
+        for name, cmd, cmd_single_pass in variants:
+            output, elapsed, calls = run(cmd, bindir, log)
+            output_single_pass, elapsed_single_pass, calls_single_pass = run(cmd_single_pass, bindir, log)
+
+            print("{:<20} {:<12} {:>8} {:>8} {:>8} {:>10.3f}".format(name, "original", calls['power'], calls['audio'], sum(calls.values()), elapsed))
+            print("{:<20} {:<12} {:>8} {:>8} {:>8} {:>10.3f}  {}".format(name, "single pass", calls_single_pass['power'], calls_single_pass['audio'], sum(calls_single_pass.values()), elapsed_single_pass, output == output_single_pass))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,182 @@
+"""Measure ``get_properties`` latency, reconnect time, and fleet polling throughput over real sockets.
+
+A fake ADB server (:py:mod:`tests.fake_adbd`) runs in its own process, so the measurements include the socket path
+of :py:class:`~aio_androidtv.adb_manager.ADBPython` but not the cost of simulating the devices.
+
+* ``get_properties``: the latency of ``get_properties`` against the recorded output of each device profile
+* ``reconnect``: the time that it takes to reconnect, without and with RSA authentication, and to recover from injected connection resets
+* ``fleet``: the throughput of a :py:class:`~aio_androidtv.fleet.DeviceFleet` that polls ``--devices`` simulated devices on consecutive loopback addresses (this requires Linux)
+
+Usage::
+
+    python benchmarks/bench_fake_adbd.py [--iterations 200] [--devices 1000] [--duration 10] [--latency 0.02] [--jitter 0.01]
+
+"""
+
+
+import argparse
+import asyncio
+import multiprocessing
+import os
+import resource
+import shutil
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+from aio_adb_shell.auth.keygen import keygen  # noqa: E402 pylint: disable=wrong-import-position
+
+from aio_androidtv import setup  # noqa: E402 pylint: disable=wrong-import-position
+from aio_androidtv.adb_manager import ADBPython  # noqa: E402 pylint: disable=wrong-import-position
+from aio_androidtv.fleet import DeviceFleet, _percentile  # noqa: E402 pylint: disable=wrong-import-position
+from tests.fake_adbd import FakeAdbServer, host_range  # noqa: E402 pylint: disable=wrong-import-position
+
+
+def raise_open_files_limit():
+    """Raise the soft limit on open files to the hard limit, since each simulated device needs a socket."""
+    _, hard = resource.getrlimit(resource.RLIMIT_NOFILE)
+    resource.setrlimit(resource.RLIMIT_NOFILE, (hard, hard))
+
+
+def run_server(hosts, port, ready, server_kwargs):
+    """Run the fake ADB server (in its own process)."""
+    raise_open_files_limit()
+    server = FakeAdbServer(hosts, port, **server_kwargs)
+    loop = asyncio.new_event_loop()
+    asyncio.set_event_loop(loop)
+    loop.run_until_complete(server.start())
+    ready.set()
+    loop.run_forever()
+
+
+def start_server(hosts, port, **server_kwargs):
+    """Start the fake ADB server in a new process and wait until it is listening."""
+    context = multiprocessing.get_context('spawn')
+    ready = context.Event()
+    process = context.Process(target=run_server, args=(hosts, port, ready, server_kwargs), daemon=True)
+    process.start()
+    ready.wait()
+    return process
+
+
+def summarize(name, latencies):
+    """Print the percentiles of ``latencies`` (in milliseconds)."""
+    latencies = sorted(latencies)
+    print("{:<36} {:>8} {:>10.2f} {:>10.2f} {:>10.2f}".format(name, len(latencies), 1000 * _percentile(latencies, 50), 1000 * _percentile(latencies, 95), 1000 * _percentile(latencies, 99)))
+
+
+async def bench_get_properties(port, device_class, iterations):
+    """Time ``get_properties`` against one device."""
+    atv = await setup('127.0.0.1', port, device_class=device_class)
+    latencies = []
+    for _ in range(iterations):
+        start = time.perf_counter()
+        await atv.get_properties(lazy=False)
+        latencies.append(time.perf_counter() - start)
+
+    await atv.adb_close()
+    return latencies
+
+
+async def bench_reconnect(port, adbkey, iterations):
+    """Time ``connect`` followed by one shell command."""
+    adb = ADBPython('127.0.0.1', port, adbkey)
+    latencies = []
+    failures = 0
+    for _ in range(iterations):
+        start = time.perf_counter()
+        while True:
+            try:
+                if await adb.connect() and await adb.shell('getprop ro.serialno') is not None:
+                    break
+            except (ConnectionError, ValueError):
+                pass
+            failures += 1
+        latencies.append(time.perf_counter() - start)
+
+    await adb.close()
+    return latencies, failures
+
+
+async def bench_fleet(hosts, port, duration, interval):
+    """Poll the devices for ``duration`` seconds and return the statistics."""
+    fleet = DeviceFleet(max_concurrency=256, interval_s=interval, min_host_interval_s=0.)
+    start = time.perf_counter()
+    atvs = await asyncio.gather(*[setup(host, port, device_class='androidtv') for host in hosts])
+    setup_time = time.perf_counter() - start
+    for atv in atvs:
+        fleet.add(atv)
+
+    fleet.start()
+    await asyncio.sleep(duration)
+    stats = fleet.stats()
+    await fleet.stop()
+
+    for atv in atvs:
+        await atv.adb_close()
+
+    return setup_time, stats
+
+
+def main():
+    """Run the benchmarks."""
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--iterations', type=int, default=200, help="the number of `get_properties` calls and reconnects to time")
+    parser.add_argument('--devices', type=int, default=1000, help="the number of simulated devices in the fleet benchmark")
+    parser.add_argument('--duration', type=float, default=10., help="how long to poll the fleet (in seconds)")
+    parser.add_argument('--interval', type=float, default=1., help="the polling interval of each device in the fleet (in seconds)")
+    parser.add_argument('--latency', type=float, default=0.02, help="the simulated response latency of the devices (in seconds)")
+    parser.add_argument('--jitter', type=float, default=0.01, help="the maximum random variation in the latency (in seconds)")
+    parser.add_argument('--port', type=int, default=15556, help="the first port to use for the fake ADB servers")
+    args = parser.parse_args()
+
+    raise_open_files_limit()
+    loop = asyncio.get_event_loop()
+    latency = dict(latency_s=args.latency, jitter_s=args.jitter, seed=0)
+    print("{:<36} {:>8} {:>10} {:>10} {:>10}".format("benchmark", "count", "p50 (ms)", "p95 (ms)", "p99 (ms)"))
+
+    # get_properties
+    for device_class in ('androidtv', 'firetv'):
+        server = start_server(['127.0.0.1'], args.port, fixtures=device_class, cache=True, **latency)
+        try:
+            summarize("get_properties ({})".format(device_class), loop.run_until_complete(bench_get_properties(args.port, device_class, args.iterations)))
+        finally:
+            server.terminate()
+            server.join()
+
+    # reconnect
+    tmpdir = tempfile.mkdtemp()
+    try:
+        adbkey = os.path.join(tmpdir, 'adbkey')
+        keygen(adbkey)
+        for name, server_kwargs, key in (("reconnect", {}, ''),
+                                         ("reconnect (auth)", dict(auth=True), adbkey),
+                                         ("reconnect (10% resets)", dict(failure_rate=0.1), '')):
+            server = start_server(['127.0.0.1'], args.port + 1, **dict(latency, **server_kwargs))
+            try:
+                latencies, failures = loop.run_until_complete(bench_reconnect(args.port + 1, key, args.iterations))
+                summarize(name + (" [{} failed]".format(failures) if failures else ""), latencies)
+            finally:
+                server.terminate()
+                server.join()
+    finally:
+        shutil.rmtree(tmpdir)
+
+    # fleet
+    hosts = host_range(args.devices)
+    server = start_server(hosts, args.port + 2, **latency)
+    try:
+        setup_time, stats = loop.run_until_complete(bench_fleet(hosts, args.port + 2, args.duration, args.interval))
+    finally:
+        server.terminate()
+        server.join()
+
+    print()
+    print("Fleet of {} devices: set up in {:.1f} s, {:.1f} polls/s (expected {:.1f}), {} errors, {} timeouts, p99 latency {:.1f} ms".format(
+        args.devices, setup_time, stats['polls_per_s'], args.devices / args.interval, stats['errors'], stats['timeouts'], 1000 * (stats['latency_p99_s'] or 0.)))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,134 @@
+"""Measure the parse time and memory allocations per poll of the property parsing hot path.
+
+The corpora are the recorded device outputs in ``tests/fixtures``, from several Android TV and Fire TV OS versions
+(``androidtv_11`` and ``firetv_7`` have large ``ps -A`` listings).  For each one, the outputs of the
+``get_properties``, ``STREAM_MUSIC``, and running apps commands are generated by running the real commands against
+the recorded output (see :py:func:`tests.fake_adbd.run_fixtures_command`), and then each parser is timed with
+:py:mod:`timeit` and its allocations are measured with :py:mod:`tracemalloc`.
+
+The results can be saved with ``--save`` and compared with saved results with ``--compare``, in which case the exit
+status is 1 if any parser has become more than ``--tolerance`` slower or allocates more than ``--tolerance`` more.
+
+Usage::
+
+    python benchmarks/bench_parsing.py [--fixtures androidtv firetv_7] [--save results.json] [--compare baseline.json] [--tolerance 0.2]
+
+"""
+
+
+import argparse
+import json
+import os
+import sys
+import timeit
+import tracemalloc
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+from aio_androidtv import constants  # noqa: E402 pylint: disable=wrong-import-position
+from aio_androidtv.androidtv import AndroidTV  # noqa: E402 pylint: disable=wrong-import-position
+from aio_androidtv.firetv import FireTV  # noqa: E402 pylint: disable=wrong-import-position
+from tests.fake_adbd import FIXTURES_DIR, run_fixtures_command  # noqa: E402 pylint: disable=wrong-import-position
+
+
+#: The number of times that each measurement is repeated (the fastest one is reported)
+REPEAT = 5
+
+
+def get_cases(fixtures):
+    """Get the parsers to benchmark for one corpus, as ``(name, function)`` pairs; ``get_properties`` parses everything that is needed for one poll."""
+    if fixtures.startswith('firetv'):
+        atv = FireTV('127.0.0.1')
+        running_apps_cmd = constants.CMD_FIRETV_RUNNING_APPS
+    else:
+        atv = AndroidTV('127.0.0.1')
+        running_apps_cmd = constants.CMD_ANDROIDTV_RUNNING_APPS
+
+    properties_output = run_fixtures_command(fixtures, atv._get_properties_cmd(True, False, False))  # pylint: disable=protected-access
+    stream_music_raw = run_fixtures_command(fixtures, constants.CMD_STREAM_MUSIC)
+    running_apps_output = run_fixtures_command(fixtures, running_apps_cmd)
+
+    stream_music = atv._parse_stream_music(stream_music_raw)  # pylint: disable=protected-access
+    audio_output_device = atv._audio_output_device(stream_music)  # pylint: disable=protected-access
+
+    # pylint: disable=protected-access
+    return [('get_properties', lambda: atv._parse_properties(properties_output, True)),
+            ('stream_music', lambda: atv._parse_stream_music(stream_music_raw)),
+            ('audio_output_device', lambda: atv._audio_output_device(stream_music)),
+            ('is_volume_muted', lambda: atv._is_volume_muted(stream_music)),
+            ('volume', lambda: atv._volume(stream_music, audio_output_device)),
+            ('running_apps', lambda: atv._running_apps(running_apps_output))]
+
+
+def measure(func):
+    """Get the time (in microseconds) and the peak memory that is allocated (in bytes) per call of ``func``."""
+    # warm up (e.g., the `re` module's cache of compiled patterns)
+    func()
+
+    timer = timeit.Timer(func)
+    number, _ = timer.autorange()
+    time_us = 1e6 * min(timer.repeat(REPEAT, number)) / number
+
+    tracemalloc.start()
+    try:
+        func()
+        tracemalloc.reset_peak()
+        before = tracemalloc.get_traced_memory()[0]
+        func()
+        peak_bytes = tracemalloc.get_traced_memory()[1] - before
+    finally:
+        tracemalloc.stop()
+
+    return {'time_us': time_us, 'peak_bytes': peak_bytes}
+
+
+def compare(results, baseline, tolerance):
+    """Get the names of the benchmarks whose time or allocations are more than ``tolerance`` worse than ``baseline``."""
+    regressions = []
+    for name, result in sorted(results.items()):
+        if name not in baseline:
+            continue
+        for key in ('time_us', 'peak_bytes'):
+            if result[key] > baseline[name][key] * (1. + tolerance):
+                regressions.append("{} {}: {:.1f} -> {:.1f}".format(name, key, baseline[name][key], result[key]))
+
+    return regressions
+
+
+def main():
+    """Run the benchmarks."""
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--fixtures', nargs='+', default=sorted(os.listdir(FIXTURES_DIR)), help="the corpora in tests/fixtures to use (default is all of them)")
+    parser.add_argument('--save', help="save the results to this JSON file")
+    parser.add_argument('--compare', help="compare the results with those in this JSON file")
+    parser.add_argument('--tolerance', type=float, default=0.2, help="the relative slowdown or allocation increase that counts as a regression")
+    args = parser.parse_args()
+
+    results = {}
+    print("{:<16} {:<20} {:>12} {:>16}".format("corpus", "parser", "time (us)", "peak alloc (B)"))
+    for fixtures in args.fixtures:
+        for name, func in get_cases(fixtures):
+            result = measure(func)
+            results['{}/{}'.format(fixtures, name)] = result
+            print("{:<16} {:<20} {:>12.2f} {:>16}".format(fixtures, name, result['time_us'], result['peak_bytes']))
+        print()
+
+    if args.save:
+        with open(args.save, 'w') as f:
+            json.dump(results, f, indent=2, sort_keys=True)
+
+    if args.compare:
+        with open(args.compare) as f:
+            regressions = compare(results, json.load(f), args.tolerance)
+
+        if regressions:
+            print("Regressions (more than {:.0%} worse):".format(args.tolerance))
+            for regression in regressions:
+                print("  " + regression)
+            sys.exit(1)
+
+        print("No regressions (tolerance {:.0%})".format(args.tolerance))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,80 @@
+"""Compare sending a key sequence one key at a time with :py:meth:`~aio_androidtv.basetv.BaseTV.send_keys`.
+
+The ADB transport is replaced by a fake whose ``shell`` method sleeps for ``--rtt`` seconds per command, which
+simulates the network round-trip, plus ``--spawn-cost`` seconds per ``input`` process that the command starts,
+which simulates the JVM start-up that each ``input`` call costs on the device.
+
+Usage::
+
+    python benchmarks/bench_send_keys.py [--rtt 0.02] [--spawn-cost 0.1] [--keys 10]
+
+"""
+
+
+import argparse
+import asyncio
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+from aio_androidtv import constants  # noqa: E402 pylint: disable=wrong-import-position
+from aio_androidtv.basetv import BaseTV  # noqa: E402 pylint: disable=wrong-import-position
+
+
+class FakeAdbDevice(object):
+    """A fake ``AdbDeviceTcp`` whose shell commands take a simulated amount of time."""
+
+    def __init__(self, rtt, spawn_cost):
+        self.available = True
+        self.rtt = rtt
+        self.spawn_cost = spawn_cost
+        self.commands = 0
+
+    async def shell(self, cmd, *args, **kwargs):
+        """Simulate sending a shell command."""
+        self.commands += 1
+        await asyncio.sleep(self.rtt + self.spawn_cost * cmd.count("input "))
+        return ''
+
+
+async def bench(sw_version, keys, rtt, spawn_cost):
+    """Send ``keys`` one at a time and with ``send_keys`` and return the elapsed times and the number of commands."""
+    btv = BaseTV('127.0.0.1')
+    btv.device_properties = {'sw_version': sw_version}
+    btv._adb._adb = FakeAdbDevice(rtt, spawn_cost)  # pylint: disable=protected-access
+
+    start = time.perf_counter()
+    for key in keys:
+        await btv._key(key)  # pylint: disable=protected-access
+    elapsed_per_key = time.perf_counter() - start
+    commands_per_key = btv._adb._adb.commands  # pylint: disable=protected-access
+
+    btv._adb._adb.commands = 0  # pylint: disable=protected-access
+    start = time.perf_counter()
+    await btv.send_keys(keys)
+    elapsed_batched = time.perf_counter() - start
+
+    return elapsed_per_key, commands_per_key, elapsed_batched, btv._adb._adb.commands  # pylint: disable=protected-access
+
+
+def main():
+    """Run the benchmark for a device that supports multiple key codes per ``input keyevent`` call and one that does not."""
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--rtt', type=float, default=0.02, help="simulated network round-trip time (in seconds)")
+    parser.add_argument('--spawn-cost', type=float, default=0.1, help="simulated cost of starting one `input` process (in seconds)")
+    parser.add_argument('--keys', type=int, default=10, help="the number of keys in the sequence")
+    args = parser.parse_args()
+
+    keys = [constants.KEY_RIGHT] * args.keys
+
+    print("{:<12} {:<10} {:>10} {:>10}".format("sw_version", "mode", "commands", "time (s)"))
+    for sw_version in ('5.1.1', '9'):
+        elapsed_per_key, commands_per_key, elapsed_batched, commands_batched = asyncio.get_event_loop().run_until_complete(bench(sw_version, keys, args.rtt, args.spawn_cost))
+        print("{:<12} {:<10} {:>10} {:>10.3f}".format(sw_version, "per key", commands_per_key, elapsed_per_key))
+        print("{:<12} {:<10} {:>10} {:>10.3f}".format(sw_version, "send_keys", commands_batched, elapsed_batched))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,110 @@
+"""Measure how fleet polling throughput scales with the number of worker processes.
+
+A fake ADB server (:py:mod:`tests.fake_adbd`) runs in its own process and simulates ``--devices`` devices on
+consecutive loopback addresses (this requires Linux, where all of ``127.0.0.0/8`` is routed to the loopback
+interface).  The devices are first polled by a :py:class:`~aio_androidtv.fleet.DeviceFleet` in this process and
+then by a :py:class:`~aio_androidtv.sharding.ShardedFleet` with each of the ``--workers`` counts.
+
+Usage::
+
+    python benchmarks/bench_sharded_fleet.py [--devices 200] [--workers 1 2 4] [--duration 10] [--interval 0.5]
+
+"""
+
+
+import argparse
+import asyncio
+import multiprocessing
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+from aio_androidtv import setup  # noqa: E402 pylint: disable=wrong-import-position
+from aio_androidtv.fleet import DeviceFleet  # noqa: E402 pylint: disable=wrong-import-position
+from aio_androidtv.sharding import ShardedFleet  # noqa: E402 pylint: disable=wrong-import-position
+from tests.fake_adbd import FakeAdbServer, host_range  # noqa: E402 pylint: disable=wrong-import-position
+
+
+def run_server(hosts, port, ready):
+    """Run the fake ADB server (in its own process)."""
+    server = FakeAdbServer(hosts, port)
+    loop = asyncio.new_event_loop()
+    asyncio.set_event_loop(loop)
+    loop.run_until_complete(server.start())
+    ready.set()
+    loop.run_forever()
+
+
+async def bench_single_process(hosts, port, duration, interval):
+    """Poll the devices from this process and return the statistics."""
+    fleet = DeviceFleet(max_concurrency=len(hosts), interval_s=interval, min_host_interval_s=0.)
+    for host in hosts:
+        fleet.add(await setup(host, port, device_class='androidtv'))
+
+    fleet.start()
+    await asyncio.sleep(duration)
+    stats = fleet.stats()
+    await fleet.stop()
+
+    for atv in fleet.devices:
+        await atv.adb_close()
+
+    return stats
+
+
+async def bench_sharded(hosts, port, workers, duration, interval):
+    """Poll the devices from ``workers`` worker processes and return the statistics."""
+    fleet = ShardedFleet(workers=workers, stats_interval_s=duration / 2., max_concurrency=len(hosts), interval_s=interval, min_host_interval_s=0.)
+    for host in hosts:
+        fleet.add(host, port, device_class='androidtv')
+
+    fleet.start()
+
+    # let the workers connect to their devices before measuring
+    await asyncio.sleep(duration / 2.)
+    start = fleet.stats()['polls']
+    await asyncio.sleep(duration)
+    stats = fleet.stats()
+    await fleet.stop()
+
+    stats['polls_per_s'] = (stats['polls'] - start) / duration
+    return stats
+
+
+def main():
+    """Run the benchmark."""
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--devices', type=int, default=200, help="the number of simulated devices")
+    parser.add_argument('--workers', type=int, nargs='+', default=[1, 2, 4], help="the numbers of worker processes to test")
+    parser.add_argument('--duration', type=float, default=10., help="how long to poll for each configuration (in seconds)")
+    parser.add_argument('--interval', type=float, default=0.5, help="the polling interval of each device (in seconds)")
+    parser.add_argument('--port', type=int, default=15555, help="the port of the fake ADB server")
+    args = parser.parse_args()
+
+    hosts = host_range(args.devices)
+    context = multiprocessing.get_context('spawn')
+    ready = context.Event()
+    server = context.Process(target=run_server, args=(hosts, args.port, ready), daemon=True)
+    server.start()
+    ready.wait()
+
+    loop = asyncio.get_event_loop()
+    start = time.perf_counter()
+    print("{:<20} {:>12} {:>14}".format("mode", "polls/s", "p99 latency (s)"))
+    try:
+        stats = loop.run_until_complete(bench_single_process(hosts, args.port, args.duration, args.interval))
+        print("{:<20} {:>12.1f} {:>14.4f}".format("single process", stats['polls_per_s'], stats['latency_p99_s']))
+
+        for workers in args.workers:
+            stats = loop.run_until_complete(bench_sharded(hosts, args.port, workers, args.duration, args.interval))
+            print("{:<20} {:>12.1f} {:>14.4f}".format("{} workers".format(workers), stats['polls_per_s'], stats['latency_p99_s'] or 0.))
+    finally:
+        server.terminate()
+
+    print("Total time: {:.1f} s".format(time.perf_counter() - start))
+
+
+if __name__ == '__main__':
+    main()
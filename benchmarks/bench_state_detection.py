@@ -0,0 +1,68 @@
+"""Measure the per-poll cost of custom state detection for apps with few and many rules.
+
+For each rule set, :py:meth:`~aio_androidtv.basetv.BaseTV._custom_state_detection` is timed with :py:mod:`timeit`
+for the properties of a poll in which the first rule applies, the last rule applies, and no rule applies.
+
+Usage::
+
+    python benchmarks/bench_state_detection.py [--rules 1 10 100]
+
+"""
+
+
+import argparse
+import os
+import sys
+import timeit
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+from aio_androidtv import constants  # noqa: E402 pylint: disable=wrong-import-position
+from aio_androidtv.androidtv import AndroidTV  # noqa: E402 pylint: disable=wrong-import-position
+
+
+#: The app whose rules are evaluated
+APP = 'com.example.app'
+
+#: The number of times that each measurement is repeated (the fastest one is reported)
+REPEAT = 5
+
+
+def make_rules(num_rules):
+    """Make ``num_rules`` rules that each check ``media_session_state`` and ``wake_lock_size``, followed by ``'media_session_state'``."""
+    rules = [{constants.STATE_PAUSED if i % 2 else constants.STATE_PLAYING: {'media_session_state': 3, 'wake_lock_size': i + 10}} for i in range(num_rules)]
+    return {APP: rules + ['media_session_state']}
+
+
+def get_cases(num_rules):
+    """Get the properties for which to time the rules, as ``(name, properties)`` pairs."""
+    return [('first rule', dict(media_session_state=3, wake_lock_size=10, audio_state=constants.STATE_IDLE)),
+            ('last rule', dict(media_session_state=2, wake_lock_size=num_rules + 10, audio_state=constants.STATE_IDLE)),
+            ('no rule', dict(media_session_state=None, wake_lock_size=num_rules + 10, audio_state=constants.STATE_IDLE)),
+            ('other app', dict(media_session_state=3, wake_lock_size=10, audio_state=constants.STATE_IDLE, current_app='com.other.app'))]
+
+
+def measure(func):
+    """Get the time (in microseconds) per call of ``func``."""
+    timer = timeit.Timer(func)
+    number, _ = timer.autorange()
+    return 1e6 * min(timer.repeat(REPEAT, number)) / number
+
+
+def main():
+    """Run the benchmark."""
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--rules', type=int, nargs='+', default=[1, 10, 100], help="the numbers of rules for the app")
+    args = parser.parse_args()
+
+    atv = AndroidTV('127.0.0.1')
+    print("{:<8} {:<12} {:>12}".format("rules", "case", "time (us)"))
+    for num_rules in args.rules:
+        atv._state_detection_rules = make_rules(num_rules)  # pylint: disable=protected-access
+        for name, properties in get_cases(num_rules):
+            kwargs = dict({'current_app': APP}, **properties)
+            print("{:<8} {:<12} {:>12.3f}".format(num_rules, name, measure(lambda: atv._custom_state_detection(**kwargs))))  # pylint: disable=protected-access,cell-var-from-loop
+
+
+if __name__ == '__main__':
+    main()
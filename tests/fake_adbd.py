@@ -0,0 +1,745 @@
+"""A fake device that speaks the ADB TCP protocol on localhost.
+
+* :py:class:`FakeAdbServer` accepts ADB connections and answers shell commands.
+* :py:func:`host_range` gets consecutive loopback addresses for simulating many devices.
+* :py:func:`run_fixtures_command` runs a device command against recorded output, without a server.
+
+Each host in ``hosts`` is a simulated device; on Linux, any address in ``127.0.0.0/8`` can be used, so a single
+server can simulate many devices on the same port.
+
+Shell commands are answered in one of two ways:
+
+* With canned ``responses`` (the default), which is cheap enough to simulate thousands of devices.
+* With ``fixtures``: the command is run by a local shell in which ``dumpsys``, ``getprop``, ``ip``, and ``ps`` are
+  replaced by scripts that print the files that were recorded from a real device (see ``tests/fixtures``).  The
+  real command pipelines are used, so the output is what the device would send, and interactive streams (e.g., a
+  :py:class:`~aio_androidtv.adb_manager.ShellSession`) work too.
+
+The server can require RSA authentication, and it can simulate slow or unreliable devices with ``latency_s``,
+``jitter_s``, ``bandwidth_bps``, and ``failure_rate``.
+
+Usage::
+
+    python -m tests.fake_adbd [--hosts 16] [--port 5555] [--fixtures androidtv] [--auth] [--latency 0.05]
+
+"""
+
+
+import argparse
+import asyncio
+import base64
+import itertools
+import logging
+import os
+import random
+import shutil
+import struct
+import subprocess
+import tempfile
+
+from aio_adb_shell import constants as adb_constants
+from aio_adb_shell.adb_message import AdbMessage, checksum
+
+_LOGGER = logging.getLogger(__name__)
+
+
+#: The default banner that is sent in response to ``CNXN``
+DEFAULT_BANNER = b'device::ro.product.name=fake;ro.product.model=Fake TV;ro.product.device=fake;\0'
+
+#: The output of the ``get_device_properties`` command
+DEVICE_PROPERTIES_OUTPUT = """NVIDIA
+SHIELD Android TV
+0123456789
+9
+    link/ether ab:cd:ef:gh:ij:kl brd ff:ff:ff:ff:ff:ff
+Device "eth0" does not exist.
+"""
+
+#: The output of the ``get_properties`` command
+PROPERTIES_OUTPUT = """110Wake Locks: size=2
+com.amazon.tv.launcher
+
+- STREAM_MUSIC:
+   Muted: false
+   Min: 0
+   Max: 60
+   Current: 2 (speaker): 20, 40000 (hmdi_arc): 22, 40000000 (default): 15
+   Devices: hmdi_arc
+- STREAM_ALARM:
+   Muted: false
+   Min: 0
+   Max: 7
+   Current: 2 (speaker): 3, 40000 (hmdi_arc): 3, 40000000 (default): 2
+   Devices: speaker
+u0_a18    316   197   1189204 115000 ffffffff 00000000 S com.amazon.tv.launcher
+"""
+
+#: The default responses to shell commands: the first response whose key is contained in the command is sent
+DEFAULT_RESPONSES = (('getprop ro.product.manufacturer', DEVICE_PROPERTIES_OUTPUT),
+                     ('dumpsys power', PROPERTIES_OUTPUT))
+
+#: The directory that contains the recorded output of each simulated device (e.g., ``fixtures/androidtv``)
+FIXTURES_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'fixtures')
+
+#: The scripts that replace device commands in fixtures mode; they read the files in ``$FAKE_ADBD_FIXTURES``
+SHIMS = {'dumpsys': 'cat "$FAKE_ADBD_FIXTURES/dumpsys_$(echo "$*" | tr \' \' _).txt" 2>/dev/null\n',
+         'getprop': 'if [ -z "$1" ]; then cat "$FAKE_ADBD_FIXTURES/getprop.txt"; else sed -n "s/^\\[$1\\]: \\[\\(.*\\)\\]$/\\1/p" "$FAKE_ADBD_FIXTURES/getprop.txt"; fi\n',
+         'ip': 'if [ -f "$FAKE_ADBD_FIXTURES/ip_addr_$3.txt" ]; then cat "$FAKE_ADBD_FIXTURES/ip_addr_$3.txt"; else echo "Device \\"$3\\" does not exist." >&2; exit 1; fi\n',
+         'ps': 'cat "$FAKE_ADBD_FIXTURES/ps.txt"\n',
+         'am': 'exit 0\n',
+         'input': 'exit 0\n',
+         'monkey': 'exit 0\n'}
+
+#: The shells that can run commands in fixtures mode, in order of preference; like Android's ``mksh``, they must support ``echo -e`` and interpret escapes in ``echo '1\\c'``
+SHELLS = (('mksh',), ('bash', '-O', 'xpg_echo'))
+
+#: Failure mode: abort the TCP connection
+FAILURE_RESET = 'reset'
+
+#: Failure mode: open the stream, but close it without sending any output
+FAILURE_CLOSE = 'close'
+
+#: Failure mode: never respond to the ``OPEN`` message
+FAILURE_STALL = 'stall'
+
+#: The ``DigestInfo`` prefix of a PKCS #1 v1.5 SHA-1 signature, which is followed by the signed token
+SHA1_DIGEST_INFO = bytes.fromhex('3021300906052b0e03021a05000414')
+
+#: The length (in bytes) of the token that is sent in an ``AUTH`` message
+AUTH_TOKEN_SIZE = 20
+
+
+def host_range(count, first='127.0.0.1'):
+    """Get ``count`` consecutive IPv4 addresses, starting with ``first``.
+
+    Parameters
+    ----------
+    count : int
+        The number of addresses
+    first : str
+        The first address
+
+    Returns
+    -------
+    list
+        The addresses
+
+    """
+    start = struct.unpack('!I', bytes(int(octet) for octet in first.split('.')))[0]
+    return ['.'.join(str(octet) for octet in struct.pack('!I', start + i)) for i in range(count)]
+
+
+def fixtures_path(fixtures):
+    """Get the directory of a set of recorded device output.
+
+    Parameters
+    ----------
+    fixtures : str
+        The name of a directory in :py:const:`FIXTURES_DIR` (e.g., ``'androidtv'``) or the path to a directory
+
+    Returns
+    -------
+    str
+        The path to the directory
+
+    """
+    return fixtures if os.path.isdir(fixtures) else os.path.join(FIXTURES_DIR, fixtures)
+
+
+def find_shell():
+    """Find a shell that can run device commands.
+
+    Returns
+    -------
+    list, None
+        The command line of the first shell in :py:const:`SHELLS` that is installed, or ``None`` if none of them are installed
+
+    """
+    return next(([shutil.which(shell[0])] + list(shell[1:]) for shell in SHELLS if shutil.which(shell[0])), None)
+
+
+def make_shims():
+    """Write the :py:const:`SHIMS` to a temporary directory, which the caller must remove.
+
+    Returns
+    -------
+    str
+        The directory
+
+    """
+    bindir = tempfile.mkdtemp(prefix='fake_adbd_')
+    for name, script in SHIMS.items():
+        path = os.path.join(bindir, name)
+        with open(path, 'w') as f:
+            f.write('#!/bin/sh\n' + script)
+        os.chmod(path, 0o755)
+
+    return bindir
+
+
+def shims_env(bindir, fixtures):
+    """Get the environment in which device commands are run against recorded output.
+
+    Parameters
+    ----------
+    bindir : str
+        The directory that contains the :py:const:`SHIMS`
+    fixtures : str
+        The directory of recorded output
+
+    Returns
+    -------
+    dict
+        The environment variables
+
+    """
+    return dict(os.environ, PATH=bindir + os.pathsep + os.environ.get('PATH', ''), FAKE_ADBD_FIXTURES=fixtures)
+
+
+def run_fixtures_command(fixtures, cmd):
+    """Run a device command against recorded output, as in fixtures mode, without a server.
+
+    Parameters
+    ----------
+    fixtures : str
+        The name of a directory in :py:const:`FIXTURES_DIR` (e.g., ``'androidtv'``) or the path to a directory
+    cmd : str
+        The shell command
+
+    Returns
+    -------
+    str
+        The output of the command, including anything that it wrote to standard error (as the ADB shell service does)
+
+    Raises
+    ------
+    RuntimeError
+        None of the :py:const:`SHELLS` are installed
+
+    """
+    shell = find_shell()
+    if not shell:
+        raise RuntimeError("Running device commands requires one of these shells: {}".format(", ".join(shell[0] for shell in SHELLS)))
+
+    bindir = make_shims()
+    try:
+        return subprocess.run(shell + ['-c', cmd], stdin=subprocess.DEVNULL, stdout=subprocess.PIPE, stderr=subprocess.STDOUT, env=shims_env(bindir, fixtures_path(fixtures)), check=False).stdout.decode('utf-8')
+    finally:
+        shutil.rmtree(bindir, ignore_errors=True)
+
+
+def parse_public_key(pubkey):
+    """Get the modulus and exponent of a public key in the format that ADB uses (i.e., the contents of ``adbkey.pub``).
+
+    Parameters
+    ----------
+    pubkey : bytes
+        The base64-encoded key, optionally followed by a space and a comment
+
+    Returns
+    -------
+    modulus : int
+        The RSA modulus
+    exponent : int
+        The RSA public exponent
+
+    """
+    data = base64.b64decode(pubkey.rstrip(b'\0').split()[0])
+
+    # struct {uint32 len; uint32 n0inv; uint32 n[len]; uint32 rr[len]; uint32 exponent;}, in little endian
+    words = struct.unpack('<I', data[:4])[0]
+    modulus = int.from_bytes(data[8:8 + 4 * words], 'little')
+    exponent = struct.unpack('<I', data[8 + 8 * words:12 + 8 * words])[0]
+    return modulus, exponent
+
+
+def verify_signature(pubkey, token, signature):
+    """Check that ``signature`` is the signature of ``token`` by the private key of ``pubkey``.
+
+    ADB signs the token as if it were a SHA-1 digest, so the signature is verified without hashing the token.
+
+    Parameters
+    ----------
+    pubkey : bytes
+        The public key, in the format of ``adbkey.pub``
+    token : bytes
+        The token that was sent to the client
+    signature : bytes
+        The signature that the client sent
+
+    Returns
+    -------
+    bool
+        Whether or not the signature is valid
+
+    """
+    modulus, exponent = parse_public_key(pubkey)
+    size = (modulus.bit_length() + 7) // 8
+    signed = int.from_bytes(signature, 'big')
+    if signed >= modulus:
+        return False
+
+    padded = pow(signed, exponent, modulus).to_bytes(size, 'big')
+    suffix = b'\0' + SHA1_DIGEST_INFO + token
+    return padded.startswith(b'\0\1') and padded.endswith(suffix) and padded[2:-len(suffix)] == b'\xff' * (size - 2 - len(suffix))
+
+
+class _Stream(object):
+    """The server's side of an ADB stream.
+
+    Parameters
+    ----------
+    local_id : int
+        The server's ID for the stream
+    remote_id : int
+        The client's ID for the stream
+
+    """
+    def __init__(self, local_id, remote_id):
+        self.local_id = local_id
+        self.remote_id = remote_id
+
+        #: A queue to which ``None`` is put when the client acknowledges a ``WRTE`` message
+        self.acks = asyncio.Queue()
+
+        #: A queue of the data that the client writes to the stream
+        self.input = asyncio.Queue()
+
+        #: The task that serves the stream
+        self.task = None
+
+
+class FakeAdbServer(object):
+    """An asyncio server that simulates devices which accept ADB connections.
+
+    Parameters
+    ----------
+    hosts : list
+        The addresses on which to listen; each one is a simulated device
+    port : int
+        The port on which to listen, or 0 to pick a free port
+    responses : tuple, None
+        ``(substring, output)`` pairs: a shell command is answered with the output of the first pair whose substring is in the command (default is :py:const:`DEFAULT_RESPONSES`)
+    banner : bytes
+        The banner that is sent in response to ``CNXN``
+    fixtures : str, None
+        The name of a directory in :py:const:`FIXTURES_DIR` (e.g., ``'androidtv'``) or the path to a directory of recorded output; if provided, shell commands are run by a local shell instead of being answered with ``responses``
+    cache : bool
+        In fixtures mode, whether to run each distinct command only once and then send its cached output
+    auth : bool
+        Whether clients must authenticate with an RSA key
+    authorized_keys : list, None
+        The public keys (in the format of ``adbkey.pub``) that are accepted when ``auth`` is true
+    accept_new_keys : bool
+        Whether a public key that a client sends is added to ``authorized_keys`` (as if the user had accepted the prompt on the device); if false, the client gets no response
+    latency_s : float
+        How long the device takes to respond to ``CNXN`` and ``OPEN`` messages
+    jitter_s : float
+        The maximum random amount that is added to or subtracted from ``latency_s``
+    bandwidth_bps : int, None
+        The rate (in bytes per second) at which the output of each command is sent, or ``None`` for no limit
+    failure_rate : float
+        The probability that a shell command fails in one of the ``failure_modes``
+    failure_modes : tuple
+        The ways in which a shell command can fail: :py:const:`FAILURE_RESET`, :py:const:`FAILURE_CLOSE`, and/or :py:const:`FAILURE_STALL`
+    seed : int, None
+        The seed for the random numbers that are used for jitter and failure injection
+
+    """
+    def __init__(self, hosts=('127.0.0.1',), port=0, responses=None, banner=DEFAULT_BANNER, fixtures=None, cache=False, auth=False, authorized_keys=None, accept_new_keys=True,
+                 latency_s=0., jitter_s=0., bandwidth_bps=None, failure_rate=0., failure_modes=(FAILURE_RESET,), seed=None):  # pylint: disable=too-many-arguments
+        self.hosts = list(hosts)
+        self.port = port
+        self.responses = responses if responses is not None else DEFAULT_RESPONSES
+        self.banner = banner
+        self.fixtures = fixtures_path(fixtures) if fixtures else None
+        self.cache = cache
+        self.auth = auth
+        self.authorized_keys = set(key.strip() for key in authorized_keys or ())
+        self.accept_new_keys = accept_new_keys
+        self.latency_s = latency_s
+        self.jitter_s = jitter_s
+        self.bandwidth_bps = bandwidth_bps
+        self.failure_rate = failure_rate
+        self.failure_modes = failure_modes
+
+        #: The number of connections, authenticated connections, shell commands, and injected failures that have been handled
+        self.connections = 0
+        self.authentications = 0
+        self.commands = 0
+        self.failures = 0
+
+        self._servers = []
+
+        # the task that handles each open connection, keyed by its writer
+        self._connections = {}
+        self._local_ids = itertools.count(1)
+        self._random = random.Random(seed)
+        self._outputs = {}
+
+        # the directory of the fake device commands and the shell that runs commands in fixtures mode
+        self._bindir = None
+        self._shell = None
+
+    async def start(self):
+        """Start listening on all of the ``hosts``.
+
+        Returns
+        -------
+        int
+            The port on which the server listens
+
+        """
+        if self.fixtures:
+            self._shell = find_shell()
+            if not self._shell:
+                raise RuntimeError("Fixtures mode requires one of these shells: {}".format(", ".join(shell[0] for shell in SHELLS)))
+            self._bindir = make_shims()
+
+        for host in self.hosts:
+            server = await asyncio.start_server(self._handle_connection, host, self.port)
+            self._servers.append(server)
+            if not self.port:
+                self.port = server.sockets[0].getsockname()[1]
+
+        return self.port
+
+    async def close(self):
+        """Stop listening and close all connections.
+
+        """
+        for server in self._servers:
+            server.close()
+
+        tasks = list(self._connections.values())
+        self.drop_connections()
+        await asyncio.gather(*tasks, return_exceptions=True)
+
+        for server in self._servers:
+            await server.wait_closed()
+        self._servers = []
+
+        if self._bindir:
+            shutil.rmtree(self._bindir, ignore_errors=True)
+            self._bindir = None
+
+    def drop_connections(self):
+        """Abort all of the open connections, as if the devices had dropped off the network.
+
+        Returns
+        -------
+        int
+            The number of connections that were aborted
+
+        """
+        writers = list(self._connections)
+        for writer in writers:
+            writer.transport.abort()
+
+        return len(writers)
+
+    def respond(self, cmd):
+        """Get the canned output of a shell command.
+
+        Parameters
+        ----------
+        cmd : str
+            The shell command
+
+        Returns
+        -------
+        str
+            The output
+
+        """
+        for substring, output in self.responses:
+            if substring in cmd:
+                return output
+
+        return ''
+
+    # ======================================================================= #
+    #                                                                         #
+    #                                Protocol                                 #
+    #                                                                         #
+    # ======================================================================= #
+    @staticmethod
+    async def _read_message(reader):
+        """Read a message from the client.
+
+        Parameters
+        ----------
+        reader : asyncio.StreamReader
+            The stream from the client
+
+        Returns
+        -------
+        command : bytes
+            The command (e.g., ``b'OPEN'``)
+        arg0 : int
+            The first argument
+        arg1 : int
+            The second argument
+        data : bytes
+            The data
+
+        """
+        cmd, arg0, arg1, data_length, _, _ = struct.unpack(adb_constants.MESSAGE_FORMAT, await reader.readexactly(adb_constants.MESSAGE_SIZE))
+        data = await reader.readexactly(data_length) if data_length else b''
+        return adb_constants.WIRE_TO_ID[cmd], arg0, arg1, data
+
+    @staticmethod
+    def _write_message(writer, command, arg0, arg1, data=b''):
+        """Send a message to the client.
+
+        Parameters
+        ----------
+        writer : asyncio.StreamWriter
+            The stream to the client
+        command : bytes
+            The command (e.g., ``b'WRTE'``)
+        arg0 : int
+            The first argument
+        arg1 : int
+            The second argument
+        data : bytes
+            The data
+
+        """
+        msg = AdbMessage(command, arg0, arg1, data)
+        writer.write(struct.pack(adb_constants.MESSAGE_FORMAT, msg.command, arg0, arg1, len(data), checksum(data), msg.magic) + data)
+
+    async def _handle_connection(self, reader, writer):
+        """Handle one ADB connection until the client closes it.
+
+        Messages for a stream (``OKAY``, ``WRTE``, and ``CLSE``) are routed to the task that serves it.
+
+        Parameters
+        ----------
+        reader : asyncio.StreamReader
+            The stream from the client
+        writer : asyncio.StreamWriter
+            The stream to the client
+
+        """
+        self.connections += 1
+        self._connections[writer] = asyncio.current_task()
+        streams = {}
+        token = None
+        connected = False
+
+        try:
+            while True:
+                command, arg0, arg1, data = await self._read_message(reader)
+
+                if command == adb_constants.CNXN:
+                    await self._delay()
+                    if self.auth:
+                        token = os.urandom(AUTH_TOKEN_SIZE)
+                        self._write_message(writer, adb_constants.AUTH, adb_constants.AUTH_TOKEN, 0, token)
+                    else:
+                        connected = True
+                        self._write_message(writer, adb_constants.CNXN, adb_constants.VERSION, adb_constants.MAX_ADB_DATA, self.banner)
+
+                elif command == adb_constants.AUTH and token is not None:
+                    if arg0 == adb_constants.AUTH_SIGNATURE:
+                        if any(verify_signature(key, token, data) for key in self.authorized_keys):
+                            token = None
+                            connected = True
+                            self.authentications += 1
+                            self._write_message(writer, adb_constants.CNXN, adb_constants.VERSION, adb_constants.MAX_ADB_DATA, self.banner)
+                        else:
+                            # ask for another signature, after which the client sends its public key
+                            token = os.urandom(AUTH_TOKEN_SIZE)
+                            self._write_message(writer, adb_constants.AUTH, adb_constants.AUTH_TOKEN, 0, token)
+
+                    elif arg0 == adb_constants.AUTH_RSAPUBLICKEY and self.accept_new_keys:
+                        self.authorized_keys.add(data.rstrip(b'\0').strip())
+                        token = None
+                        connected = True
+                        self.authentications += 1
+                        self._write_message(writer, adb_constants.CNXN, adb_constants.VERSION, adb_constants.MAX_ADB_DATA, self.banner)
+
+                elif command == adb_constants.OPEN and connected:
+                    stream = _Stream(next(self._local_ids), arg0)
+                    streams[stream.local_id] = stream
+                    stream.task = asyncio.ensure_future(self._serve_stream(writer, stream, data.rstrip(b'\0').decode('utf-8')))
+                    stream.task.add_done_callback(lambda _, local_id=stream.local_id: streams.pop(local_id, None))
+
+                elif command == adb_constants.OKAY and arg1 in streams:
+                    streams[arg1].acks.put_nowait(None)
+
+                elif command == adb_constants.WRTE and arg1 in streams:
+                    self._write_message(writer, adb_constants.OKAY, arg1, arg0)
+                    streams[arg1].input.put_nowait(data)
+
+                elif command == adb_constants.CLSE and arg1 in streams:
+                    streams.pop(arg1).task.cancel()
+
+                await writer.drain()
+
+        except (asyncio.IncompleteReadError, ConnectionError):
+            pass
+
+        finally:
+            for stream in list(streams.values()):
+                stream.task.cancel()
+            self._connections.pop(writer, None)
+            writer.close()
+
+    async def _serve_stream(self, writer, stream, destination):
+        """Run a shell command and send its output in a stream, and then close the stream.
+
+        Parameters
+        ----------
+        writer : asyncio.StreamWriter
+            The stream to the client
+        stream : _Stream
+            The stream
+        destination : str
+            The service and command (e.g., ``'shell:getprop'``)
+
+        """
+        service, _, cmd = destination.partition(':')
+        if service != 'shell':
+            self._write_message(writer, adb_constants.CLSE, 0, stream.remote_id)
+            return
+
+        self.commands += 1
+        failure = self._random.choice(self.failure_modes) if self.failure_modes and self._random.random() < self.failure_rate else None
+        if failure:
+            self.failures += 1
+            _LOGGER.debug("Injecting a '%s' failure into command '%s'", failure, cmd)
+            if failure == FAILURE_RESET:
+                writer.transport.abort()
+                return
+            if failure == FAILURE_STALL:
+                await asyncio.Event().wait()
+
+        try:
+            await self._delay()
+            self._write_message(writer, adb_constants.OKAY, stream.local_id, stream.remote_id)
+
+            if failure == FAILURE_CLOSE:
+                pass
+            elif not self.fixtures:
+                await self._send(writer, stream, self.respond(cmd).encode('utf-8'))
+            elif self.cache and cmd and cmd in self._outputs:
+                await self._send(writer, stream, self._outputs[cmd])
+            else:
+                await self._run(writer, stream, cmd)
+
+            self._write_message(writer, adb_constants.CLSE, stream.local_id, stream.remote_id)
+            await writer.drain()
+
+        except ConnectionError:
+            pass
+
+    async def _send(self, writer, stream, data):
+        """Send data in a stream, waiting for the client to acknowledge each packet.
+
+        Parameters
+        ----------
+        writer : asyncio.StreamWriter
+            The stream to the client
+        stream : _Stream
+            The stream
+        data : bytes
+            The data
+
+        """
+        for i in range(0, len(data), adb_constants.MAX_ADB_DATA):
+            chunk = data[i:i + adb_constants.MAX_ADB_DATA]
+            if self.bandwidth_bps:
+                await asyncio.sleep(len(chunk) / self.bandwidth_bps)
+
+            self._write_message(writer, adb_constants.WRTE, stream.local_id, stream.remote_id, chunk)
+            await writer.drain()
+            await stream.acks.get()
+
+    async def _run(self, writer, stream, cmd):
+        """Run a shell command in fixtures mode, forwarding the data that the client writes to its standard input and sending its output.
+
+        Parameters
+        ----------
+        writer : asyncio.StreamWriter
+            The stream to the client
+        stream : _Stream
+            The stream
+        cmd : str
+            The shell command; if it is empty, an interactive shell is started
+
+        """
+        args = self._shell + ['-c', cmd] if cmd else self._shell
+        process = await asyncio.create_subprocess_exec(*args, stdin=asyncio.subprocess.PIPE, stdout=asyncio.subprocess.PIPE, stderr=asyncio.subprocess.STDOUT, env=shims_env(self._bindir, self.fixtures))
+
+        async def feed():
+            while True:
+                process.stdin.write(await stream.input.get())
+                await process.stdin.drain()
+
+        feeder = asyncio.ensure_future(feed())
+        output = b''
+        try:
+            while True:
+                data = await process.stdout.read(adb_constants.MAX_ADB_DATA)
+                if not data:
+                    break
+                output += data
+                await self._send(writer, stream, data)
+
+            await process.wait()
+            if self.cache and cmd:
+                self._outputs[cmd] = output
+
+        finally:
+            feeder.cancel()
+            if process.returncode is None:
+                process.kill()
+                await process.wait()
+
+    # ======================================================================= #
+    #                                                                         #
+    #                                 Helpers                                 #
+    #                                                                         #
+    # ======================================================================= #
+    async def _delay(self):
+        """Wait for ``latency_s``, plus or minus a random amount up to ``jitter_s``.
+
+        """
+        delay = self.latency_s + (self._random.uniform(-self.jitter_s, self.jitter_s) if self.jitter_s else 0.)
+        if delay > 0:
+            await asyncio.sleep(delay)
+
+
+def main():
+    """Run a fake ADB server until it is interrupted."""
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--hosts', type=int, default=1, help="the number of simulated devices, listening on consecutive addresses starting at 127.0.0.1")
+    parser.add_argument('--port', type=int, default=5555, help="the port on which to listen")
+    parser.add_argument('--fixtures', help="run commands against the recorded output in this directory of tests/fixtures (e.g., 'androidtv' or 'firetv')")
+    parser.add_argument('--cache', action='store_true', help="in fixtures mode, run each distinct command only once")
+    parser.add_argument('--auth', action='store_true', help="require RSA authentication (any public key is accepted)")
+    parser.add_argument('--latency', type=float, default=0., help="the response latency (in seconds)")
+    parser.add_argument('--jitter', type=float, default=0., help="the maximum random variation in the latency (in seconds)")
+    parser.add_argument('--bandwidth', type=int, default=None, help="the rate at which output is sent (in bytes per second)")
+    parser.add_argument('--failure-rate', type=float, default=0., help="the probability that a shell command fails")
+    parser.add_argument('--failure-modes', nargs='+', default=[FAILURE_RESET], choices=[FAILURE_RESET, FAILURE_CLOSE, FAILURE_STALL], help="the ways in which shell commands fail")
+    args = parser.parse_args()
+
+    server = FakeAdbServer(host_range(args.hosts), args.port, fixtures=args.fixtures, cache=args.cache, auth=args.auth, latency_s=args.latency, jitter_s=args.jitter,
+                           bandwidth_bps=args.bandwidth, failure_rate=args.failure_rate, failure_modes=tuple(args.failure_modes))
+    loop = asyncio.get_event_loop()
+    loop.run_until_complete(server.start())
+    print("Listening on port {} of {} addresses".format(server.port, args.hosts))
+
+    try:
+        loop.run_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        loop.run_until_complete(server.close())
+
+
+if __name__ == '__main__':
+    main()
@@ -1,7 +1,10 @@
 """Define patches used for androidtv tests."""
 
+import re
 from unittest.mock import patch
 
+from aio_adb_shell import constants as adb_constants
+
 try:
     from unittest.mock import AsyncMock
 except ImportError:
@@ -14,6 +17,9 @@ except ImportError:
 
 KEY_PYTHON = "python"
 
+# The framing that `aio_androidtv.adb_manager.ShellSession` uses to send a command
+SHELL_SESSION_CMD = re.compile(r"echo '(.*?)''(.*?)'; \{ (.*)\n\} </dev/null; echo -n '(.*?)''(.*?)'\n", re.DOTALL)
+
 
 class AdbDeviceTcpFake(object):
     """A fake of the `aio_adb_shell.adb_device.AdbDeviceTcp` class."""
@@ -22,6 +28,12 @@ class AdbDeviceTcpFake(object):
         """Initialize a fake `adb_shell.adb_device.AdbDeviceTcp` instance."""
         self.available = False
 
+        # the state of the fake persistent shell session
+        self.session_input = b''
+        self.session_packets = []
+        self.session_closed = []
+        self.session_opened = 0
+
     async def close(self):
         """Close the socket connection."""
         self.available = False
@@ -40,6 +52,41 @@ class AdbDeviceTcpFake(object):
         """Send an ADB shell command."""
         return None
 
+    async def _open(self, destination, adb_info):
+        """Open a stream for a persistent shell session."""
+        adb_info.local_id = 1
+        adb_info.remote_id = 1
+        self.session_input = b''
+        self.session_packets = []
+        self.session_opened += 1
+
+    async def _send(self, msg, adb_info):
+        """Send a packet on the persistent shell session; the commands that it contains are run via `shell`."""
+        command = adb_constants.WIRE_TO_ID[msg.command]
+        if command == adb_constants.CLSE:
+            self.session_closed.append(adb_info.local_id)
+            return
+
+        if command != adb_constants.WRTE:
+            return
+
+        self.session_packets.append((adb_constants.OKAY, b''))
+        self.session_input += msg.data
+        match = SHELL_SESSION_CMD.match(self.session_input.decode('utf8'))
+        if match:
+            self.session_input = b''
+            begin1, begin2, cmd, end1, end2 = match.groups()
+            output = await self.shell(cmd) or ''
+            self.session_packets.append((adb_constants.WRTE, "{}{}\n{}{}{}".format(begin1, begin2, output, end1, end2).encode('utf8')))
+
+    async def _read(self, expected_cmds, adb_info, *args, **kwargs):
+        """Read a packet from the persistent shell session; the session is closed if there are no more packets."""
+        if not self.session_packets:
+            return adb_constants.CLSE, 1, 1, b''
+
+        command, data = self.session_packets.pop(0)
+        return command, 1, 1, data
+
 
 def patch_connect(success):
     """Mock the `adb_shell.adb_device.AdbDeviceTcp` class."""
@@ -1,13 +1,21 @@
 import asyncio
 from contextlib import contextmanager
+import os
+import shutil
 import sys
+import tempfile
 import unittest
-from unittest.mock import patch
+from unittest.mock import Mock, patch
 
 sys.path.insert(0, '..')
 
-from aio_androidtv.adb_manager import _acquire, ADBPython
-from aio_androidtv.exceptions import LockNotAcquiredException
+from aio_adb_shell.auth.keygen import keygen
+from aio_adb_shell.exceptions import InvalidCommandError, TcpTimeoutException
+
+from aio_androidtv.adb_manager import _acquire, ADBPython, KeyStore
+from aio_androidtv.exceptions import CommandTimeoutException, LockNotAcquiredException
+from aio_androidtv.supervisor import STATE_CLOSED
+from aio_androidtv.scheduler import PRIORITY_INTERACTIVE, PRIORITY_POLLING
 
 from . import patchers
 from .async_wrapper import awaiter
@@ -53,7 +61,7 @@ class AsyncFakeLock:
     def __init__(self):
         self._acquired = True
 
-    async def acquire(self):
+    async def acquire(self, *args):
         if self._acquired:
             self._acquired = False
             return True
@@ -69,9 +77,9 @@ class AsyncLockedLock(AsyncFakeLock):
 
 
 class AsyncTimedLock(AsyncFakeLock):
-    async def acquire(self):
+    async def acquire(self, *args):
         await asyncio.sleep(1.0)
-        return await super().acquire()
+        return await super().acquire(*args)
 
 
 class TestLock(unittest.TestCase):
@@ -224,6 +232,80 @@ class TestADBPython(unittest.TestCase):
 
                 release.assert_not_called()
 
+    @awaiter
+    async def test_adb_shell_priority(self):
+        """Test that a waiting interactive command is sent before a waiting polling command.
+
+        """
+        sent = []
+
+        async def shell(self, cmd, *args, **kwargs):
+            sent.append(cmd)
+            return cmd
+
+        with patchers.patch_connect(True)[self.PATCH_KEY], patch("{}.AdbDeviceTcpFake.shell".format(patchers.__name__), shell):
+            self.assertTrue(await self.adb.connect())
+            async with self.adb._adb_lock:
+                polling = asyncio.ensure_future(self.adb.shell("POLLING", priority=PRIORITY_POLLING))
+                interactive = asyncio.ensure_future(self.adb.shell("INTERACTIVE", priority=PRIORITY_INTERACTIVE))
+                await asyncio.sleep(0.01)
+                self.assertEqual(self.adb.command_stats()['polling']['queued'], 1)
+                self.assertEqual(self.adb.command_stats()['interactive']['queued'], 1)
+
+            self.assertEqual(await asyncio.gather(polling, interactive), ["POLLING", "INTERACTIVE"])
+            self.assertEqual(sent, ["INTERACTIVE", "POLLING"])
+
+    @awaiter
+    async def test_adb_streaming_shell(self):
+        """Test that the output of a streaming command is yielded as it arrives.
+
+        """
+        async def streaming_shell(self, cmd, *args, **kwargs):
+            for data in (b'I/ActivityManager( 812): Disp', b'layed com.netflix.ninja/.MainActivity\n'):
+                yield data
+
+        with patch("{}.AdbDeviceTcpFake.streaming_shell".format(patchers.__name__), streaming_shell, create=True):
+            self.assertEqual([data async for data in self.adb.streaming_shell("logcat")], [])
+
+            with patchers.patch_connect(True)[self.PATCH_KEY]:
+                self.assertTrue(await self.adb.connect())
+
+            self.assertEqual(b''.join([data async for data in self.adb.streaming_shell("logcat")]), b'I/ActivityManager( 812): Displayed com.netflix.ninja/.MainActivity\n')
+            self.assertFalse(self.adb._adb_lock.locked())
+
+    @awaiter
+    async def test_adb_shell_total_timeout(self):
+        """Test that a command that runs out of its total time raises a `CommandTimeoutException` and that its stream is closed.
+
+        """
+        with patchers.patch_connect(True)[self.PATCH_KEY], patchers.patch_shell("TEST")[self.PATCH_KEY]:
+            self.assertTrue(await self.adb.connect())
+
+        supervisor = Mock(state=STATE_CLOSED)
+        timeout = InvalidCommandError("Never got one of the expected responses ([b'CLSE', b'WRTE'])", 0, (1., 1.))
+        with patch.object(self.adb, '_supervisor', supervisor), patch.object(self.adb, '_close_abandoned_stream', new_callable=patchers.AsyncMock) as close_abandoned_stream:
+            with patch.object(self.adb._adb, 'shell', side_effect=timeout, new_callable=patchers.AsyncMock):
+                with self.assertRaises(TcpTimeoutException):
+                    await self.adb.shell("TEST")
+
+            # the stream is closed in the background before the lock is released
+            self.assertTrue(self.adb._abandoned_stream)
+            await asyncio.sleep(0.01)
+            close_abandoned_stream.assert_called_once()
+            self.assertFalse(self.adb._adb_lock.locked())
+            supervisor.trip.assert_not_called()
+
+            # a packet with an unknown command is not a timeout
+            self.adb._abandoned_stream = False
+            with patch.object(self.adb._adb, 'shell', side_effect=InvalidCommandError('Unknown command: 1234', 1234, (0, 0)), new_callable=patchers.AsyncMock):
+                with self.assertRaises(InvalidCommandError):
+                    await self.adb.shell("TEST")
+
+            self.assertFalse(self.adb._abandoned_stream)
+            supervisor.trip.assert_called_once()
+
+        self.assertTrue(issubclass(CommandTimeoutException, TcpTimeoutException))
+
     @awaiter
     async def test_adb_push_fail(self):
         """Test when an ADB push command is not executed because the device is unavailable.
@@ -357,6 +439,55 @@ class TestADBPythonWithAuthentication(unittest.TestCase):
             self.assertTrue(self.adb._available)
 
 
+class TestKeyStore(unittest.TestCase):
+    """Test the `KeyStore` class."""
+
+    def setUp(self):
+        self.tmpdir = tempfile.mkdtemp()
+        self.adbkey = os.path.join(self.tmpdir, 'adbkey')
+        keygen(self.adbkey)
+
+    def tearDown(self):
+        shutil.rmtree(self.tmpdir)
+
+    @awaiter
+    async def test_get_signer(self):
+        """Check that signers are cached, shared by concurrent lookups, and reloaded when the key files change.
+
+        """
+        key_store = KeyStore()
+        signers = await asyncio.gather(*[key_store.get_signer(self.adbkey) for _ in range(10)])
+        self.assertEqual(key_store.loads, 1)
+        self.assertTrue(all(signer is signers[0] for signer in signers))
+
+        self.assertIs(await key_store.get_signer(self.adbkey), signers[0])
+        self.assertEqual(key_store.loads, 1)
+
+        # the public key is modified
+        stat = os.stat(self.adbkey + '.pub')
+        os.utime(self.adbkey + '.pub', ns=(stat.st_atime_ns, stat.st_mtime_ns + 10**9))
+        signer = await key_store.get_signer(self.adbkey)
+        self.assertIsNot(signer, signers[0])
+        self.assertEqual(key_store.loads, 2)
+
+        # the public key is removed
+        os.remove(self.adbkey + '.pub')
+        self.assertIsNot(await key_store.get_signer(self.adbkey), signer)
+        self.assertEqual(key_store.loads, 3)
+
+        key_store.invalidate(self.adbkey)
+        await key_store.get_signer(self.adbkey)
+        self.assertEqual(key_store.loads, 4)
+
+        key_store.invalidate()
+        await key_store.get_signer(self.adbkey)
+        self.assertEqual(key_store.loads, 5)
+
+        # the private key does not exist
+        with self.assertRaises(FileNotFoundError):
+            await key_store.get_signer(os.path.join(self.tmpdir, 'missing'))
+
+
 class TestADBPythonClose(unittest.TestCase):
     """Test the `ADBPython.close` method."""
 
@@ -377,3 +508,250 @@ class TestADBPythonClose(unittest.TestCase):
 
             await self.adb.close()
             self.assertFalse(self.adb.available)
+
+
+class TestADBPythonPersistentShell(unittest.TestCase):
+    """Test the `ADBPython` class with a persistent shell session."""
+
+    PATCH_KEY = 'python'
+
+    def setUp(self):
+        """Create an `ADBPython` instance that uses a persistent shell session.
+
+        """
+        with patchers.PATCH_ADB_DEVICE_TCP, patchers.patch_connect(True)[self.PATCH_KEY]:
+            self.adb = ADBPython('HOST', 5555, persistent_shell=True)
+
+    @awaiter
+    async def test_adb_shell_success(self):
+        """Test that commands are run in a single shell session.
+
+        """
+        with patchers.patch_connect(True)[self.PATCH_KEY], patchers.patch_shell("TEST")[self.PATCH_KEY]:
+            self.assertTrue(await self.adb.connect())
+            self.assertEqual(await self.adb.shell("TEST1"), "TEST")
+            self.assertEqual(self.adb._adb.shell_cmd, "TEST1")
+            self.assertEqual(await self.adb.shell("TEST2"), "TEST")
+            self.assertEqual(self.adb._adb.shell_cmd, "TEST2")
+            self.assertEqual(self.adb._adb.session_opened, 1)
+            self.assertTrue(self.adb._shell_session.alive)
+
+    @awaiter
+    async def test_adb_shell_long_command(self):
+        """Test that a command that does not fit in one packet is split up.
+
+        """
+        cmd = "echo " + "x" * 5000
+        with patchers.patch_connect(True)[self.PATCH_KEY], patchers.patch_shell("TEST")[self.PATCH_KEY]:
+            self.assertTrue(await self.adb.connect())
+            self.assertEqual(await self.adb.shell(cmd), "TEST")
+            self.assertEqual(self.adb._adb.shell_cmd, cmd)
+
+    @awaiter
+    async def test_adb_shell_session_closed_before_sending(self):
+        """Test that the command is sent on a new stream when the session is closed before the command is sent.
+
+        """
+        async def _read_clse(*args, **kwargs):
+            return b'CLSE', 1, 1, b''
+
+        with patchers.patch_connect(True)[self.PATCH_KEY], patchers.patch_shell("TEST")[self.PATCH_KEY]:
+            self.assertTrue(await self.adb.connect())
+            with patch.object(self.adb._adb, '_read', _read_clse):
+                self.assertEqual(await self.adb.shell("TEST"), "TEST")
+
+            self.assertIsNone(self.adb._shell_session)
+            self.assertEqual(self.adb._adb.shell_cmd, "TEST")
+
+    @awaiter
+    async def test_adb_shell_session_open_fail(self):
+        """Test that the command is sent on a new stream when the session cannot be opened.
+
+        """
+        with patchers.patch_connect(True)[self.PATCH_KEY], patchers.patch_shell("TEST")[self.PATCH_KEY]:
+            self.assertTrue(await self.adb.connect())
+            with patch.object(self.adb._adb, '_open', side_effect=OSError):
+                self.assertEqual(await self.adb.shell("TEST"), "TEST")
+
+            self.assertIsNone(self.adb._shell_session)
+
+    @awaiter
+    async def test_adb_shell_session_closed_while_running(self):
+        """Test that the partial output is returned when the command closes the session.
+
+        """
+        with patchers.patch_connect(True)[self.PATCH_KEY], patchers.patch_shell("TEST")[self.PATCH_KEY]:
+            self.assertTrue(await self.adb.connect())
+            self.assertEqual(await self.adb.shell("TEST"), "TEST")
+
+            # the device echoes the begin marker and some output and then closes the stream
+            async def _send(msg, adb_info):
+                if msg.data:
+                    self.adb._adb.session_packets = [(b'OKAY', b''), (b'WRTE', b'__AIO_ANDROIDTV_BEGIN_2__\nPARTIAL')]
+
+            with patch.object(self.adb._adb, '_send', _send):
+                self.assertEqual(await self.adb.shell("exit"), "PARTIAL")
+
+            self.assertFalse(self.adb._shell_session.alive)
+
+    @awaiter
+    async def test_adb_shell_fail(self):
+        """Test that the session is closed and the command is not resent when an error occurs after it was sent.
+
+        """
+        with patchers.patch_connect(True)[self.PATCH_KEY], patchers.patch_shell(error=True)[self.PATCH_KEY]:
+            self.assertTrue(await self.adb.connect())
+            with self.assertRaises(AttributeError):
+                await self.adb.shell("TEST")
+
+            self.assertIsNone(self.adb._shell_session)
+            self.assertEqual(self.adb._adb.session_closed, [1])
+
+    @awaiter
+    async def test_adb_pull_push_screencap_close_session(self):
+        """Test that the session is closed before other streams are opened.
+
+        """
+        with patchers.patch_connect(True)[self.PATCH_KEY], patchers.patch_shell("TEST")[self.PATCH_KEY]:
+            self.assertTrue(await self.adb.connect())
+
+            for method, args in ((self.adb.pull, ("TEST_LOCAL_PATH", "TEST_DEVICE_PATH")), (self.adb.push, ("TEST_LOCAL_PATH", "TEST_DEVICE_PATH"))):
+                await self.adb.shell("TEST")
+                self.assertTrue(self.adb._shell_session.alive)
+                with patchers.PATCH_PULL[self.PATCH_KEY], patchers.PATCH_PUSH[self.PATCH_KEY]:
+                    await method(*args)
+                self.assertIsNone(self.adb._shell_session)
+
+        with patchers.patch_connect(True)[self.PATCH_KEY], patchers.patch_shell(PNG_IMAGE)[self.PATCH_KEY]:
+            await self.adb.shell("TEST")
+            self.assertTrue(self.adb._shell_session.alive)
+            self.assertEqual(await self.adb.screencap(), PNG_IMAGE)
+            self.assertIsNone(self.adb._shell_session)
+            self.assertEqual(len(self.adb._adb.session_closed), 3)
+
+
+class TestADBPythonMaxStreams(unittest.TestCase):
+    """Test the `ADBPython` class with more than one stream."""
+
+    PATCH_KEY = 'python'
+
+    def setUp(self):
+        """Create an `ADBPython` instance that can have two commands in flight.
+
+        """
+        with patchers.PATCH_ADB_DEVICE_TCP, patchers.patch_connect(True)[self.PATCH_KEY]:
+            self.adb = ADBPython('HOST', 5555, max_streams=2)
+
+    @awaiter
+    async def test_adb_shell_while_locked(self):
+        """Test that a command is sent on the additional stream when the first stream is busy.
+
+        """
+        stream = self.adb._extra_streams[0]
+        with patchers.patch_connect(True)[self.PATCH_KEY], patchers.patch_shell("TEST")[self.PATCH_KEY]:
+            self.assertTrue(await self.adb.connect())
+            self.assertFalse(stream.available)
+
+            # the first stream is free
+            self.assertEqual(await self.adb.shell("TEST1"), "TEST")
+            self.assertEqual(self.adb._adb.shell_cmd, "TEST1")
+            self.assertFalse(stream.available)
+
+            # the first stream is busy
+            async with self.adb._adb_lock:
+                self.assertEqual(await self.adb.shell("TEST2"), "TEST")
+                self.assertEqual(stream._adb.shell_cmd, "TEST2")
+                self.assertTrue(stream.available)
+
+                await self.adb.push("TEST_LOCAL_PATH", "TEST_DEVICE_PATH")
+                await self.adb.pull("TEST_LOCAL_PATH", "TEST_DEVICE_PATH")
+
+            await self.adb.close()
+            self.assertFalse(stream.available)
+
+    @awaiter
+    async def test_adb_shell_while_screencap(self):
+        """Test that a command is not held up by a screencap that is in flight.
+
+        """
+        async def shell(self, cmd, *args, **kwargs):
+            if cmd == "screencap -p":
+                await asyncio.sleep(0.2)
+                return PNG_IMAGE
+            return "TEST"
+
+        with patchers.patch_connect(True)[self.PATCH_KEY], patch("{}.AdbDeviceTcpFake.shell".format(patchers.__name__), shell):
+            self.assertTrue(await self.adb.connect())
+            screencap = asyncio.ensure_future(self.adb.screencap())
+            await asyncio.sleep(0)
+
+            self.assertEqual(await asyncio.wait_for(self.adb.shell("TEST"), 0.1), "TEST")
+            self.assertFalse(screencap.done())
+            self.assertEqual(await screencap, PNG_IMAGE)
+
+    @awaiter
+    async def test_adb_shell_connect_fail(self):
+        """Test that a command waits for the first stream when the additional stream cannot connect.
+
+        """
+        with patchers.patch_connect(True)[self.PATCH_KEY], patchers.patch_shell("TEST")[self.PATCH_KEY]:
+            self.assertTrue(await self.adb.connect())
+
+        with patchers.patch_connect(False)[self.PATCH_KEY], patchers.patch_shell("TEST")[self.PATCH_KEY]:
+            await self.adb._adb_lock.acquire()
+            asyncio.get_event_loop().call_later(0.1, self.adb._adb_lock.release)
+            self.assertEqual(await self.adb.shell("TEST"), "TEST")
+            self.assertEqual(self.adb._adb.shell_cmd, "TEST")
+            self.assertFalse(self.adb._extra_streams[0].available)
+
+    @awaiter
+    async def test_adb_shell_connect_backoff(self):
+        """Test that an additional stream that failed to connect is not tried again until its backoff has passed.
+
+        """
+        stream = self.adb._extra_streams[0]
+        with patchers.patch_connect(True)[self.PATCH_KEY], patchers.patch_shell("TEST")[self.PATCH_KEY]:
+            self.assertTrue(await self.adb.connect())
+
+            with patch.object(stream, 'connect', return_value=False, new_callable=patchers.AsyncMock) as connect:
+                await self.adb._adb_lock.acquire()
+                asyncio.get_event_loop().call_later(0.05, self.adb._adb_lock.release)
+                self.assertEqual(await self.adb.shell("TEST1"), "TEST")
+                self.assertEqual(connect.call_count, 1)
+
+                await self.adb._adb_lock.acquire()
+                asyncio.get_event_loop().call_later(0.05, self.adb._adb_lock.release)
+                self.assertEqual(await self.adb.shell("TEST2"), "TEST")
+                self.assertEqual(connect.call_count, 1)
+                self.assertEqual(self.adb._stream_backoff[stream][0], 1)
+
+                # the backoff has passed
+                self.adb._stream_backoff[stream] = (1, 0.)
+                await self.adb._adb_lock.acquire()
+                asyncio.get_event_loop().call_later(0.05, self.adb._adb_lock.release)
+                self.assertEqual(await self.adb.shell("TEST3"), "TEST")
+                self.assertEqual(connect.call_count, 2)
+                self.assertEqual(self.adb._stream_backoff[stream][0], 2)
+
+    @awaiter
+    async def test_adb_shell_reserve_stream(self):
+        """Test that concurrent commands do not pick the same additional stream.
+
+        """
+        stream = self.adb._extra_streams[0]
+        connects = []
+
+        async def connect(*args, **kwargs):
+            connects.append(kwargs)
+            await asyncio.sleep(0.02)
+            return False
+
+        with patchers.patch_connect(True)[self.PATCH_KEY], patchers.patch_shell("TEST")[self.PATCH_KEY]:
+            self.assertTrue(await self.adb.connect())
+
+            with patch.object(stream, 'connect', connect):
+                await self.adb._adb_lock.acquire()
+                asyncio.get_event_loop().call_later(0.05, self.adb._adb_lock.release)
+                self.assertEqual(await asyncio.gather(self.adb.shell("TEST1"), self.adb.shell("TEST2")), ["TEST", "TEST"])
+                self.assertEqual(len(connects), 1)
+                self.assertFalse(self.adb._reserved_streams)
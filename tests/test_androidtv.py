@@ -465,6 +465,59 @@ class TestAndroidTVPython(unittest.TestCase):
             is_volume_muted = await self.atv.is_volume_muted()
             self.assertFalse(is_volume_muted)
 
+    @awaiter
+    async def test_volume_cache(self):
+        """Check that the volume properties are answered from the cached ``STREAM_MUSIC`` block and updated after volume commands.
+
+        """
+        self.atv.volume_cache_ttl_s = 10.
+        self.atv.max_volume = None
+        with patchers.patch_shell(STREAM_MUSIC_ON)[self.PATCH_KEY]:
+            self.assertEqual(await self.atv.volume(), 22)
+
+        with patchers.patch_shell(None)[self.PATCH_KEY]:
+            self.assertEqual(await self.atv.volume(), 22)
+            self.assertEqual(await self.atv.volume_level(), 22. / 60)
+            self.assertEqual(await self.atv.audio_output_device(), 'hmdi_arc')
+            self.assertFalse(await self.atv.is_volume_muted())
+
+        with patchers.patch_shell('')[self.PATCH_KEY]:
+            self.assertEqual(await self.atv.volume_up(), 23. / 60)
+            self.assertEqual(await self.atv.volume_down(), 22. / 60)
+            self.assertEqual(await self.atv.volume_down(), 21. / 60)
+            self.assertEqual(await self.atv.set_volume_level(0.5), 0.5)
+            await self.atv.mute_volume()
+
+        with patchers.patch_shell(None)[self.PATCH_KEY]:
+            self.assertEqual(await self.atv.volume(), 30)
+            self.assertTrue(await self.atv.is_volume_muted())
+
+            # the volume of the other output devices is unchanged
+            self.assertEqual(self.atv._stream_music.volume('speaker'), 20)
+
+            # the cached block is stale
+            self.atv._stream_music_time -= 10.
+            self.assertIsNone(await self.atv.volume())
+
+        # `get_properties` updates the cache
+        with patchers.patch_shell(GET_PROPERTIES_OUTPUT3)[self.PATCH_KEY]:
+            await self.atv.get_properties(lazy=True)
+
+        with patchers.patch_shell(None)[self.PATCH_KEY]:
+            self.assertEqual(await self.atv.volume(), 22)
+
+            # the cached block is stale and the volume command is not applied
+            self.atv._stream_music_time -= 10.
+            await self.atv.mute_volume()
+
+        # an unchanged `get_properties` output refreshes the cache with the block that was parsed from it
+        with patchers.patch_shell(GET_PROPERTIES_OUTPUT3)[self.PATCH_KEY]:
+            await self.atv.get_properties(lazy=True)
+
+        with patchers.patch_shell(None)[self.PATCH_KEY]:
+            self.assertEqual(await self.atv.volume(), 22)
+            self.assertFalse(await self.atv.is_volume_muted())
+
     @awaiter
     async def test_set_volume_level(self):
         """Check that the ``set_volume_level`` method works correctly.
@@ -644,6 +697,33 @@ class TestAndroidTVPython(unittest.TestCase):
             properties = await self.atv.get_properties_dict(get_running_apps=True, lazy=False)
             self.assertEqual(properties, true_properties)
 
+    @awaiter
+    async def test_get_properties_single_pass(self):
+        """Check that the ``get_properties`` method works correctly when ``single_pass=True``.
+
+        """
+        for get_running_apps, lazy, cmd in [(True, True, constants.CMD_ANDROIDTV_PROPERTIES_LAZY_RUNNING_APPS_SINGLE_PASS),
+                                             (False, True, constants.CMD_ANDROIDTV_PROPERTIES_LAZY_NO_RUNNING_APPS_SINGLE_PASS),
+                                             (True, False, constants.CMD_ANDROIDTV_PROPERTIES_NOT_LAZY_RUNNING_APPS_SINGLE_PASS),
+                                             (False, False, constants.CMD_ANDROIDTV_PROPERTIES_NOT_LAZY_NO_RUNNING_APPS_SINGLE_PASS)]:
+            # `dumpsys power` and `dumpsys audio` are each run only once
+            self.assertEqual(cmd.count("dumpsys power"), 1)
+            self.assertEqual(cmd.count("dumpsys audio"), 1)
+
+            # `printf` is not available on devices before Android 6
+            self.assertNotIn("printf", cmd)
+
+            with patchers.patch_shell(GET_PROPERTIES_OUTPUT_PLEX_PAUSED + RUNNING_APPS_OUTPUT)[self.PATCH_KEY]:
+                properties = await self.atv.get_properties(get_running_apps=get_running_apps, lazy=lazy)
+                properties_single_pass = await self.atv.get_properties(get_running_apps=get_running_apps, lazy=lazy, single_pass=True)
+                self.assertEqual(getattr(self.atv._adb, self.ADB_ATTR).shell_cmd, cmd)
+                self.assertEqual(properties_single_pass, properties)
+
+        with patchers.patch_shell(GET_PROPERTIES_OUTPUT3)[self.PATCH_KEY]:
+            state = await self.atv.update(single_pass=True)
+            self.assertEqual(getattr(self.atv._adb, self.ADB_ATTR).shell_cmd, constants.CMD_ANDROIDTV_PROPERTIES_LAZY_RUNNING_APPS_SINGLE_PASS)
+            self.assertTupleEqual(state, STATE3)
+
     @awaiter
     async def test_update(self):
         """Check that the ``update`` method works correctly.
@@ -699,6 +779,69 @@ class TestAndroidTVPython(unittest.TestCase):
             true_state = STATE3[:2] + (RUNNING_APPS_LIST,) + STATE3[3:]
             self.assertTupleEqual(state, true_state)
 
+    @awaiter
+    async def test_get_properties_hashed(self):
+        """Check that ``get_properties`` reuses the last properties when the device reports that the output is unchanged.
+
+        """
+        with patchers.patch_connect(True)[self.PATCH_KEY]:
+            await self.atv.adb_connect()
+
+        cmd = self.atv._get_properties_cmd(True, True, False)
+
+        with patchers.patch_shell('abc123\n' + GET_PROPERTIES_OUTPUT3)[self.PATCH_KEY]:
+            properties = await self.atv.get_properties(lazy=True, hashed=True)
+            self.assertEqual(getattr(self.atv._adb._adb, 'shell_cmd'), constants.CMD_HASHED.format(cmd, ''))
+            self.assertTupleEqual(await self.atv.update(hashed=True), STATE3)
+
+        with patchers.patch_shell(constants.HASHED_OUTPUT_UNCHANGED)[self.PATCH_KEY]:
+            with patch.object(self.atv, '_parse_properties') as parse:
+                self.assertIs(await self.atv.get_properties(lazy=True, hashed=True), properties)
+                self.assertEqual(getattr(self.atv._adb._adb, 'shell_cmd'), constants.CMD_HASHED.format(cmd, 'abc123'))
+                assert not parse.called
+
+        # `md5sum` is not available on the device, so no hash is sent next time
+        with patchers.patch_shell('\n' + GET_PROPERTIES_OUTPUT3)[self.PATCH_KEY]:
+            self.assertIs(await self.atv.get_properties(lazy=True, hashed=True), properties)
+            self.assertIsNone(self.atv._last_properties_hash)
+
+        with patchers.patch_shell(None)[self.PATCH_KEY]:
+            self.assertIsNone((await self.atv.get_properties(lazy=True, hashed=True))[0])
+
+    @awaiter
+    async def test_update_if_changed(self):
+        """Check that the ``update_if_changed`` method works correctly.
+
+        """
+        with patchers.patch_connect(True)[self.PATCH_KEY]:
+            await self.atv.adb_connect()
+
+        self.assertIsNone(self.atv.last_update)
+        with patchers.patch_shell(GET_PROPERTIES_OUTPUT3)[self.PATCH_KEY]:
+            changed, state = await self.atv.update_if_changed()
+            self.assertEqual(changed, frozenset(self.atv.PROPERTIES_FIELDS))
+            self.assertTupleEqual(state, STATE3)
+
+            # the output is unchanged, so it is not parsed again and the state is not redetermined
+            with patch.object(self.atv, '_parse_properties') as parse, patch.object(self.atv, '_update_from_properties') as update:
+                self.assertEqual(await self.atv.update_if_changed(), (frozenset(), None))
+                self.assertTupleEqual(self.atv.last_update, STATE3)
+                self.assertIs(await self.atv.get_properties(lazy=True), await self.atv.get_properties(lazy=True))
+                assert not parse.called
+                assert not update.called
+
+            # the state detection rules changed
+            self.atv._state_detection_rules = STATE_DETECTION_RULES1
+            changed, state = await self.atv.update_if_changed()
+            self.assertEqual(changed, frozenset())
+            self.assertTupleEqual(state, (constants.STATE_OFF,) + STATE3[1:])
+
+        with patchers.patch_shell(GET_PROPERTIES_OUTPUT2)[self.PATCH_KEY]:
+            changed, state = await self.atv.update_if_changed()
+            self.assertIn('awake', changed)
+            self.assertNotIn('screen_on', changed)
+            self.assertTupleEqual(state, STATE2)
+
     async def assertUpdate(self, get_properties, update):
         """Check that the results of the `update` method are as expected.
 
@@ -1,4 +1,6 @@
 import asyncio
+import shutil
+import subprocess
 import sys
 import unittest
 from unittest.mock import patch
@@ -16,7 +18,7 @@ except ImportError:
 sys.path.insert(0, '..')
 
 from aio_androidtv import constants, ha_state_detection_rules_validator
-from aio_androidtv.basetv import BaseTV
+from aio_androidtv.basetv import BaseTV, compile_state_detection_rules
 
 from . import patchers
 from .async_wrapper import awaiter
@@ -314,6 +316,34 @@ class TestBaseTVPython(unittest.TestCase):
             await self.btv.media_previous_track()
             self.assertEqual(getattr(self.btv._adb, self.ADB_ATTR).shell_cmd, "input keyevent {}".format(constants.KEY_PREVIOUS))
 
+    @awaiter
+    async def test_send_keys(self):
+        """Test that the ``send_keys`` method sends the correct commands.
+
+        """
+        keys = [constants.KEY_UP, constants.KEY_UP, constants.KEY_RIGHT, constants.KEY_ENTER]
+
+        with patchers.patch_connect(True)[self.PATCH_KEY], patchers.patch_shell('')[self.PATCH_KEY]:
+            await self.btv.adb_shell("TEST")
+            await self.btv.send_keys([])
+            self.assertEqual(getattr(self.btv._adb, self.ADB_ATTR).shell_cmd, "TEST")
+
+            # the Android version is not known
+            await self.btv.send_keys(keys)
+            self.assertEqual(getattr(self.btv._adb, self.ADB_ATTR).shell_cmd, "input keyevent 19 && input keyevent 19 && input keyevent 22 && input keyevent 66")
+
+            # Android 5 does not support multiple key codes in one `input keyevent` call
+            self.btv.device_properties = {'sw_version': '5.1.1'}
+            await self.btv.send_keys(keys)
+            self.assertEqual(getattr(self.btv._adb, self.ADB_ATTR).shell_cmd, "input keyevent 19 && input keyevent 19 && input keyevent 22 && input keyevent 66")
+
+            self.btv.device_properties = {'sw_version': '9'}
+            await self.btv.send_keys(keys)
+            self.assertEqual(getattr(self.btv._adb, self.ADB_ATTR).shell_cmd, "input keyevent 19 19 22 66")
+
+            await self.btv.send_keys(keys[:2], delay=0.5)
+            self.assertEqual(getattr(self.btv._adb, self.ADB_ATTR).shell_cmd, "input keyevent 19 && sleep 0.5 && input keyevent 19")
+
     @awaiter
     async def test_get_device_properties(self):
         """Check that ``get_device_properties`` works correctly.
@@ -482,6 +512,81 @@ class TestBaseTVPython(unittest.TestCase):
             self.assertEqual(await self.btv.learn_sendevent(), "sendevent /dev/input/event4 4 4 458833 && sendevent /dev/input/event4 1 108 1 && sendevent /dev/input/event4 0 0 0 && sendevent /dev/input/event4 4 4 458833 && sendevent /dev/input/event4 1 108 0 && sendevent /dev/input/event4 0 0 0")
 
 
+class TestCompileStateDetectionRules(unittest.TestCase):
+    def test_compile_state_detection_rules(self):
+        """Check that the compiled rules determine the state in the same way as the rules are documented.
+
+        """
+        self.assertEqual(compile_state_detection_rules(None), {})
+
+        compiled = compile_state_detection_rules({'app1': ['media_session_state', 'audio_state', {'standby': {'wake_lock_size': 4}}, 'idle', 'playing'],
+                                                  'app2': [{'paused': {'media_session_state': 3, 'wake_lock_size': 1}, 'playing': {'media_session_state': 3}}],
+                                                  'app3': [{'playing': {'INVALID': 1}}, {'paused': {'wake_lock_size': None}}, {'off': {}}],
+                                                  'app4': ['INVALID', {'INVALID': {'wake_lock_size': 1}}]})
+
+        # `media_session_state`, then `audio_state`, then conditions, then a constant state
+        self.assertEqual(compiled['app1'](2, 4, constants.STATE_PLAYING), constants.STATE_PAUSED)
+        self.assertEqual(compiled['app1'](3, 4, constants.STATE_PAUSED), constants.STATE_PLAYING)
+        self.assertEqual(compiled['app1'](1, 4, constants.STATE_PAUSED), constants.STATE_IDLE)
+        self.assertEqual(compiled['app1'](None, 4, constants.STATE_PAUSED), constants.STATE_PAUSED)
+        self.assertEqual(compiled['app1'](None, 4, 'INVALID'), constants.STATE_STANDBY)
+        self.assertEqual(compiled['app1'](None, None, None), constants.STATE_IDLE)
+
+        # all of the conditions must be true
+        self.assertEqual(compiled['app2'](3, 1, None), constants.STATE_PAUSED)
+        self.assertEqual(compiled['app2'](3, 2, None), constants.STATE_PLAYING)
+        self.assertIsNone(compiled['app2'](2, 1, None))
+        self.assertIsNone(compiled['app2'](None, None, None))
+
+        # invalid conditions are never true, and no conditions are always true
+        self.assertEqual(compiled['app3'](None, 1, None), constants.STATE_OFF)
+        self.assertIsNone(compiled['app4'](3, 1, constants.STATE_PLAYING))
+
+    def test_set_state_detection_rules(self):
+        """Check that the rules are compiled when they are set.
+
+        """
+        with patchers.patch_connect(True)['python'], patchers.patch_shell('')['python']:
+            btv = BaseTV('HOST', 5555, state_detection_rules=STATE_DETECTION_RULES1)
+
+        self.assertIs(btv._state_detection_rules, STATE_DETECTION_RULES1)
+        self.assertIsNone(btv._custom_state_detection('INVALID'))
+        self.assertIsNone(btv._custom_state_detection(None))
+
+        self.assertEqual(btv._custom_state_detection('com.amazon.tv.launcher'), constants.STATE_OFF)
+
+        btv._state_detection_rules = {'com.amazon.tv.launcher': ['playing']}
+        self.assertEqual(btv._custom_state_detection('com.amazon.tv.launcher'), constants.STATE_PLAYING)
+
+        btv._state_detection_rules = None
+        self.assertIsNone(btv._custom_state_detection('com.amazon.tv.launcher'))
+
+
+@unittest.skipUnless(shutil.which('sh') and shutil.which('md5sum'), "`sh` and `md5sum` are required")
+class TestCmdHashed(unittest.TestCase):
+    """Run the :py:const:`aio_androidtv.constants.CMD_HASHED` wrapper in a local shell."""
+
+    @staticmethod
+    def run_hashed(cmd, last_hash):
+        """Run ``cmd`` wrapped in ``CMD_HASHED`` and return its output."""
+        return subprocess.run(['sh', '-c', constants.CMD_HASHED.format(cmd, last_hash)], stdout=subprocess.PIPE, check=True).stdout.decode('utf-8')
+
+    def test_cmd_hashed(self):
+        """Check that the output is only sent when its hash differs from the last one.
+
+        """
+        # `printf` is not available on devices before Android 6
+        self.assertNotIn("printf", constants.CMD_HASHED)
+
+        cmd = "printf '11' && echo 'Wake Locks: size=2'"
+        output_hash, _, output = self.run_hashed(cmd, '').partition('\n')
+        self.assertEqual(len(output_hash), 32)
+        self.assertEqual(output, '11Wake Locks: size=2\n')
+
+        self.assertEqual(self.run_hashed(cmd, output_hash), constants.HASHED_OUTPUT_UNCHANGED)
+        self.assertEqual(self.run_hashed(cmd + " && echo 'com.amazon.tv.launcher'", output_hash).partition('\n')[2], '11Wake Locks: size=2\ncom.amazon.tv.launcher\n')
+
+
 class TestHAStateDetectionRulesValidator(unittest.TestCase):
     def test_ha_state_detection_rules_validator(self):
         """Check that ``ha_state_detection_rules_validator()`` works correctly.
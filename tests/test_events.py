@@ -0,0 +1,246 @@
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
+import json
+import os
+import sys
+import unittest
+from unittest.mock import patch
+
+sys.path.insert(0, '..')
+
+from aio_androidtv import constants
+from aio_androidtv.androidtv import AndroidTV
+from aio_androidtv.events import EventMonitor, LineParser, parse_event
+
+from . import patchers
+from .async_wrapper import awaiter
+
+
+REPLAY_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'replay')
+
+with open(os.path.join(REPLAY_DIR, 'events.json')) as f:
+    REPLAY_EVENTS = json.load(f)
+
+GET_PROPERTIES = (True, True, constants.STATE_IDLE, 2, 'com.amazon.tv.launcher', None, 'hmdi_arc', False, 22, ['com.amazon.tv.launcher'])
+
+
+def read_replay(filename):
+    """Read a file from the replay corpus."""
+    with open(os.path.join(REPLAY_DIR, filename), 'rb') as f:
+        return f.read()
+
+
+def replay(data, chunk_size):
+    """Feed ``data`` to a `LineParser` in chunks of ``chunk_size`` bytes and return the events that are parsed from it."""
+    parser = LineParser()
+    lines = []
+    for i in range(0, len(data), chunk_size):
+        lines.extend(parser.feed(data[i:i + chunk_size]))
+    lines.extend(parser.flush())
+
+    return [event for event in map(parse_event, lines) if event]
+
+
+class TestLineParser(unittest.TestCase):
+    """Test the `LineParser` class and the `parse_event` function."""
+
+    def test_partial_lines(self):
+        """Check that lines and UTF-8 characters that are split across chunks are reassembled.
+
+        """
+        parser = LineParser()
+        data = 'I/ActivityManager(  812): Displayed com.netflix.ninja/.MainActivity\r\nCafé\nend'.encode('utf-8')
+
+        split = data.index('é'.encode('utf-8')) + 1
+
+        self.assertEqual(parser.feed(data[:20]), [])
+        self.assertEqual(parser.feed(data[20:split]), ['I/ActivityManager(  812): Displayed com.netflix.ninja/.MainActivity'])
+        self.assertEqual(parser.feed(data[split:split + 1]), [])
+        self.assertEqual(parser.feed(data[split + 1:]), ['Café'])
+        self.assertEqual(parser.flush(), ['end'])
+        self.assertEqual(parser.flush(), [])
+
+    def test_replay(self):
+        """Check that the replay corpus yields the same events regardless of how the output is chunked.
+
+        """
+        for filename, events in REPLAY_EVENTS.items():
+            data = read_replay(filename)
+            for chunk_size in (1, 7, 64, 4096, len(data)):
+                self.assertEqual(replay(data, chunk_size), events, "{} (chunk size = {})".format(filename, chunk_size))
+
+    def test_parse_event(self):
+        """Check that lines that are not events are ignored.
+
+        """
+        self.assertIsNone(parse_event(''))
+        self.assertIsNone(parse_event('I/ActivityManager(  812): Killing 4321:com.netflix.ninja/u0a86 (adj 906): empty #17'))
+
+
+class TestEventMonitor(unittest.TestCase):
+    """Test the `EventMonitor` class."""
+
+    PATCH_KEY = 'python'
+
+    def setUp(self):
+        with patchers.PATCH_ADB_DEVICE_TCP, patchers.patch_connect(True)[self.PATCH_KEY], patchers.patch_shell('')[self.PATCH_KEY]:
+            self.atv = AndroidTV('HOST', 5555)
+
+        self.updates = []
+        self.monitor = EventMonitor(self.atv, self.updates.append, reconcile_interval_s=10., reconnect_interval_s=10.)
+
+    def test_adb_options(self):
+        """Check that the event stream's connection uses the options of the device's own connection.
+
+        """
+        executor = ThreadPoolExecutor(1)
+        with patchers.PATCH_ADB_DEVICE_TCP, patchers.patch_connect(True)[self.PATCH_KEY], patchers.patch_shell('')[self.PATCH_KEY]:
+            atv = AndroidTV('HOST', 5555, auth_executor=executor, tcp_keepalive_s=5)
+
+        monitor = EventMonitor(atv)
+        self.assertIs(monitor._adb.auth_executor, executor)
+        self.assertEqual(monitor._adb.tcp_keepalive_s, 5)
+        executor.shutdown()
+
+    @awaiter
+    async def test_run(self):
+        """Check that the state is updated from the streamed events and reconciled on connect and wake-up.
+
+        """
+        data = read_replay('logcat_androidtv.txt')
+
+        async def streaming_shell(cmd, idle_timeout_s=None):
+            self.assertEqual(cmd, constants.CMD_LOGCAT_EVENTS)
+            for i in range(0, len(data), 50):
+                yield data[i:i + 50]
+                await asyncio.sleep(0)
+
+        with patch.object(self.atv, 'get_properties', return_value=GET_PROPERTIES, new_callable=patchers.AsyncMock) as get_properties, patch.object(self.monitor._adb, 'connect', return_value=True, new_callable=patchers.AsyncMock), patch.object(self.monitor._adb, 'streaming_shell', streaming_shell):
+            self.monitor._adb._available = True
+            self.monitor.start()
+            await asyncio.sleep(0.05)
+            await self.monitor.stop()
+
+        self.assertEqual(self.monitor.events, len(REPLAY_EVENTS['logcat_androidtv.txt']))
+
+        # one full retrieval on connect and one when the device woke up
+        self.assertEqual(self.monitor.reconciles, 2)
+        self.assertEqual(get_properties.call_count, 2)
+
+        self.assertEqual([update[:2] for update in self.updates], [(constants.STATE_PLAYING, 'com.amazon.tv.launcher'),
+                                                                   (constants.STATE_IDLE, 'com.netflix.ninja'),
+                                                                   (constants.STATE_PLAYING, 'com.netflix.ninja'),
+                                                                   (constants.STATE_PAUSED, 'com.netflix.ninja'),
+                                                                   (constants.STATE_IDLE, 'com.google.android.tvlauncher'),
+                                                                   (constants.STATE_STANDBY, 'com.google.android.tvlauncher'),
+                                                                   (constants.STATE_IDLE, 'com.google.android.tvlauncher'),
+                                                                   (constants.STATE_OFF, 'com.google.android.tvlauncher'),
+                                                                   (constants.STATE_IDLE, 'com.google.android.tvlauncher'),
+                                                                   (constants.STATE_PLAYING, 'com.amazon.tv.launcher')])
+
+    @awaiter
+    async def test_stream_cancelled(self):
+        """Check that cancelling the event stream ends it instead of being treated as a failed stream.
+
+        """
+        async def streaming_shell(cmd, idle_timeout_s=None):
+            yield b''
+            await asyncio.sleep(10.)
+
+        with patch.object(self.monitor._adb, 'streaming_shell', streaming_shell):
+            task = asyncio.ensure_future(self.monitor._stream())
+            await asyncio.sleep(0.01)
+            task.cancel()
+            with self.assertRaises(asyncio.CancelledError):
+                await task
+
+    @awaiter
+    async def test_reconcile_errors(self):
+        """Check that a failed retrieval of the properties is logged and retried.
+
+        """
+        self.monitor.reconnect_interval_s = 0.01
+
+        with patch.object(self.atv, 'get_properties', side_effect=[ConnectionResetError('reset'), GET_PROPERTIES], new_callable=patchers.AsyncMock) as get_properties:
+            with self.assertLogs('aio_androidtv.events', 'WARNING'):
+                self.assertFalse(await self.monitor._try_reconcile())
+            self.assertEqual(self.monitor.reconcile_errors, 1)
+            self.assertIsNone(self.monitor.properties)
+
+            self.assertTrue(await self.monitor._try_reconcile())
+            self.assertEqual(get_properties.call_count, 2)
+
+        self.assertEqual(self.monitor.reconciles, 1)
+        self.assertIsNotNone(self.monitor.properties)
+
+        # the device is unavailable
+        with patch.object(self.atv, 'get_properties', return_value=(None,) * len(GET_PROPERTIES), new_callable=patchers.AsyncMock):
+            with self.assertLogs('aio_androidtv.events', 'WARNING'):
+                self.assertFalse(await self.monitor._try_reconcile())
+            self.assertEqual(self.monitor.reconcile_errors, 2)
+            self.assertEqual(self.monitor.reconciles, 1)
+
+        # the reconcile loop keeps running after a failure
+        self.monitor._reconcile_now = asyncio.Event()
+        with patch.object(self.atv, 'get_properties', side_effect=[ConnectionResetError('reset'), GET_PROPERTIES], new_callable=patchers.AsyncMock) as get_properties:
+            with self.assertLogs('aio_androidtv.events', 'WARNING'):
+                task = asyncio.ensure_future(self.monitor._reconcile_loop())
+                self.monitor._reconcile_now.set()
+                await asyncio.sleep(0.05)
+
+            self.assertFalse(task.done())
+            task.cancel()
+            await asyncio.gather(task, return_exceptions=True)
+
+        self.assertEqual(get_properties.call_count, 2)
+        self.assertEqual(self.monitor.reconcile_errors, 3)
+        self.assertEqual(self.monitor.reconciles, 2)
+
+    @awaiter
+    async def test_handle_line(self):
+        """Check that events are ignored until the properties have been retrieved.
+
+        """
+        self.assertEqual(await self.monitor.handle_line('** Activity resuming: com.amazon.tv.launcher'), {'current_app': 'com.amazon.tv.launcher', 'media_session_state': None})
+        self.assertIsNone(self.monitor.properties)
+        self.assertIsNone(await self.monitor.handle_line('Monitoring activity manager...'))
+
+    @awaiter
+    async def test_last_update(self):
+        """Check that the updates that are determined from events are recorded as the device's last update.
+
+        """
+        with patch.object(self.atv, 'get_properties', return_value=GET_PROPERTIES, new_callable=patchers.AsyncMock):
+            await self.monitor.reconcile()
+        self.assertEqual(self.atv.last_update, self.monitor.update)
+
+        await self.monitor.handle_line('I/ActivityManager(  812): Displayed com.netflix.ninja/.MainActivity')
+        self.assertEqual(self.atv.last_update[:2], (constants.STATE_IDLE, 'com.netflix.ninja'))
+        self.assertEqual(self.atv.last_update, self.monitor.update)
+
+        # the state is unchanged, so `update_if_changed` does not compute an update
+        with patch.object(self.atv, 'get_properties', return_value=self.monitor.properties, new_callable=patchers.AsyncMock):
+            self.assertEqual(await self.atv.update_if_changed(), (frozenset(), None))
+
+    def test_new_event_loop(self):
+        """Check that the monitor runs in an event loop other than the one that was current when it was created.
+
+        """
+        async def run():
+            with patch.object(self.atv, 'get_properties', return_value=GET_PROPERTIES, new_callable=patchers.AsyncMock) as get_properties, patch.object(self.monitor._adb, 'connect', return_value=True, new_callable=patchers.AsyncMock):
+                self.monitor.start()
+                await asyncio.sleep(0.02)
+                await self.monitor.handle_line('I/PowerManagerService(  812): Waking up from sleep (uid 1000)...')
+                await asyncio.sleep(0.02)
+                await self.monitor.stop()
+            return get_properties.call_count
+
+        loop = asyncio.new_event_loop()
+        try:
+            self.assertGreaterEqual(loop.run_until_complete(run()), 2)
+        finally:
+            loop.close()
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,343 @@
+import asyncio
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+import os
+import shutil
+import sys
+import tempfile
+import time
+import unittest
+from unittest.mock import patch
+
+sys.path.insert(0, '..')
+
+from aio_adb_shell.auth.keygen import keygen
+
+from aio_androidtv import constants, setup
+from aio_androidtv.adb_manager import ADBPython
+from aio_androidtv.exceptions import CommandTimeoutException
+from aio_androidtv.androidtv import AndroidTV
+from aio_androidtv.firetv import FireTV
+
+from .async_wrapper import awaiter
+from .fake_adbd import FAILURE_CLOSE, FAILURE_RESET, FAILURE_STALL, FIXTURES_DIR, SHELLS, FakeAdbServer, run_fixtures_command
+
+
+HAS_SHELL = any(shutil.which(shell[0]) for shell in SHELLS)
+
+
+class TestFakeAdbServer(unittest.TestCase):
+    """Test `ADBPython` over real sockets, against the fake ADB server."""
+
+    @classmethod
+    def setUpClass(cls):
+        cls.tmpdir = tempfile.mkdtemp()
+        cls.adbkey = os.path.join(cls.tmpdir, 'adbkey')
+        keygen(cls.adbkey)
+
+    @classmethod
+    def tearDownClass(cls):
+        shutil.rmtree(cls.tmpdir)
+
+    @awaiter
+    async def test_auth(self):
+        """Check that a new key is accepted and that its signature is verified on the next connection.
+
+        """
+        server = FakeAdbServer(auth=True)
+        port = await server.start()
+        try:
+            adb = ADBPython('127.0.0.1', port, self.adbkey)
+            self.assertTrue(await adb.connect())
+            self.assertEqual(len(server.authorized_keys), 1)
+            self.assertEqual(await adb.shell('dumpsys power'), server.respond('dumpsys power'))
+
+            # the key is now authorized, so the signature is accepted
+            self.assertTrue(await adb.connect())
+            self.assertEqual(server.authentications, 2)
+            self.assertEqual(len(server.authorized_keys), 1)
+            await adb.close()
+
+            # no key
+            self.assertFalse(await ADBPython('127.0.0.1', port).connect())
+
+            # the user does not accept the new key
+            server.authorized_keys = set()
+            server.accept_new_keys = False
+            self.assertFalse(await ADBPython('127.0.0.1', port, self.adbkey).connect(auth_timeout_s=0.1))
+            self.assertEqual(server.authentications, 2)
+
+        finally:
+            await server.close()
+
+    @awaiter
+    async def test_auth_executor(self):
+        """Check the authentication when the token is signed in a thread pool and in a process pool.
+
+        """
+        for executor_class in (ThreadPoolExecutor, ProcessPoolExecutor):
+            server = FakeAdbServer(auth=True)
+            port = await server.start()
+            try:
+                with executor_class(1) as executor:
+                    # the key is new, so the public key is sent
+                    adb = ADBPython('127.0.0.1', port, self.adbkey, auth_executor=executor)
+                    self.assertTrue(await adb.connect())
+                    self.assertEqual(len(server.authorized_keys), 1)
+                    self.assertEqual(await adb.shell('dumpsys power'), server.respond('dumpsys power'))
+
+                    # the key is authorized, so the signature is accepted
+                    self.assertTrue(await adb.connect())
+                    self.assertEqual(server.authentications, 2)
+                    self.assertEqual(len(server.authorized_keys), 1)
+                    self.assertEqual(await adb.shell('dumpsys power'), server.respond('dumpsys power'))
+                    await adb.close()
+
+                    # the user does not accept the new key
+                    server.authorized_keys = set()
+                    server.accept_new_keys = False
+                    self.assertFalse(await ADBPython('127.0.0.1', port, self.adbkey, auth_executor=executor).connect(auth_timeout_s=0.1))
+
+            finally:
+                await server.close()
+
+        # the device does not require authentication
+        server = FakeAdbServer()
+        port = await server.start()
+        try:
+            with ThreadPoolExecutor(1) as executor:
+                adb = ADBPython('127.0.0.1', port, self.adbkey, auth_executor=executor)
+                self.assertTrue(await adb.connect())
+                self.assertEqual(await adb.shell('dumpsys power'), server.respond('dumpsys power'))
+                await adb.close()
+
+        finally:
+            await server.close()
+
+    @unittest.skipUnless(HAS_SHELL, "requires mksh or bash")
+    @awaiter
+    async def test_fixtures(self):
+        """Check the properties that are parsed from the recorded output of an Android TV and a Fire TV device.
+
+        """
+        for fixtures, expected in (('androidtv', (constants.STATE_PLAYING, 'com.plexapp.android')), ('firetv', (constants.STATE_PLAYING, 'com.netflix.ninja'))):
+            server = FakeAdbServer(fixtures=fixtures, cache=True)
+            port = await server.start()
+            try:
+                atv = await setup('127.0.0.1', port, device_class=fixtures)
+                self.assertEqual(atv.device_properties['sw_version'], '9' if fixtures == 'androidtv' else '5.1.1')
+                self.assertTrue(atv.device_properties['ethmac'])
+
+                for _ in range(2):
+                    update = await atv.update()
+                    self.assertEqual(update[:2], expected)
+                    self.assertIn(expected[1], update[2])
+
+                if fixtures == 'androidtv':
+                    self.assertEqual(update[3:], ('hdmi', False, 0.6))
+
+                # the second update used the cached output
+                self.assertEqual(len(server._outputs), 2)
+                await atv.adb_close()
+
+            finally:
+                await server.close()
+
+    @unittest.skipUnless(HAS_SHELL, "requires mksh or bash")
+    def test_run_fixtures_command(self):
+        """Check that the device properties and the current app can be parsed from every corpus.
+
+        """
+        self.assertEqual(run_fixtures_command('androidtv_7', 'ip addr show eth0'), 'Device "eth0" does not exist.\n')
+
+        for fixtures in sorted(os.listdir(FIXTURES_DIR)):
+            atv = (FireTV if fixtures.startswith('firetv') else AndroidTV)('127.0.0.1')
+            self.assertEqual(run_fixtures_command(fixtures, constants.CMD_MANUFACTURER + " && " + constants.CMD_MODEL).count('\n'), 2)
+
+            properties = atv._parse_properties(run_fixtures_command(fixtures, atv._get_properties_cmd(True, False, False)), True)
+            self.assertTrue(properties.screen_on, fixtures)
+            self.assertIn(properties.current_app, properties.running_apps, fixtures)
+
+    @unittest.skipUnless(HAS_SHELL, "requires mksh or bash")
+    @awaiter
+    async def test_persistent_shell(self):
+        """Check that commands can be run one after another in an interactive shell.
+
+        """
+        server = FakeAdbServer(fixtures='androidtv')
+        port = await server.start()
+        try:
+            adb = ADBPython('127.0.0.1', port, persistent_shell=True)
+            self.assertTrue(await adb.connect())
+            self.assertEqual(await adb.shell('getprop ro.product.model'), 'SHIELD Android TV\n')
+            self.assertEqual(await adb.shell('echo $FAKE_ADBD_FIXTURES'), server.fixtures + '\n')
+            self.assertEqual(server.commands, 1)
+
+            # a command that misses its deadline is stopped and only its session is closed
+            with self.assertRaises(CommandTimeoutException):
+                await adb.shell('sleep 1', timeout_s=0.1)
+            await asyncio.sleep(0.05)
+            self.assertFalse(adb._adb_lock.locked())
+            self.assertEqual(await adb.shell('echo again'), 'again\n')
+            self.assertEqual(server.connections, 1)
+            await adb.close()
+
+        finally:
+            await server.close()
+
+    @awaiter
+    async def test_latency_and_bandwidth(self):
+        """Check that responses are delayed by the latency and throttled by the bandwidth.
+
+        """
+        server = FakeAdbServer(responses=(('big', 'x' * 4096),), latency_s=0.05, bandwidth_bps=40960)
+        port = await server.start()
+        try:
+            adb = ADBPython('127.0.0.1', port)
+            self.assertTrue(await adb.connect())
+
+            start = time.monotonic()
+            self.assertEqual(await adb.shell('small'), '')
+            self.assertGreaterEqual(time.monotonic() - start, 0.045)
+
+            start = time.monotonic()
+            self.assertEqual(len(await adb.shell('big')), 4096)
+            self.assertGreaterEqual(time.monotonic() - start, 0.14)
+            await adb.close()
+
+        finally:
+            await server.close()
+
+    @awaiter
+    async def test_command_timeout(self):
+        """Check that a command gives up at its deadline and that only its stream is closed.
+
+        """
+        server = FakeAdbServer(latency_s=0.2)
+        port = await server.start()
+        try:
+            adb = ADBPython('127.0.0.1', port)
+            self.assertTrue(await adb.connect())
+            supervisor = adb.supervise()
+
+            start = time.monotonic()
+            with self.assertRaises(CommandTimeoutException):
+                await adb.shell('dumpsys power', timeout_s=0.05)
+            self.assertLess(time.monotonic() - start, 0.15)
+
+            # the next command is sent on the same connection, after the abandoned stream is closed
+            server.latency_s = 0.
+            self.assertEqual(await adb.shell('dumpsys power'), server.respond('dumpsys power'))
+            self.assertEqual(server.connections, 1)
+            self.assertEqual(supervisor.stats()['trips'], 0)
+
+            # a cancelled command is stopped, and the lock is released once its stream is closed
+            server.latency_s = 0.05
+            task = asyncio.ensure_future(adb.shell('dumpsys power'))
+            await asyncio.sleep(0.01)
+            task.cancel()
+            with self.assertRaises(asyncio.CancelledError):
+                await task
+            self.assertTrue(adb._adb_lock.locked())
+            self.assertEqual(len(adb._abandon_tasks), 1)
+            await asyncio.sleep(0.25)
+            self.assertFalse(adb._adb_lock.locked())
+            self.assertFalse(adb._abandoned_stream)
+            self.assertEqual(adb._abandon_tasks, set())
+
+            self.assertEqual(await adb.shell('getprop'), server.respond('getprop'))
+            self.assertEqual(server.connections, 1)
+
+            await supervisor.stop()
+            await adb.close()
+
+        finally:
+            await server.close()
+
+    @awaiter
+    async def test_close_abandoned(self):
+        """Check that closing the connection waits for an abandoned command's stream to be closed and the lock to be released.
+
+        """
+        server = FakeAdbServer(latency_s=0.2)
+        port = await server.start()
+        try:
+            adb = ADBPython('127.0.0.1', port)
+            self.assertTrue(await adb.connect())
+
+            with self.assertRaises(CommandTimeoutException):
+                await adb.shell('dumpsys power', timeout_s=0.05)
+            self.assertEqual(len(adb._abandon_tasks), 1)
+
+            await adb.close()
+            self.assertEqual(adb._abandon_tasks, set())
+            self.assertFalse(adb._adb_lock.locked())
+            self.assertFalse(adb._abandoned_stream)
+
+        finally:
+            await server.close()
+
+    @awaiter
+    async def test_command_timeout_stalled(self):
+        """Check that the connection is closed if the device does not respond on an abandoned stream.
+
+        """
+        server = FakeAdbServer(failure_rate=1., failure_modes=(FAILURE_STALL,))
+        port = await server.start()
+        try:
+            adb = ADBPython('127.0.0.1', port)
+            self.assertTrue(await adb.connect())
+
+            # the connection is closed in the background, and then the lock is released
+            with patch('aio_androidtv.adb_manager.ABANDONED_STREAM_TIMEOUT_S', 0.05), self.assertLogs('aio_androidtv.adb_manager', 'WARNING'):
+                with self.assertRaises(CommandTimeoutException):
+                    await adb.screencap(timeout_s=0.05)
+                await asyncio.sleep(0.1)
+            self.assertFalse(adb.available)
+            self.assertFalse(adb._adb_lock.locked())
+
+            server.failure_rate = 0.
+            self.assertTrue(await adb.connect())
+            self.assertEqual(await adb.shell('dumpsys power'), server.respond('dumpsys power'))
+
+            await adb.close()
+
+        finally:
+            await server.close()
+
+    @awaiter
+    async def test_failures_and_reconnect(self):
+        """Check the injected failures and that the client can reconnect after the connection is dropped.
+
+        """
+        server = FakeAdbServer(failure_rate=1., failure_modes=(FAILURE_RESET,))
+        port = await server.start()
+        try:
+            adb = ADBPython('127.0.0.1', port)
+            self.assertTrue(await adb.connect())
+            # `aio_adb_shell` raises a `ValueError` if the socket is closed before a message is read
+            with self.assertRaises((ConnectionError, ValueError)):
+                await adb.shell('dumpsys power')
+            self.assertEqual(server.failures, 1)
+
+            server.failure_modes = (FAILURE_CLOSE,)
+            self.assertTrue(await adb.connect())
+            self.assertEqual(await adb.shell('dumpsys power'), '')
+
+            # the device drops off the network and comes back
+            server.failure_rate = 0.
+            self.assertEqual(server.drop_connections(), 1)
+            await asyncio.sleep(0.01)
+            with self.assertRaises((ConnectionError, ValueError)):
+                await adb.shell('dumpsys power')
+
+            self.assertTrue(await adb.connect())
+            self.assertEqual(await adb.shell('dumpsys power'), server.respond('dumpsys power'))
+            self.assertEqual(server.connections, 3)
+            await adb.close()
+
+        finally:
+            await server.close()
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -264,6 +264,27 @@ class TestFireTVPython(unittest.TestCase):
             properties = await self.ftv.get_properties_dict(lazy=False)
             self.assertDictEqual(properties, GET_PROPERTIES_DICT5)
 
+    @awaiter
+    async def test_get_properties_single_pass(self):
+        """Check that ``get_properties()`` works correctly when ``single_pass=True``.
+
+        """
+        for get_running_apps, lazy, cmd in [(True, True, constants.CMD_FIRETV_PROPERTIES_LAZY_RUNNING_APPS_SINGLE_PASS),
+                                             (False, True, constants.CMD_FIRETV_PROPERTIES_LAZY_NO_RUNNING_APPS_SINGLE_PASS),
+                                             (True, False, constants.CMD_FIRETV_PROPERTIES_NOT_LAZY_RUNNING_APPS_SINGLE_PASS),
+                                             (False, False, constants.CMD_FIRETV_PROPERTIES_NOT_LAZY_NO_RUNNING_APPS_SINGLE_PASS)]:
+            # `dumpsys power` is run only once
+            self.assertEqual(cmd.count("dumpsys power"), 1)
+
+            # `printf` is not available on Fire OS 5
+            self.assertNotIn("printf", cmd)
+
+            with patchers.patch_shell(GET_PROPERTIES_OUTPUT5)[self.PATCH_KEY]:
+                properties = await self.ftv.get_properties(get_running_apps=get_running_apps, lazy=lazy)
+                properties_single_pass = await self.ftv.get_properties(get_running_apps=get_running_apps, lazy=lazy, single_pass=True)
+                self.assertEqual(getattr(self.ftv._adb, self.ADB_ATTR).shell_cmd, cmd)
+                self.assertEqual(properties_single_pass, properties)
+
     @awaiter
     async def test_update(self):
         """Check that the ``update`` method works correctly.
@@ -313,6 +334,67 @@ class TestFireTVPython(unittest.TestCase):
             state = await self.ftv.update()
             self.assertEqual(state[0], constants.STATE_IDLE)
 
+    @awaiter
+    async def test_get_properties_hashed(self):
+        """Check that ``get_properties`` reuses the last properties when the device reports that the output is unchanged.
+
+        """
+        with patchers.patch_connect(True)[self.PATCH_KEY]:
+            await self.ftv.adb_connect()
+
+        cmd = self.ftv._get_properties_cmd(True, True, False)
+
+        with patchers.patch_shell('abc123\n' + GET_PROPERTIES_OUTPUT3)[self.PATCH_KEY]:
+            properties = await self.ftv.get_properties(lazy=True, hashed=True)
+            self.assertEqual(getattr(self.ftv._adb._adb, 'shell_cmd'), constants.CMD_HASHED.format(cmd, ''))
+            self.assertTupleEqual(await self.ftv.update(hashed=True), STATE3)
+
+        with patchers.patch_shell(constants.HASHED_OUTPUT_UNCHANGED)[self.PATCH_KEY]:
+            with patch.object(self.ftv, '_parse_properties') as parse:
+                self.assertIs(await self.ftv.get_properties(lazy=True, hashed=True), properties)
+                self.assertEqual(getattr(self.ftv._adb._adb, 'shell_cmd'), constants.CMD_HASHED.format(cmd, 'abc123'))
+                assert not parse.called
+
+        # `md5sum` is not available on the device, so no hash is sent next time
+        with patchers.patch_shell('\n' + GET_PROPERTIES_OUTPUT3)[self.PATCH_KEY]:
+            self.assertIs(await self.ftv.get_properties(lazy=True, hashed=True), properties)
+            self.assertIsNone(self.ftv._last_properties_hash)
+
+        with patchers.patch_shell(None)[self.PATCH_KEY]:
+            self.assertIsNone((await self.ftv.get_properties(lazy=True, hashed=True))[0])
+
+    @awaiter
+    async def test_update_if_changed(self):
+        """Check that the ``update_if_changed`` method works correctly.
+
+        """
+        with patchers.patch_connect(True)[self.PATCH_KEY]:
+            await self.ftv.adb_connect()
+
+        with patchers.patch_shell(GET_PROPERTIES_OUTPUT3)[self.PATCH_KEY]:
+            changed, state = await self.ftv.update_if_changed()
+            self.assertEqual(changed, frozenset(self.ftv.PROPERTIES_FIELDS))
+            self.assertTupleEqual(state, STATE3)
+
+            # the output is unchanged, so it is not parsed again and the state is not redetermined
+            with patch.object(self.ftv, '_parse_properties') as parse, patch.object(self.ftv, '_update_from_properties') as update:
+                self.assertEqual(await self.ftv.update_if_changed(), (frozenset(), None))
+                self.assertIs(await self.ftv.get_properties(lazy=True), await self.ftv.get_properties(lazy=True))
+                assert not parse.called
+                assert not update.called
+
+            # the state detection rules changed
+            self.ftv._state_detection_rules = STATE_DETECTION_RULES1
+            changed, state = await self.ftv.update_if_changed()
+            self.assertEqual(changed, frozenset())
+            self.assertTupleEqual(state, (constants.STATE_OFF,) + STATE3[1:])
+
+        with patchers.patch_shell(GET_PROPERTIES_OUTPUT2)[self.PATCH_KEY]:
+            changed, state = await self.ftv.update_if_changed()
+            self.assertIn('awake', changed)
+            self.assertNotIn('screen_on', changed)
+            self.assertTupleEqual(state, STATE2)
+
     async def assertUpdate(self, get_properties, update):
         """Check that the results of the `update` method are as expected.
 
@@ -464,5 +546,57 @@ class TestFireTVPython(unittest.TestCase):
                                 (constants.STATE_PAUSED, 'unknown', ['unknown']))
 
 
+    @awaiter
+    async def test_builtin_state_detection_rules(self):
+        """Check that the built-in state detection rules can be overridden and extended for one device.
+
+        """
+        self.assertIs(self.ftv.builtin_state_detection_rules, FireTV.BUILTIN_STATE_DETECTION_RULES)
+        self.assertIn(constants.APP_AMAZON_VIDEO, self.ftv.builtin_state_detection_rules)
+
+        await self.assertUpdate([True, True, 1, 'unknown', 3, ['unknown']],
+                                (constants.STATE_PLAYING, 'unknown', ['unknown']))
+
+        # add rules for an app
+        self.ftv.builtin_state_detection_rules = dict(self.ftv.builtin_state_detection_rules, unknown=['media_session_state', 'idle'])
+        await self.assertUpdate([True, True, 1, 'unknown', 3, ['unknown']],
+                                (constants.STATE_PLAYING, 'unknown', ['unknown']))
+
+        await self.assertUpdate([True, True, 1, 'unknown', None, ['unknown']],
+                                (constants.STATE_IDLE, 'unknown', ['unknown']))
+
+        # override the rules for an app
+        await self.assertUpdate([True, True, 1, constants.APP_AMAZON_VIDEO, 3, [constants.APP_AMAZON_VIDEO]],
+                                (constants.STATE_PLAYING, constants.APP_AMAZON_VIDEO, [constants.APP_AMAZON_VIDEO]))
+
+        self.ftv.builtin_state_detection_rules = {constants.APP_AMAZON_VIDEO: ['paused']}
+        await self.assertUpdate([True, True, 1, constants.APP_AMAZON_VIDEO, 3, [constants.APP_AMAZON_VIDEO]],
+                                (constants.STATE_PAUSED, constants.APP_AMAZON_VIDEO, [constants.APP_AMAZON_VIDEO]))
+
+        # the custom rules still take precedence
+        self.ftv._state_detection_rules = {constants.APP_AMAZON_VIDEO: ['media_session_state']}
+        await self.assertUpdate([True, True, 1, constants.APP_AMAZON_VIDEO, 3, [constants.APP_AMAZON_VIDEO]],
+                                (constants.STATE_PLAYING, constants.APP_AMAZON_VIDEO, [constants.APP_AMAZON_VIDEO]))
+
+        # the class's rules are unchanged
+        self.assertIsNot(FireTV('HOST').builtin_state_detection_rules, self.ftv.builtin_state_detection_rules)
+
+        with self.assertRaises(KeyError):
+            self.ftv.builtin_state_detection_rules = {constants.APP_AMAZON_VIDEO: ['invalid']}
+
+    @awaiter
+    async def test_update_if_changed_builtin_rules(self):
+        """Check that ``update_if_changed`` determines the state again when the built-in rules change.
+
+        """
+        with patch('aio_androidtv.firetv.FireTV.get_properties', return_value=[True, True, 1, 'unknown', 3, ['unknown']], new_callable=AsyncMock):
+            changed, state = await self.ftv.update_if_changed()
+            self.assertEqual(state[0], constants.STATE_PLAYING)
+
+            self.ftv.builtin_state_detection_rules = {'unknown': ['idle']}
+            changed, state = await self.ftv.update_if_changed()
+            self.assertEqual(changed, frozenset())
+            self.assertEqual(state[0], constants.STATE_IDLE)
+
 if __name__ == "__main__":
     unittest.main()
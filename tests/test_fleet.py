@@ -0,0 +1,162 @@
+import asyncio
+import sys
+import time
+import unittest
+
+sys.path.insert(0, '..')
+
+from aio_androidtv.fleet import DEFAULT_THROUGHPUT_WINDOW_S, DeviceFleet, _percentile
+
+from .async_wrapper import awaiter
+
+
+class FakeDevice(object):
+    """A fake device whose `update` method takes ``delay_s`` seconds."""
+
+    active = 0
+    max_active = 0
+
+    def __init__(self, host, port=5555, delay_s=0., fail=False):
+        self.host = host
+        self.port = port
+        self.delay_s = delay_s
+        self.fail = fail
+        self.starts = []
+
+    async def update(self):
+        self.starts.append(time.monotonic())
+        FakeDevice.active += 1
+        FakeDevice.max_active = max(FakeDevice.max_active, FakeDevice.active)
+        try:
+            await asyncio.sleep(self.delay_s)
+            if self.fail:
+                raise ConnectionResetError("Connection reset by peer")
+            return ('idle', self.host)
+        finally:
+            FakeDevice.active -= 1
+
+
+class TestDeviceFleet(unittest.TestCase):
+    """Test the `DeviceFleet` class."""
+
+    def setUp(self):
+        FakeDevice.active = 0
+        FakeDevice.max_active = 0
+        self.updates = []
+        self.fleet = DeviceFleet(lambda atv, update: self.updates.append(update), max_concurrency=3, interval_s=0.01, min_host_interval_s=0., update_timeout_s=0.05)
+
+    @awaiter
+    async def test_concurrency_limit(self):
+        """Check that no more than ``max_concurrency`` polls run at the same time.
+
+        """
+        devices = [FakeDevice('192.168.0.{}'.format(i), delay_s=0.01) for i in range(10)]
+        await asyncio.gather(*[self.fleet.poll(atv) for atv in devices])
+
+        self.assertEqual(FakeDevice.max_active, 3)
+        self.assertEqual(len(self.updates), 10)
+
+        stats = self.fleet.stats()
+        self.assertEqual(stats['polls'], 10)
+        self.assertGreaterEqual(stats['latency_p99_s'], stats['latency_p50_s'])
+
+    def test_new_event_loop(self):
+        """Check that the concurrency limit works in an event loop other than the one that was current when the fleet was created.
+
+        """
+        devices = [FakeDevice('192.168.0.{}'.format(i), delay_s=0.01) for i in range(5)]
+
+        async def run():
+            await asyncio.gather(*[self.fleet.poll(atv) for atv in devices])
+
+        loop = asyncio.new_event_loop()
+        try:
+            loop.run_until_complete(run())
+        finally:
+            loop.close()
+
+        self.assertEqual(FakeDevice.max_active, 3)
+        self.assertEqual(len(self.updates), 5)
+
+    @awaiter
+    async def test_slow_and_failing_devices(self):
+        """Check that slow and failing devices do not delay the others.
+
+        """
+        self.fleet.add(FakeDevice('slow', delay_s=10.))
+        self.fleet.add(FakeDevice('failing', fail=True))
+        fast = FakeDevice('fast')
+        self.fleet.add(fast)
+        self.fleet.add(fast)
+        self.assertEqual(len(self.fleet.devices), 3)
+
+        self.fleet.start()
+        await asyncio.sleep(0.2)
+        await self.fleet.stop()
+
+        stats = self.fleet.stats()
+        self.assertEqual(stats['devices'], 3)
+        self.assertGreater(len(fast.starts), 5)
+        self.assertGreater(stats['timeouts'], 0)
+        self.assertGreater(stats['errors'], 0)
+        self.assertGreater(stats['polls_per_s'], 0)
+        self.assertTrue(all(update == ('idle', 'fast') for update in self.updates))
+
+        await self.fleet.remove(fast)
+        self.assertEqual(len(self.fleet.devices), 2)
+
+    @awaiter
+    async def test_host_rate_limit(self):
+        """Check that the polls of devices on the same host are spaced by ``min_host_interval_s``.
+
+        """
+        self.fleet.min_host_interval_s = 0.02
+        devices = [FakeDevice('192.168.0.1', port) for port in (5555, 5556, 5557)]
+        await asyncio.gather(*[self.fleet.poll(atv) for atv in devices])
+
+        starts = sorted(atv.starts[0] for atv in devices)
+        self.assertGreaterEqual(starts[1] - starts[0], 0.015)
+        self.assertGreaterEqual(starts[2] - starts[1], 0.015)
+
+    @awaiter
+    async def test_failing_callback(self):
+        """Check that a failing callback is logged and does not stop the polling.
+
+        """
+        def callback(atv, update):
+            self.updates.append(update)
+            raise ValueError("callback failed")
+
+        self.fleet.callback = callback
+        atv = FakeDevice('fast')
+        self.fleet.add(atv)
+
+        with self.assertLogs('aio_androidtv.fleet', 'WARNING'):
+            self.fleet.start()
+            await asyncio.sleep(0.1)
+        await self.fleet.stop()
+
+        self.assertGreater(len(self.updates), 2)
+        self.assertEqual(self.fleet.stats()['errors'], 0)
+
+    def test_finished_trimmed(self):
+        """Check that the finish times outside of the throughput window are forgotten when a poll is recorded.
+
+        """
+        self.fleet._finished.extend([time.monotonic() - 2 * DEFAULT_THROUGHPUT_WINDOW_S] * 100)
+        self.fleet._record(0.01)
+        self.assertEqual(len(self.fleet._finished), 1)
+
+    def test_percentile(self):
+        """Check the nearest-rank percentiles.
+
+        """
+        values = list(range(1, 101))
+        self.assertEqual(_percentile(values, 50), 50)
+        self.assertEqual(_percentile(values, 99), 99)
+        self.assertEqual(_percentile([3], 95), 3)
+        self.assertIsNone(_percentile([], 50))
+
+
+if __name__ == "__main__":
+    unittest.main()
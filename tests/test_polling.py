@@ -0,0 +1,148 @@
+import asyncio
+import sys
+import unittest
+from unittest.mock import patch
+
+sys.path.insert(0, '..')
+
+from aio_androidtv import constants
+from aio_androidtv.exceptions import CommandTimeoutException, LockNotAcquiredException
+from aio_androidtv.firetv import FireTV
+from aio_androidtv.polling import AdaptivePoller
+
+from . import patchers
+from .async_wrapper import awaiter
+
+
+UPDATE_OFF = (constants.STATE_OFF, None, None)
+
+UPDATE_PLAYING = (constants.STATE_PLAYING, 'com.netflix.ninja', ['com.netflix.ninja'])
+
+
+class TestAdaptivePoller(unittest.TestCase):
+    """Test the `AdaptivePoller` class."""
+
+    PATCH_KEY = 'python'
+
+    def setUp(self):
+        with patchers.PATCH_ADB_DEVICE_TCP, patchers.patch_connect(True)[self.PATCH_KEY], patchers.patch_shell('')[self.PATCH_KEY]:
+            self.ftv = FireTV('HOST', 5555)
+        self.poller = AdaptivePoller(self.ftv)
+
+    async def poll(self, *updates):
+        """Poll the device once for each of the results of ``update_if_changed`` and return the intervals."""
+        with patch.object(self.ftv, 'update_if_changed', side_effect=updates, new_callable=patchers.AsyncMock):
+            return [await self.poller.poll() for _ in updates]
+
+    @awaiter
+    async def test_backoff(self):
+        """Check that the interval backs off exponentially while the device is off.
+
+        """
+        intervals = await self.poll((frozenset(), UPDATE_OFF), *[(frozenset(), None)] * 5)
+        self.assertEqual(intervals, [1., 10., 20., 40., 60., 60.])
+        self.assertEqual(self.poller.state, constants.STATE_OFF)
+
+        # the state changes, so the interval drops to the minimum and then to the interval for the new state
+        intervals = await self.poll((frozenset(['current_app']), UPDATE_PLAYING), (frozenset(), None))
+        self.assertEqual(intervals, [1., 2.])
+
+        stats = self.poller.stats()
+        self.assertEqual(stats['interval_s'], 2.)
+        self.assertEqual(stats['polls'], 8)
+        self.assertEqual(stats['changes'], 2)
+
+    @awaiter
+    async def test_command(self):
+        """Check that the device is polled at the minimum interval after an interactive command.
+
+        """
+        await self.poll((frozenset(), UPDATE_OFF), (frozenset(), None))
+        self.assertEqual(self.poller.interval_s, 10.)
+
+        with patchers.patch_connect(True)[self.PATCH_KEY]:
+            await self.ftv.adb_connect()
+
+        with patchers.patch_shell('')[self.PATCH_KEY]:
+            await self.ftv.power()
+
+        self.assertEqual(await self.poll((frozenset(), None)), [1.])
+
+        self.poller.boost_s = 0.
+        self.assertEqual(await self.poll((frozenset(), None)), [10.])
+
+    @awaiter
+    async def test_run(self):
+        """Check that the polling loop calls the callback and wakes up early when a command is sent.
+
+        """
+        updates = []
+
+        async def callback(update):
+            updates.append(update)
+
+        self.poller.callback = callback
+        self.poller.min_interval_s = 0.01
+
+        with patch.object(self.ftv, 'update_if_changed', side_effect=[(frozenset(), UPDATE_OFF)] + [(frozenset(), None)] * 10, new_callable=patchers.AsyncMock):
+            self.poller.start()
+            await asyncio.sleep(0.05)
+            self.assertEqual(self.poller.stats()['polls'], 2)
+            self.assertEqual(updates, [UPDATE_OFF])
+
+            self.poller.notify_command()
+            await asyncio.sleep(0.05)
+            self.assertGreater(self.poller.stats()['polls'], 2)
+
+            await self.poller.stop()
+
+    @awaiter
+    async def test_errors(self):
+        """Check that a failed poll is logged and counted, backs off the interval, and does not end the polling loop.
+
+        """
+        intervals = await self.poll(LockNotAcquiredException(), CommandTimeoutException(), ConnectionResetError())
+        self.assertEqual(intervals, [2., 4., 8.])
+
+        stats = self.poller.stats()
+        self.assertEqual(stats['polls'], 3)
+        self.assertEqual(stats['errors'], 3)
+
+        # the polling loop keeps running
+        self.poller.min_interval_s = 0.01
+        self.poller.interval_s = 0.01
+        with patch.object(self.ftv, 'update_if_changed', side_effect=[LockNotAcquiredException(), (frozenset(), UPDATE_PLAYING)] + [(frozenset(), None)] * 10, new_callable=patchers.AsyncMock):
+            with self.assertLogs('aio_androidtv.polling', 'WARNING'):
+                task = self.poller.start()
+                await asyncio.sleep(0.05)
+
+            self.assertFalse(task.done())
+            self.assertEqual(self.poller.state, constants.STATE_PLAYING)
+            self.assertEqual(self.poller.stats()['errors'], 4)
+
+            await self.poller.stop()
+
+    def test_new_event_loop(self):
+        """Check that the poller runs in an event loop other than the one that was current when it was created.
+
+        """
+        async def run():
+            with patch.object(self.ftv, 'update_if_changed', return_value=(frozenset(), None), new_callable=patchers.AsyncMock):
+                self.poller.min_interval_s = 0.01
+                self.poller.start()
+                await asyncio.sleep(0.03)
+                self.poller.notify_command()
+                await asyncio.sleep(0.03)
+                await self.poller.stop()
+
+        loop = asyncio.new_event_loop()
+        try:
+            loop.run_until_complete(run())
+        finally:
+            loop.close()
+
+        self.assertGreater(self.poller.stats()['polls'], 1)
+
+
+if __name__ == "__main__":
+    unittest.main()
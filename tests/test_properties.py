@@ -0,0 +1,177 @@
+import pickle
+import sys
+import unittest
+
+sys.path.insert(0, '..')
+
+from aio_androidtv.properties import ANDROIDTV_FIELDS, FIRETV_FIELDS, DeviceProperties, StreamMusic
+
+
+ANDROIDTV_PROPERTIES = (True, True, 'idle', 2, 'com.plexapp.android', 3, 'hmdi_arc', False, 22, ['com.plexapp.android'])
+
+FIRETV_PROPERTIES = (True, True, 2, 'com.plexapp.android', 3, ['com.plexapp.android'])
+
+STREAM_MUSIC_OUTPUT = """- STREAM_MUSIC:
+   Muted: true
+   Min: 0
+   Max: 25
+   streamVolume:25
+   Current: 400 (hdmi): 25, 4000000 (usb_headset): 12, 40000000 (default): 15
+   Devices: hdmi, usb_headset
+- STREAM_ALARM:
+   Muted: false
+   Min: 1
+   Max: 7
+   Current: 400 (hdmi): 3, 40000000 (default): 2
+   Devices: speaker
+"""
+
+
+class TestDeviceProperties(unittest.TestCase):
+    """Test the `DeviceProperties` class."""
+
+    def test_androidtv(self):
+        """Test a snapshot of Android TV properties.
+
+        """
+        properties = DeviceProperties(*ANDROIDTV_PROPERTIES)
+        self.assertEqual(len(properties), 10)
+        self.assertEqual(properties, ANDROIDTV_PROPERTIES)
+        self.assertEqual(properties, list(ANDROIDTV_PROPERTIES))
+        self.assertEqual(tuple(properties), ANDROIDTV_PROPERTIES)
+        self.assertEqual(properties[2], 'idle')
+        self.assertEqual(properties[-1], ['com.plexapp.android'])
+        self.assertEqual(properties[:2], (True, True))
+        self.assertEqual(properties.volume, 22)
+        self.assertDictEqual(properties.as_dict(), dict(zip(ANDROIDTV_FIELDS, ANDROIDTV_PROPERTIES)))
+
+        screen_on, awake, audio_state, wake_lock_size, current_app, media_session_state, audio_output_device, is_volume_muted, volume, running_apps = properties
+        self.assertEqual(current_app, 'com.plexapp.android')
+
+    def test_firetv(self):
+        """Test a snapshot of Fire TV properties.
+
+        """
+        properties = DeviceProperties.from_sequence(FIRETV_PROPERTIES, FIRETV_FIELDS)
+        self.assertEqual(len(properties), 6)
+        self.assertEqual(properties, FIRETV_PROPERTIES)
+        self.assertIsNone(properties.audio_state)
+        self.assertDictEqual(properties.as_dict(), dict(zip(FIRETV_FIELDS, FIRETV_PROPERTIES)))
+        self.assertIs(DeviceProperties.from_sequence(properties, FIRETV_FIELDS), properties)
+        self.assertIn('current_app=', repr(properties))
+        self.assertNotIn('audio_state=', repr(properties))
+
+        screen_on, awake, wake_lock_size, current_app, media_session_state, running_apps = properties
+        self.assertEqual(wake_lock_size, 2)
+
+    def test_immutable(self):
+        """Test that a snapshot cannot be modified.
+
+        """
+        properties = DeviceProperties(*ANDROIDTV_PROPERTIES)
+        with self.assertRaises(AttributeError):
+            properties.screen_on = False
+
+        with self.assertRaises(AttributeError):
+            del properties.screen_on
+
+        with self.assertRaises(AttributeError):
+            properties.new_attribute = True
+
+    def test_equality_and_diff(self):
+        """Test comparing two snapshots.
+
+        """
+        properties = DeviceProperties(*ANDROIDTV_PROPERTIES)
+        same = DeviceProperties(*ANDROIDTV_PROPERTIES)
+        changed = DeviceProperties(*(ANDROIDTV_PROPERTIES[:2] + ('playing', 3) + ANDROIDTV_PROPERTIES[4:]))
+
+        self.assertEqual(properties, same)
+        self.assertEqual(hash(properties), hash(same))
+        self.assertNotEqual(properties, changed)
+        self.assertNotEqual(properties, DeviceProperties.from_sequence(ANDROIDTV_PROPERTIES[:6], FIRETV_FIELDS))
+        self.assertNotEqual(properties, 'properties')
+
+        self.assertEqual(properties.diff(same), ())
+        self.assertEqual(changed.diff(properties), ('audio_state', 'wake_lock_size'))
+        self.assertEqual(properties.diff(None), ANDROIDTV_FIELDS)
+
+    def test_replace(self):
+        """Test creating a copy of a snapshot with some of the properties replaced.
+
+        """
+        properties = DeviceProperties.from_sequence(FIRETV_PROPERTIES, FIRETV_FIELDS)
+        replaced = properties.replace(screen_on=False, current_app='com.amazon.tv.launcher')
+        self.assertEqual(replaced, (False, True, 2, 'com.amazon.tv.launcher', 3, ['com.plexapp.android']))
+        self.assertEqual(replaced.fields, FIRETV_FIELDS)
+        self.assertEqual(properties, FIRETV_PROPERTIES)
+
+        with self.assertRaises(ValueError):
+            properties.replace(volume=22)
+
+    def test_pickle(self):
+        """Test that a snapshot can be pickled.
+
+        """
+        properties = DeviceProperties.from_sequence(FIRETV_PROPERTIES, FIRETV_FIELDS)
+        unpickled = pickle.loads(pickle.dumps(properties))
+        self.assertEqual(unpickled, properties)
+        self.assertEqual(unpickled.fields, FIRETV_FIELDS)
+
+
+class TestStreamMusic(unittest.TestCase):
+    """Test the `StreamMusic` class."""
+
+    def test_from_output(self):
+        """Check that the ``STREAM_MUSIC`` block is parsed and that the other streams are ignored.
+
+        """
+        stream_music = StreamMusic.from_output(STREAM_MUSIC_OUTPUT)
+        self.assertEqual(stream_music.device, 'hdmi')
+        self.assertTrue(stream_music.muted)
+        self.assertEqual(stream_music.min_volume, 0.)
+        self.assertEqual(stream_music.max_volume, 25.)
+        self.assertDictEqual(stream_music.volumes, {'hdmi': 25, 'usb_headset': 12, 'default': 15})
+        self.assertEqual(stream_music.volume('usb_headset'), 12)
+        self.assertIsNone(stream_music.volume('speaker'))
+        self.assertIsNone(stream_music.volume(None))
+
+        # a list of lines
+        self.assertEqual(StreamMusic.from_output(STREAM_MUSIC_OUTPUT.splitlines()), stream_music)
+
+        # the block is not followed by another stream
+        self.assertEqual(StreamMusic.from_output(STREAM_MUSIC_OUTPUT.split('- STREAM_ALARM')[0]), stream_music)
+
+    def test_from_output_missing(self):
+        """Check the parsed block when it or its lines are missing.
+
+        """
+        self.assertIsNone(StreamMusic.from_output(None))
+        self.assertIsNone(StreamMusic.from_output(''))
+        self.assertIsNone(StreamMusic.from_output(' '))
+        self.assertIsNone(StreamMusic.from_output('- STREAM_ALARM:\n   Muted: false\n'))
+
+        stream_music = StreamMusic.from_output('- STREAM_MUSIC:\n \n- STREAM')
+        self.assertEqual(stream_music, StreamMusic())
+        self.assertIsNone(stream_music.device)
+        self.assertIsNone(stream_music.muted)
+        self.assertIsNone(stream_music.max_volume)
+        self.assertDictEqual(stream_music.volumes, {})
+
+    def test_immutable(self):
+        """Check that the parsed block cannot be modified.
+
+        """
+        stream_music = StreamMusic.from_output(STREAM_MUSIC_OUTPUT)
+        with self.assertRaises(AttributeError):
+            stream_music.device = 'speaker'
+
+        with self.assertRaises(AttributeError):
+            del stream_music.muted
+
+        self.assertNotEqual(stream_music, StreamMusic('hdmi'))
+        self.assertEqual(repr(StreamMusic('hdmi', False)), "StreamMusic(device='hdmi', muted=False, min_volume=None, max_volume=None, volumes={})")
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,114 @@
+import asyncio
+import sys
+import unittest
+
+sys.path.insert(0, '..')
+
+from aio_androidtv.adb_manager import _acquire
+from aio_androidtv.exceptions import LockNotAcquiredException
+from aio_androidtv.scheduler import CommandScheduler, PRIORITY_BULK, PRIORITY_INTERACTIVE, PRIORITY_POLLING
+
+from .async_wrapper import awaiter
+
+
+class TestCommandScheduler(unittest.TestCase):
+    """Test the `CommandScheduler` class."""
+
+    def setUp(self):
+        self.scheduler = CommandScheduler(aging_s=0)
+        self.order = []
+
+    async def _command(self, name, priority):
+        """Acquire the scheduler, record the order in which commands run, and release it."""
+        async with _acquire(self.scheduler, priority=priority):
+            self.order.append(name)
+            await asyncio.sleep(0)
+
+    @awaiter
+    async def test_priority_order(self):
+        """Test that waiting commands are granted the lock in order of priority.
+
+        """
+        await self.scheduler.acquire(PRIORITY_BULK)
+        self.assertTrue(self.scheduler.locked())
+
+        tasks = [asyncio.ensure_future(self._command(name, priority)) for name, priority in (('bulk', PRIORITY_BULK),
+                                                                                             ('polling1', PRIORITY_POLLING),
+                                                                                             ('interactive', PRIORITY_INTERACTIVE),
+                                                                                             ('polling2', PRIORITY_POLLING))]
+        await asyncio.sleep(0.01)
+        self.assertEqual(self.scheduler.queue_depth(), {'interactive': 1, 'polling': 2, 'bulk': 1})
+
+        self.scheduler.release()
+        await asyncio.gather(*tasks)
+
+        self.assertEqual(self.order, ['interactive', 'polling1', 'polling2', 'bulk'])
+        self.assertFalse(self.scheduler.locked())
+
+        stats = self.scheduler.stats()
+        self.assertEqual(stats['bulk']['granted'], 2)
+        self.assertEqual(stats['polling']['granted'], 2)
+        self.assertEqual(stats['interactive']['granted'], 1)
+        self.assertEqual(stats['interactive']['queued'], 0)
+        self.assertGreaterEqual(stats['bulk']['max_wait_s'], stats['bulk']['mean_wait_s'])
+
+    @awaiter
+    async def test_aging(self):
+        """Test that a command that has been waiting long enough is promoted ahead of a higher priority command.
+
+        """
+        self.scheduler.aging_s = 0.01
+        await self.scheduler.acquire()
+
+        bulk = asyncio.ensure_future(self._command('bulk', PRIORITY_BULK))
+        await asyncio.sleep(0.05)
+
+        interactive = asyncio.ensure_future(self._command('interactive', PRIORITY_INTERACTIVE))
+        await asyncio.sleep(0.01)
+        self.scheduler.release()
+        await asyncio.gather(bulk, interactive)
+
+        self.assertEqual(self.order, ['bulk', 'interactive'])
+
+    @awaiter
+    async def test_timeout(self):
+        """Test that a command that times out is removed from the queue and does not hold the lock.
+
+        """
+        await self.scheduler.acquire()
+
+        with self.assertRaises(LockNotAcquiredException):
+            async with _acquire(self.scheduler, 0.01, PRIORITY_INTERACTIVE):
+                pass
+
+        self.assertEqual(self.scheduler.queue_depth()['interactive'], 0)
+        self.scheduler.release()
+        self.assertFalse(self.scheduler.locked())
+
+    @awaiter
+    async def test_cancelled_after_grant(self):
+        """Test that the lock is passed on when a command is cancelled after it has been granted the lock.
+
+        """
+        await self.scheduler.acquire()
+        first = asyncio.ensure_future(self.scheduler.acquire(PRIORITY_INTERACTIVE))
+        second = asyncio.ensure_future(self._command('second', PRIORITY_POLLING))
+        await asyncio.sleep(0.01)
+
+        self.scheduler.release()
+        first.cancel()
+        await second
+
+        self.assertEqual(self.order, ['second'])
+        self.assertFalse(self.scheduler.locked())
+
+    def test_release_unlocked(self):
+        """Test that releasing a lock that is not held raises an error.
+
+        """
+        with self.assertRaises(RuntimeError):
+            self.scheduler.release()
+
+
+if __name__ == "__main__":
+    unittest.main()
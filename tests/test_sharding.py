@@ -0,0 +1,128 @@
+import asyncio
+import sys
+import time
+import unittest
+
+sys.path.insert(0, '..')
+
+from aio_androidtv import constants
+from aio_androidtv.sharding import ShardedFleet, shard_for
+
+from .async_wrapper import awaiter
+from .fake_adbd import FakeAdbServer, host_range
+
+
+async def wait_for(condition, timeout_s=20.):
+    """Wait until ``condition()`` is true."""
+    deadline = time.monotonic() + timeout_s
+    while not condition():
+        if time.monotonic() > deadline:
+            raise AssertionError("Timed out")
+        await asyncio.sleep(0.05)
+
+
+class TestShardFor(unittest.TestCase):
+    """Test the `shard_for` function."""
+
+    def test_stable(self):
+        """Check that only the hosts of a removed worker are reassigned.
+
+        """
+        hosts = host_range(100)
+        assignments = {host: shard_for(host, [0, 1, 2]) for host in hosts}
+        self.assertEqual(set(assignments.values()), {0, 1, 2})
+        self.assertEqual(assignments, {host: shard_for(host, [2, 1, 0]) for host in hosts})
+
+        reassigned = {host: shard_for(host, [0, 2]) for host in hosts}
+        for host in hosts:
+            if assignments[host] != 1:
+                self.assertEqual(reassigned[host], assignments[host])
+
+        self.assertIsNone(shard_for(hosts[0], []))
+
+
+class TestShardedFleet(unittest.TestCase):
+    """Test the `ShardedFleet` class with worker processes that poll a fake ADB server."""
+
+    def test_add_twice(self):
+        """Check that adding a device again only sends it to its worker if the arguments changed.
+
+        """
+        class FakeConn(object):
+            def __init__(self):
+                self.sent = []
+
+            def send(self, msg):
+                self.sent.append(msg)
+
+        conn = FakeConn()
+        fleet = ShardedFleet(workers=1)
+        fleet._processes = {0: None}
+        fleet._conns = {0: conn}
+
+        fleet.add('192.168.0.1', 5555, device_class='androidtv')
+        fleet.add('192.168.0.1', '5555', device_class='androidtv')
+        self.assertEqual(len(conn.sent), 1)
+
+        fleet.add('192.168.0.1', 5555, device_class='firetv')
+        self.assertEqual(len(conn.sent), 2)
+        self.assertEqual(conn.sent[1][1]['device_class'], 'firetv')
+        self.assertEqual(fleet._devices, {('192.168.0.1', 5555): {'host': '192.168.0.1', 'port': 5555, 'device_class': 'firetv'}})
+
+    @awaiter
+    async def test_rebalance(self):
+        """Check that the workers report state changes and that a dead worker's devices are reassigned.
+
+        """
+        server = FakeAdbServer(host_range(4))
+        port = await server.start()
+
+        calls = []
+        fleet = ShardedFleet(lambda host, port, update: calls.append(host), workers=2, stats_interval_s=0.1, interval_s=0.05, min_host_interval_s=0.)
+        for host in server.hosts:
+            fleet.add(host, port, device_class='androidtv')
+
+        fleet.start()
+        try:
+            await wait_for(lambda: len(fleet.updates) == 4)
+            self.assertEqual(sorted(calls), sorted(server.hosts))
+            self.assertEqual(fleet.updates[(server.hosts[0], port)][0], constants.STATE_PLAYING)
+            await wait_for(lambda: fleet.stats()['polls'] > 4)
+
+            # kill the worker that polls the first host
+            worker = fleet._assignments[(server.hosts[0], port)]
+            moved = [host for host in server.hosts if fleet._assignments[(host, port)] == worker]
+            del calls[:]
+            fleet._processes[worker].terminate()
+
+            await wait_for(lambda: fleet.stats()['workers'] == 1)
+            self.assertEqual(set(fleet._assignments.values()), set(fleet._processes))
+
+            # the new worker reports the current state of the devices that it took over
+            await wait_for(lambda: sorted(calls) == sorted(moved))
+
+            fleet.remove(server.hosts[0], port)
+            self.assertNotIn((server.hosts[0], port), fleet.updates)
+        finally:
+            await fleet.stop()
+            await server.close()
+
+        self.assertEqual(fleet.stats()['workers'], 0)
+
+    @awaiter
+    async def test_stop(self):
+        """Check that the worker processes have exited when `stop` returns.
+
+        """
+        fleet = ShardedFleet(workers=2)
+        fleet.start()
+        processes = list(fleet._processes.values())
+        self.assertEqual(len(processes), 2)
+
+        await fleet.stop()
+        self.assertEqual([process.is_alive() for process in processes], [False, False])
+        self.assertEqual(fleet.stats()['workers'], 0)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,290 @@
+import asyncio
+import socket
+import sys
+import time
+import unittest
+
+sys.path.insert(0, '..')
+
+from aio_androidtv.adb_manager import TCP_KEEPALIVE_PROBES, ADBPython
+from aio_androidtv.supervisor import STATE_CLOSED, STATE_OPEN, ConnectionSupervisor
+
+from .async_wrapper import awaiter
+from .fake_adbd import FAILURE_STALL, FakeAdbServer
+
+
+class TestConnectionSupervisor(unittest.TestCase):
+    """Test the `ConnectionSupervisor` class, against the fake ADB server."""
+
+    @awaiter
+    async def test_reconnect(self):
+        """Check that commands fail fast while the device is down and that the connection is re-established.
+
+        """
+        server = FakeAdbServer()
+        port = await server.start()
+        try:
+            adb = ADBPython('127.0.0.1', port)
+            self.assertTrue(await adb.connect())
+            supervisor = adb.supervise(min_backoff_s=0.02, max_backoff_s=0.08, jitter=0.)
+            self.assertIs(adb.supervise(), supervisor)
+            self.assertTrue(supervisor.running)
+            self.assertEqual(await adb.shell('dumpsys power'), server.respond('dumpsys power'))
+
+            # the device drops off the network
+            await server.close()
+            with self.assertRaises((ConnectionError, ValueError)):
+                await adb.shell('dumpsys power')
+
+            self.assertEqual(supervisor.state, STATE_OPEN)
+            self.assertFalse(adb.available)
+
+            start = time.monotonic()
+            self.assertIsNone(await adb.shell('dumpsys power'))
+            self.assertFalse(await adb.connect())
+            self.assertLess(time.monotonic() - start, 0.01)
+
+            # the backoff grows, up to `max_backoff_s`
+            await asyncio.sleep(0.3)
+            stats = supervisor.stats()
+            self.assertEqual(stats['trips'], 1)
+            self.assertGreaterEqual(stats['failed_attempts'], 3)
+            self.assertEqual(stats['attempts'], stats['failed_attempts'])
+            self.assertEqual(stats['reconnects'], 0)
+            self.assertLessEqual(stats['next_attempt_s'] or 0., 0.08)
+
+            # the device comes back
+            server = FakeAdbServer(port=port)
+            await server.start()
+            await asyncio.sleep(0.15)
+            self.assertEqual(supervisor.state, STATE_CLOSED)
+            self.assertTrue(adb.available)
+            self.assertEqual(supervisor.stats()['reconnects'], 1)
+            self.assertEqual(await adb.shell('dumpsys power'), server.respond('dumpsys power'))
+
+            await supervisor.stop()
+            self.assertFalse(supervisor.running)
+            await adb.close()
+
+        finally:
+            await server.close()
+
+    @awaiter
+    async def test_not_connected(self):
+        """Check that the supervisor connects if the connection is not established when it starts.
+
+        """
+        server = FakeAdbServer()
+        port = await server.start()
+        try:
+            adb = ADBPython('127.0.0.1', port)
+            supervisor = adb.supervise(min_backoff_s=0.01, jitter=0.)
+            self.assertIsNone(await adb.shell('dumpsys power'))
+
+            await asyncio.sleep(0.1)
+            self.assertTrue(adb.available)
+            self.assertEqual(supervisor.stats()['trips'], 1)
+            self.assertEqual(await adb.shell('dumpsys power'), server.respond('dumpsys power'))
+
+            await supervisor.stop()
+            await adb.close()
+
+        finally:
+            await server.close()
+
+    @awaiter
+    async def test_keepalive(self):
+        """Check that the idle connection is probed and that a connection that stopped responding is replaced.
+
+        """
+        server = FakeAdbServer()
+        port = await server.start()
+        try:
+            adb = ADBPython('127.0.0.1', port)
+            self.assertFalse(await adb.probe())
+            self.assertTrue(await adb.connect())
+            supervisor = adb.supervise(min_backoff_s=0.01, jitter=0., keepalive_interval_s=0.05, keepalive_timeout_s=0.05)
+
+            # the connection is only probed while it is idle
+            for _ in range(5):
+                await adb.shell('dumpsys power')
+                await asyncio.sleep(0.02)
+            self.assertEqual(supervisor.stats()['probes'], 0)
+
+            await asyncio.sleep(0.12)
+            self.assertGreaterEqual(supervisor.stats()['probes'], 1)
+            self.assertEqual(server.commands, 5 + supervisor.stats()['probes'])
+            self.assertEqual(supervisor.stats()['trips'], 0)
+
+            # the device stops responding
+            server.failure_rate = 1.
+            server.failure_modes = (FAILURE_STALL,)
+            await asyncio.sleep(0.15)
+            self.assertGreaterEqual(supervisor.stats()['trips'], 1)
+            self.assertGreaterEqual(supervisor.stats()['reconnects'], 1)
+
+            # the device responds again, and the command is sent on a new connection
+            server.failure_rate = 0.
+            await asyncio.sleep(0.1)
+            self.assertEqual(supervisor.state, STATE_CLOSED)
+            self.assertEqual(await adb.shell('dumpsys power'), server.respond('dumpsys power'))
+            self.assertGreaterEqual(server.connections, 2)
+
+            await supervisor.stop()
+            await adb.close()
+
+        finally:
+            await server.close()
+
+    @awaiter
+    async def test_probe_cancelled(self):
+        """Check that cancelling a probe cancels the caller instead of reporting the connection as dead.
+
+        """
+        server = FakeAdbServer()
+        port = await server.start()
+        try:
+            adb = ADBPython('127.0.0.1', port)
+            self.assertTrue(await adb.connect())
+            supervisor = adb.supervise(min_backoff_s=0.01, jitter=0.)
+
+            server.failure_rate = 1.
+            server.failure_modes = (FAILURE_STALL,)
+            task = asyncio.ensure_future(adb.probe(1.))
+            await asyncio.sleep(0.05)
+            task.cancel()
+            with self.assertRaises(asyncio.CancelledError):
+                await task
+
+            self.assertEqual(supervisor.stats()['trips'], 0)
+            self.assertEqual(supervisor.state, STATE_CLOSED)
+
+            await supervisor.stop()
+            await adb.close()
+
+        finally:
+            await server.close()
+
+    @awaiter
+    async def test_probe_command_in_flight(self):
+        """Check that a probe only reports the connection as alive while the command in flight is younger than its timeout.
+
+        """
+        server = FakeAdbServer()
+        port = await server.start()
+        try:
+            adb = ADBPython('127.0.0.1', port)
+            self.assertTrue(await adb.connect())
+            last_used = adb._last_used
+
+            # the device stops responding to a command
+            server.failure_rate = 1.
+            server.failure_modes = (FAILURE_STALL,)
+            task = asyncio.ensure_future(adb.shell('dumpsys power', timeout_s=1.))
+            await asyncio.sleep(0.01)
+
+            self.assertTrue(await adb.probe(0.1))
+            await asyncio.sleep(0.1)
+            self.assertFalse(await adb.probe(0.1))
+            self.assertEqual(adb._last_used, last_used)
+            self.assertEqual(server.commands, 1)
+
+            task.cancel()
+            await asyncio.gather(task, return_exceptions=True)
+            await adb.close()
+
+        finally:
+            await server.close()
+
+    @awaiter
+    async def test_tcp_keepalive(self):
+        """Check that the TCP keepalive options are set on the socket.
+
+        """
+        server = FakeAdbServer()
+        port = await server.start()
+        try:
+            adb = ADBPython('127.0.0.1', port, tcp_keepalive_s=5)
+            self.assertTrue(await adb.connect())
+
+            sock = adb._adb._handle._writer.get_extra_info('socket')
+            self.assertTrue(sock.getsockopt(socket.SOL_SOCKET, socket.SO_KEEPALIVE))
+            if hasattr(socket, 'TCP_KEEPIDLE'):
+                self.assertEqual(sock.getsockopt(socket.IPPROTO_TCP, socket.TCP_KEEPIDLE), 5)
+            if hasattr(socket, 'TCP_KEEPCNT'):
+                self.assertEqual(sock.getsockopt(socket.IPPROTO_TCP, socket.TCP_KEEPCNT), TCP_KEEPALIVE_PROBES)
+
+            await adb.close()
+
+        finally:
+            await server.close()
+
+    @awaiter
+    async def test_stopped(self):
+        """Check that the circuit does not open when the supervisor is not running, and that `stop` closes it.
+
+        """
+        supervisor = ConnectionSupervisor(ADBPython('127.0.0.1', 5555), jitter=0.)
+        supervisor.trip()
+        self.assertEqual(supervisor.state, STATE_CLOSED)
+        self.assertEqual(supervisor._jittered(2.), 2.)
+
+        supervisor.state = STATE_OPEN
+        await supervisor.stop()
+        self.assertEqual(supervisor.state, STATE_CLOSED)
+
+    @awaiter
+    async def test_stop_during_reconnect(self):
+        """Check that `stop` ends the supervisor while a reconnect attempt is in progress.
+
+        """
+        adb = ADBPython('127.0.0.1', 5555)
+        connecting = asyncio.Event()
+
+        async def slow_connect(**kwargs):
+            connecting.set()
+            await asyncio.sleep(10.)
+            return True
+
+        adb._connect = slow_connect
+        supervisor = ConnectionSupervisor(adb, min_backoff_s=0., jitter=0.)
+        supervisor.start()
+        await asyncio.wait_for(connecting.wait(), 1.)
+
+        await asyncio.wait_for(supervisor.stop(), 1.)
+        self.assertFalse(supervisor.running)
+        self.assertEqual(supervisor.state, STATE_CLOSED)
+        self.assertEqual(supervisor.stats()['reconnects'], 0)
+
+
+    def test_new_event_loop(self):
+        """Check that the supervisor runs in an event loop other than the one that was current when it was created.
+
+        """
+        adb = ADBPython('127.0.0.1', 5555)
+        supervisor = ConnectionSupervisor(adb, min_backoff_s=0., jitter=0.)
+
+        async def connect(**kwargs):
+            return True
+
+        async def run():
+            adb._connect = connect
+            supervisor.start()
+            await asyncio.sleep(0.02)
+            supervisor.trip()
+            await asyncio.sleep(0.02)
+            self.assertTrue(supervisor.running)
+            await supervisor.stop()
+
+        loop = asyncio.new_event_loop()
+        try:
+            loop.run_until_complete(run())
+        finally:
+            loop.close()
+
+        self.assertEqual(supervisor.stats()['trips'], 2)
+        self.assertEqual(supervisor.stats()['reconnects'], 2)
+
+
+if __name__ == "__main__":
+    unittest.main()
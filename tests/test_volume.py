@@ -0,0 +1,134 @@
+import asyncio
+import sys
+import unittest
+from unittest.mock import patch
+
+sys.path.insert(0, '..')
+
+from aio_androidtv.androidtv import AndroidTV
+
+from . import patchers
+from .async_wrapper import awaiter
+
+
+DEBOUNCE_S = 0.02
+
+
+class TestVolumeController(unittest.TestCase):
+    """Test the `VolumeController` class."""
+
+    PATCH_KEY = 'python'
+
+    def setUp(self):
+        with patchers.PATCH_ADB_DEVICE_TCP, patchers.patch_connect(True)[self.PATCH_KEY], patchers.patch_shell('')[self.PATCH_KEY]:
+            self.atv = AndroidTV('HOST', 5555)
+            self.atv.max_volume = 60.
+
+    @awaiter
+    async def test_coalesce(self):
+        """Check that rapid volume changes are sent as one ``set_volume_level`` command.
+
+        """
+        controller = self.atv.volume_controller(debounce_s=DEBOUNCE_S)
+        self.assertIs(self.atv.volume_controller(), controller)
+        self.assertEqual(controller.debounce_s, DEBOUNCE_S)
+
+        with patch.object(self.atv, 'volume', return_value=22, new_callable=patchers.AsyncMock) as volume, patch.object(self.atv, 'set_volume_level', new_callable=patchers.AsyncMock) as set_volume_level:
+            for i in range(5):
+                self.assertEqual(await controller.volume_up(), (23. + i) / 60)
+            self.assertEqual(await controller.volume_down(2), 25. / 60)
+
+            # the current volume was only determined once and nothing has been sent yet
+            self.assertEqual(volume.call_count, 1)
+            set_volume_level.assert_not_called()
+            self.assertEqual(controller.target, 25)
+
+            await asyncio.sleep(DEBOUNCE_S * 1.5)
+            set_volume_level.assert_called_once_with(25. / 60)
+            self.assertEqual(controller.commands, 1)
+
+            # the target is kept while the changes continue
+            self.assertEqual(await controller.volume_up(), 26. / 60)
+            self.assertEqual(volume.call_count, 1)
+            await asyncio.sleep(DEBOUNCE_S * 1.5)
+            set_volume_level.assert_called_with(26. / 60)
+
+            # the target is forgotten after a window without changes
+            await asyncio.sleep(DEBOUNCE_S * 2)
+            self.assertIsNone(controller.target)
+            self.assertEqual(set_volume_level.call_count, 2)
+
+            self.assertEqual(await controller.volume_up(), 23. / 60)
+            self.assertEqual(volume.call_count, 2)
+            await controller.close()
+            set_volume_level.assert_called_with(23. / 60)
+            self.assertIsNone(controller.target)
+
+    @awaiter
+    async def test_set_volume_level(self):
+        """Check the absolute volume changes, the range of the target, and ``flush``.
+
+        """
+        controller = self.atv.volume_controller(debounce_s=10.)
+
+        with patch.object(self.atv, 'volume', return_value=None, new_callable=patchers.AsyncMock) as volume, patch.object(self.atv, 'set_volume_level', new_callable=patchers.AsyncMock) as set_volume_level:
+            self.assertEqual(await controller.set_volume_level(0.5), 0.5)
+            self.assertEqual(await controller.volume_down(40), 0.)
+            self.assertEqual(await controller.volume_up(100), 1.)
+            volume.assert_not_called()
+
+            await controller.flush()
+            set_volume_level.assert_called_once_with(1.)
+            await controller.flush()
+            self.assertEqual(controller.commands, 1)
+
+            await controller.close()
+            self.assertEqual(set_volume_level.call_count, 1)
+
+            # the current volume cannot be determined
+            self.atv.max_volume = None
+            self.assertIsNone(await controller.set_volume_level(0.5))
+            self.assertIsNone(await controller.volume_up())
+            self.assertEqual(volume.call_count, 2)
+
+    @awaiter
+    async def test_failure(self):
+        """Check that a failed command is logged and that the target is forgotten.
+
+        """
+        controller = self.atv.volume_controller(debounce_s=DEBOUNCE_S)
+
+        with patch.object(self.atv, 'volume', return_value=22, new_callable=patchers.AsyncMock), patch.object(self.atv, 'set_volume_level', side_effect=ConnectionResetError, new_callable=patchers.AsyncMock):
+            with self.assertLogs('aio_androidtv.volume', 'WARNING'):
+                await controller.volume_up()
+                await asyncio.sleep(DEBOUNCE_S * 1.5)
+
+            self.assertIsNone(controller.target)
+
+
+    def test_new_event_loop(self):
+        """Check that concurrent volume changes work in an event loop other than the one that was current when the controller was created.
+
+        """
+        controller = self.atv.volume_controller(debounce_s=DEBOUNCE_S)
+
+        async def volume():
+            await asyncio.sleep(0.01)
+            return 22
+
+        async def run():
+            with patch.object(self.atv, 'volume', volume), patch.object(self.atv, 'set_volume_level', new_callable=patchers.AsyncMock) as set_volume_level:
+                levels = await asyncio.gather(controller.volume_up(), controller.volume_up())
+                await controller.close()
+                set_volume_level.assert_called_once_with(24. / 60)
+                return levels
+
+        loop = asyncio.new_event_loop()
+        try:
+            self.assertEqual(loop.run_until_complete(run()), [23. / 60, 24. / 60])
+        finally:
+            loop.close()
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,153 @@
+import asyncio
+import sys
+import unittest
+from unittest.mock import patch
+
+sys.path.insert(0, '..')
+
+from aio_androidtv import constants
+from aio_androidtv.androidtv import AndroidTV
+from aio_androidtv.watch import StateChange, Subscription, WatchHub
+
+from . import patchers
+from .async_wrapper import awaiter
+
+
+UPDATE1 = (constants.STATE_IDLE, 'com.amazon.tv.launcher', ['com.amazon.tv.launcher'], 'hmdi_arc', False, 0.5)
+
+UPDATE2 = (constants.STATE_PLAYING, 'com.netflix.ninja', ['com.amazon.tv.launcher', 'com.netflix.ninja'], 'hmdi_arc', False, 0.5)
+
+UPDATE3 = (constants.STATE_PLAYING, 'com.netflix.ninja', ['com.amazon.tv.launcher', 'com.netflix.ninja'], 'hmdi_arc', True, 0.5)
+
+
+class TestWatch(unittest.TestCase):
+    """Test the `BaseTV.watch` method."""
+
+    PATCH_KEY = 'python'
+
+    def setUp(self):
+        with patchers.PATCH_ADB_DEVICE_TCP, patchers.patch_connect(True)[self.PATCH_KEY], patchers.patch_shell('')[self.PATCH_KEY]:
+            self.atv = AndroidTV('HOST', 5555)
+
+    @awaiter
+    async def test_shared_poll(self):
+        """Check that several subscribers share one poll and only receive the transitions they asked for.
+
+        """
+        updates = [(frozenset(), UPDATE1), (frozenset(), UPDATE2), (frozenset(), UPDATE3)] + [(frozenset(), None)] * 100
+
+        with patch.object(self.atv, 'update_if_changed', side_effect=updates, new_callable=patchers.AsyncMock) as update_if_changed:
+            changes1 = self.atv.watch(min_interval_s=0.001)
+            changes2 = self.atv.watch(fields=('is_volume_muted',))
+            self.assertIs(self.atv._watch_hub.poller.min_interval_s, 0.001)
+
+            async with changes1, changes2:
+                change1 = await changes1.__anext__()
+                self.assertEqual(change1, StateChange({'state': (None, constants.STATE_IDLE), 'current_app': (None, 'com.amazon.tv.launcher'), 'is_volume_muted': (None, False), 'volume_level': (None, 0.5)}, UPDATE1))
+                self.assertEqual((await changes1.__anext__()).changes, {'state': (constants.STATE_IDLE, constants.STATE_PLAYING), 'current_app': ('com.amazon.tv.launcher', 'com.netflix.ninja')})
+                self.assertEqual((await changes1.__anext__()).changes, {'is_volume_muted': (False, True)})
+
+                self.assertEqual((await changes2.__anext__()).changes, {'is_volume_muted': (None, False)})
+                self.assertEqual((await changes2.__anext__()).changes, {'is_volume_muted': (False, True)})
+
+            # the device is no longer polled once all subscriptions are closed
+            calls = update_if_changed.call_count
+            await asyncio.sleep(0.01)
+            self.assertEqual(update_if_changed.call_count, calls)
+
+            # the iteration ends after the subscription is closed
+            self.assertEqual([change async for change in changes1], [])
+
+            # a new subscriber starts with the current state
+            async with self.atv.watch(fields=('state',)) as changes3:
+                self.assertEqual((await changes3.__anext__()).changes, {'state': (None, constants.STATE_PLAYING)})
+
+    @awaiter
+    async def test_drop_oldest(self):
+        """Check that the oldest state change is dropped when a subscriber's queue is full.
+
+        """
+        with patch.object(self.atv, 'update_if_changed', return_value=(frozenset(), None), new_callable=patchers.AsyncMock):
+            changes = self.atv.watch(queue_size=2, min_interval_s=10.)
+            hub = self.atv._watch_hub
+
+            for update in (UPDATE1, UPDATE2, UPDATE3):
+                hub._dispatch(update)
+
+            await changes.close()
+            self.assertEqual(changes.dropped, 1)
+            self.assertEqual([change.update async for change in changes], [UPDATE2, UPDATE3])
+
+    def test_new_event_loop(self):
+        """Check that a subscription created outside of an event loop can be iterated in another event loop.
+
+        """
+        hub = WatchHub(self.atv)
+        changes = Subscription(hub, ('state',), 2)
+
+        async def run():
+            task = asyncio.ensure_future(changes.__anext__())
+            await asyncio.sleep(0)
+            changes._deliver({'state': (None, constants.STATE_IDLE)}, UPDATE1)
+            change = await asyncio.wait_for(task, 1.)
+            await changes.close()
+            return change
+
+        loop = asyncio.new_event_loop()
+        try:
+            self.assertEqual(loop.run_until_complete(run()), StateChange({'state': (None, constants.STATE_IDLE)}, UPDATE1))
+        finally:
+            loop.close()
+
+    @awaiter
+    async def test_poller_done(self):
+        """Check that the iterations end when the polling task ends while there are subscriptions.
+
+        """
+        with patch.object(self.atv, 'update_if_changed', return_value=(frozenset(), None), new_callable=patchers.AsyncMock):
+            changes = self.atv.watch(min_interval_s=0.01)
+            hub = self.atv._watch_hub
+            await asyncio.sleep(0.02)
+
+            with self.assertLogs('aio_androidtv.watch', 'WARNING'):
+                hub.poller._task.cancel()
+                self.assertEqual(await asyncio.wait_for(self._collect(changes), 1.), [])
+
+            # the polling task fails
+            with patch.object(hub.poller, 'run', side_effect=RuntimeError("poller failed"), new_callable=patchers.AsyncMock):
+                changes = self.atv.watch()
+                with self.assertRaises(RuntimeError):
+                    await asyncio.wait_for(changes.__anext__(), 1.)
+
+            # a new subscription restarts the polling
+            async with self.atv.watch() as changes:
+                self.assertFalse(hub.poller._task.done())
+
+    @awaiter
+    async def test_update_if_changed_called_directly(self):
+        """Check that a transition is delivered even if a direct call to ``update_if_changed`` received it first.
+
+        """
+        updates = [(frozenset(), UPDATE1)]
+
+        async def update_if_changed(*args, **kwargs):
+            if updates:
+                self.atv._last_update = updates[0][1]
+                return updates.pop()
+            return frozenset(), None
+
+        with patch.object(self.atv, 'update_if_changed', update_if_changed):
+            async with self.atv.watch(fields=('state',), min_interval_s=0.01) as changes:
+                self.assertEqual((await changes.__anext__()).changes, {'state': (None, constants.STATE_IDLE)})
+
+                # another caller receives the change
+                self.atv._last_update = UPDATE2
+                self.assertEqual((await asyncio.wait_for(changes.__anext__(), 1.)).changes, {'state': (constants.STATE_IDLE, constants.STATE_PLAYING)})
+
+    @staticmethod
+    async def _collect(changes):
+        return [change async for change in changes]
+
+
+if __name__ == "__main__":
+    unittest.main()